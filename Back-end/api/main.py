@@ -4,7 +4,7 @@ import asyncio
 import logging
 from typing import Optional 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, HTTPException, Depends 
+from fastapi import FastAPI, Request, HTTPException, Depends, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,7 +18,7 @@ from core.ai_models.youtube_handler import youtube_handler_instance
 from core.config import settings
 from utils.file_cleaner import start_background_cleanup
 from api.dependencies import get_rag_orchestrator 
-from api.routers import admin_api, chat_api, avatar_api, import_api, sheets_api, analytics_api, line_webhook, alert_api
+from api.routers import admin_api, chat_api, avatar_api, import_api, sheets_api, analytics_api, line_webhook, alert_api, image_api
 
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("uvicorn").propagate = False
@@ -41,6 +41,10 @@ async def lifespan(app: FastAPI):
     
     from core.services.analytics_service import AnalyticsService
     app.state.analytics_service = AnalyticsService(app.state.mongo_manager)
+    from core.services.analytics_buffer import analytics_buffer
+    analytics_buffer.start()
+    from core.services.analytics_rollup_service import analytics_rollup_service
+    analytics_rollup_service.start()
     
     try:
         await app.state.qdrant_manager.initialize()
@@ -52,11 +56,28 @@ async def lifespan(app: FastAPI):
     logging.info("✅ [Lifespan] งานทำความสะอาดเบื้องหลังเริ่มต้นแล้ว")
     
     # เริ่ม News Scheduler สำหรับ Smart News Monitor
+    # AlertBus (Redis) จะเลือก leader ให้มีเพียง process เดียวที่รัน scheduler และกระจาย alert ให้ทุก worker
     from core.services.news_scheduler import news_scheduler
     from core.services.alert_manager import alert_manager
+    from core.services.alert_bus import alert_bus
     news_scheduler.set_alert_callback(alert_manager.broadcast_alert)
-    news_scheduler.start()
-    logging.info("✅ [Lifespan] News Scheduler เริ่มทำงาน")
+    await alert_bus.start(alert_manager, news_scheduler)
+    logging.info("✅ [Lifespan] Alert Bus / News Scheduler เริ่มทำงาน")
+
+    # ดึงรูป Google ล่วงหน้าช่วงคนใช้น้อย ให้สถานที่ที่ไม่มีรูปในเครื่อง (ใช้ leader ของ AlertBus ถ้ามี Redis)
+    from core.services.image_prefetch_service import ImagePrefetchService
+    app.state.image_prefetcher = ImagePrefetchService(app.state.rag_orchestrator.image_service)
+    app.state.image_prefetcher.start()
+
+    # 📝 โหลด prompt ใหม่อัตโนมัติเมื่อแก้ไฟล์ใน prompts/ (ถ้ามี watchdog)
+    from core.services.prompt_registry import prompt_registry
+    prompt_registry.start_watching()
+
+    # 🎤 โหลด Local Whisper (ระบบสำรองของ Groq) เบื้องหลัง ไม่ให้ผู้ใช้คนแรกที่ Groq ล่มต้องรอโหลดโมเดล
+    from core.ai_models.speech_handler import speech_handler_instance
+    app.state.whisper_preload_task = None
+    if settings.WHISPER_PRELOAD:
+        app.state.whisper_preload_task = asyncio.create_task(speech_handler_instance.preload_local_model())
     
     logging.info("✅ [Lifespan] เริ่มต้นเสร็จสมบูรณ์ พร้อมให้บริการ")
     
@@ -67,13 +88,31 @@ async def lifespan(app: FastAPI):
     await app.state.query_interpreter.close()
     
     app.state.cleanup_task.cancel()
+    app.state.rag_orchestrator.image_service.stop_watcher()
+    await app.state.image_prefetcher.stop()
+    if app.state.whisper_preload_task:
+        app.state.whisper_preload_task.cancel()
+    speech_handler_instance.local_engine.shutdown()
+    prompt_registry.stop_watching()
     logging.info("✅ [Lifespan] งานทำความสะอาดเบื้องหลังหยุดแล้ว")
     
     # หยุด News Scheduler
     from core.services.news_scheduler import news_scheduler
+    from core.services.alert_bus import alert_bus
+    await alert_bus.stop()
     news_scheduler.stop()
+    
     logging.info("✅ [Lifespan] News Scheduler หยุดทำงาน")
     
+    # เขียน analytics events ที่ค้างใน buffer ก่อนปิด connection
+    from core.services.analytics_buffer import analytics_buffer
+    from core.services.analytics_rollup_service import analytics_rollup_service
+    await analytics_rollup_service.stop()
+    await analytics_buffer.stop()
+    
+    from core.database.async_mongo import close_async_client
+    await close_async_client()
+    
     logging.info("✅ [Lifespan] ปิดการทำงานสมบูรณ์")
 
 
@@ -107,6 +146,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 app.include_router(admin_api.router, prefix="/api/admin") 
@@ -117,6 +157,7 @@ app.include_router(sheets_api.router, prefix="/api/admin/sheets")  # Google Shee
 app.include_router(analytics_api.router, prefix="/api/analytics")  # Feedback & Stats
 app.include_router(line_webhook.router, prefix="/api/v1/line")     # LINE Webhook
 app.include_router(alert_api.router, prefix="/api")                 # Smart News Alerts
+app.include_router(image_api.router, prefix="/api/images")          # Thumbnail / Preview / WebP variants
 
 
 @app.get("/health", tags=["Health"])
@@ -157,12 +198,22 @@ async def health_check(request: Request):
 async def get_navigation_list(
     lat: Optional[float] = None, 
     lon: Optional[float] = None, 
+    limit: Optional[int] = Query(None, ge=1, le=500, description="จำนวนต่อหน้า (ไม่ระบุ = ทั้งหมด)"),
+    offset: int = Query(0, ge=0),
+    radius_km: Optional[float] = Query(None, gt=0, description="เฉพาะสถานที่ในรัศมี (ต้องส่ง lat/lon)"),
     orchestrator: RAGOrchestrator = Depends(get_rag_orchestrator)
 ):
     try:
-        location_list = await orchestrator.get_navigation_list(user_lat=lat, user_lon=lon)
+        location_list, total = await orchestrator.get_navigation_list(
+            user_lat=lat, user_lon=lon, limit=limit, offset=offset, radius_km=radius_km
+        )
         from fastapi.responses import JSONResponse
-        return JSONResponse(content=location_list, media_type="application/json; charset=utf-8")
+        # คง response เป็น list เหมือนเดิม - จำนวนทั้งหมดส่งทาง header สำหรับทำหน้าถัดไป
+        return JSONResponse(
+            content=location_list,
+            media_type="application/json; charset=utf-8",
+            headers={"X-Total-Count": str(total)}
+        )
     except Exception as e:
         logging.error(f"❌ [API-NavList] เกิดข้อผิดพลาดในการดึงรายการนำทาง: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="ไม่สามารถดึงข้อมูลรายการนำทางได้")
@@ -5,7 +5,7 @@ from pathlib import Path
 from typing import List, Dict, Any
 from bson import ObjectId
 from fastapi import (APIRouter, Body, Depends, File, HTTPException, UploadFile,
-                     status, Query)
+                     status, Query, Request)
 from pydantic import ValidationError
 
 from ..schemas import (LocationAdminSummaryWithImage, LocationBase, LocationInDB,
@@ -81,6 +81,7 @@ async def upload_location_image(
 
 @router.post("/sync-images", tags=["Admin :: Image Sync"])
 async def sync_images(
+    request: Request,
     db: MongoDBManager = Depends(get_mongo_manager)
 ):
     """
@@ -92,11 +93,17 @@ async def sync_images(
     - ตรวจสอบว่ารูปภาพทั้งหมดถูกบันทึกในฐานข้อมูล
     
     Returns:
-        สรุปผลการ sync (จำนวนรูป prefix ที่พบ และบันทึก)
+        สรุปผลการ sync (จำนวนรูป prefix ที่พบ และบันทึก/ลบเฉพาะไฟล์ที่เปลี่ยน)
     """
     try:
-        sync_service = ImageSyncService(db)
-        result = await asyncio.to_thread(sync_service.sync_images)
+        orchestrator = getattr(request.app.state, "rag_orchestrator", None)
+        if orchestrator is not None:
+            # sync แบบ incremental และอัปเดต cache รูปของ RAG ทันที
+            result = await orchestrator.image_service.sync_now()
+        else:
+            sync_service = ImageSyncService(db)
+            result = await asyncio.to_thread(sync_service.sync_images)
+            result.pop("changes", None)
         logging.info(f"✅ [API] Image Sync สำเร็จ: {result}")
         return result
     except Exception as e:
@@ -104,6 +111,16 @@ async def sync_images(
         raise HTTPException(status_code=500, detail=f"Image sync failed: {e}")
 
 
+@router.get("/embedding/stats", tags=["Admin :: Monitoring"])
+async def get_embedding_stats(
+    vector_db: QdrantManager = Depends(get_qdrant_manager)
+):
+    """
+    📊 สถิติของ Embedding Micro-Batcher (Histogram ขนาด batch, เวลา encode เฉลี่ย)
+    """
+    return vector_db.get_embedding_stats()
+
+
 @router.get("/analytics/dashboard", tags=["Admin :: Analytics"])
 async def get_analytics_dashboard(
     days: int = Query(30, description="จำนวนวันย้อนหลังที่ต้องการดูข้อมูล"),
@@ -11,6 +11,7 @@ from datetime import datetime, timezone
 
 from core.services.alert_manager import alert_manager
 from core.services.news_scheduler import news_scheduler
+from core.services.alert_bus import alert_bus
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +60,7 @@ async def alert_websocket(websocket: WebSocket):
             # Keep connection alive
             # Client สามารถส่ง "ping" มาเพื่อ keep alive
             data = await websocket.receive_text()
+            alert_manager.touch(websocket)
             
             if data == "ping":
                 await alert_manager.send_to_one(websocket, {"type": "pong"})
@@ -106,11 +108,62 @@ async def get_alert_stats():
         "stats": {
             "active_connections": alert_manager.connection_count,
             "total_alerts": alert_manager.alert_count,
-            "scheduler_running": news_scheduler.running
+            "scheduler_running": news_scheduler.running,
+            "fanout": alert_manager.get_metrics(),
+            "bus": alert_bus.get_status()
         }
     }
 
 
+@router.get("/pipeline/stats")
+async def get_pipeline_stats():
+    """สถิติ News Pipeline: จำนวนข่าวใหม่/ซ้ำ และ LLM calls ที่ประหยัดได้ในแต่ละรอบ"""
+    return {"success": True, "stats": news_scheduler.get_pipeline_stats()}
+
+
+@router.get("/pipeline/runs")
+async def get_pipeline_runs(limit: int = 50):
+    """เวลาแต่ละ stage ของรอบ NewsScheduler ย้อนหลัง (บันทึกใน MongoDB)"""
+    from core.services.alert_storage_service import alert_storage_service
+    
+    runs = await alert_storage_service.get_pipeline_runs(limit=limit)
+    return {"success": True, "count": len(runs), "runs": runs}
+
+
+@router.get("/geocoding/stats")
+async def get_geocoding_stats():
+    """สถิติ Geocoding: hit ของ Gazetteer/Cache และจำนวนที่ต้องถาม Nominatim"""
+    from core.services.geocoding_service import geocoding_service
+    return {"success": True, "stats": geocoding_service.get_stats()}
+
+
+@router.get("/conditions/cache")
+async def get_conditions_cache_stats():
+    """สถิติ cache ของ Weather / PM2.5 (hit, stale hit, จำนวนครั้งที่เรียก API จริง)"""
+    from core.services.weather_service import weather_service
+    from core.services.air_quality_service import air_quality_service
+    return {
+        "success": True,
+        "weather": weather_service.get_cache_stats(),
+        "air_quality": air_quality_service.get_cache_stats()
+    }
+
+
+@router.get("/news/analyzed")
+async def get_cached_news_analyses(limit: int = 20, min_severity: int = 1):
+    """
+    ดึงผลวิเคราะห์ข่าวที่เก็บไว้ (ยังไม่หมดอายุ) โดยไม่ต้องเรียก LLM ใหม่
+    """
+    from core.services.news_seen_store import news_seen_store
+    
+    analyses = await news_seen_store.get_cached_analyses(limit=limit, min_severity=min_severity)
+    return {
+        "success": True,
+        "count": len(analyses),
+        "alerts": analyses
+    }
+
+
 @router.post("/test")
 async def send_test_alert(request: TestAlertRequest):
     """
@@ -157,22 +210,28 @@ async def trigger_manual_poll():
 
 @router.post("/scheduler/start")
 async def start_scheduler():
-    """เริ่ม scheduler"""
-    if news_scheduler.running:
-        return {"success": False, "message": "Scheduler กำลังทำงานอยู่แล้ว"}
-    
+    """เริ่ม scheduler (ผ่าน alert_bus: รันเฉพาะบน leader ไม่เกิด poller ซ้อนเมื่อมีหลาย worker)"""
     # ตั้ง callback สำหรับ broadcast
     news_scheduler.set_alert_callback(alert_manager.broadcast_alert)
-    news_scheduler.start()
-    
-    return {"success": True, "message": "Scheduler เริ่มทำงาน"}
+    try:
+        changed = await alert_bus.set_scheduler_enabled(True)
+    except Exception as e:
+        logger.error(f"❌ [AlertAPI] Scheduler start error: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    if not changed:
+        return {"success": False, "message": "Scheduler กำลังทำงานอยู่แล้ว", "bus": alert_bus.get_status()}
+    return {"success": True, "message": "Scheduler เริ่มทำงาน", "bus": alert_bus.get_status()}
 
 
 @router.post("/scheduler/stop")
 async def stop_scheduler():
-    """หยุด scheduler"""
-    news_scheduler.stop()
-    return {"success": True, "message": "Scheduler หยุดทำงาน"}
+    """หยุด scheduler (มีผลกับ leader ไม่ว่า request จะเข้า worker ไหน)"""
+    try:
+        await alert_bus.set_scheduler_enabled(False)
+    except Exception as e:
+        logger.error(f"❌ [AlertAPI] Scheduler stop error: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"success": True, "message": "Scheduler หยุดทำงาน", "bus": alert_bus.get_status()}
 
 
 @router.delete("/history")
@@ -185,14 +244,15 @@ async def clear_alert_history():
 # ====== MongoDB Endpoints ======
 
 @router.get("/db/recent")
-async def get_alerts_from_db(limit: int = 50, min_severity: int = 1, skip: int = 0):
+async def get_alerts_from_db(limit: int = 50, min_severity: int = 1, skip: int = 0, before: Optional[str] = None):
     """
     ดึง alerts จาก MongoDB (persisted)
     
     Args:
         limit: จำนวนสูงสุด
         min_severity: ระดับความสำคัญขั้นต่ำ
-        skip: จำนวนที่ข้าม (สำหรับ pagination)
+        skip: จำนวนที่ข้าม (สำหรับ pagination แบบเดิม)
+        before: ส่ง next_before จากหน้าก่อนเพื่อดึงหน้าถัดไป (เร็วกว่า skip เมื่อข้อมูลเยอะ)
     """
     try:
         from core.services.alert_storage_service import alert_storage_service
@@ -200,13 +260,15 @@ async def get_alerts_from_db(limit: int = 50, min_severity: int = 1, skip: int =
         alerts = await alert_storage_service.get_recent_alerts(
             limit=limit,
             min_severity=min_severity,
-            skip=skip
+            skip=skip,
+            before=before
         )
         
         return {
             "success": True,
             "count": len(alerts),
-            "alerts": alerts
+            "alerts": alerts,
+            "next_before": alerts[-1]["_id"] if len(alerts) == limit else None
         }
     except Exception as e:
         logger.error(f"❌ [AlertAPI] DB query error: {e}")
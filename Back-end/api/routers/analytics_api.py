@@ -32,3 +32,31 @@ async def submit_feedback(request: Request, feedback: FeedbackSchema):
     )
     
     return {"status": "success", "message": "Feedback recorded"}
+
+@router.get("/ingest/stats")
+async def get_ingest_stats():
+    """
+    สถิติ AnalyticsBuffer: จำนวน events ที่ค้าง/เขียนแล้ว/ถูกทิ้ง และเวลา flush ล่าสุด
+    """
+    from core.services.analytics_buffer import analytics_buffer
+    return {"success": True, "stats": analytics_buffer.get_stats()}
+
+@router.get("/rollup/stats")
+async def get_rollup_stats():
+    """
+    สถานะ Analytics Rollup: เวลาอัปเดตล่าสุด ช่วงที่คำนวณ และสถิติ cache
+    """
+    from core.services.analytics_rollup_service import analytics_rollup_service
+    return {"success": True, "stats": analytics_rollup_service.get_stats()}
+
+@router.post("/rollup/refresh")
+async def refresh_rollups():
+    """
+    สั่งอัปเดต rollup ทันที (ไม่ต้องรอรอบถัดไปของ background job)
+    """
+    from core.services.analytics_rollup_service import analytics_rollup_service
+    try:
+        result = await analytics_rollup_service.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rollup failed: {e}")
+    return {"success": True, "refresh": result}
@@ -9,6 +9,7 @@ import asyncio
 from typing import Optional, List, Dict, Any 
 from core.ai_models.rag_orchestrator import RAGOrchestrator
 from core.ai_models.speech_handler import speech_handler_instance
+from core.ai_models.streaming_stt import StreamingTranscriber, parse_sample_rate
 from core.config import settings
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from ..dependencies import get_rag_orchestrator
@@ -63,6 +64,7 @@ async def process_orchestrator_result(result: Dict[str, Any]) -> Dict[str, Any]:
         "answer": result.get("answer", "ขออภัยค่ะ มีบางอย่างผิดพลาด"),
         "action": result.get("action"),
         "action_payload": result.get("action_payload"),
+        "language": result.get("language"),
     }
 
     image_url = result.get("image_url")
@@ -107,6 +109,21 @@ async def _handle_audio_input(websocket: WebSocket, audio_bytes: bytes, orchestr
             if is_websocket_active(websocket):
                 await websocket.send_text(json.dumps({"emotion": "confused", "answer": "ไม่ได้ยินที่คุณพูดเลยค่ะ ลองพูดอีกครั้งนะคะ", "isEmpty": True}))
             return
+    except (WebSocketDisconnect, StarletteWebSocketDisconnect, ConnectionResetError, BrokenPipeError):
+        logging.info("📴 [WebSocket] Audio stream interrupted by client (Normal)")
+        return
+    await _handle_transcript(websocket, transcribed_text, orchestrator, ai_mode)
+
+async def _handle_stream_chunk(websocket: WebSocket, stream: StreamingTranscriber, chunk: bytes, orchestrator: RAGOrchestrator, ai_mode: str = 'fast'):
+    """🎙️ Streaming STT: ป้อน chunk เข้า VAD ถ้าจบประโยคแล้วตอบทันที"""
+    transcribed_text = await stream.feed(chunk)
+    if transcribed_text and is_websocket_active(websocket):
+        await websocket.send_text(json.dumps({"action": "STT_FINAL", "text": transcribed_text, "emotion": "thinking"}))
+        await _handle_transcript(websocket, transcribed_text, orchestrator, ai_mode)
+
+async def _handle_transcript(websocket: WebSocket, transcribed_text: str, orchestrator: RAGOrchestrator, ai_mode: str = 'fast'):
+    if not is_websocket_active(websocket): return
+    try:
         logging.info(f"👂 [Avatar WebSocket] ได้ยิน (ดิบ): '{transcribed_text}' | โหมด: {ai_mode}")
         result = await orchestrator.answer_query(transcribed_text, mode='voice', ai_mode=ai_mode)
         payload = await process_orchestrator_result(result)
@@ -129,7 +146,7 @@ async def _handle_audio_input(websocket: WebSocket, audio_bytes: bytes, orchestr
         
         if text_to_speak and not is_music_action:
             if is_websocket_active(websocket):
-                 async for audio_chunk in speech_handler_instance.synthesize_speech_stream(text_to_speak):
+                 async for audio_chunk in speech_handler_instance.synthesize_speech_stream(text_to_speak, lang=payload.get("language")):
                      if is_websocket_active(websocket):
                          await websocket.send_bytes(audio_chunk)
     except (WebSocketDisconnect, StarletteWebSocketDisconnect, ConnectionResetError, BrokenPipeError):
@@ -166,7 +183,7 @@ async def _handle_text_input(websocket: WebSocket, query_text: str, orchestrator
         if text_to_speak and not is_music_action:
             if is_websocket_active(websocket):
                 try:
-                    async for audio_chunk in speech_handler_instance.synthesize_speech_stream(text_to_speak):
+                    async for audio_chunk in speech_handler_instance.synthesize_speech_stream(text_to_speak, lang=payload.get("language")):
                         if is_websocket_active(websocket):
                             await websocket.send_bytes(audio_chunk)
                 except (WebSocketDisconnect, StarletteWebSocketDisconnect, ConnectionResetError, BrokenPipeError):
@@ -194,6 +211,11 @@ async def handle_avatar_chat(websocket: WebSocket, orchestrator: RAGOrchestrator
     
     # 🆕 State tracking per connection
     current_ai_mode = 'fast' 
+    stt_stream: Optional[StreamingTranscriber] = None  # 🎙️ มีค่าเมื่อ client เปิดโหมด streaming STT
+
+    async def send_partial(text: str):
+        if is_websocket_active(websocket):
+            await websocket.send_text(json.dumps({"action": "STT_PARTIAL", "text": text}))
     
     try:
         while True:
@@ -215,6 +237,18 @@ async def handle_avatar_chat(websocket: WebSocket, orchestrator: RAGOrchestrator
                                 await _handle_idle_prompt(websocket)
                             elif data.get("action") == "SET_MODE":
                                 logging.info(f"🔄 [Avatar WS] อัปเดตโหมดเป็น: {current_ai_mode}")
+                            elif data.get("action") == "STT_START":
+                                if stt_stream is not None:
+                                    stt_stream.close()
+                                stt_stream = StreamingTranscriber(parse_sample_rate(data), on_partial=send_partial)
+                                logging.info(f"🎙️ [Avatar WS] เริ่ม streaming STT ({stt_stream.sample_rate} Hz)")
+                            elif data.get("action") == "STT_STOP" and stt_stream is not None:
+                                stream, stt_stream = stt_stream, None
+                                transcribed_text = await stream.flush()
+                                stream.close()
+                                if transcribed_text:
+                                    await websocket.send_text(json.dumps({"action": "STT_FINAL", "text": transcribed_text, "emotion": "thinking"}))
+                                    await _handle_transcript(websocket, transcribed_text, orchestrator, current_ai_mode)
                                 
                         except Exception as e:
                              logging.error(f"ข้อผิดพลาดในการประมวลผลข้อความ: {e}", exc_info=True)
@@ -226,7 +260,10 @@ async def handle_avatar_chat(websocket: WebSocket, orchestrator: RAGOrchestrator
 
                     elif bytes_data := message.get("bytes"):
                         # 🎤 Ensure audio uses the current mode
-                        await _handle_audio_input(websocket, bytes_data, orchestrator, ai_mode=current_ai_mode) 
+                        if stt_stream is not None:
+                            await _handle_stream_chunk(websocket, stt_stream, bytes_data, orchestrator, ai_mode=current_ai_mode)
+                        else:
+                            await _handle_audio_input(websocket, bytes_data, orchestrator, ai_mode=current_ai_mode) 
                 
                 elif message["type"] == "websocket.disconnect":
                     break
@@ -241,4 +278,6 @@ async def handle_avatar_chat(websocket: WebSocket, orchestrator: RAGOrchestrator
     except Exception as e:
         logging.error(f"❌ [Avatar WebSocket] Fatal Error: {e}", exc_info=True)
     finally:
+        if stt_stream is not None:
+            stt_stream.close()
         logging.info("🛑 [Avatar WebSocket] ตัวจัดการการเชื่อมต่อทำงานเสร็จสิ้น")
\ No newline at end of file
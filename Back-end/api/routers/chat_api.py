@@ -8,6 +8,7 @@ from ..dependencies import get_rag_orchestrator, get_analytics_service
 from core.services.analytics_service import AnalyticsService
 
 from core.ai_models.speech_handler import speech_handler_instance
+from core.ai_models.streaming_stt import StreamingTranscriber, parse_sample_rate
 
 
 def construct_full_image_url(image_path: str | None) -> str | None:
@@ -18,6 +19,16 @@ def construct_full_image_url(image_path: str | None) -> str | None:
         return f"http://{settings.API_HOST}:{settings.API_PORT}{image_path}"
     return image_path
 
+def _parse_coordinates(data: dict) -> tuple:
+    """(user_lat, user_lon) จาก payload ของ WebSocket - ค่าไม่ถูกต้องถือว่าไม่มีพิกัด"""
+    try:
+        lat, lon = float(data["user_lat"]), float(data["user_lon"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None, None
+
 router = APIRouter(tags=["Text Chat"])
 
 @router.post("/transcribe", response_model=ChatResponse)
@@ -29,7 +40,7 @@ async def handle_audio_chat(
         logging.info(f"💬 [API-Audio] ได้รับไฟล์เสียง: {file.filename}")
         audio_bytes = await file.read()
 
-        transcribed_text = await speech_handler_instance.transcribe_audio_bytes(audio_bytes)
+        transcribed_text = await speech_handler_instance.transcribe_audio_bytes(audio_bytes, filename=file.filename)
         
         if not transcribed_text:
             logging.warning("[API-Audio] การถอดเสียงล้มเหลวหรือว่างเปล่า")
@@ -96,7 +107,9 @@ async def handle_text_chat(
             result = await orchestrator.answer_query(
                 query=query_data, 
                 mode='text', 
-                session_id=session_id 
+                session_id=session_id,
+                user_lat=query.user_lat,
+                user_lon=query.user_lon
             )
         else:
             raise HTTPException(status_code=400, detail="Invalid query format.")
@@ -281,6 +294,21 @@ async def get_navigation(
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator = Depends(get_rag_orchestrator)):
     await websocket.accept()
+    stt_stream = None  # 🎙️ StreamingTranscriber เมื่อ client เปิดโหมด streaming STT
+    stt_coordinates = (None, None)
+
+    async def send_partial(text: str):
+        await websocket.send_json({"action": "STT_PARTIAL", "text": text})
+
+    async def answer_transcript(transcribed_text: str):
+        logging.info(f"👂 [WS] ถอดเสียง: {transcribed_text}")
+        await websocket.send_json({"action": "STT_FINAL", "text": transcribed_text})
+        result = await orchestrator.answer_query(
+            transcribed_text, mode='text', user_lat=stt_coordinates[0], user_lon=stt_coordinates[1]
+        )
+        result["transcribed_query"] = transcribed_text
+        await websocket.send_json(result)
+
     try:
         while True:
             data = await websocket.receive()
@@ -288,6 +316,22 @@ async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator
             if "text" in data:
                 try:
                     query_data = json.loads(data["text"])
+                    action = query_data.get("action")
+                    if action == "STT_START":
+                        if stt_stream is not None:
+                            stt_stream.close()
+                        stt_stream = StreamingTranscriber(parse_sample_rate(query_data), on_partial=send_partial)
+                        stt_coordinates = _parse_coordinates(query_data)
+                        continue
+                    if action == "STT_STOP":
+                        if stt_stream is not None:
+                            stream, stt_stream = stt_stream, None
+                            transcribed_text = await stream.flush()
+                            stream.close()
+                            if transcribed_text:
+                                await answer_transcript(transcribed_text)
+                        continue
+
                     query_text = query_data.get("query", "")
                     ai_mode = query_data.get("ai_mode", "fast")  # fast | detailed
                     # 🆕 รับ intent จาก Frontend - ไม่ต้องใช้ LLM วิเคราะห์
@@ -296,6 +340,8 @@ async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator
                     # 🆕 รับ slug (ถ้ามี) สำหรับ Navigation / System Commands
                     slug = query_data.get("slug")
                     entity_query = query_data.get("entity_query") # manual query text if slug is missing
+                    # 📍 พิกัดผู้ใช้ (ถ้า Frontend ส่งมา) สำหรับคำถามแบบ "ใกล้ฉัน"
+                    user_lat, user_lon = _parse_coordinates(query_data)
                     
                     logging.info(f"💬 [WS] ข้อความ: {query_text} | โหมด: {ai_mode} | เจตนา: {intent} | Slug: {slug}")
                     
@@ -305,7 +351,9 @@ async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator
                         ai_mode=ai_mode,
                         frontend_intent=intent,
                         slug=slug,
-                        entity_query=entity_query
+                        entity_query=entity_query,
+                        user_lat=user_lat,
+                        user_lon=user_lon
                     )
                     await websocket.send_json(result)
                 except Exception as e:
@@ -315,6 +363,11 @@ async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator
             elif "bytes" in data:
                 try:
                     audio_bytes = data["bytes"]
+                    if stt_stream is not None:
+                        transcribed_text = await stt_stream.feed(audio_bytes)
+                        if transcribed_text:
+                            await answer_transcript(transcribed_text)
+                        continue
                     logging.info(f"🎤 [WS] ได้รับข้อมูลเสียง: {len(audio_bytes)} bytes")
                     
                     transcribed_text = await speech_handler_instance.transcribe_audio_bytes(audio_bytes)
@@ -338,3 +391,6 @@ async def websocket_endpoint(websocket: WebSocket, orchestrator: RAGOrchestrator
             logging.error(f"❌ [WS] ข้อผิดพลาด Runtime: {e}")
     except Exception as e:
         logging.error(f"❌ [WS] ข้อผิดพลาดที่ไม่คาดคิด: {e}")
+    finally:
+        if stt_stream is not None:
+            stt_stream.close()
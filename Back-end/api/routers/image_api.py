@@ -0,0 +1,71 @@
+# /api/routers/image_api.py
+"""
+Image Variants API: ส่งรูปย่อ / รูปพรีวิว / WebP ของรูปใน static/images/
+GET /api/images/{variant}/{filename}  (variant: thumb | preview | webp)
+GET /api/images/search/stats, POST /api/images/search/prefetch  (Google image fallback: cache / quota / prefetch)
+"""
+
+import logging
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from core.config import settings
+from core.services.image_derivative_service import image_derivative_service, VARIANTS
+from core.tools.image_search_tool import image_search_tool_instance
+
+router = APIRouter(tags=["Images"])
+
+
+@router.get("/stats")
+async def get_variant_stats():
+    """สถิติการสร้าง/ใช้ cache ของรูป variant"""
+    return {"success": True, "stats": image_derivative_service.get_stats()}
+
+
+@router.get("/search/stats")
+async def get_image_search_stats(request: Request):
+    """สถิติ cache / โควต้า Google CSE วันนี้ / ผลการ prefetch ล่าสุด"""
+    prefetcher = getattr(request.app.state, "image_prefetcher", None)
+    return {
+        "success": True,
+        "search": await image_search_tool_instance.get_stats(),
+        "prefetch": prefetcher.get_stats() if prefetcher else None
+    }
+
+
+@router.post("/search/prefetch")
+async def run_image_prefetch(request: Request):
+    """สั่ง prefetch รูปจาก Google ทันที (ไม่รอช่วง off-peak แต่ยังเก็บโควต้าสำรองไว้)"""
+    prefetcher = getattr(request.app.state, "image_prefetcher", None)
+    if prefetcher is None:
+        raise HTTPException(status_code=503, detail="Image prefetcher is not running.")
+    try:
+        result = await prefetcher.prefetch(respect_hours=False)
+    except Exception as e:
+        logging.error(f"❌ [ImageAPI] prefetch ล้มเหลว: {e}")
+        raise HTTPException(status_code=500, detail="Image prefetch failed.")
+    return {"success": True, "result": result}
+
+
+@router.get("/{variant}/{filename}")
+async def get_image_variant(variant: str, filename: str, request: Request):
+    """
+    ส่งไฟล์ variant (สร้างครั้งแรกแล้วเก็บ cache บนดิสก์)
+    ETag = hash ของไฟล์ต้นฉบับ + variant -> browser/LINE ใช้ If-None-Match ได้ 304
+    """
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown image variant.")
+
+    result = await image_derivative_service.get_variant(filename, variant)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Image not found.")
+
+    path, etag, media_type = result
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={settings.IMAGE_VARIANT_MAX_AGE_SECONDS}",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=media_type, headers=headers)
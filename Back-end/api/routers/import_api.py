@@ -61,6 +61,7 @@ class ConfirmSaveResponse(BaseModel):
     success: bool
     saved_count: int = Field(..., description="จำนวน records ที่ save สำเร็จ")
     failed_count: int = Field(0, description="จำนวน records ที่ save ไม่สำเร็จ")
+    vector_failed_rows: List[int] = Field(default_factory=list, description="แถว (เริ่มที่ 1) ที่บันทึกแล้วแต่สร้าง Vector ไม่สำเร็จ")
     message: str
 
 
@@ -391,6 +392,7 @@ async def confirm_save_data(
     saved_count = 0
     failed_count = 0
     errors = []
+    pending_vectors = []  # 🚀 เก็บไว้ encode + upsert ทีเดียวตอนท้าย (Micro-Batching)
     
     for idx, row in enumerate(request.transformed_rows):
         try:
@@ -455,12 +457,9 @@ async def confirm_save_data(
             if not mongo_id:
                 raise Exception("MongoDB insert returned None")
             
-            # Create vector in Qdrant
-            try:
-                desc_for_vector = f"หัวข้อ: {location_doc['title']}\nประเภท: {location_doc['topic']}\nสรุป: {location_doc['summary']}"
-                await vector_db.upsert_location(mongo_id=mongo_id, description=desc_for_vector)
-            except Exception as ve:
-                logging.warning(f"⚠️ การสร้าง Vector ล้มเหลวสำหรับ {mongo_id}: {ve}")
+            # Queue vector for Qdrant (upserted in one batch below)
+            desc_for_vector = f"หัวข้อ: {location_doc['title']}\nประเภท: {location_doc['topic']}\nสรุป: {location_doc['summary']}"
+            pending_vectors.append({"row": idx + 1, "mongo_id": mongo_id, "description": desc_for_vector})
             
             saved_count += 1
             logging.info(f"✅ Saved: {location_doc['title']} (slug: {slug})")
@@ -471,6 +470,21 @@ async def confirm_save_data(
             errors.append(error_msg)
             logging.error(f"❌ บันทึกแถวที่ {idx + 1} ล้มเหลว: {e}")
     
+    # Create vectors in Qdrant (single batched encode + upsert)
+    vector_failed_rows = []
+    if pending_vectors:
+        try:
+            await vector_db.upsert_locations(pending_vectors)
+        except Exception as ve:
+            # Batch ล้มเหลว -> ลองทีละแถว เพื่อไม่ให้แถวเดียวที่มีปัญหาทำให้ Vector ของทั้ง import หายไป
+            logging.warning(f"⚠️ การสร้าง Vector แบบ Batch ล้มเหลว ({len(pending_vectors)} รายการ) ลองทีละรายการ: {ve}")
+            for item in pending_vectors:
+                try:
+                    await vector_db.upsert_location(mongo_id=item["mongo_id"], description=item["description"])
+                except Exception as row_error:
+                    vector_failed_rows.append(item["row"])
+                    logging.warning(f"⚠️ การสร้าง Vector ล้มเหลวสำหรับแถวที่ {item['row']} ({item['mongo_id']}): {row_error}")
+    
     # Build result message
     if failed_count == 0:
         message = f"บันทึกสำเร็จทั้งหมด {saved_count} รายการ!"
@@ -478,11 +492,14 @@ async def confirm_save_data(
         message = f"บันทึก {saved_count} รายการ, ล้มเหลว {failed_count} รายการ"
         if errors:
             message += f". Errors: {'; '.join(errors[:3])}"
+    if vector_failed_rows:
+        message += f" (สร้าง Vector ไม่สำเร็จ แถวที่: {', '.join(map(str, vector_failed_rows))})"
     
     return ConfirmSaveResponse(
         success=failed_count == 0,
         saved_count=saved_count,
         failed_count=failed_count,
+        vector_failed_rows=vector_failed_rows,
         message=message
     )
 
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Request, HTTPException, Header
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import MessageEvent, TextMessage
-from core.database.redis_client import redis_client
+from core.database.redis_client import async_redis_queue
 
 # Load environment variables from .env file
 load_dotenv()
@@ -62,8 +62,8 @@ async def line_webhook(request: Request, x_line_signature: str = Header(None)):
                     "type": "text"
                 }
                 
-                # Push to Redis Queue
-                redis_client.push_message(payload)
+                # Push to Redis Stream (async - ไม่บล็อก Event Loop)
+                await async_redis_queue.push_message(payload)
                 print(f"[LINE Webhook] Event pushed for user: {event.source.user_id}")
 
         return "OK"
@@ -48,6 +48,8 @@ class LocationAdminSummaryWithImage(LocationAdminSummary):
 class ChatQuery(BaseModel):
     query: str | Dict[str, Any] = Field(..., description="Query string or action object")
     session_id: Optional[str] = None
+    user_lat: Optional[float] = Field(None, ge=-90, le=90, description="User latitude (enables near-me answers)")
+    user_lon: Optional[float] = Field(None, ge=-180, le=180, description="User longitude (enables near-me answers)")
 
 class ActionPayloadPrompt(BaseModel): placeholder: str
 
@@ -0,0 +1,190 @@
+# /core/ai_models/audio_preprocessor.py
+# เตรียมเสียงก่อนส่งแปลงเป็นข้อความ (ใช้ร่วมกันทั้ง Groq, Local Whisper และ /api/chat/transcribe)
+#   1. decode   : ถอดรหัสไฟล์จากเบราว์เซอร์ (webm/opus, ogg, wav, ...) ครั้งเดียว -> 16 kHz mono PCM16
+#   2. trim     : ตัดความเงียบหัว/ท้ายด้วย energy VAD (RMS ต่อเฟรม 30 ms)
+#   3. encode   : บีบอัดใหม่ในหน่วยความจำ (ค่าเริ่มต้น Ogg/Opus 24 kbps) -> อัปโหลดไป Groq น้อยลง
+# ผลลัพธ์เก็บ PCM float32 ไว้ด้วย Local Whisper จึงไม่ต้อง decode ซ้ำ
+# ถ้า decode ไม่ได้ (เช่น ไม่มี ffmpeg) จะส่งไฟล์เดิมไปตามปกติ
+
+import io
+import time
+import wave
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+from pydub import AudioSegment
+
+from core.config import settings
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# ระดับเสียงรบกวนพื้นหลัง = percentile ที่ 10 ของ RMS ต่อเฟรม ใช้ได้เฉพาะคลิปที่มีช่วงเงียบชัดเจน
+# (percentile ที่ 90 ต้องดังกว่าอย่างน้อย MIN_DYNAMIC_RANGE เท่า ไม่งั้นถือว่าพูดต่อเนื่องทั้งคลิป -> ไม่ตัด)
+NOISE_PERCENTILE = 10
+SPEECH_PERCENTILE = 90
+MIN_DYNAMIC_RANGE = 4.0
+
+# นามสกุลที่บอก ffmpeg ได้ตรงๆ (อย่างอื่นให้ ffmpeg เดา format จากเนื้อไฟล์)
+INPUT_FORMATS = {"webm", "ogg", "wav", "mp3", "flac"}
+
+# format -> (นามสกุลไฟล์ที่ส่งไป Groq, พารามิเตอร์ของ pydub export)
+EXPORT_FORMATS = {
+    "ogg": ("ogg", {"format": "ogg", "codec": "libopus"}),
+    "flac": ("flac", {"format": "flac"}),
+    "wav": ("wav", {"format": "wav"}),
+}
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """ห่อ PCM16 mono เป็นไฟล์ WAV ในหน่วยความจำ"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class PreparedAudio:
+    """เสียงที่เตรียมแล้ว: data/filename สำหรับอัปโหลด + samples (float32 16 kHz) สำหรับ Local Whisper"""
+
+    def __init__(self, data: bytes, filename: str, samples: Optional[np.ndarray] = None, timings: Optional[Dict[str, float]] = None):
+        self.data = data
+        self.filename = filename
+        self.samples = samples
+        self.timings = timings or {}
+
+    @property
+    def is_silent(self) -> bool:
+        """decode ได้แต่ไม่มีเสียงเลย (ไฟล์ว่าง) -> ไม่ต้องเรียก STT"""
+        return self.samples is not None and self.samples.size == 0
+
+    @property
+    def duration(self) -> float:
+        return self.samples.size / SAMPLE_RATE if self.samples is not None else 0.0
+
+
+def trim_silence(pcm: np.ndarray, padding_ms: Optional[int] = None) -> np.ndarray:
+    """
+    ตัดความเงียบหัว/ท้ายของ PCM16 (16 kHz mono) ด้วยพลังงานเสียงต่อเฟรม
+    เกณฑ์ = max(STT_VAD_ENERGY_THRESHOLD, ระดับเสียงรบกวนพื้นหลัง x 2.5) และเหลือขอบไว้ padding_ms
+    เป็นแค่การลดขนาดไฟล์ ไม่ใช่ตัวตัดสินว่ามีเสียงพูดหรือไม่ -> ถ้าไม่แน่ใจให้คืนเสียงเดิมทั้งหมด (ให้ STT ตัดสิน):
+    - ไม่มีเฟรมไหนดังเกินเกณฑ์ (เช่น ไมค์เสียงเบา)
+    - ไม่มีช่วงเงียบที่ชัดเจน (พูดต่อเนื่องทั้งคลิป / เสียงรบกวนสม่ำเสมอ)
+    - จะตัดออกเกิน STT_TRIM_MAX_RATIO ของความยาวคลิป
+    """
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    n_frames = pcm.size // frame
+    if n_frames == 0:
+        return pcm
+
+    frames = pcm[:n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    noise_floor, loud = (float(v) for v in np.percentile(rms, [NOISE_PERCENTILE, SPEECH_PERCENTILE]))
+    if loud < noise_floor * MIN_DYNAMIC_RANGE:
+        return pcm
+    voiced = np.flatnonzero(rms > max(settings.STT_VAD_ENERGY_THRESHOLD, noise_floor * 2.5))
+    if voiced.size == 0:
+        return pcm
+
+    padding = (settings.STT_TRIM_PADDING_MS if padding_ms is None else padding_ms) // FRAME_MS
+    start = max(int(voiced[0]) - padding, 0) * frame
+    end = min(int(voiced[-1]) + 1 + padding, n_frames) * frame
+    if voiced[-1] == n_frames - 1:
+        end = pcm.size  # เสียงพูดยาวถึงท้ายไฟล์ -> เก็บเศษเฟรมสุดท้ายไว้ด้วย
+    if pcm.size - (end - start) > pcm.size * settings.STT_TRIM_MAX_RATIO:
+        return pcm
+    return pcm[start:end]
+
+
+def _export(pcm: np.ndarray) -> tuple:
+    extension, params = EXPORT_FORMATS.get(settings.STT_UPLOAD_FORMAT, EXPORT_FORMATS["ogg"])
+    segment = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+    if extension == "ogg":
+        params = {**params, "bitrate": settings.STT_UPLOAD_BITRATE}
+    buffer = io.BytesIO()
+    segment.export(buffer, **params)
+    return buffer.getvalue(), f"speech.{extension}"
+
+
+def _finish(pcm: np.ndarray, original: bytes, filename: str, timings: Dict[str, float], trim: bool) -> PreparedAudio:
+    decoded_size = pcm.size
+    if trim:
+        started = time.perf_counter()
+        pcm = trim_silence(pcm)
+        timings["trim_ms"] = (time.perf_counter() - started) * 1000
+
+    samples = pcm.astype(np.float32) / 32768.0
+    if pcm.size == 0:
+        return PreparedAudio(b"", filename, samples, timings)
+
+    started = time.perf_counter()
+    try:
+        data, upload_name = _export(pcm)
+    except Exception as e:
+        # เช่น ffmpeg ไม่มี libopus -> WAV ไม่ต้องใช้ encoder ภายนอก
+        logging.warning(f"⚠️ [AudioPrep] encode {settings.STT_UPLOAD_FORMAT} ล้มเหลว ({e}) ใช้ WAV แทน")
+        data, upload_name = pcm_to_wav(pcm.tobytes(), SAMPLE_RATE), "speech.wav"
+    timings["encode_ms"] = (time.perf_counter() - started) * 1000
+
+    if original and len(data) >= len(original) and pcm.size == decoded_size:
+        # บีบอัดแล้วไม่เล็กลงและไม่ได้ตัดความเงียบออกเลย -> ส่งไฟล์เดิม
+        data, upload_name = original, filename
+    return PreparedAudio(data, upload_name, samples, timings)
+
+
+def _log(prepared: PreparedAudio, original_size: int):
+    stages = ", ".join(f"{name[:-3]} {ms:.0f} ms" for name, ms in prepared.timings.items())
+    logging.info(
+        f"🎚️ [AudioPrep] {original_size / 1024:.1f} KB -> {len(prepared.data) / 1024:.1f} KB "
+        f"({prepared.duration:.1f}s speech) | {stages}"
+    )
+
+
+def decode_to_pcm(audio_bytes: bytes, filename: Optional[str] = None) -> np.ndarray:
+    """ถอดรหัสไฟล์เสียงเป็น PCM16 16 kHz mono (int16) ในหน่วยความจำ"""
+    fmt = Path(filename or "").suffix.lstrip(".").lower()
+    segment = AudioSegment.from_file(io.BytesIO(audio_bytes), format=fmt if fmt in INPUT_FORMATS else None)
+    segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16)
+
+
+def prepare_audio(audio_bytes: bytes, filename: str = "audio.webm") -> PreparedAudio:
+    """decode -> 16 kHz mono -> ตัดความเงียบ -> encode (sync - เรียกผ่าน thread)"""
+    if not settings.STT_PREPROCESS_ENABLED:
+        return PreparedAudio(audio_bytes, filename)
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    try:
+        pcm = decode_to_pcm(audio_bytes, filename)
+    except Exception as e:
+        logging.warning(f"⚠️ [AudioPrep] decode '{filename}' ล้มเหลว ({e}) ส่งไฟล์เดิมแทน")
+        return PreparedAudio(audio_bytes, filename)
+    timings["decode_ms"] = (time.perf_counter() - started) * 1000
+
+    prepared = _finish(pcm, audio_bytes, filename, timings, trim=True)
+    _log(prepared, len(audio_bytes))
+    return prepared
+
+
+def prepare_pcm(pcm: bytes, sample_rate: int) -> PreparedAudio:
+    """PCM16 mono จาก streaming STT (VAD ตัดขอบมาแล้ว): แค่ resample เป็น 16 kHz + encode"""
+    timings: Dict[str, float] = {}
+    if sample_rate != SAMPLE_RATE:
+        started = time.perf_counter()
+        segment = AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=1).set_frame_rate(SAMPLE_RATE)
+        pcm = segment.raw_data
+        timings["resample_ms"] = (time.perf_counter() - started) * 1000
+
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if not settings.STT_PREPROCESS_ENABLED:
+        return PreparedAudio(pcm_to_wav(samples.tobytes(), SAMPLE_RATE), "speech.wav", samples.astype(np.float32) / 32768.0)
+
+    prepared = _finish(samples, b"", "speech.wav", timings, trim=False)
+    _log(prepared, len(pcm))
+    return prepared
@@ -5,7 +5,7 @@ Groq AI Handler (Llama) - สำหรับ Fast Mode
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from groq import AsyncGroq
 from core.config import settings
 from core.ai_models.key_manager import groq_key_manager
@@ -74,15 +74,15 @@ async def get_groq_response(
     return f"ขออภัยค่ะ ระบบ Groq ขัดข้องชั่วคราว ({str(last_error)[:50]})"
 
 
-async def get_small_talk_response(user_query: str) -> str:
+async def get_small_talk_response(user_query: str, lang: Optional[str] = None) -> str:
     """
     สำหรับ Small Talk / การสนทนาทั่วไป
     ใช้ Language Detector ตรวจจับภาษาและโหลด persona prompt
     """
     from core.services.language_detector import language_detector
     
-    # ตรวจจับภาษาจาก user query
-    detected_lang = language_detector.detect(user_query)
+    # ใช้ภาษาที่ตรวจไว้แล้วของ request นี้ (หรือตรวจจับจาก user query)
+    detected_lang = lang or language_detector.detect(user_query)
     lang_info = language_detector.get_language_info(detected_lang)
     
     # โหลด persona prompt ตามภาษา (ใช้ persona_groq เพราะ fast mode)
@@ -1,6 +1,5 @@
 # /core/ai_models/handlers/analytics_handler.py
 
-import asyncio
 import logging
 import json
 from datetime import datetime, timezone
@@ -9,6 +8,7 @@ from typing import Dict, Any, Optional, Callable, Awaitable
 from core.database.mongodb_manager import MongoDBManager
 from core.ai_models.query_interpreter import QueryInterpreter
 from core.services.language_detector import language_detector  # 🌐 Auto-detect language
+from core.services.analytics_buffer import analytics_buffer
 
 class AnalyticsHandler:
     def __init__(self, 
@@ -21,23 +21,13 @@ class AnalyticsHandler:
         self.mongo_manager = mongo_manager
         self.query_interpreter = query_interpreter
         self.orchestrator_callback = orchestrator_callback
-        self.analytics_log_collection = self.mongo_manager.get_collection("analytics_logs")
         self.lang_detector = language_detector  # 🌐 Language detector instance
         logging.info("✅ Analytics Handler initialized.")
 
-    async def _log_analytics_event_async(self, log_data: dict):
-        """ (Async Wrapper) เรียกใช้ฟังก์ชัน log_analytics_event ใน Thread แยก """
-        if self.analytics_log_collection is None:
-            logging.warning("Cannot log analytics: collection not available.")
-            return
-        try:
-            await asyncio.to_thread(
-                self.mongo_manager.log_analytics_event, 
-                log_data, 
-                collection_name="analytics_logs"
-            )
-        except Exception as e:
-            logging.error(f"❌ [Analytics] Async logging failed: {e}", exc_info=True)
+    def _log_analytics_event(self, log_data: dict):
+        """ ส่ง event เข้า AnalyticsBuffer (เขียนลง analytics_logs เป็นชุดโดย flusher เบื้องหลัง) """
+        if not analytics_buffer.submit(log_data):
+            logging.warning("⚠️ [Analytics] buffer เต็ม ทับ event เก่าสุด")
 
     async def _extract_analytics_data_with_llm(self, user_answer: str) -> Dict[str, Any]:
         system_prompt = f"""You are an entity extractor. Analyze the user's text, which is a response to the question "Where are you from? OR What are you interested in?".
@@ -97,14 +87,14 @@ EXAMPLES:
 
         return " ".join(keywords)
 
-    async def handle_analytics_response(self, user_answer: str, session_id: str, mode: str) -> dict:
+    async def handle_analytics_response(self, user_answer: str, session_id: str, mode: str, lang: Optional[str] = None) -> dict:
         """
         (เมธอดหลัก) จัดการคำตอบที่ผู้ใช้ตอบกลับมาหลังจากถูกถามคำถามต้อนรับ
         """
         logging.info(f"📊 [AnalyticsHandler] Processing response '{user_answer}' for Session '{session_id}'")
         
-        # 🌐 Auto-detect language from user message
-        detected_lang = self.lang_detector.detect(user_answer)
+        # 🌐 Auto-detect language from user message (ใช้ผลที่ตรวจไว้แล้วถ้ามี)
+        detected_lang = lang or self.lang_detector.detect(user_answer)
         lang_info = self.lang_detector.get_language_info(detected_lang)
         logging.info(f"🌐 [Analytics] Detected language: {detected_lang} ({lang_info['name']})")
         
@@ -142,7 +132,7 @@ EXAMPLES:
         elif "วัด" in user_answer or "เที่ยว" in user_answer or "อยากไป" in user_answer: 
             is_implicit_query = True
 
-        asyncio.create_task(self._log_analytics_event_async(log_data))
+        self._log_analytics_event(log_data)
 
         if is_implicit_query:
             origin = log_data.get("user_origin")
@@ -181,7 +171,7 @@ EXAMPLES:
                     "image_gallery": [],
                 }
 
-    async def log_interest_event(self, session_id: str, topic: str, query: str):
+    async def log_interest_event(self, session_id: str, topic: str, query: str, lang: Optional[str] = None):
         """
         บันทึกความสนใจของผู้ใช้ (Interest) จากการถามปกติ (ไม่ใช่ Welcome Flow)
         พร้อม Auto-detect language และ infer origin
@@ -189,7 +179,7 @@ EXAMPLES:
         if not topic: return
         
         # 🌐 Auto-detect language and infer origin
-        detected_lang = self.lang_detector.detect(query)
+        detected_lang = lang or self.lang_detector.detect(query)
         lang_info = self.lang_detector.get_language_info(detected_lang)
         
         # Infer origin from language (if not Thai)
@@ -216,5 +206,5 @@ EXAMPLES:
             "event_type": "query_interest"  # ระบุว่าเป็น event จากการถาม
         }
         
-        # บันทึกลง DB แบบ Fire-and-forget
-        asyncio.create_task(self._log_analytics_event_async(log_data))
\ No newline at end of file
+        # เข้าคิว AnalyticsBuffer (ไม่มี I/O ใน request)
+        self._log_analytics_event(log_data)
\ No newline at end of file
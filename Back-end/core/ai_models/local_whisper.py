@@ -0,0 +1,165 @@
+# /core/ai_models/local_whisper.py
+# Local Whisper (ระบบสำรองเมื่อ Groq ล้มเหลว) เลือก backend ได้ใน core/config.py (LOCAL_WHISPER_BACKEND)
+#   - "faster_whisper" : CTranslate2 + int8 (WHISPER_COMPUTE_TYPE) เร็วกว่า openai-whisper fp32 หลายเท่าบน CPU
+#   - "whisper_cpp"    : whisper.cpp ผ่าน pywhispercpp (ไม่ต้องมี torch / CTranslate2)
+# - โหลดโมเดลครั้งเดียวแบบ single-flight (request ที่มาพร้อมกันรอตัวที่กำลังโหลด ไม่โหลดซ้ำ)
+# - inference ทำใน worker thread ของตัวเอง 1 ตัว (ไม่แย่ง thread pool ของ asyncio.to_thread และไม่ให้ CPU ท่วม)
+# - WHISPER_PRELOAD=true: โหลด + warm-up ตอน startup ผู้ใช้คนแรกไม่ต้องรอโหลดโมเดล
+
+import io
+import os
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from core.config import settings
+from core.ai_models.audio_preprocessor import SAMPLE_RATE, decode_to_pcm
+
+SUPPORTED_BACKENDS = ("faster_whisper", "whisper_cpp")
+
+AudioInput = Union[bytes, bytearray, np.ndarray]
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = (backend or settings.LOCAL_WHISPER_BACKEND).lower().replace("-", "_")
+    if backend not in SUPPORTED_BACKENDS:
+        logging.warning(f"⚠️ [LocalWhisper] ไม่รู้จัก LOCAL_WHISPER_BACKEND '{backend}' ใช้ 'faster_whisper' แทน")
+        return "faster_whisper"
+    return backend
+
+
+class LocalWhisperEngine:
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = _resolve_backend(backend)
+        self.model = None
+        self._load_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {"load_seconds": None, "transcriptions": 0, "partials": 0, "total_inference_ms": 0.0, "errors": 0}
+
+    @property
+    def cpu_threads(self) -> int:
+        return settings.WHISPER_CPU_THREADS or max((os.cpu_count() or 2) - 1, 1)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def is_available(self) -> bool:
+        """มี library ของ backend ที่เลือกใน process นี้หรือไม่"""
+        if self.model is not None:
+            return True
+        try:
+            if self.backend == "whisper_cpp":
+                import pywhispercpp  # noqa: F401
+            else:
+                import faster_whisper  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    # ====== Loading ======
+
+    def load(self):
+        """โหลดโมเดล (sync) - ถ้ามี thread อื่นกำลังโหลดอยู่จะรอแล้วใช้ตัวเดียวกัน"""
+        if self.model is not None:
+            return self.model
+        with self._load_lock:
+            if self.model is not None:
+                return self.model
+            started = time.perf_counter()
+            model_size = settings.WHISPER_MODEL_SIZE
+            if self.backend == "whisper_cpp":
+                from pywhispercpp.model import Model
+                logging.info(f"🔄 [LocalWhisper] กำลังโหลด whisper.cpp '{model_size}' ({self.cpu_threads} threads)...")
+                model = Model(model_size, n_threads=self.cpu_threads, print_progress=False, print_realtime=False)
+            else:
+                from faster_whisper import WhisperModel
+                device = "cuda" if str(settings.DEVICE).startswith("cuda") else "cpu"
+                logging.info(f"🔄 [LocalWhisper] กำลังโหลด faster-whisper '{model_size}' ({device}, {settings.WHISPER_COMPUTE_TYPE})...")
+                model = WhisperModel(
+                    model_size,
+                    device=device,
+                    compute_type=settings.WHISPER_COMPUTE_TYPE,
+                    cpu_threads=self.cpu_threads if device == "cpu" else 0
+                )
+            self.model = model
+            self.stats["load_seconds"] = round(time.perf_counter() - started, 1)
+            logging.info(f"✅ [LocalWhisper] โหลดโมเดลเสร็จใน {self.stats['load_seconds']}s")
+        return self.model
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-whisper")
+        return self._executor
+
+    async def preload(self, warm_up: bool = True):
+        """โหลดโมเดลใน inference worker + ถอดเสียงเงียบ 1 วินาทีเพื่ออุ่นเครื่อง (ไม่ block event loop)"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._get_executor(), self.load)
+        if warm_up:
+            await loop.run_in_executor(self._get_executor(), self._run, np.zeros(SAMPLE_RATE, dtype=np.float32), True)
+
+    # ====== Inference ======
+
+    def _run(self, audio: AudioInput, partial: bool = False) -> str:
+        model = self.load()
+        if self.backend == "whisper_cpp":
+            if isinstance(audio, (bytes, bytearray)):
+                audio = decode_to_pcm(bytes(audio)).astype(np.float32) / 32768.0  # whisper.cpp รับเฉพาะ PCM float32 16 kHz
+            segments = model.transcribe(audio, language="th", n_threads=self.cpu_threads)
+        else:
+            if isinstance(audio, (bytes, bytearray)):
+                audio = io.BytesIO(audio)  # faster-whisper ถอดรหัสไฟล์จากหน่วยความจำได้เอง
+            segments, _info = model.transcribe(
+                audio,
+                language="th",
+                beam_size=1 if partial else 5,
+                condition_on_previous_text=False,
+                without_timestamps=True
+            )
+        return "".join(segment.text for segment in segments).strip()
+
+    def transcribe_sync(self, audio: AudioInput, partial: bool = False) -> str:
+        """
+        audio: bytes ของไฟล์เสียง (webm/wav/...) หรือ numpy float32 (16 kHz mono)
+        partial=True: ถอดระหว่างผู้ใช้ยังพูดอยู่ (beam เดียว เน้นเร็ว)
+        """
+        try:
+            self.load()  # เวลาโหลดโมเดลนับแยกใน load_seconds
+            started = time.perf_counter()
+            text = self._run(audio, partial)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["partials" if partial else "transcriptions"] += 1
+        self.stats["total_inference_ms"] += elapsed_ms
+        if not partial:
+            logging.info(f"🐢 [LocalWhisper] ถอดเสียงด้วย {self.backend} ใช้เวลา {elapsed_ms:.0f} ms")
+        return text
+
+    async def transcribe(self, audio: AudioInput, partial: bool = False) -> str:
+        """ถอดเสียงใน inference worker ของ Local Whisper (คิวเดียว ทำทีละงาน)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.transcribe_sync, audio, partial)
+
+    def get_stats(self) -> Dict:
+        runs = self.stats["transcriptions"] + self.stats["partials"]
+        return {
+            **self.stats,
+            "total_inference_ms": round(self.stats["total_inference_ms"], 1),
+            "backend": self.backend,
+            "model": settings.WHISPER_MODEL_SIZE,
+            "loaded": self.is_loaded,
+            "avg_inference_ms": round(self.stats["total_inference_ms"] / runs, 1) if runs else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
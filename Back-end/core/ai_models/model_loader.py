@@ -0,0 +1,111 @@
+# /core/ai_models/model_loader.py
+# โหลดโมเดล Embedding / Re-ranker ตาม Inference Backend ที่เลือกใน core/config.py
+#   - "torch"     : PyTorch fp32 (แบบเดิม)
+#   - "onnx"      : ONNX Runtime (fp32)
+#   - "onnx-int8" : ONNX Runtime + Dynamic Quantization (int8) เร็วสุดบน CPU
+# ไฟล์ ONNX ต้อง export ไว้ก่อนด้วย scripts/export_onnx_models.py
+# ถ้าตั้ง USE_MODEL_HOST=true จะใช้โมเดลจาก Model Host (workers/model_host.py) แทนการโหลดเอง
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from sentence_transformers import SentenceTransformer, CrossEncoder
+from core.config import settings
+
+SUPPORTED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def get_onnx_model_dir(model_name: str) -> Path:
+    """โฟลเดอร์ที่เก็บโมเดลที่ export เป็น ONNX แล้ว (เช่น models/onnx/intfloat__multilingual-e5-large)"""
+    return Path(settings.ONNX_MODEL_DIR) / model_name.replace("/", "__")
+
+
+def get_onnx_file_name(backend: str) -> str:
+    """ชื่อไฟล์ .onnx (relative กับโฟลเดอร์โมเดล) ของแต่ละ backend"""
+    if backend == "onnx-int8":
+        return f"onnx/model_qint8_{settings.ONNX_QUANTIZATION_CONFIG}.onnx"
+    return "onnx/model.onnx"
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = (backend or settings.INFERENCE_BACKEND).lower()
+    if backend not in SUPPORTED_BACKENDS:
+        logging.warning(f"⚠️ [ModelLoader] ไม่รู้จัก INFERENCE_BACKEND '{backend}' ใช้ 'torch' แทน")
+        return "torch"
+    return backend
+
+
+def _onnx_source(model_name: str, backend: str) -> Optional[Path]:
+    """คืน path โมเดล ONNX ถ้ามีไฟล์ที่ต้องการอยู่จริง ไม่งั้นคืน None"""
+    model_dir = get_onnx_model_dir(model_name)
+    if (model_dir / get_onnx_file_name(backend)).is_file():
+        return model_dir
+    logging.warning(
+        f"⚠️ [ModelLoader] ไม่พบไฟล์ ONNX '{get_onnx_file_name(backend)}' ใน {model_dir} "
+        f"(รัน scripts/export_onnx_models.py ก่อน) กำลังใช้ PyTorch แทน"
+    )
+    return None
+
+
+def _remote_client(allow_remote: bool):
+    if not (allow_remote and settings.USE_MODEL_HOST):
+        return None
+    from core.ai_models.remote_models import connect_model_host
+    return connect_model_host()
+
+
+def load_embedding_model(backend: Optional[str] = None, allow_remote: bool = True):
+    """โหลดโมเดล Embedding (SentenceTransformer) ตาม backend หรือใช้ตัวที่ Model Host โหลดไว้"""
+    client = _remote_client(allow_remote)
+    if client is not None:
+        from core.ai_models.remote_models import RemoteEmbeddingModel
+        return RemoteEmbeddingModel(client)
+
+    backend = _resolve_backend(backend)
+    model_name = settings.EMBEDDING_MODEL_NAME
+
+    if backend != "torch":
+        model_dir = _onnx_source(model_name, backend)
+        if model_dir is not None:
+            try:
+                model = SentenceTransformer(
+                    str(model_dir),
+                    device=settings.DEVICE,
+                    backend="onnx",
+                    model_kwargs={"file_name": get_onnx_file_name(backend)}
+                )
+                logging.info(f"✅ [ModelLoader] Embedding '{model_name}' ใช้ backend '{backend}'")
+                return model
+            except Exception as e:
+                logging.error(f"❌ [ModelLoader] โหลด Embedding แบบ {backend} ล้มเหลว: {e} กำลังใช้ PyTorch แทน")
+
+    return SentenceTransformer(model_name, device=settings.DEVICE)
+
+
+def load_reranker_model(backend: Optional[str] = None, allow_remote: bool = True):
+    """โหลดโมเดล Re-ranker (CrossEncoder) ตาม backend หรือใช้ตัวที่ Model Host โหลดไว้"""
+    client = _remote_client(allow_remote)
+    if client is not None:
+        from core.ai_models.remote_models import RemoteReranker
+        return RemoteReranker(client)
+
+    backend = _resolve_backend(backend)
+    model_name = settings.RERANKER_MODEL_NAME
+
+    if backend != "torch":
+        model_dir = _onnx_source(model_name, backend)
+        if model_dir is not None:
+            try:
+                model = CrossEncoder(
+                    str(model_dir),
+                    device=settings.DEVICE,
+                    backend="onnx",
+                    model_kwargs={"file_name": get_onnx_file_name(backend)}
+                )
+                logging.info(f"✅ [ModelLoader] Re-ranker '{model_name}' ใช้ backend '{backend}'")
+                return model
+            except Exception as e:
+                logging.error(f"❌ [ModelLoader] โหลด Re-ranker แบบ {backend} ล้มเหลว: {e} กำลังใช้ PyTorch แทน")
+
+    return CrossEncoder(model_name, device=settings.DEVICE)
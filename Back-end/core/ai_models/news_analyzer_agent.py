@@ -62,6 +62,9 @@ class NewsAnalyzerAgent:
 severity_score: 1=ทั่วไป, 2=น่าสนใจ, 3=สำคัญ, 4=เร่งด่วน, 5=วิกฤต
 ถ้าข่าวไม่เกี่ยวกับน่าน ให้ is_relevant = false"""
 
+    # จำนวนข่าวสูงสุดต่อ 1 Gemini call (Batch Mode)
+    BATCH_SIZE = 5
+
     def __init__(self):
         self.llm_handler = None
         
@@ -174,12 +177,13 @@ severity_score: 1=ทั่วไป, 2=น่าสนใจ, 3=สำคัญ
         
         return json_str.strip()
     
-    async def analyze_batch(self, news_items: List[Dict]) -> List[Dict]:
+    async def analyze_batch(self, news_items: List[Dict], raise_on_error: bool = False) -> List[Dict]:
         """
         วิเคราะห์ข่าวหลายรายการพร้อมกัน (ใช้ Gemini 1 ครั้ง)
         
         Args:
             news_items: List of news items (max 10)
+            raise_on_error: โยน exception ออกไปแทนการคืน [] (ให้ผู้เรียกแยก "ล้มเหลว" กับ "ไม่มีข่าวที่เกี่ยวข้อง" ได้)
             
         Returns:
             List of relevant analyzed items
@@ -188,7 +192,7 @@ severity_score: 1=ทั่วไป, 2=น่าสนใจ, 3=สำคัญ
             return []
             
         # จำกัด 5 ข่าว เพื่อลด API calls และป้องกัน rate limit
-        items_to_analyze = news_items[:5]
+        items_to_analyze = news_items[:self.BATCH_SIZE]
         
         # สร้างรายการข่าวสำหรับ prompt (จำกัด body 150 ตัวอักษร)
         news_list_str = ""
@@ -209,6 +213,8 @@ severity_score: 1=ทั่วไป, 2=น่าสนใจ, 3=สำคัญ
             
             if not parsed or not isinstance(parsed, list):
                 logger.error("❌ [NewsAnalyzer] Batch response ไม่ใช่ JSON Array")
+                if raise_on_error:
+                    raise ValueError("Batch response is not a JSON array")
                 return []
             
             # Map results กลับไปยังข่าวต้นฉบับ
@@ -242,6 +248,8 @@ severity_score: 1=ทั่วไป, 2=น่าสนใจ, 3=สำคัญ
             
         except Exception as e:
             logger.error(f"❌ [NewsAnalyzer] Batch analyze error: {e}")
+            if raise_on_error:
+                raise
             return []
     
     async def _call_llm(self, prompt: str, system_prompt: str = "", max_tokens: int = 1024) -> str:
@@ -9,9 +9,7 @@ import json
 import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-from sentence_transformers import CrossEncoder
+from typing import Any, Dict, List, Optional, Tuple
 
 # 🆕 แยก Gemini และ Groq handlers ออกจากกัน
 from core.ai_models.gemini_handler import get_gemini_response
@@ -19,16 +17,23 @@ from core.ai_models.groq_handler import get_groq_response, get_small_talk_respon
 from core.ai_models.query_interpreter import QueryInterpreter
 from core.ai_models.youtube_handler import youtube_handler_instance
 from core.config import settings
+from core.ai_models.model_loader import load_reranker_model
 from .handlers.analytics_handler import AnalyticsHandler
-from core.database.mongodb_manager import MongoDBManager
+from core.database.mongodb_manager import MongoDBManager, location_geo_point
 from core.database.qdrant_manager import QdrantManager
 from core.tools.image_search_tool import image_search_tool_instance
 from core.services.calculator_service import calculator_service  # 🧮 เครื่องคิดเลข Python
 from utils.helper_functions import create_synthetic_document
 from .services.session_manager import SessionManager
 from .services.navigation_service import NavigationService
+from .services.location_geo_index import LocationGeoIndex
+from .services.lexical_index import LexicalIndex, reciprocal_rank_fusion
 from .services.prompt_engine import PromptEngine
+from .services.query_signals import is_air_quality_query, is_near_me_query, is_weather_query
 from core.services.image_service import ImageService
+from core.services.weather_service import weather_service
+from core.services.air_quality_service import air_quality_service
+from core.services.language_detector import language_detector
 
 BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
 
@@ -55,14 +60,16 @@ class RAGOrchestrator:
         self.prompt_engine = PromptEngine()
         self.nav_service = NavigationService(mongo_manager, self.prompt_engine)
         self.image_service = ImageService(mongo_manager)
+        self.geo_index = LocationGeoIndex(mongo_manager, self.image_service)
+        self.lexical_index = LexicalIndex(mongo_manager)
 
         self.reranker_model_name = settings.RERANKER_MODEL_NAME
         self.device = settings.DEVICE
 
-        logging.info(f"🔄 กำลังโหลดโมเดล Re-ranker ('{self.reranker_model_name}' บน '{self.device}')...")
+        logging.info(f"🔄 กำลังโหลดโมเดล Re-ranker ('{self.reranker_model_name}' บน '{self.device}', backend: {settings.INFERENCE_BACKEND})...")
         # โหลดโมเดล CrossEncoder สำหรับทำ Reranking
         # ช่วยจัดลำดับความสำคัญของเอกสารที่ค้นหาเจอ ให้แม่นยำขึ้น
-        self.reranker = CrossEncoder(self.reranker_model_name, device=self.device)
+        self.reranker = load_reranker_model()
         logging.info("✅ โหลดโมเดล Re-ranker เรียบร้อยแล้ว")
 
         self.log_collection = self.mongo_manager.get_collection("query_logs")
@@ -87,13 +94,14 @@ class RAGOrchestrator:
                 if found_images:
                     doc_images.extend(found_images)
                     for img_url in found_images:
-                        if img_url not in static_image_gallery:
-                            static_image_gallery.append(img_url)
+                        gallery_url = self.image_service.surface_url(img_url, "gallery")
+                        if gallery_url not in static_image_gallery:
+                            static_image_gallery.append(gallery_url)
                     processed_prefixes.add(prefix)
             source_info.append({
                 "title": doc.get("title", "N/A"),
                 "summary": doc.get("summary", ""),
-                "image_urls": doc_images[: settings.SOURCE_CARD_IMAGE_LIMIT],
+                "image_urls": [self.image_service.surface_url(url, "source_card") for url in doc_images[: settings.SOURCE_CARD_IMAGE_LIMIT]],
             })
         return {"source_info": source_info, "image_gallery": static_image_gallery}
 
@@ -103,14 +111,95 @@ class RAGOrchestrator:
         corrected_query = kwargs.get('corrected_query') or "สวัสดี"
         
         logging.info(f"👋 [Welcome] Generating Dynamic Greeting for: '{corrected_query}'")
-        final_answer = await get_small_talk_response(user_query=corrected_query)
+        final_answer = await get_small_talk_response(user_query=corrected_query, lang=kwargs.get("lang"))
         
         return {
             "answer": final_answer,
+            "language": kwargs.get("lang"),
             "action": None, # ไม่ต้อง Force Analytics แล้ว
             "action_payload": None, "image_url": None, "image_gallery": [], "sources": [],
         }
 
+    def _live_conditions_context(self, query: str) -> str:
+        """
+        ข้อมูลสภาพอากาศ/PM2.5 ล่าสุดจาก cache ของ WeatherService/AirQualityService (ไม่รอ network)
+        คืน "" ถ้าคำถามไม่เกี่ยวข้อง หรือยังไม่มีข้อมูลใน cache
+        """
+        parts = []
+        
+        if is_weather_query(query):
+            weather = weather_service.get_cached_weather()
+            if weather:
+                desc = weather.get("description") or weather.get("condition") or ""
+                parts.append(
+                    f"สภาพอากาศปัจจุบันที่น่าน: {weather.get('temperature')}°C, ความชื้น {weather.get('humidity')}%, "
+                    f"ลม {weather.get('wind_speed')} m/s {desc} (อัปเดต {weather.get('fetched_at', '')})"
+                )
+        
+        if is_air_quality_query(query):
+            pm25 = air_quality_service.get_cached_pm25()
+            if pm25:
+                parts.append(
+                    f"คุณภาพอากาศ: PM2.5 {pm25.get('pm25')} µg/m³, AQI {pm25.get('aqi')} ({pm25.get('aqi_level_th')}) "
+                    f"สถานี {pm25.get('station_name')} (เวลา {pm25.get('time', '')})"
+                )
+        
+        if parts:
+            logging.info(f"🌤️ [RAG] ใช้ข้อมูลอากาศ/ฝุ่นจาก cache ({len(parts)} รายการ)")
+        return "\n".join(parts)
+
+    @staticmethod
+    def _result_payload(res) -> dict:
+        """payload ของผลค้นหา (ScoredPoint ของ Qdrant หรือ dict ที่สร้างเอง)"""
+        if hasattr(res, 'payload'): return res.payload or {}
+        if isinstance(res, dict): return res.get('payload', {})
+        return {}
+
+    async def _retrieve(self, query: str, metadata_filter: dict) -> list:
+        """
+        🔀 Hybrid Retrieval: Qdrant (dense) + BM25 (lexical) รวมอันดับด้วย Reciprocal Rank Fusion
+        คืนไม่เกิน HYBRID_CANDIDATE_BUDGET รายการ (เอกสารที่เจอแค่ฝั่ง BM25 จะเป็น dict ที่มี is_lexical_match)
+        """
+        dense_search = self.qdrant_manager.search_similar(
+            query_text=query,
+            top_k=settings.QDRANT_TOP_K,
+            metadata_filter=metadata_filter # 🆕 Apply Merged Filter
+        )
+        if not settings.HYBRID_SEARCH_ENABLED:
+            return await dense_search
+
+        dense_results, lexical_results = await asyncio.gather(
+            dense_search,
+            self.lexical_index.search(query, settings.HYBRID_LEXICAL_TOP_K, metadata_filter),
+            return_exceptions=True
+        )
+        if isinstance(dense_results, BaseException):
+            raise dense_results
+        if isinstance(lexical_results, BaseException):
+            logging.warning(f"⚠️ [Hybrid] BM25 ล้มเหลว ({lexical_results}) ใช้ผลจาก Qdrant อย่างเดียว")
+            return dense_results
+
+        dense_by_id = {}
+        for res in dense_results:
+            mongo_id = self._result_payload(res).get("mongo_id")
+            if mongo_id:
+                dense_by_id.setdefault(mongo_id, res)
+
+        fused = reciprocal_rank_fusion(
+            [list(dense_by_id), [mongo_id for mongo_id, _ in lexical_results]],
+            k=settings.HYBRID_RRF_K
+        )[:settings.HYBRID_CANDIDATE_BUDGET]
+
+        results = []
+        for mongo_id, rrf_score in fused:
+            if mongo_id in dense_by_id:
+                results.append(dense_by_id[mongo_id])
+            else:
+                results.append({"payload": {"mongo_id": mongo_id, "is_lexical_match": True}, "score": rrf_score})
+        lexical_only = sum(1 for res in results if self._result_payload(res).get("is_lexical_match"))
+        logging.info(f"🔀 [Hybrid] '{query}': dense {len(dense_by_id)} + BM25 {len(lexical_results)} -> {len(results)} รายการ (จาก BM25 อย่างเดียว {lexical_only})")
+        return results
+
     def _map_frontend_intent(self, frontend_intent: str) -> str:
         """
         🆕 แปลง frontend intent เป็น internal intent
@@ -127,8 +216,8 @@ class RAGOrchestrator:
         return intent_map.get(frontend_intent.upper(), "INFORMATIONAL")
 
     async def _handle_small_talk(self, corrected_query: str, **kwargs) -> dict:
-        final_answer = await get_small_talk_response(user_query=corrected_query)
-        return {"answer": final_answer, "action": None, "sources": [], "image_url": None, "image_gallery": []}
+        final_answer = await get_small_talk_response(user_query=corrected_query, lang=kwargs.get("lang"))
+        return {"answer": final_answer, "action": None, "sources": [], "image_url": None, "image_gallery": [], "language": kwargs.get("lang")}
 
     async def _handle_calculate(self, corrected_query: str, **kwargs) -> dict:
         """
@@ -179,6 +268,9 @@ class RAGOrchestrator:
         turn_count: int = 1, session_id: Optional[str] = None, ai_mode: str = "fast", 
         original_query: str = None,
         interpretation: Dict[str, Any] = None,
+        user_lat: Optional[float] = None,
+        user_lon: Optional[float] = None,
+        lang: Optional[str] = None,
         **kwargs
     ) -> dict:
         interpretation = interpretation or kwargs.get("interpretation", {})
@@ -216,6 +308,9 @@ class RAGOrchestrator:
         metadata_filter["exclude_categories"] = EXCLUDED_CATEGORIES
         logging.info(f"🚫 [Filter] Excluding categories: {EXCLUDED_CATEGORIES}")
 
+        # 📍 [Near Me] มีพิกัดผู้ใช้ + ถามหา "ใกล้ฉัน/แถวนี้" -> ใช้สถานที่ใกล้เคียงจาก $geoNear เป็น candidate เพิ่มจาก Qdrant
+        near_me = user_lat is not None and user_lon is not None and is_near_me_query(original_query or corrected_query)
+
         # 2. ค้นหาข้อมูล (Retrieval)
         # ใช้ Qdrant สำหรับค้นหาด้วยความหมาย (Semantic Search)
         # เราจะค้นหาด้วยทุก sub-query เพื่อความครอบคลุม
@@ -254,7 +349,7 @@ class RAGOrchestrator:
         # 🔥 SMART FEATURE: Trending Recommendations for Broad Queries
         # If no specific entity is requested AND no specific filters (except maybe general category),
         # we consider it a "Broad Query" and inject recommended tourist attractions.
-        is_broad_query = (not found_direct_entity) and (entity is None) and (not location_filter)
+        is_broad_query = (not found_direct_entity) and (entity is None) and (not location_filter) and (not near_me)
         
         if is_broad_query:
             logging.info("🔥 [RAG] Broad Query Detected! Fetching Recommended Attractions...")
@@ -290,17 +385,36 @@ class RAGOrchestrator:
             except Exception as e:
                 logging.error(f"❌ [RAG] Error fetching recommended attractions: {e}")
 
-        for q in unique_queries:
-            # Pass metadata_filter to search_similar
-            qdrant_results = await self.qdrant_manager.search_similar(
-                query_text=q, 
-                top_k=settings.QDRANT_TOP_K,
-                metadata_filter=metadata_filter # 🆕 Apply Merged Filter
+        if near_me:
+            nearby_docs = await asyncio.to_thread(
+                self.mongo_manager.find_locations_near,
+                user_lat, user_lon,
+                settings.GEO_NEAR_RADIUS_KM,
+                settings.GEO_NEAR_CANDIDATES,
+                category,
+                EXCLUDED_CATEGORIES
             )
+            logging.info(f"📍 [Near Me] พบ {len(nearby_docs)} สถานที่ในรัศมี {settings.GEO_NEAR_RADIUS_KM} กม.")
+            for doc in nearby_docs:
+                qdrant_results_combined.append({
+                    "payload": {
+                        "mongo_id": str(doc.get("_id")),
+                        "title": doc.get("title"),
+                        "category": doc.get("category"),
+                        "slug": doc.get("slug"),
+                        "location_data": doc.get("location_data"),
+                        "is_nearby": True
+                    },
+                    "score": 0.8
+                })
+
+        for q in unique_queries:
+            # Dense (Qdrant) + Lexical (BM25) ด้วย metadata_filter เดียวกัน
+            qdrant_results = await self._retrieve(q, metadata_filter)
             qdrant_results_combined.extend(qdrant_results)
             for res in qdrant_results:
-                if res.payload and res.payload.get("mongo_id"):
-                    mongo_ids_from_search.append(res.payload.get("mongo_id"))
+                if self._result_payload(res).get("mongo_id"):
+                    mongo_ids_from_search.append(self._result_payload(res).get("mongo_id"))
 
         # [แผนสำรอง] หาก Qdrant ไม่พบผลลัพธ์ (หรือระบบล่ม) ให้ลองค้นหาข้อความใน MongoDB แทน
         if not qdrant_results_combined:
@@ -337,10 +451,7 @@ class RAGOrchestrator:
         
         # Capture Trending IDs to re-apply metadata later
         # FIX: Check if res is object (ScoredPoint) or dict
-        def get_payload(res):
-            if hasattr(res, 'payload'): return res.payload
-            if isinstance(res, dict): return res.get('payload', {})
-            return {}
+        get_payload = self._result_payload
 
         trending_ids = {get_payload(res).get('mongo_id') for res in qdrant_results_combined 
                         if get_payload(res).get('is_trending')}
@@ -371,6 +482,10 @@ class RAGOrchestrator:
             if doc_id in direct_match_ids:
                 doc['is_direct_match'] = True
                 doc['title'] = f"🎯 {doc.get('title')}" # Hack: Add target to title
+            if near_me:
+                point = location_geo_point(doc.get('location_data'))
+                if point:
+                    doc['distance_km'] = self.nav_service.calculate_distance(user_lat, user_lon, point["coordinates"][1], point["coordinates"][0])
         
         # TODO: Consider synthetic doc creation - we might need to update it
         # from core.ai_models.utils.summarizer import create_synthetic_document # Removed as it's imported globally now
@@ -391,6 +506,9 @@ class RAGOrchestrator:
             elif doc.get('is_trending'):
                 # Trending items get a floor, but can go higher if relevant
                 boosted_score = max(boosted_score, 0.85) 
+            if near_me and doc.get('distance_km') is not None:
+                # 📍 ใกล้กว่าได้คะแนนเพิ่มมากกว่า (เพิ่ม 0 ที่ขอบรัศมี)
+                boosted_score += settings.GEO_PROXIMITY_WEIGHT * max(0.0, 1 - doc['distance_km'] / settings.GEO_NEAR_RADIUS_KM)
             final_scores.append(boosted_score)
         
         # �🔍 [Debug Log] แสดงคะแนน Reranking ของแต่ละเอกสาร
@@ -434,9 +552,15 @@ class RAGOrchestrator:
                 doc_text = create_synthetic_document(doc)
                 if doc.get('is_trending'):
                     doc_text = f"🔥 [POPULAR/TRENDING] นี่ยอดนิยมในช่วงนี้: {doc_text}"
+                if doc.get('distance_km') is not None:
+                    doc_text = f"📍 ห่างจากผู้ใช้ประมาณ {doc['distance_km']} กม. | {doc_text}"
                 context_parts.append(f"[Document {i}]\nTitle: {doc.get('title')}\nInfo: {doc_text}")
             context_str = "\n\n----------------\n\n".join(context_parts)
 
+        live_conditions = self._live_conditions_context(original_query or corrected_query)
+        if live_conditions:
+            context_str = f"[Live Conditions]\n{live_conditions}\n\n----------------\n\n{context_str}"
+
         history = []
         if session_id:
             session = await self.session_manager.get_session(session_id)
@@ -447,7 +571,8 @@ class RAGOrchestrator:
             context=context_str, 
             history=history,
             ai_mode=ai_mode,  # 🆕 ส่ง mode ไปเลือก prompt ที่เหมาะสม
-            is_low_confidence=is_low_confidence # 🛡️ [Self-Correction]
+            is_low_confidence=is_low_confidence, # 🛡️ [Self-Correction]
+            lang=lang
         )
         
         messages = [
@@ -501,48 +626,43 @@ class RAGOrchestrator:
             "image_url": None, 
             "image_gallery": static_gallery[:settings.FINAL_GALLERY_IMAGE_LIMIT],
             "sources": prepared_data["source_info"],
+            "language": lang,
             "_primary_topic": final_docs[0].get("title") if final_docs else None # ส่ง Topic กลับไปบันทึก State
         }
 
-    async def get_navigation_list(self, user_lat: float = None, user_lon: float = None) -> List[Dict[str, Any]]:
+    async def get_navigation_list(
+        self,
+        user_lat: float = None,
+        user_lon: float = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        radius_km: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """รายการสถานที่สำหรับ V-Maps (อ่านจาก LocationGeoIndex ในหน่วยความจำ) คืน (หน้าที่ขอ, จำนวนทั้งหมด)"""
         try:
-            collection = self.mongo_manager.get_collection("nan_locations")
-            if collection is None:
-                logging.warning("⚠️ [NavList] ไม่สามารถเชื่อมต่อ MongoDB ได้ กำลังส่งคืนข้อมูลจำลอง")
-                return []
-
-            docs = await asyncio.to_thread(lambda: list(collection.find(
-                {"doc_type": "Location"}, 
-                {"title":1, "slug":1, "topic":1, "summary":1, "category":1, "location_data":1, "metadata":1, "_id":0}
-            )))
-            
-            if user_lat and user_lon:
-                docs = self.nav_service.sort_locations_by_distance(docs, user_lat, user_lon)
-            
-            for doc in docs:
-                imgs = self.image_service.get_location_images(doc)
-                doc["image_urls"] = [imgs[0]] if imgs else []
-            
-            return docs
+            return await self.geo_index.query(user_lat, user_lon, limit=limit, offset=offset, radius_km=radius_km)
         except Exception as e:
             logging.error(f"❌ [NavList] เกิดข้อผิดพลาด: {e}")
-            return []
+            return [], 0
 
     async def handle_get_directions(self, entity_slug: str, user_lat: float = None, user_lon: float = None) -> dict:
         return await self.nav_service.handle_get_directions(entity_slug, user_lat, user_lon)
     
-    async def answer_query(self, query: str, mode: str = "text", session_id: Optional[str] = None, ai_mode: str = "fast", frontend_intent: str = None, slug: Optional[str] = None, entity_query: Optional[str] = None, **kwargs) -> dict:
+    async def answer_query(self, query: str, mode: str = "text", session_id: Optional[str] = None, ai_mode: str = "fast", frontend_intent: str = None, slug: Optional[str] = None, entity_query: Optional[str] = None, user_lat: Optional[float] = None, user_lon: Optional[float] = None, **kwargs) -> dict:
         """
         ai_mode: 'fast' = Llama/Groq, 'detailed' = Gemini
         frontend_intent: 'GENERAL' | 'MUSIC' | 'NAVIGATION' | 'FAQ' (จาก Frontend)
+        user_lat / user_lon: พิกัดผู้ใช้ (ถ้ามี) ใช้กับคำถามแบบ "ใกล้ฉัน" และลิงก์นำทาง
         """
         session_data = await self.session_manager.get_session(session_id)
         current_turn = session_data.get("turn_count", 0) + 1
         history = session_data.get("history", []) 
+        # 🌐 ตรวจจับภาษาครั้งเดียวต่อ request แล้วส่งต่อให้ Prompt / Small Talk / Analytics / TTS
+        lang = language_detector.detect(query)
         
         if session_id and session_data.get("awaiting") == "analytics_origin_or_topic":
             self.session_manager.collection.update_one({"session_id": session_id}, {"$unset": {"awaiting": ""}})
-            return await self.analytics_handler.handle_analytics_response(query, session_id, mode)
+            return await self.analytics_handler.handle_analytics_response(query, session_id, mode, lang=lang)
 
         start_time = time.perf_counter() # ⏱️ Start Timer
 
@@ -561,7 +681,7 @@ class RAGOrchestrator:
                  target_entity = slug or entity_query or query
                  if target_entity:
                      logging.info(f"🏎️ [Quick Nav] ข้าม Logic เพื่อนำทางไปยัง: '{target_entity}'")
-                     return await self.handle_get_directions(entity_slug=target_entity)
+                     return await self.handle_get_directions(entity_slug=target_entity, user_lat=user_lat, user_lon=user_lon)
 
             logging.info(f"🚀 [Intent] ใช้เจตนาจาก FRONTEND: {intent}")
             interpretation = {"intent": intent, "corrected_query": query, "entity": entity, "is_complex": False, "sub_queries": [query], "location_filter": {}}
@@ -598,8 +718,8 @@ class RAGOrchestrator:
                 logging.info(f"🗺️ [Smart Router] เปลี่ยนไปใช้ตัวจัดการการนำทางสำหรับ: '{target_entity}'")
                 return await self.handle_get_directions(
                     entity_slug=target_entity, 
-                    user_lat=kwargs.get('user_lat', 0.0),
-                    user_lon=kwargs.get('user_lon', 0.0)
+                    user_lat=user_lat,
+                    user_lon=user_lon
                 )
         
         # 🧮 [Calculator Detection] ตรวจจับคำถามคณิตศาสตร์ก่อน (Hybrid Mode)
@@ -628,6 +748,9 @@ class RAGOrchestrator:
             ai_mode=ai_mode,   # 🆕 ส่ง ai_mode ไปยัง handlers
             interpretation=interpretation, # 🆕 Send full interpretation object (with location_filter)
             original_query=query, # 🆕 ส่งคำถามต้นฉบับไปด้วย
+            user_lat=user_lat,
+            user_lon=user_lon,
+            lang=lang,
             **kwargs
         )
 
@@ -649,6 +772,6 @@ class RAGOrchestrator:
             
             # 🚀 [Analytics] บันทึกเหตุการณ์ความสนใจหากพบหัวข้อ
             if primary_topic:
-                await self.analytics_handler.log_interest_event(session_id, primary_topic, query)
+                await self.analytics_handler.log_interest_event(session_id, primary_topic, query, lang=lang)
             
         return response
\ No newline at end of file
@@ -0,0 +1,127 @@
+# /core/ai_models/remote_models.py
+# Remote-Model Adapter: เรียกใช้โมเดลที่ Model Host (workers/model_host.py) โหลดไว้แล้ว
+# แทนการโหลด e5-large / CrossEncoder / Whisper ซ้ำในทุก process (FastAPI หลาย worker + LINE worker)
+# มี interface เหมือน SentenceTransformer.encode / CrossEncoder.predict เพื่อให้ใช้แทนกันได้ทันที
+
+import base64
+import logging
+from typing import List, Optional, Union
+
+import httpx
+import numpy as np
+
+from core.config import settings
+
+
+def decode_array(payload: dict) -> np.ndarray:
+    """แปลง {"shape": [...], "data": base64(float32)} กลับเป็น numpy array"""
+    raw = base64.b64decode(payload["data"])
+    return np.frombuffer(raw, dtype=np.float32).reshape(payload["shape"])
+
+
+def encode_array(array: np.ndarray) -> dict:
+    """แปลง numpy array เป็น dict ที่ส่งผ่าน JSON ได้ (float32 + base64 เล็กกว่า list ของ float มาก)"""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+class ModelHostClient:
+    """HTTP client ไปยัง Model Host (Unix socket ถ้าตั้ง MODEL_HOST_SOCKET ไม่งั้นใช้ MODEL_HOST_URL)"""
+
+    def __init__(self):
+        if settings.MODEL_HOST_SOCKET:
+            transport = httpx.HTTPTransport(uds=settings.MODEL_HOST_SOCKET)
+            self.client = httpx.Client(transport=transport, base_url="http://model-host", timeout=settings.MODEL_HOST_TIMEOUT)
+            self.target = f"unix://{settings.MODEL_HOST_SOCKET}"
+        else:
+            self.client = httpx.Client(base_url=settings.MODEL_HOST_URL, timeout=settings.MODEL_HOST_TIMEOUT)
+            self.target = settings.MODEL_HOST_URL
+        self._info: Optional[dict] = None
+
+    def info(self) -> dict:
+        if self._info is None:
+            response = self.client.get("/info")
+            response.raise_for_status()
+            self._info = response.json()
+        return self._info
+
+    def post_json(self, path: str, body: dict) -> dict:
+        response = self.client.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    def post_bytes(self, path: str, content: bytes, params: dict = None) -> dict:
+        response = self.client.post(path, content=content, params=params,
+                                    headers={"Content-Type": "application/octet-stream"})
+        response.raise_for_status()
+        return response.json()
+
+
+_client: Optional[ModelHostClient] = None
+
+
+def get_model_host_client() -> ModelHostClient:
+    global _client
+    if _client is None:
+        _client = ModelHostClient()
+    return _client
+
+
+class RemoteEmbeddingModel:
+    """ใช้แทน SentenceTransformer: encode ผ่าน Model Host (Host จะรวม batch ข้าม process ให้อีกชั้น)"""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+        self._dimension = client.info().get("dimension")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_tensor: bool = False,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = decode_array(self.client.post_json("/embed", {"texts": texts}))
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.clip(norms, 1e-12, None)
+        return vectors[0] if single else vectors
+
+
+class RemoteReranker:
+    """ใช้แทน CrossEncoder: predict ผ่าน Model Host"""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+
+    def predict(self, sentences: List[List[str]], show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        pairs = [list(pair) for pair in sentences]
+        if not pairs:
+            return np.array([], dtype=np.float32)
+        result = self.client.post_json("/rerank", {"pairs": pairs})
+        return np.asarray(result["scores"], dtype=np.float32)
+
+
+def connect_model_host() -> Optional[ModelHostClient]:
+    """ลองเชื่อมต่อ Model Host คืน client ถ้าพร้อมใช้งาน ไม่งั้นคืน None (ให้ผู้เรียก fallback ไปโหลดโมเดลเอง)"""
+    client = get_model_host_client()
+    try:
+        info = client.info()
+        logging.info(f"🔗 [ModelHost] เชื่อมต่อ {client.target} สำเร็จ (backend: {info.get('backend')})")
+        return client
+    except Exception as e:
+        logging.error(f"❌ [ModelHost] เชื่อมต่อ {client.target} ไม่ได้: {e} กำลังโหลดโมเดลใน process นี้แทน")
+        return None
+
+
+def transcribe_remote(audio_bytes: bytes) -> str:
+    """ส่งไฟล์เสียงไปให้ Local Whisper ที่ Model Host แปลงเป็นข้อความ (ภาษาไทยเสมอ เหมือน LocalWhisperEngine)"""
+    result = get_model_host_client().post_bytes("/transcribe", audio_bytes)
+    return result.get("text", "")
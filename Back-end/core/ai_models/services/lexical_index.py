@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.database.mongodb_manager import MongoDBManager
+from utils.helper_functions import create_synthetic_document
+
+try:
+    from pythainlp.tokenize import word_tokenize
+except ImportError:  # pythainlp เป็น optional dependency -> ใช้ bigram ของตัวอักษรไทยแทน
+    word_tokenize = None
+
+LEXICAL_PROJECTION = {
+    "title": 1, "topic": 1, "summary": 1, "details": 1, "keywords": 1, "category": 1,
+    "related_info.district": 1, "related_info.sub_district": 1,
+    "location_data.district": 1, "location_data.sub_district": 1,
+}
+
+RE_THAI_RUN = re.compile(r"[\u0E00-\u0E7F]+")
+RE_WORD = re.compile(r"[\u0E00-\u0E7F]+|[^\W_]+", re.UNICODE)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_RELATIVE_SCORE = 0.3  # ตัดผลที่คะแนนต่ำกว่า 30% ของอันดับหนึ่ง (คำทั่วไป / bigram ที่บังเอิญตรง)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    ตัดคำสำหรับ BM25: ภาษาไทยใช้ pythainlp newmm (ถ้ามี) ไม่งั้นใช้ bigram ของตัวอักษร
+    ภาษาอื่นตัดตามช่องว่าง/เครื่องหมาย (ตัวพิมพ์เล็ก)
+    """
+    tokens: List[str] = []
+    for word in RE_WORD.findall((text or "").lower()):
+        if not RE_THAI_RUN.fullmatch(word):
+            tokens.append(word)
+        elif word_tokenize is not None:
+            tokens.extend(t for t in word_tokenize(word, engine="newmm", keep_whitespace=False) if t.strip())
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """รวมหลายรายการที่เรียงแล้ว (id) ด้วย RRF: score = Σ 1 / (k + rank)"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(dict.fromkeys(ranking), start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _area_field(doc: dict, key: str) -> Optional[str]:
+    """district / sub_district ของเอกสาร ตามที่ใส่ใน Qdrant payload (admin ใช้ related_info, import ใช้ location_data)"""
+    return (doc.get("related_info") or {}).get(key) or (doc.get("location_data") or {}).get(key)
+
+
+class LexicalIndex:
+    """
+    BM25 ในหน่วยความจำ ครอบคลุมเอกสารสังเคราะห์ชุดเดียวกับที่ส่งเข้า Qdrant (create_synthetic_document)
+    - ช่วยคำค้นที่เป็นชื่อเฉพาะ / คำไทยที่ไม่ค่อยพบ (อาหารพื้นเมือง ชื่อหมู่บ้าน) ซึ่ง e5 มักจัดอันดับต่ำ
+    - สร้างใหม่เมื่อมีการเขียน nan_locations (MongoDBManager.locations_revision) หรือเกิน LEXICAL_INDEX_MAX_AGE_SECONDS
+    """
+
+    def __init__(self, mongo_manager: MongoDBManager):
+        self.mongo_manager = mongo_manager
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_ids: List[str] = []
+        self._categories: List[Optional[str]] = []
+        self._districts: List[Optional[str]] = []
+        self._sub_districts: List[Optional[str]] = []
+        self._doc_lengths: List[int] = []
+        self._avg_length = 0.0
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return (
+            self._version != MongoDBManager.locations_revision
+            or time.monotonic() - self._built_at > settings.LEXICAL_INDEX_MAX_AGE_SECONDS
+        )
+
+    def _build(self):
+        """โหลดเอกสารทั้งหมด + ตัดคำ + สร้าง inverted index (sync - เรียกผ่าน thread)"""
+        collection = self.mongo_manager.get_collection("nan_locations")
+        if collection is None:
+            raise RuntimeError("MongoDB is not connected.")
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_ids, categories, districts, sub_districts, lengths = [], [], [], [], []
+        for doc in collection.find({}, LEXICAL_PROJECTION):
+            tokens = tokenize(create_synthetic_document(doc))
+            index = len(doc_ids)
+            for token, tf in Counter(tokens).items():
+                postings[token].append((index, tf))
+            doc_ids.append(str(doc["_id"]))
+            categories.append(doc.get("category"))
+            districts.append(_area_field(doc, "district"))
+            sub_districts.append(_area_field(doc, "sub_district"))
+            lengths.append(len(tokens))
+        return dict(postings), doc_ids, categories, districts, sub_districts, lengths
+
+    async def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        async with self._lock:
+            if not self._is_stale():
+                return
+            version = MongoDBManager.locations_revision
+            started = time.perf_counter()
+            postings, doc_ids, categories, districts, sub_districts, lengths = await asyncio.to_thread(self._build)
+
+            self._postings = postings
+            self._doc_ids = doc_ids
+            self._categories = categories
+            self._districts = districts
+            self._sub_districts = sub_districts
+            self._doc_lengths = lengths
+            self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+            self._version = version
+            self._built_at = time.monotonic()
+            segmenter = "newmm" if word_tokenize is not None else "bigram"
+            logging.info(f"🔤 [LexicalIndex] สร้าง BM25 ({segmenter}) {len(doc_ids)} เอกสาร / {len(postings)} คำ ใน {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def _score(self, query: str) -> Dict[int, float]:
+        n_docs = len(self._doc_ids)
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[index] / (self._avg_length or 1.0))
+                scores[index] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    async def search(self, query: str, top_k: int, metadata_filter: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """คืน [(mongo_id, bm25_score)] เรียงจากมากไปน้อย (กรอง district / sub_district / category / exclude_categories แบบเดียวกับ Qdrant)"""
+        await self._ensure_fresh()
+        metadata_filter = metadata_filter or {}
+        district = metadata_filter.get("district")
+        sub_district = metadata_filter.get("sub_district")
+        category = metadata_filter.get("category")
+        excluded = set(metadata_filter.get("exclude_categories") or [])
+
+        def allowed(index: int) -> bool:
+            doc_category = self._categories[index]
+            if (category and doc_category != category) or doc_category in excluded:
+                return False
+            if district and self._districts[index] != district:
+                return False
+            return not (sub_district and self._sub_districts[index] != sub_district)
+
+        # กรองก่อนจัดอันดับ (เหมือน Qdrant) -> เกณฑ์ MIN_RELATIVE_SCORE เทียบกับอันดับหนึ่งที่ผ่าน filter
+        ranked = sorted(
+            ((index, score) for index, score in self._score(query).items() if allowed(index)),
+            key=lambda item: item[1], reverse=True
+        )
+        results = []
+        for index, score in ranked[:top_k]:
+            if score < ranked[0][1] * MIN_RELATIVE_SCORE:
+                break
+            results.append((self._doc_ids[index], score))
+        return results
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.database.mongodb_manager import MongoDBManager
+
+EARTH_RADIUS_KM = 6371.0
+
+NAV_PROJECTION = {"title": 1, "slug": 1, "topic": 1, "summary": 1, "category": 1, "location_data": 1, "metadata": 1, "_id": 0}
+
+
+def haversine_km(lat: float, lon: float, lats_rad: np.ndarray, lons_rad: np.ndarray) -> np.ndarray:
+    """ระยะทาง (กม.) จากจุดเดียวไปทุกจุดพร้อมกัน (lats_rad / lons_rad เป็นเรเดียน)"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    a = np.sin((lats_rad - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lats_rad) * np.sin((lons_rad - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _coordinate(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class LocationGeoIndex:
+    """
+    รายการสถานที่สำหรับหน้า V-Maps ในหน่วยความจำ:
+    - เอกสาร (พร้อม URL รูปย่อของการ์ด) + พิกัดเป็น NumPy array
+    - หาใกล้สุดด้วย haversine แบบ vectorized + argpartition (ไม่ต้อง sort ทั้งหมด)
+    - สร้างใหม่เมื่อมีการเขียน nan_locations (MongoDBManager.locations_revision) / ชุดรูปเปลี่ยน (ImageService.revision)
+      หรือเมื่อเกิน NAV_INDEX_MAX_AGE_SECONDS (รับการแก้จาก worker อื่น)
+    """
+
+    def __init__(self, mongo_manager: MongoDBManager, image_service):
+        self.mongo_manager = mongo_manager
+        self.image_service = image_service
+        self._docs: List[Dict[str, Any]] = []
+        self._lats = np.empty(0)
+        self._lons = np.empty(0)
+        self._has_coords = np.empty(0, dtype=bool)
+        self._version: Optional[Tuple[int, int]] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _current_version(self) -> Tuple[int, int]:
+        return (MongoDBManager.locations_revision, self.image_service.revision)
+
+    def _is_stale(self) -> bool:
+        return (
+            self._version != self._current_version()
+            or time.monotonic() - self._built_at > settings.NAV_INDEX_MAX_AGE_SECONDS
+        )
+
+    def _build(self) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        """โหลดสถานที่ทั้งหมดครั้งเดียว + เตรียมรูปย่อของการ์ด (sync - เรียกผ่าน thread)"""
+        collection = self.mongo_manager.get_collection("nan_locations")
+        if collection is None:
+            raise RuntimeError("MongoDB is not connected.")
+        docs = list(collection.find({"doc_type": "Location"}, NAV_PROJECTION))
+
+        for doc in docs:
+            imgs = self.image_service.get_location_images(doc)
+            doc["image_urls"] = [self.image_service.surface_url(imgs[0], "nav_card")] if imgs else []
+
+        lats = np.array([_coordinate((doc.get("location_data") or {}).get("latitude")) for doc in docs], dtype=np.float64)
+        lons = np.array([_coordinate((doc.get("location_data") or {}).get("longitude")) for doc in docs], dtype=np.float64)
+        return docs, lats, lons
+
+    async def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        async with self._lock:
+            if not self._is_stale():
+                return
+            version = self._current_version()
+            started = time.perf_counter()
+            docs, lats, lons = await asyncio.to_thread(self._build)
+
+            self._docs = docs
+            self._has_coords = ~(np.isnan(lats) | np.isnan(lons))
+            self._lats = np.radians(np.nan_to_num(lats))
+            self._lons = np.radians(np.nan_to_num(lons))
+            self._version = version
+            self._built_at = time.monotonic()
+            logging.info(f"🗺️ [GeoIndex] โหลดสถานที่ {len(docs)} แห่ง (มีพิกัด {int(self._has_coords.sum())}) ใน {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    async def query(
+        self,
+        user_lat: Optional[float] = None,
+        user_lon: Optional[float] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        radius_km: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        คืน (รายการสถานที่ของหน้าที่ขอ, จำนวนทั้งหมดที่ผ่านเงื่อนไข)
+        มีพิกัดผู้ใช้ -> เรียงใกล้ไปไกล (สถานที่ไม่มีพิกัดอยู่ท้าย, ถ้ากำหนด radius_km จะถูกตัดออก)
+        """
+        await self._ensure_fresh()
+        docs, has_coords = self._docs, self._has_coords
+        offset = max(offset, 0)
+
+        if user_lat is None or user_lon is None:
+            total = len(docs)
+            end = total if limit is None else offset + limit
+            return [dict(doc) for doc in docs[offset:end]], total
+
+        distances = haversine_km(user_lat, user_lon, self._lats, self._lons)
+        distances[~has_coords] = np.inf
+
+        if radius_km is not None:
+            candidates = np.flatnonzero(distances <= radius_km)
+        else:
+            candidates = np.arange(len(docs))
+        total = len(candidates)
+
+        # top-k: argpartition แยก k ตัวที่ใกล้สุดก่อน แล้ว sort เฉพาะ k ตัวนั้น
+        k = total if limit is None else min(offset + limit, total)
+        if 0 < k < total:
+            candidates = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+        ordered = candidates[np.argsort(distances[candidates], kind="stable")][offset:k]
+
+        page = []
+        for i in ordered:
+            doc = dict(docs[i])
+            doc["distance_km"] = round(float(distances[i]), 1) if has_coords[i] else None
+            page.append(doc)
+        return page, total
@@ -1,21 +1,22 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from core.services.language_detector import language_detector
 
 class PromptEngine:
     def __init__(self):
         pass
 
-    def build_rag_prompt(self, user_query: str, context: str, history: List[dict], ai_mode: str = "fast", is_low_confidence: bool = False) -> Dict[str, str]:
+    def build_rag_prompt(self, user_query: str, context: str, history: List[dict], ai_mode: str = "fast", is_low_confidence: bool = False, lang: Optional[str] = None) -> Dict[str, str]:
         """
         สร้าง Prompt สำหรับการตอบคำถามโดยใช้ข้อมูลอ้างอิง
         ai_mode: 'fast' = กระชับสำหรับ Llama, 'detailed' = ละเอียดสำหรับ Gemini
         is_low_confidence: ถ้า True แสดงว่าระบบค้นหาไม่เจอข้อมูลที่ตรงเป๊ะ ให้ AI ตอบอย่างระมัดระวัง
+        lang: ภาษาที่ตรวจจับไว้แล้วใน answer_query (ไม่ส่งมา = ตรวจจากคำถามเอง)
         
         ทุกอย่างโหลดจากไฟล์ .txt ตามภาษาที่ตรวจจับ
         """
         
-        # 🌐 ตรวจจับภาษาจาก user query
-        detected_lang = language_detector.detect(user_query)
+        # 🌐 ใช้ภาษาที่ตรวจไว้แล้วของ request นี้ (หรือตรวจจับจาก user query)
+        detected_lang = lang or language_detector.detect(user_query)
         lang_info = language_detector.get_language_info(detected_lang)
         
         # โหลด persona prompt ตามภาษาและโมเดล
@@ -0,0 +1,58 @@
+import re
+
+# ❗ ห้ามเช็คแค่ substring: "อากาศ" อยู่ใน "บรรยากาศ" (คำที่พบบ่อยที่สุดคำหนึ่งในข้อมูลท่องเที่ยว),
+#    "rain" อยู่ใน "training"/"terrain", "ร้อน"/"หนาว" อยู่ในคำอธิบายอาหาร/สถานที่จำนวนมาก
+# ภาษาไทย -> ใช้วลีที่ชัดเจน หรือ "อากาศ" คู่กับคำถาม/เวลา (ตัดคำประสมอย่าง "บรรยากาศ" ออกก่อน)
+# ภาษาอังกฤษ -> จับทั้งคำ (\b)
+
+# คำที่บ่งบอกว่าผู้ใช้ถามเรื่องสภาพอากาศ (ตอบจาก cache ได้เลย ไม่ต้องเรียก API)
+WEATHER_PHRASES_TH = (
+    "สภาพอากาศ", "พยากรณ์อากาศ", "อากาศเป็นยังไง", "อากาศเป็นอย่างไร", "อากาศเป็นไง", "อากาศดีไหม", "อากาศดีมั้ย",
+    "อากาศวันนี้", "อากาศตอนนี้", "อากาศพรุ่งนี้", "อากาศร้อน", "อากาศหนาว", "อากาศเย็น",
+    "ฝนตก", "ฝนจะตก", "อุณหภูมิ", "กี่องศา",
+)
+RE_WEATHER_EN = re.compile(r"\b(?:weather|temperature|forecast|rain|rainy|raining|humidity)\b")
+WEATHER_MARKERS_TH = ("เป็นยังไง", "เป็นไง", "อย่างไร", "ไหม", "มั้ย", "หรือเปล่า", "วันนี้", "ตอนนี้", "พรุ่งนี้", "ช่วงนี้")
+NOT_WEATHER_TH = ("บรรยากาศ", "อากาศยาน", "ปรับอากาศ")
+
+# คำที่บ่งบอกว่าผู้ใช้ถามเรื่องฝุ่น / คุณภาพอากาศ
+AIR_QUALITY_PHRASES_TH = ("ฝุ่น", "หมอกควัน", "คุณภาพอากาศ", "ค่าอากาศ")
+RE_AIR_QUALITY_EN = re.compile(r"\bpm\s?2\.5\b|\b(?:aqi|air quality|smog|haze)\b")
+
+
+def _strip(text: str, words: tuple) -> str:
+    for word in words:
+        text = text.replace(word, " ")
+    return text
+
+
+def is_weather_query(text: str) -> bool:
+    q = _strip((text or "").lower(), NOT_WEATHER_TH)
+    if any(phrase in q for phrase in WEATHER_PHRASES_TH):
+        return True
+    if "อากาศ" in q and any(marker in q for marker in WEATHER_MARKERS_TH):
+        return True
+    return bool(RE_WEATHER_EN.search(q))
+
+
+def is_air_quality_query(text: str) -> bool:
+    q = (text or "").lower()
+    return any(phrase in q for phrase in AIR_QUALITY_PHRASES_TH) or bool(RE_AIR_QUALITY_EN.search(q))
+
+
+# คำที่บอกว่าผู้ใช้ถามหาสถานที่ใกล้ตัว (ใช้คู่กับพิกัดผู้ใช้ -> $geoNear)
+NEAR_ME_PHRASES_TH = ("ใกล้ฉัน", "ใกล้เรา", "ใกล้ผม", "ใกล้หนู", "แถวนี้", "ละแวกนี้")
+# "ใกล้ๆ" / "ใกล้ที่สุด" / "ใกล้ตัว" ตามด้วยชื่อสถานที่ได้ ("ร้านกาแฟใกล้ๆวัดภูมินทร์", "ใกล้ตัวเมือง") -> นับเฉพาะเมื่อจบประโยค หรือตามด้วยคำลงท้าย/คำถาม
+RE_NEAR_ME_AMBIGUOUS_TH = re.compile(
+    r"(?:ใกล้\s?ๆ|ใกล้ที่สุด|ใกล้ตัว)\s*(?:$|[?!.,]|ครับ|คับ|ค่ะ|คะ|ค่า|จ้ะ|จ้า|นะ|หน่อย|บ้าง|ไหม|มั้ย|มี|อะไร|ที่ไหน|ตรงไหน|คือ|ดี|ตอนนี้)"
+)
+# "near me" / "nearby" / "closest" นับได้เลย ยกเว้น "nearby to X" / "closest to X" (ยกเว้น X = me / here / us)
+RE_NEAR_ME_EN = re.compile(r"\bnear (?:me|here|us)\b|\b(?:nearby|closest)\b(?!\s+(?:to|from)\s+(?!me\b|here\b|us\b|my\b))")
+
+
+def is_near_me_query(text: str) -> bool:
+    """คำถามที่ขอ "ใกล้ตัวผู้ใช้" (ไม่รวม "ใกล้ + ชื่อสถานที่" เช่น "ร้านกาแฟใกล้ๆวัดภูมินทร์")"""
+    q = (text or "").lower()
+    if any(phrase in q for phrase in NEAR_ME_PHRASES_TH):
+        return True
+    return bool(RE_NEAR_ME_AMBIGUOUS_TH.search(q) or RE_NEAR_ME_EN.search(q))
@@ -1,15 +1,18 @@
 import io
-import os
 import re
+import time
 import logging
 import asyncio
-import tempfile
+from typing import Optional
+import numpy as np
 from groq import Groq
 import edge_tts
 from gtts import gTTS  # Fallback TTS
 from pydub import AudioSegment  # สำหรับ speed up เสียง
 from core.config import settings
 from core.ai_models.key_manager import groq_key_manager
+from core.ai_models.local_whisper import LocalWhisperEngine
+from core.ai_models.audio_preprocessor import PreparedAudio, pcm_to_wav, prepare_audio, prepare_pcm
 
 # ==========================================
 # ⚡ Regex Optimization (Compiled once)
@@ -105,9 +108,8 @@ class SpeechHandler:
     def __init__(self):
         logging.info("🎤 [Speech] กำลังเริ่มต้น SpeechHandler (หลัก: Groq, สำรอง: Local)")
         
-        # 🛡️ Instance-level model storage (No more global)
-        self.local_whisper_model = None
-        self._model_lock = asyncio.Lock() # For thread-safe model loading if needed closer to async context
+        # 🛡️ Local Whisper: โหลดครั้งเดียว (single-flight) + inference worker ของตัวเอง
+        self.local_engine = LocalWhisperEngine()
         
         try:
             from core.services.language_detector import language_detector
@@ -122,69 +124,92 @@ class SpeechHandler:
             return Groq(api_key=api_key)
         return None
 
-    def _transcribe_with_groq(self, file_path: str) -> str:
+    def _transcribe_with_groq(self, audio_bytes: bytes, filename: str = "audio.webm") -> str:
         client = self._get_groq_client()
         if not client:
             raise Exception("No Groq API Key available")
 
-        with open(file_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(file_path, file.read()),
-                model=settings.GROQ_WHISPER_MODEL, 
-                response_format="json",
-                language="th",
-                temperature=0.0
-            )
+        # ส่งจากหน่วยความจำตรงๆ (ไม่ต้องเขียนไฟล์ชั่วคราว)
+        transcription = client.audio.transcriptions.create(
+            file=(filename, audio_bytes),
+            model=settings.GROQ_WHISPER_MODEL, 
+            response_format="json",
+            language="th",
+            temperature=0.0
+        )
         return transcription.text
 
-    def _get_local_model(self):
-        """Lazy load local model in a thread-safe way (mostly called from thread executor)"""
-        # Note: Since this is often called inside asyncio.to_thread, standard locks apply
-        if self.local_whisper_model is None:
-            import whisper
-            model_size = settings.WHISPER_MODEL_SIZE
-            logging.info(f"🔄 [Speech] กำลังโหลด Local Whisper '{model_size}' (ระบบสำรอง)...")
-            self.local_whisper_model = whisper.load_model(model_size, device=settings.DEVICE)
-        return self.local_whisper_model
-
-    def _transcribe_with_local(self, file_path: str) -> str:
-        model = self._get_local_model()
-        logging.info("🐢 [Speech] กำลังแปลงเสียงเป็นข้อความด้วย Local Whisper...")
-        result = model.transcribe(file_path, language="th")
-        return result.get('text', '').strip()
-
-    async def transcribe_audio_bytes(self, audio_bytes: bytes) -> str:
-        if not audio_bytes: return ""
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_file:
-            temp_file.write(audio_bytes)
-            temp_file_path = temp_file.name
+    @staticmethod
+    def _uses_model_host_whisper() -> bool:
+        return settings.USE_MODEL_HOST and settings.MODEL_HOST_WHISPER
+
+    async def preload_local_model(self):
+        """โหลด Local Whisper ล่วงหน้า (WHISPER_PRELOAD) - ข้ามถ้าใช้ Whisper ของ Model Host"""
+        if self._uses_model_host_whisper():
+            return
+        try:
+            await self.local_engine.preload()
+        except Exception as e:
+            logging.error(f"❌ [Speech] โหลด Local Whisper ล่วงหน้าล้มเหลว: {e}")
+
+    async def _transcribe_local_fallback(self, audio: PreparedAudio) -> str:
+        if self._uses_model_host_whisper():
+            # 🧩 ใช้ Whisper ที่ Model Host โหลดไว้แล้ว ไม่ต้องโหลดซ้ำใน process นี้
+            from core.ai_models.remote_models import transcribe_remote
+            return await asyncio.to_thread(transcribe_remote, audio.data)
+        # ใช้ PCM ที่ decode ไว้แล้ว (ไม่ต้องถอดรหัสไฟล์ซ้ำ)
+        return await self.local_engine.transcribe(audio.samples if audio.samples is not None else audio.data)
 
+    async def _transcribe_prepared(self, audio: PreparedAudio) -> str:
+        if audio.is_silent:
+            logging.info("🔇 [Speech] ไฟล์เสียงว่าง ข้ามการแปลงเสียง")
+            return ""
+
+        started = time.perf_counter()
         try:
             logging.info("🚀 [Speech] กำลังลองใช้ Groq Whisper...")
-            text = await asyncio.to_thread(self._transcribe_with_groq, temp_file_path)
-            logging.info(f"✅ [Speech] ผลลัพธ์จาก Groq: '{text}'")
+            text = await asyncio.to_thread(self._transcribe_with_groq, audio.data, audio.filename)
+            logging.info(f"✅ [Speech] ผลลัพธ์จาก Groq ({(time.perf_counter() - started) * 1000:.0f} ms): '{text}'")
             return text
 
         except Exception as e:
             logging.warning(f"⚠️ [Speech] Groq ล้มเหลว ({e}). กำลังเปลี่ยนไปใช้ Local Whisper...")
             try:
-                text = await asyncio.to_thread(self._transcribe_with_local, temp_file_path)
+                text = await self._transcribe_local_fallback(audio)
                 logging.info(f"✅ [Speech] ผลลัพธ์จาก Local: '{text}'")
                 return text
             except Exception as local_e:
                 logging.error(f"❌ [Speech] การแปลงเสียงเป็นข้อความล้มเหลวทั้งหมด: {local_e}")
                 return ""
-        finally:
-            if os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                except:
-                    pass
-
-    async def synthesize_speech_stream(self, text: str):
+
+    async def transcribe_audio_bytes(self, audio_bytes: bytes, filename: str = "audio.webm") -> str:
+        if not audio_bytes: return ""
+        # 🎚️ decode ครั้งเดียว -> ตัดความเงียบ -> 16 kHz mono -> บีบอัด (ใช้ร่วมกันทั้ง Groq และ Local)
+        audio = await asyncio.to_thread(prepare_audio, audio_bytes, filename or "audio.webm")
+        return await self._transcribe_prepared(audio)
+
+    async def transcribe_pcm(self, pcm: bytes, sample_rate: int) -> str:
+        """ถอดเสียง PCM16 mono (จาก streaming STT ที่ VAD ตัดขอบแล้ว) - แค่ resample + บีบอัด ไม่ต้อง decode"""
+        if not pcm: return ""
+        audio = await asyncio.to_thread(prepare_pcm, pcm, sample_rate)
+        return await self._transcribe_prepared(audio)
+
+    def local_partials_available(self) -> bool:
+        """ถอดเสียงระหว่างพูด (partial) ใช้ได้เมื่อเปิด STT_PARTIALS_ENABLED และมี Local Whisper ใน process นี้"""
+        return settings.STT_PARTIALS_ENABLED and self.local_engine.is_available()
+
+    async def transcribe_partial(self, pcm: bytes, sample_rate: int) -> str:
+        """ถอดเสียงที่พูดมาถึงตอนนี้ด้วย Local Whisper (ผลชั่วคราว ไม่ส่ง Groq)"""
+        if sample_rate == 16000:
+            audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        else:
+            audio = pcm_to_wav(pcm, sample_rate)
+        return await self.local_engine.transcribe(audio, partial=True)
+
+    async def synthesize_speech_stream(self, text: str, lang: Optional[str] = None):
         """
         Async Generator that yields audio chunks (bytes).
+        - lang: ภาษาที่ตรวจไว้แล้ว (เช่น result["language"] จาก orchestrator) ไม่ต้องตรวจซ้ำ
         - Uses Edge TTS by default (streaming with sentence buffering).
         - Falls back to gTTS (yields single full chunk).
         """
@@ -198,8 +223,8 @@ class SpeechHandler:
         logging.info(f"🗣️  [TTS Stream] เริ่มสังเคราะห์เสียง: '{clean_text[:50]}...'")
 
         # 🌐 Detect language
-        detected_lang = "th"
-        if self.lang_detector:
+        detected_lang = lang or "th"
+        if self.lang_detector and not lang:
             detected_lang = self.lang_detector.detect(text)
             logging.info(f"🌐 [TTS] ภาษา: {detected_lang}")
 
@@ -0,0 +1,198 @@
+# /core/ai_models/streaming_stt.py
+"""
+Streaming Speech-to-Text สำหรับ WebSocket (avatar / chat)
+
+โปรโตคอล (client -> server):
+- {"action": "STT_START", "sample_rate": 16000}  เริ่มโหมด streaming (เสียง = PCM16 little-endian mono)
+- binary chunk                                   ส่งเสียงทีละชิ้นระหว่างพูด (ขนาดใดก็ได้)
+- {"action": "STT_STOP"}                         จบโหมด streaming (ถ้ายังมีเสียงค้าง = ถือว่าจบประโยค)
+server -> client: {"action": "STT_PARTIAL", "text"} ระหว่างพูด (ถ้าเปิด STT_PARTIALS_ENABLED)
+                  {"action": "STT_FINAL", "text"}   เมื่อ VAD ตัดสินว่าจบประโยค แล้วตามด้วยคำตอบตามปกติ
+binary ที่ส่งมาโดยไม่ได้ STT_START = ไฟล์เสียงทั้งก้อนแบบเดิม
+
+VAD ฝั่ง server ใช้พลังงานเสียง (RMS) ต่อเฟรม 30 ms: เมื่อเงียบต่อเนื่อง STT_VAD_SILENCE_MS หลังมีเสียงพูด
+-> ส่งเสียงที่ตัดช่วงเงียบหัว/ท้ายแล้วไป Groq ทันที (ไม่ต้องรอ client หยุดอัด)
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from core.config import settings
+from core.ai_models.speech_handler import speech_handler_instance
+
+FRAME_MS = 30
+PRE_ROLL_MS = 300    # เก็บเสียงก่อนเริ่มพูดไว้ด้วย (พยัญชนะต้นไม่ถูกตัด)
+TAIL_KEEP_MS = 200   # เก็บความเงียบท้ายประโยคไว้เล็กน้อย
+
+
+def parse_sample_rate(data: dict) -> int:
+    """sample_rate จากข้อความ STT_START (ค่าเพี้ยน -> 16000)"""
+    try:
+        rate = int(data.get("sample_rate", 16000))
+    except (TypeError, ValueError):
+        return 16000
+    return rate if 8000 <= rate <= 48000 else 16000
+
+
+class EnergyVAD:
+    """ตรวจจับช่วงพูด/จบประโยคจากพลังงานเสียงของ PCM16 mono"""
+
+    def __init__(self, sample_rate: int):
+        self.frame_bytes = int(sample_rate * FRAME_MS / 1000) * 2
+        self.threshold = settings.STT_VAD_ENERGY_THRESHOLD
+        self.noise_floor = 0.0
+        self.reset()
+
+    def reset(self):
+        """เริ่มประโยคใหม่ (คงระดับเสียงรบกวนพื้นหลังที่เรียนรู้ไว้)"""
+        self.speech_ms = 0
+        self.silence_ms = 0
+
+    def is_speech(self, frame: bytes) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        # ระดับเสียงรบกวนพื้นหลังปรับตามห้อง (EMA ของเฟรมที่ไม่ใช่เสียงพูด)
+        speech = rms > max(self.threshold, self.noise_floor * 2.5)
+        if not speech:
+            self.noise_floor = rms if self.noise_floor == 0 else 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+    def update(self, speech: bool):
+        if speech:
+            self.speech_ms += FRAME_MS
+            self.silence_ms = 0
+        elif self.speech_ms:
+            self.silence_ms += FRAME_MS
+
+    @property
+    def started(self) -> bool:
+        return self.speech_ms >= settings.STT_VAD_MIN_SPEECH_MS
+
+    @property
+    def ended(self) -> bool:
+        return self.started and self.silence_ms >= settings.STT_VAD_SILENCE_MS
+
+    @property
+    def discarded(self) -> bool:
+        """เสียงสั้นๆ (เช่น เคาะโต๊ะ) แล้วเงียบไป -> ไม่ใช่เสียงพูด"""
+        return not self.started and self.silence_ms >= settings.STT_VAD_SILENCE_MS
+
+
+class StreamingTranscriber:
+    """
+    สถานะ streaming STT ของ WebSocket หนึ่งการเชื่อมต่อ
+    feed() รับ chunk เสียง คืนข้อความเมื่อจบประโยค (เรียก Groq ทันทีที่ VAD ตัดจบ) / None ถ้ายังพูดไม่จบ
+    """
+
+    def __init__(self, sample_rate: int = 16000, on_partial: Optional[Callable[[str], Awaitable[None]]] = None):
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.partials_enabled = on_partial is not None and speech_handler_instance.local_partials_available()
+        self._pending = b""
+        self._partial_task: Optional[asyncio.Task] = None
+        self._utterance_id = 0
+        self.vad = EnergyVAD(sample_rate)
+        self._reset()
+
+    def _reset(self):
+        self.vad.reset()
+        self._pre_roll = deque(maxlen=max(PRE_ROLL_MS // FRAME_MS, 1))
+        self._speech = bytearray()
+        self._utterance_id += 1
+        self._last_partial_bytes = 0
+        self._started_at: Optional[float] = None
+
+    @property
+    def _max_bytes(self) -> int:
+        return settings.STT_MAX_UTTERANCE_SECONDS * self.sample_rate * 2
+
+    async def feed(self, chunk: bytes) -> Optional[str]:
+        data = self._pending + chunk
+        frame_bytes = self.vad.frame_bytes
+        usable = len(data) - len(data) % frame_bytes
+        self._pending = data[usable:]
+
+        for offset in range(0, usable, frame_bytes):
+            frame = data[offset:offset + frame_bytes]
+            speech = self.vad.is_speech(frame)
+            self.vad.update(speech)
+
+            if self.vad.speech_ms == 0:
+                self._pre_roll.append(frame)
+                continue
+            if not self._speech:
+                self._started_at = time.perf_counter()
+                self._speech.extend(b"".join(self._pre_roll))
+            self._speech.extend(frame)
+
+            if self.vad.ended or len(self._speech) >= self._max_bytes:
+                # ไม่ส่งเสียงเงียบท้ายประโยคทั้งหมดไป Groq / เสียงที่เหลือใน chunk นี้เก็บไว้เป็นต้นประโยคถัดไป
+                trim = max(self.vad.silence_ms - TAIL_KEEP_MS, 0) // FRAME_MS * frame_bytes
+                self._pending = data[offset + frame_bytes:]
+                return await self._finish(trim)
+            if self.vad.discarded:
+                self._reset()
+        self._maybe_schedule_partial()
+        return None
+
+    async def flush(self) -> Optional[str]:
+        """client สั่งหยุด: ถ้ามีเสียงพูดค้างอยู่ให้ถอดเลย"""
+        self._pending = b""
+        if not self.vad.started:
+            self._reset()
+            return None
+        return await self._finish(0)
+
+    async def _finish(self, trim_bytes: int) -> Optional[str]:
+        pcm = bytes(self._speech[:len(self._speech) - trim_bytes] if trim_bytes else self._speech)
+        spoke_ms = self.vad.speech_ms
+        speech_started = self._started_at
+        self._cancel_partial()
+        self._reset()
+        if spoke_ms < settings.STT_VAD_MIN_SPEECH_MS:
+            return None
+
+        started = time.perf_counter()
+        text = await speech_handler_instance.transcribe_pcm(pcm, self.sample_rate)
+        logging.info(
+            f"🎙️ [StreamSTT] จบประโยค: เสียง {len(pcm) / (self.sample_rate * 2):.1f}s, "
+            f"ถอดเสียง {(time.perf_counter() - started) * 1000:.0f} ms "
+            f"(รวมตั้งแต่เริ่มพูด {(time.perf_counter() - speech_started) * 1000:.0f} ms)"
+        )
+        return (text or "").strip() or None
+
+    # ====== Partial transcripts ======
+
+    def _maybe_schedule_partial(self):
+        if not self.partials_enabled or not self.vad.started:
+            return
+        if self._partial_task is not None and not self._partial_task.done():
+            return  # ทำทีละงาน ไม่ให้ CPU ท่วม
+        interval_bytes = settings.STT_PARTIAL_INTERVAL_MS * self.sample_rate * 2 // 1000
+        if len(self._speech) - self._last_partial_bytes < interval_bytes:
+            return
+        self._last_partial_bytes = len(self._speech)
+        self._partial_task = asyncio.create_task(self._run_partial(bytes(self._speech), self._utterance_id))
+
+    async def _run_partial(self, pcm: bytes, utterance_id: int):
+        try:
+            text = await speech_handler_instance.transcribe_partial(pcm, self.sample_rate)
+            if text and utterance_id == self._utterance_id:
+                await self.on_partial(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"⚠️ [StreamSTT] partial transcription ล้มเหลว: {e}")
+
+    def _cancel_partial(self):
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        self._partial_task = None
+
+    def close(self):
+        self._cancel_partial()
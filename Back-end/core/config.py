@@ -17,6 +17,23 @@ class Settings:
     
     EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-large")
     RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL_NAME", "BAAI/bge-reranker-base")
+
+    # ⚡ Inference Backend สำหรับ Embedding + Re-ranker: "torch" | "onnx" | "onnx-int8"
+    # (ต้อง export โมเดลก่อนด้วย scripts/export_onnx_models.py)
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", str(_BACKEND_DIR / "models" / "onnx"))
+    ONNX_QUANTIZATION_CONFIG: str = os.getenv("ONNX_QUANTIZATION_CONFIG", "avx2")  # arm64 | avx2 | avx512 | avx512_vnni
+
+    # 🧩 Shared Model Host (workers/model_host.py) - โหลด Embedding/Re-ranker/Whisper ครั้งเดียวให้ทุก process ใช้ร่วมกัน
+    USE_MODEL_HOST: bool = os.getenv("USE_MODEL_HOST", "false").lower() == "true"
+    MODEL_HOST_SOCKET: str = os.getenv("MODEL_HOST_SOCKET", "/tmp/nan_model_host.sock")  # ว่าง = ใช้ TCP (MODEL_HOST_URL)
+    MODEL_HOST_URL: str = os.getenv("MODEL_HOST_URL", "http://127.0.0.1:9191")
+    MODEL_HOST_WHISPER: bool = os.getenv("MODEL_HOST_WHISPER", "false").lower() == "true"
+    MODEL_HOST_TIMEOUT: float = float(os.getenv("MODEL_HOST_TIMEOUT", 60))
+
+    # 🚀 Embedding Micro-Batching (รวมคำขอ encode ที่มาพร้อมกัน)
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
     
     # 2. LLM Models
     GEMINI_MODEL = "gemini-2.5-flash"          # โมเดลหลัก (Google)
@@ -25,12 +42,28 @@ class Settings:
     
     # 3. Speech & Audio Models
     GROQ_WHISPER_MODEL = "whisper-large-v3" # Groq STT 
-    WHISPER_MODEL_SIZE = "medium"                       # Local Whisper Fallback (base/small/medium)
+    WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "medium")  # Local Whisper Fallback (base/small/medium)
+    LOCAL_WHISPER_BACKEND: str = os.getenv("LOCAL_WHISPER_BACKEND", "faster_whisper")  # faster_whisper | whisper_cpp
+    WHISPER_COMPUTE_TYPE: str = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # faster-whisper: int8 | int8_float16 | float16 | float32
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", 0))  # 0 = จำนวน core - 1
+    WHISPER_PRELOAD: bool = os.getenv("WHISPER_PRELOAD", "false").lower() == "true"  # โหลด Local Whisper ตอน startup
     TTS_VOICE = "th-TH-PremwadeeNeural"               # เสียงพูด (Edge TTS)
     
     QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
+    QDRANT_GRPC_PORT: int = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+    QDRANT_PREFER_GRPC: bool = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"  # ค้นหาผ่าน gRPC แทน REST
     QDRANT_COLLECTION_NAME = "nan_locations"
+    # 🧭 HNSW + Quantization (Collection เดิมจะถูกปรับด้วย update_collection ตอน startup)
+    # วัดผลก่อนเปลี่ยนค่าได้ด้วย scripts/benchmark_qdrant_index.py
+    QDRANT_HNSW_M: int = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT: int = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+    QDRANT_HNSW_EF: int = int(os.getenv("QDRANT_HNSW_EF", 0))  # ef ตอนค้นหา (0 = ค่าเริ่มต้นของ Qdrant)
+    QDRANT_QUANTIZATION_ENABLED: bool = os.getenv("QDRANT_QUANTIZATION_ENABLED", "false").lower() == "true"  # scalar int8
+    QDRANT_QUANTIZATION_QUANTILE: float = float(os.getenv("QDRANT_QUANTIZATION_QUANTILE", 0.99))
+    QDRANT_QUANTIZATION_RESCORE: bool = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", 2.0))
+    QDRANT_ON_DISK_ORIGINALS: bool = os.getenv("QDRANT_ON_DISK_ORIGINALS", "true").lower() == "true"  # ใช้เมื่อเปิด quantization
 
     QDRANT_TOP_K: int = 5 # 🚀 [Optimized] Reduced from 8 to 5 to speed up Reranker
     IMAGE_FALLBACK_THRESHOLD: int = 2
@@ -52,6 +85,64 @@ class Settings:
     OPENWEATHER_API_KEY: str | None = os.getenv("OPENWEATHER_API_KEY")
     TMD_API_KEY: str | None = os.getenv("TMD_API_KEY")
     WAQI_API_KEY: str | None = os.getenv("WAQI_API_KEY")  # World Air Quality Index
+    # Cache (Stale-While-Revalidate): ค่าอากาศ/PM2.5 เปลี่ยนรายชั่วโมง แต่ API จำกัด 1000 calls/วัน
+    WEATHER_CACHE_TTL_SECONDS: int = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", 1800))
+    AIR_QUALITY_CACHE_TTL_SECONDS: int = int(os.getenv("AIR_QUALITY_CACHE_TTL_SECONDS", 1800))
+    CONDITIONS_STALE_SECONDS: int = int(os.getenv("CONDITIONS_STALE_SECONDS", 10800))  # ใช้ค่าเก่าได้อีก 3 ชม. ระหว่างรอโหลดใหม่
+
+    # Analytics Buffer: เขียน analytics_logs เป็นชุด (insert_many) แทนทีละรายการ
+    ANALYTICS_BUFFER_SIZE: int = int(os.getenv("ANALYTICS_BUFFER_SIZE", 5000))
+    ANALYTICS_FLUSH_BATCH_SIZE: int = int(os.getenv("ANALYTICS_FLUSH_BATCH_SIZE", 100))
+    ANALYTICS_FLUSH_INTERVAL_MS: int = int(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", 2000))
+    # Analytics Rollup: สรุปรายชั่วโมง/รายวันล่วงหน้า ให้ Dashboard ไม่ต้อง aggregate log ดิบทุกครั้ง
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: int = int(os.getenv("ANALYTICS_ROLLUP_INTERVAL_SECONDS", 300))
+    ANALYTICS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", 60))
+
+    # Image Sync: ติดตามโฟลเดอร์ static/images แบบ live (ต้องติดตั้ง watchdog)
+    IMAGE_WATCH_ENABLED: bool = os.getenv("IMAGE_WATCH_ENABLED", "false").lower() == "true"
+    IMAGE_WATCH_DEBOUNCE_SECONDS: float = float(os.getenv("IMAGE_WATCH_DEBOUNCE_SECONDS", 2))
+    # Image Variants: ส่งรูปย่อ/WebP แทนไฟล์ต้นฉบับความละเอียดเต็ม (สร้างด้วย Pillow + cache บนดิสก์)
+    IMAGE_VARIANTS_ENABLED: bool = os.getenv("IMAGE_VARIANTS_ENABLED", "true").lower() == "true"
+    IMAGE_VARIANTS_PREGENERATE: bool = os.getenv("IMAGE_VARIANTS_PREGENERATE", "true").lower() == "true"
+    IMAGE_VARIANT_MAX_AGE_SECONDS: int = int(os.getenv("IMAGE_VARIANT_MAX_AGE_SECONDS", 604800))
+    # Google Image fallback: โควต้า Google CSE ต่อวัน + ดึงรูปของสถานที่ที่ไม่มีรูปไว้ล่วงหน้าช่วงคนใช้น้อย (เวลาไทย)
+    GOOGLE_CSE_DAILY_QUOTA: int = int(os.getenv("GOOGLE_CSE_DAILY_QUOTA", 100))
+    IMAGE_PREFETCH_ENABLED: bool = os.getenv("IMAGE_PREFETCH_ENABLED", "true").lower() == "true"
+    IMAGE_PREFETCH_START_HOUR: int = int(os.getenv("IMAGE_PREFETCH_START_HOUR", 1))
+    IMAGE_PREFETCH_END_HOUR: int = int(os.getenv("IMAGE_PREFETCH_END_HOUR", 5))
+    IMAGE_PREFETCH_QUOTA_RESERVE: int = int(os.getenv("IMAGE_PREFETCH_QUOTA_RESERVE", 30))  # เหลือโควต้าไว้ให้ผู้ใช้จริง
+
+    # V-Maps: อายุสูงสุดของรายการสถานที่ในหน่วยความจำ (การเขียนผ่าน MongoDBManager ใน process เดียวกันโหลดใหม่ทันที)
+    NAV_INDEX_MAX_AGE_SECONDS: int = int(os.getenv("NAV_INDEX_MAX_AGE_SECONDS", 300))
+
+    # Near Me: ค้นสถานที่ใกล้พิกัดผู้ใช้ด้วย $geoNear (2dsphere) แล้วรวมกับผล Qdrant ก่อน rerank
+    GEO_NEAR_RADIUS_KM: float = float(os.getenv("GEO_NEAR_RADIUS_KM", 10))
+    GEO_NEAR_CANDIDATES: int = int(os.getenv("GEO_NEAR_CANDIDATES", 10))
+    GEO_PROXIMITY_WEIGHT: float = float(os.getenv("GEO_PROXIMITY_WEIGHT", 0.3))  # คะแนนเพิ่มสูงสุด (ที่ระยะ 0 กม.)
+
+    # Hybrid Retrieval: Qdrant (dense) + BM25 (pythainlp newmm) รวมอันดับด้วย Reciprocal Rank Fusion ก่อน rerank
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    HYBRID_LEXICAL_TOP_K: int = int(os.getenv("HYBRID_LEXICAL_TOP_K", 10))
+    HYBRID_CANDIDATE_BUDGET: int = int(os.getenv("HYBRID_CANDIDATE_BUDGET", 8))  # จำนวนเอกสารสูงสุดต่อ sub-query ที่ส่งเข้า reranker
+    HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", 60))
+    LEXICAL_INDEX_MAX_AGE_SECONDS: int = int(os.getenv("LEXICAL_INDEX_MAX_AGE_SECONDS", 300))
+
+    # Prompt Registry: ไม่มี watchdog -> เช็คว่าไฟล์ใน prompts/ เปลี่ยนไหมทุกกี่วินาที
+    PROMPT_RELOAD_CHECK_SECONDS: float = float(os.getenv("PROMPT_RELOAD_CHECK_SECONDS", 5))
+
+    # Streaming STT (WebSocket): VAD ตัดจบประโยคฝั่ง server แล้วส่ง Groq ทันที
+    STT_VAD_ENERGY_THRESHOLD: float = float(os.getenv("STT_VAD_ENERGY_THRESHOLD", 300))  # RMS ของ PCM16 ขั้นต่ำที่ถือว่าเป็นเสียงพูด
+    STT_VAD_SILENCE_MS: int = int(os.getenv("STT_VAD_SILENCE_MS", 700))        # เงียบนานเท่านี้ = จบประโยค
+    STT_VAD_MIN_SPEECH_MS: int = int(os.getenv("STT_VAD_MIN_SPEECH_MS", 250))   # สั้นกว่านี้ถือเป็นเสียงรบกวน
+    STT_MAX_UTTERANCE_SECONDS: int = int(os.getenv("STT_MAX_UTTERANCE_SECONDS", 30))
+    STT_PARTIALS_ENABLED: bool = os.getenv("STT_PARTIALS_ENABLED", "false").lower() == "true"  # ถอดระหว่างพูดด้วย faster-whisper ในเครื่อง
+    STT_PARTIAL_INTERVAL_MS: int = int(os.getenv("STT_PARTIAL_INTERVAL_MS", 1200))
+    # 🎚️ เตรียมเสียงก่อนแปลงเป็นข้อความ: decode -> ตัดความเงียบ -> 16 kHz mono -> บีบอัด (core/ai_models/audio_preprocessor.py)
+    STT_PREPROCESS_ENABLED: bool = os.getenv("STT_PREPROCESS_ENABLED", "true").lower() == "true"
+    STT_UPLOAD_FORMAT: str = os.getenv("STT_UPLOAD_FORMAT", "ogg")  # ogg (Opus) | flac | wav
+    STT_UPLOAD_BITRATE: str = os.getenv("STT_UPLOAD_BITRATE", "24k")  # ใช้กับ ogg เท่านั้น
+    STT_TRIM_PADDING_MS: int = int(os.getenv("STT_TRIM_PADDING_MS", 200))  # เหลือความเงียบไว้หัว/ท้ายประโยค
+    STT_TRIM_MAX_RATIO: float = float(os.getenv("STT_TRIM_MAX_RATIO", 0.8))  # ตัดเกินสัดส่วนนี้ของคลิป -> ใช้เสียงเดิม
 
     API_HOST: str = os.getenv("API_HOST", "127.0.0.1")
     API_PORT: int = int(os.getenv("API_PORT", 9090))
@@ -0,0 +1,40 @@
+# /core/database/async_mongo.py
+# Shared Async MongoDB Client (pymongo.AsyncMongoClient - มีใน pymongo >= 4.13 ไม่ต้องติดตั้ง motor)
+# ใช้ connection pool เดียวต่อ process สำหรับ service ที่ทำงานใน event loop
+# (แทนการสร้าง MongoDBManager ใหม่ซึ่งเปิด pool แยกอีกชุด และเรียก pymongo แบบ sync ใน async code)
+
+import logging
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+
+from core.config import settings
+
+_client: Optional[AsyncMongoClient] = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    """คืน AsyncMongoClient ตัวเดียวของ process (สร้างครั้งแรกที่เรียก - ยังไม่ต่อ network จนกว่าจะใช้งาน)"""
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(
+            settings.MONGO_URI,
+            serverSelectionTimeoutMS=5000,
+            connectTimeoutMS=5000,
+            socketTimeoutMS=10000,
+            tz_aware=True
+        )
+        logging.info("✅ [AsyncMongo] สร้าง shared AsyncMongoClient")
+    return _client
+
+
+def get_async_db():
+    return get_async_client()[settings.MONGO_DATABASE_NAME]
+
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logging.info("✅ [AsyncMongo] ปิด AsyncMongoClient")
@@ -0,0 +1,151 @@
+# /core/database/embedding_batcher.py
+# Dynamic Micro-Batching สำหรับโมเดล Embedding
+# รวมข้อความจากหลาย Request ที่เข้ามาพร้อมกัน (Kiosk + Web + LINE) ให้ encode ในครั้งเดียว
+
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ขอบเขตของ Histogram ขนาด batch (ค่าบนของแต่ละช่อง)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """
+    🚀 Micro-Batching Server สำหรับ Embedding
+
+    - ผู้เรียกแต่ละรายใส่ข้อความลงคิว แล้วรอ Future ของตัวเอง
+    - Collector จะ flush เมื่อครบ max_batch_size หรือรอครบ max_wait_ms (ไม่กี่มิลลิวินาที)
+    - encode ทั้ง batch ใน thread เดียว แล้วกระจายผลลัพธ์คืนให้ผู้เรียกแต่ละราย
+    - เก็บสถิติ Histogram ขนาด batch ไว้ดูผ่าน get_stats()
+    """
+
+    def __init__(
+        self,
+        encode_batch_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self._encode_batch_fn = encode_batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 📊 สถิติ
+        self._histogram: Dict[str, int] = {self._bucket_label(b): 0 for b in BATCH_SIZE_BUCKETS}
+        self._histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = 0
+        self._total_requests = 0
+        self._total_batches = 0
+        self._total_encode_seconds = 0.0
+        self._max_batch_seen = 0
+
+    @staticmethod
+    def _bucket_label(upper: int) -> str:
+        return f"<={upper}"
+
+    def _ensure_collector(self):
+        """สร้างคิวและ Collector Task ตาม Event Loop ที่กำลังทำงานอยู่ (Lazy Start)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._collector_task is None or self._collector_task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._collector_task = loop.create_task(self._collector())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """ใส่ข้อความเข้าคิวแล้วรอผลลัพธ์ (Vector ของข้อความนั้น)"""
+        self._ensure_collector()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        """ใส่หลายข้อความพร้อมกัน (เช่นตอน Import) ให้ Collector รวมเป็น batch เอง"""
+        return list(await asyncio.gather(*(self.encode(t) for t in texts)))
+
+    async def _collector(self):
+        while True:
+            first = await self._queue.get()
+            batch: List[Tuple[str, asyncio.Future]] = [first]
+            deadline = self._loop.time() + self.max_wait
+
+            # ⏳ รวบรวมจนกว่าจะเต็ม batch หรือหมดเวลารอ
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    # หมดเวลาแล้ว แต่ถ้ายังมีของค้างในคิวก็เก็บไปด้วยเลย
+                    while len(batch) < self.max_batch_size and not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        # ผู้เรียกที่ยกเลิกไปแล้ว (เช่น client ตัดการเชื่อมต่อ) ไม่ต้อง encode
+        batch = [(text, fut) for text, fut in batch if not fut.done()]
+        if not batch:
+            return
+
+        texts = [text for text, _ in batch]
+        started = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(self._encode_batch_fn, texts)
+        except Exception as e:
+            logging.error(f"❌ [EmbeddingBatcher] encode batch ({len(texts)} ข้อความ) ล้มเหลว: {e}")
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self._record(len(texts), time.perf_counter() - started)
+
+        # 📤 กระจายผลลัพธ์คืนให้ผู้เรียกแต่ละราย ตามลำดับเดิม
+        for (_, fut), vector in zip(batch, vectors):
+            if not fut.done():
+                fut.set_result(vector)
+
+    def _record(self, batch_size: int, seconds: float):
+        self._total_requests += batch_size
+        self._total_batches += 1
+        self._total_encode_seconds += seconds
+        self._max_batch_seen = max(self._max_batch_seen, batch_size)
+        for upper in BATCH_SIZE_BUCKETS:
+            if batch_size <= upper:
+                self._histogram[self._bucket_label(upper)] += 1
+                return
+        self._histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] += 1
+
+    def get_stats(self) -> dict:
+        """สถิติการทำงาน: Histogram ขนาด batch, ค่าเฉลี่ย, และเวลา encode"""
+        avg_batch = self._total_requests / self._total_batches if self._total_batches else 0.0
+        avg_ms = (self._total_encode_seconds / self._total_batches * 1000) if self._total_batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "total_requests": self._total_requests,
+            "total_batches": self._total_batches,
+            "avg_batch_size": round(avg_batch, 2),
+            "max_batch_seen": self._max_batch_seen,
+            "avg_encode_ms": round(avg_ms, 2),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size_histogram": dict(self._histogram),
+        }
+
+    async def close(self):
+        """หยุด Collector Task (เรียกตอนปิดแอป)"""
+        if self._collector_task and not self._collector_task.done():
+            self._collector_task.cancel()
+            try:
+                await self._collector_task
+            except asyncio.CancelledError:
+                pass
+        self._collector_task = None
@@ -10,7 +10,27 @@ from core.config import settings
 from typing import List, Dict, Any, Optional
 from datetime import datetime # 🚀 [เพิ่ม]
 
+
+def location_geo_point(location_data: Optional[dict]) -> Optional[Dict[str, Any]]:
+    """
+    GeoJSON Point จาก location_data.latitude/longitude (สำหรับ 2dsphere index ที่ field "geo")
+    พิกัดไม่ถูกต้อง/ไม่มี -> None (2dsphere ข้ามเอกสารที่ geo เป็น null)
+    """
+    try:
+        lat = float((location_data or {}).get("latitude"))
+        lon = float((location_data or {}).get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
 class MongoDBManager:
+    # เพิ่มทุกครั้งที่เขียน nan_locations ผ่าน manager (ทุก instance ใน process) ให้ cache ในหน่วยความจำรู้ว่าต้องโหลดใหม่
+    locations_revision = 0
+    _geo_index_ready = False
+
     def __init__(self):
         try:
             self.client = MongoClient(
@@ -32,6 +52,74 @@ class MongoDBManager:
             return self.db[collection_name]
         return None
 
+    @staticmethod
+    def _with_geo_point(data: dict) -> dict:
+        """ถ้ามีการเขียน location_data ให้เขียน geo (GeoJSON) ให้ตรงกันด้วย (คืน dict ใหม่ ไม่แก้ dict ของผู้เรียก)"""
+        if isinstance(data, dict) and "location_data" in data:
+            return {**data, "geo": location_geo_point(data.get("location_data"))}
+        return data
+
+    def ensure_geo_index(self, collection_name: str = "nan_locations") -> bool:
+        """สร้าง 2dsphere index ของ field "geo" (idempotent - เรียกครั้งแรกที่ใช้ $geoNear)"""
+        if MongoDBManager._geo_index_ready:
+            return True
+        collection = self.get_collection(collection_name)
+        if collection is None:
+            return False
+        try:
+            collection.create_index([("geo", "2dsphere")], name="geo_2dsphere")
+            MongoDBManager._geo_index_ready = True
+        except Exception as e:
+            print(f"❌ สร้าง 2dsphere index ล้มเหลว: {e}")
+        return MongoDBManager._geo_index_ready
+
+    def find_locations_near(
+        self,
+        lat: float,
+        lon: float,
+        max_distance_km: float,
+        limit: int = 10,
+        category: Optional[str] = None,
+        exclude_categories: Optional[List[str]] = None,
+        collection_name: str = "nan_locations"
+    ) -> list:
+        """
+        สถานที่ใกล้พิกัดที่ระบุ เรียงใกล้ -> ไกล ด้วย $geoNear (ใช้ 2dsphere index ไม่ต้องดึงทั้ง collection มาเรียงเอง)
+        แต่ละเอกสารมี "distance_km"
+        """
+        collection = self.get_collection(collection_name)
+        if collection is None or not self.ensure_geo_index(collection_name):
+            return []
+
+        query: Dict[str, Any] = {"doc_type": "Location"}
+        if category:
+            query["category"] = category
+        elif exclude_categories:
+            query["category"] = {"$nin": exclude_categories}
+
+        try:
+            return list(collection.aggregate([
+                {"$geoNear": {
+                    "near": {"type": "Point", "coordinates": [lon, lat]},
+                    "key": "geo",
+                    "distanceField": "distance_m",
+                    "maxDistance": max_distance_km * 1000,
+                    "spherical": True,
+                    "query": query
+                }},
+                {"$limit": limit},
+                {"$addFields": {"distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 1]}}},
+                {"$project": {"distance_m": 0}}
+            ]))
+        except Exception as e:
+            print(f"❌ เกิดข้อผิดพลาดในการค้นหาสถานที่ใกล้เคียง: {e}")
+            return []
+
+    @staticmethod
+    def _mark_locations_changed(collection_name: str, changed: int = 1):
+        if changed and collection_name == "nan_locations":
+            MongoDBManager.locations_revision += 1
+
     def get_locations_by_ids(self, ids: list) -> list:
         collection = self.get_collection("nan_locations")
         if collection is None:
@@ -64,7 +152,8 @@ class MongoDBManager:
         collection = self.get_collection(collection_name)
         if collection is not None:
             try:
-                result = collection.insert_one(location_data)
+                result = collection.insert_one(self._with_geo_point(location_data))
+                self._mark_locations_changed(collection_name)
                 print(f"📄 เพิ่มสถานที่ใหม่ด้วยรหัส: {result.inserted_id}")
                 return str(result.inserted_id)
             except Exception as e:
@@ -168,7 +257,8 @@ class MongoDBManager:
         collection = self.get_collection(collection_name)
         if collection is not None:
             try:
-                result = collection.update_one({"_id": ObjectId(mongo_id)}, {"$set": new_data})
+                result = collection.update_one({"_id": ObjectId(mongo_id)}, {"$set": self._with_geo_point(new_data)})
+                self._mark_locations_changed(collection_name, result.modified_count)
                 return result.modified_count
             except InvalidId:
                 print(f"❌ ไม่สามารถอัปเดตได้: รูปแบบรหัส MongoDB ไม่ถูกต้อง: '{mongo_id}'")
@@ -182,7 +272,8 @@ class MongoDBManager:
         collection = self.get_collection(collection_name)
         if collection is not None:
             try:
-                result = collection.update_one({"slug": slug}, {"$set": new_data})
+                result = collection.update_one({"slug": slug}, {"$set": self._with_geo_point(new_data)})
+                self._mark_locations_changed(collection_name, result.modified_count)
                 return result.modified_count
             except Exception as e:
                 print(f"❌ เกิดข้อผิดพลาดในการอัปเดตเอกสารด้วย Slug '{slug}': {e}")
@@ -193,6 +284,7 @@ class MongoDBManager:
         if collection is not None:
             try:
                 result = collection.delete_one({"_id": ObjectId(mongo_id)})
+                self._mark_locations_changed(collection_name, result.deleted_count)
                 return result.deleted_count
             except InvalidId:
                 print(f"❌ ไม่สามารถลบได้: รูปแบบรหัส MongoDB ไม่ถูกต้อง: '{mongo_id}'")
@@ -207,6 +299,7 @@ class MongoDBManager:
         if collection is not None:
             try:
                 result = collection.delete_one({"slug": slug})
+                self._mark_locations_changed(collection_name, result.deleted_count)
                 return result.deleted_count
             except Exception as e:
                 print(f"❌ เกิดข้อผิดพลาดในการลบเอกสารด้วย Slug '{slug}': {e}")
@@ -233,6 +326,7 @@ class MongoDBManager:
                     "metadata.sheet_id": sheet_id,
                     "metadata.synced_from": "google_sheets"
                 })
+                self._mark_locations_changed(collection_name, result.deleted_count)
                 print(f"✅ ลบข้อมูลจาก Sheet '{sheet_id}' จำนวน {result.deleted_count} รายการ")
                 return result.deleted_count
             except Exception as e:
@@ -271,142 +365,6 @@ class MongoDBManager:
                 return []
         return []
 
-    def get_analytics_summary(self, days: int = 30) -> dict:
-        """
-        ดึงสรุปข้อมูล Analytics ย้อนหลังตามจำนวนวัน (default 30 วัน)
-        คืนค่าเป็น dict ที่มี key: origin_stats, province_stats, interest_stats, total_conversations
-        """
-        collection = self.get_collection("analytics_logs")
-        if collection is None:
-            return {"origin_stats": [], "province_stats": [], "interest_stats": [], "total_conversations": 0}
-
-        try:
-            # ต้อง import datetime ที่นี่เพื่อให้มั่นใจว่าใช้งานได้
-            from datetime import datetime, timedelta, timezone
-            
-            # 1. กำหนดช่วงเวลา (ย้อนหลัง X วัน)
-            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-            
-            # Filter พื้นฐาน: เอาเฉพาะข้อมูลที่ใหม่กว่า cutoff_date
-            match_stage = {"$match": {"timestamp": {"$gte": cutoff_date}}}
-
-            # 2. Pipeline สำหรับหา User Origin (นักท่องเที่ยวมาจากไหน - ประเทศ)
-            origin_pipeline = [
-                match_stage,
-                {"$match": {"user_origin": {"$ne": None}}},  # ไม่เอาค่า Null
-                {"$group": {"_id": "$user_origin", "count": {"$sum": 1}}}, # จัดกลุ่มและนับ
-                {"$sort": {"count": -1}}, # เรียงจากมากไปน้อย
-                {"$limit": 10} # เอาแค่ Top 10 อันดับแรก
-            ]
-            
-            # 3. Pipeline สำหรับหา User Province (มาจากจังหวัดไหน - สำหรับคนไทย)
-            province_pipeline = [
-                match_stage,
-                {"$match": {"user_province": {"$ne": None}}},  # ไม่เอาค่า Null
-                {"$group": {"_id": "$user_province", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 15}  # Top 15 จังหวัด
-            ]
-            
-            # 4. Pipeline สำหรับหา Interest Topic (เขาสนใจเรื่องอะไร - หมวดหมู่)
-            interest_pipeline = [
-                match_stage,
-                {"$match": {"interest_topic": {"$ne": None}}}, # ไม่เอาค่า Null
-                {"$group": {"_id": "$interest_topic", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]
-            
-            # 5. Pipeline สำหรับหา Top Locations (สถานที่ยอดฮิต)
-            location_pipeline = [
-                match_stage,
-                {"$match": {"location_title": {"$ne": None}}},  # ไม่เอาค่า Null
-                {"$group": {"_id": "$location_title", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]
-
-            # 6. นับจำนวนข้อความทั้งหมดในช่วงเวลา (นับจาก analytics_logs)
-            total_count = collection.count_documents({"timestamp": {"$gte": cutoff_date}})
-            # 5. [NEW] Pipeline for Feedback (Like/Dislike)
-            feedback_pipeline = [
-                match_stage,
-                {"$group": {"_id": "$feedback_type", "count": {"$sum": 1}}}
-            ]
-            
-            # Execute Pipelines in Parallel (conceptually, sequential here)
-            origin_stats = list(collection.aggregate(origin_pipeline))
-            province_stats = list(collection.aggregate(province_pipeline))
-            interest_stats = list(collection.aggregate(interest_pipeline))
-            
-            # Location Stats (Top questioned locations) - ใช้ pipeline เดียวกับ interest แต่เปลี่ยน field
-            location_pipeline = [
-                match_stage,
-                {"$match": {"location_title": {"$ne": None}}},
-                {"$group": {"_id": "$location_title", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]
-            location_stats = list(collection.aggregate(location_pipeline))
-            
-            # Count total
-            total_conversations = collection.count_documents(match_stage["$match"])
-            
-            # Execute Feedback Pipeline
-            feedback_collection = self.get_collection("feedback_logs")
-            feedback_stats = []
-            if feedback_collection is not None:
-                feedback_stats = list(feedback_collection.aggregate(feedback_pipeline))
-            
-            # Default sample data for province if empty (ยังไม่มีการเก็บข้อมูล)
-            if not province_stats:
-                province_stats = [
-                    {"_id": "กรุงเทพมหานคร", "count": 0},
-                    {"_id": "เชียงใหม่", "count": 0},
-                    {"_id": "น่าน", "count": 0},
-                    {"_id": "ลำปาง", "count": 0},
-                    {"_id": "แพร่", "count": 0},
-                ]
-
-            return {
-                "origin_stats": origin_stats,
-                "province_stats": province_stats,
-                "interest_stats": interest_stats,
-                "location_stats": location_stats,
-                "total_conversations": total_conversations,
-                "feedback_stats": feedback_stats  # Returns list like: [{"_id": "like", "count": 10}, ...]
-            }
-
-        except Exception as e:
-            print(f"❌ เกิดข้อผิดพลาดในการรวบรวมข้อมูล Analytics: {e}")
-            return {"origin_stats": [], "province_stats": [], "interest_stats": [], "location_stats": [], "total_conversations": 0, "feedback_stats": []}
-
-    def get_top_locations(self, limit: int = 5, days: int = 30) -> list:
-        """
-        ดึงรายชื่อสถานที่ยอดฮิต (Top Locations) จาก Analytics Logs
-        คืนค่าเป็น list of dict: [{"_id": "วัดภูมินทร์", "count": 10}, ...]
-        """
-        collection = self.get_collection("analytics_logs")
-        if collection is None:
-            return []
-            
-        try:
-            from datetime import datetime, timedelta, timezone
-            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-            
-            pipeline = [
-                {"$match": {"timestamp": {"$gte": cutoff_date}, "location_title": {"$ne": None}}},
-                {"$group": {"_id": "$location_title", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": limit}
-            ]
-            
-            results = list(collection.aggregate(pipeline))
-            return results
-        except Exception as e:
-            print(f"❌ Error getting top locations: {e}")
-            return []
-
     def get_recommended_attractions(self, limit: int = 5) -> list:
         """
         🆕 ดึงสถานที่ท่องเที่ยวแนะนำสำหรับ Broad Query
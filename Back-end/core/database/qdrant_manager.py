@@ -2,39 +2,113 @@
 # (โค้ดที่แก้ไขแล้ว พร้อมคำอธิบายละเอียด)
 
 import uuid
-import asyncio
 import logging
 from qdrant_client import QdrantClient, AsyncQdrantClient, models 
-from sentence_transformers import SentenceTransformer
 from core.config import settings
+from core.ai_models.model_loader import load_embedding_model
+from core.database.embedding_batcher import EmbeddingBatcher
 import numpy as np 
 
+# ฟิลด์ที่ search_similar ใช้กรอง (must / must_not) -> สร้าง keyword payload index ไว้
+# (ไม่มี index = Qdrant ต้องอ่าน payload ทุก point ระหว่างค้นหา HNSW)
+PAYLOAD_INDEX_FIELDS = ("district", "sub_district", "category")
+
+# ฟิลด์ payload ที่ขอกลับมาตอนค้นหา: ใช้แค่ mongo_id ไปดึงเอกสารเต็มจาก MongoDB
+# (ไม่ส่ง text_content ทั้งก้อนกลับมาทุกผลลัพธ์)
+SEARCH_PAYLOAD_FIELDS = ["mongo_id"]
+
+
+def originals_on_disk() -> bool:
+    """เปิด int8 quantization แล้วเก็บเวกเตอร์ต้นฉบับไว้บนดิสก์ได้ (quantized vectors อยู่ใน RAM)"""
+    return settings.QDRANT_QUANTIZATION_ENABLED and settings.QDRANT_ON_DISK_ORIGINALS
+
+
+def build_hnsw_config(m: int = None, ef_construct: int = None) -> models.HnswConfigDiff:
+    return models.HnswConfigDiff(
+        m=m if m is not None else settings.QDRANT_HNSW_M,
+        ef_construct=ef_construct if ef_construct is not None else settings.QDRANT_HNSW_EF_CONSTRUCT
+    )
+
+
+def build_quantization_config(enabled: bool = None):
+    """Scalar int8 quantization (ลด RAM ของเวกเตอร์ ~4 เท่า) หรือ None ถ้าปิดไว้"""
+    if not (settings.QDRANT_QUANTIZATION_ENABLED if enabled is None else enabled):
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=settings.QDRANT_QUANTIZATION_QUANTILE,
+            always_ram=True
+        )
+    )
+
+
+def build_search_params(hnsw_ef: int = None, quantized: bool = None):
+    """
+    พารามิเตอร์ตอนค้นหา: hnsw_ef (0 = ค่าเริ่มต้นของ Qdrant) และการ rescore ด้วยเวกเตอร์ต้นฉบับเมื่อใช้ int8
+    """
+    hnsw_ef = settings.QDRANT_HNSW_EF if hnsw_ef is None else hnsw_ef
+    quantized = settings.QDRANT_QUANTIZATION_ENABLED if quantized is None else quantized
+    quantization = None
+    if quantized:
+        quantization = models.QuantizationSearchParams(
+            rescore=settings.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=settings.QDRANT_QUANTIZATION_OVERSAMPLING
+        )
+    if not hnsw_ef and quantization is None:
+        return None
+    return models.SearchParams(hnsw_ef=hnsw_ef or None, quantization=quantization)
+
+
+def describe_index_config() -> str:
+    quantization = "int8" if settings.QDRANT_QUANTIZATION_ENABLED else "off"
+    return (
+        f"m={settings.QDRANT_HNSW_M}, ef_construct={settings.QDRANT_HNSW_EF_CONSTRUCT}, "
+        f"hnsw_ef={settings.QDRANT_HNSW_EF or 'default'}, quantization={quantization}, "
+        f"originals_on_disk={originals_on_disk()}"
+    )
+
+
 class QdrantManager:
     def __init__(self):
         # สร้าง Client สำหรับเชื่อมต่อ Qdrant แบบ Asynchronous ตาม Host/Port ที่ตั้งค่าไว้
-        self.client = AsyncQdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        # prefer_grpc: ค้นหาผ่าน gRPC (6334) - protobuf เล็กกว่าและ parse เร็วกว่า JSON ของ REST
+        self.client = AsyncQdrantClient(
+            host=settings.QDRANT_HOST,
+            port=settings.QDRANT_PORT,
+            grpc_port=settings.QDRANT_GRPC_PORT,
+            prefer_grpc=settings.QDRANT_PREFER_GRPC
+        )
         
         logging.info("🔄 กำลังโหลดโมเดล Embedding...") 
         
         # โหลดโมเดล SentenceTransformer (เช่น intfloat/multilingual-e5-large) 
         # เพื่อใช้แปลงข้อความเป็น Vector (Embedding)
         # device=settings.DEVICE จะกำหนดว่าจะรันบน CPU หรือ GPU (cuda)
-        self.embedding_model = SentenceTransformer(
-            settings.EMBEDDING_MODEL_NAME, 
-            device=settings.DEVICE 
-        )
-        logging.info(f"✅ โหลดโมเดล Embedding '{settings.EMBEDDING_MODEL_NAME}' บน '{settings.DEVICE}' เรียบร้อยแล้ว")
+        # settings.INFERENCE_BACKEND เลือกได้ว่าจะใช้ PyTorch / ONNX / ONNX int8
+        self.embedding_model = load_embedding_model()
+        logging.info(f"✅ โหลดโมเดล Embedding '{settings.EMBEDDING_MODEL_NAME}' บน '{settings.DEVICE}' (backend: {settings.INFERENCE_BACKEND}) เรียบร้อยแล้ว")
 
         # ชื่อ Collection ที่จะใช้เก็บข้อมูลใน Qdrant
         self.collection_name = settings.QDRANT_COLLECTION_NAME
+        self.search_params = build_search_params()
+
+        # 🚀 Micro-Batching: รวมคำขอ encode ที่เข้ามาพร้อมกันให้เป็น batch เดียว
+        self.embedding_batcher = EmbeddingBatcher(
+            self._create_vectors_sync,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
         
     async def initialize(self):
-        """เริ่มการทำงาน: ตรวจสอบว่ามี Collection หรือยัง ถ้ายังไม่มีให้สร้างใหม่"""
+        """เริ่มการทำงาน: ตรวจสอบว่ามี Collection หรือยัง ถ้ายังไม่มีให้สร้างใหม่ / ถ้ามีแล้วปรับ config ให้ตรง (migrate in place)"""
         try:
             # ลองดึงข้อมูล Collection ดูว่ามีอยู่จริงไหม
-            await self.client.get_collection(collection_name=self.collection_name)
-            logging.info(f"✅ Collection '{self.collection_name}' already exists (Vector-Only).")
+            info = await self.client.get_collection(collection_name=self.collection_name)
         except Exception:
+            info = None
+
+        if info is None:
             # ถ้าไม่มี (เกิด Error) ให้สร้าง Collection ใหม่
             logging.warning(f"⚠️ ไม่พบ Collection '{self.collection_name}' กำลังสร้างใหม่ (Vector-Only)...") 
             await self.client.recreate_collection(
@@ -43,14 +117,66 @@ class QdrantManager:
                     # กำหนดขนาด Vector ตามขนาดของโมเดล Embedding ที่ใช้
                     size=self.embedding_model.get_sentence_embedding_dimension(),
                     # ใช้ Cosine Distance ในการวัดความเหมือน
-                    distance=models.Distance.COSINE
-                )
+                    distance=models.Distance.COSINE,
+                    # เปิด quantization แล้ว -> เวกเตอร์ต้นฉบับ (fp32) เก็บบนดิสก์ ใช้แค่ตอน rescore
+                    on_disk=originals_on_disk()
+                ),
+                hnsw_config=build_hnsw_config(),
+                quantization_config=build_quantization_config()
             )
-            logging.info(f"✅ สร้าง Collection '{self.collection_name}' สำเร็จแล้ว (Vector-Only)") 
+            logging.info(f"✅ สร้าง Collection '{self.collection_name}' สำเร็จแล้ว (Vector-Only, {describe_index_config()})") 
+        else:
+            logging.info(f"✅ Collection '{self.collection_name}' already exists (Vector-Only).")
+            await self._migrate_collection(info)
+
+        await self._ensure_payload_indexes(info)
+
+    async def _migrate_collection(self, info):
+        """ปรับ HNSW / quantization / on_disk ของ Collection เดิมด้วย update_collection (ไม่ต้องลบแล้ว import ใหม่)"""
+        changes = {}
+        desired_hnsw = build_hnsw_config()
+        current_hnsw = info.config.hnsw_config
+        if (current_hnsw.m, current_hnsw.ef_construct) != (desired_hnsw.m, desired_hnsw.ef_construct):
+            changes["hnsw_config"] = desired_hnsw
+
+        desired_quantization = build_quantization_config()
+        if info.config.quantization_config != desired_quantization:
+            changes["quantization_config"] = desired_quantization or models.Disabled.DISABLED
+
+        vectors = info.config.params.vectors
+        if isinstance(vectors, models.VectorParams) and bool(vectors.on_disk) != originals_on_disk():
+            changes["vectors_config"] = {"": models.VectorParamsDiff(on_disk=originals_on_disk())}
+
+        if not changes:
+            return
+        try:
+            await self.client.update_collection(collection_name=self.collection_name, **changes)
+            # Qdrant สร้าง index / quantized vectors ใหม่เบื้องหลัง (ระหว่างนั้นยังค้นหาได้ตามปกติ)
+            logging.info(f"🔧 [Qdrant] Migrate '{self.collection_name}': ปรับ {', '.join(changes)} -> {describe_index_config()}")
+        except Exception as e:
+            logging.error(f"❌ [Qdrant] ปรับ config ของ Collection '{self.collection_name}' ไม่สำเร็จ: {e}")
+
+    async def _ensure_payload_indexes(self, info=None):
+        """สร้าง keyword payload index ให้ฟิลด์ที่ search_similar ใช้กรอง (ที่มีอยู่แล้วจะข้าม)"""
+        existing = set((info.payload_schema or {}).keys()) if info is not None else set()
+        for field in PAYLOAD_INDEX_FIELDS:
+            if field in existing:
+                continue
+            try:
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=models.PayloadSchemaType.KEYWORD,
+                    wait=True
+                )
+                logging.info(f"✅ [Qdrant] สร้าง payload index (keyword) '{field}' แล้ว")
+            except Exception as e:
+                logging.error(f"❌ [Qdrant] สร้าง payload index '{field}' ไม่สำเร็จ: {e}")
 
     async def close(self):
         """ปิดการเชื่อมต่อกับ Qdrant เมื่อเลิกใช้งาน"""
         logging.info("⏳ Closing Qdrant client connection...")
+        await self.embedding_batcher.close()
         try:
             await self.client.close()
             logging.info("✅ Qdrant client closed.")
@@ -61,9 +187,22 @@ class QdrantManager:
         """ฟังก์ชันภายใน: แปลงข้อความเป็น Vector (ทำงานแบบ Synchronous)"""
         return self.embedding_model.encode(text, convert_to_tensor=False)
 
+    def _create_vectors_sync(self, texts: list) -> np.ndarray:
+        """ฟังก์ชันภายใน: แปลงหลายข้อความเป็น Vector ในครั้งเดียว (ใช้โดย EmbeddingBatcher)"""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            convert_to_tensor=False,
+            show_progress_bar=False
+        )
+
     async def _create_vector(self, text: str) -> np.ndarray:
-        """ฟังก์ชันภายใน: แปลงข้อความเป็น Vector แบบ Asynchronous เพื่อไม่ให้บล็อก Event Loop"""
-        return await asyncio.to_thread(self._create_vector_sync, text)
+        """ฟังก์ชันภายใน: แปลงข้อความเป็น Vector ผ่าน Micro-Batcher (ไม่บล็อก Event Loop)"""
+        return await self.embedding_batcher.encode(text)
+
+    def get_embedding_stats(self) -> dict:
+        """สถิติของ Micro-Batcher (Histogram ขนาด batch) สำหรับ Monitoring"""
+        return self.embedding_batcher.get_stats()
 
     async def upsert_location(self, mongo_id: str, description: str, metadata: dict = None):
         """เพิ่มหรืออัปเดตข้อมูลลงใน Qdrant พร้อม Metadata"""
@@ -107,8 +246,41 @@ class QdrantManager:
             ],
             wait=True # รอจนกว่าจะเขียนเสร็จจริง
         )
-        logging.info(f"✅ อัปเดต Vector (e5-prefixed) สำหรับ mongo_id '{mongo_id}' ลงใน Qdrant เรียบร้อยแล้ว") 
+        logging.info(f"✅ อัปเดต Vector (e5-prefixed) สำหรับ mongo_id '{mongo_id}' ลงใน Qdrant เรียบร้อยแล้ว")
         return True
+
+    async def upsert_locations(self, items: list) -> int:
+        """
+        🆕 เพิ่ม/อัปเดตหลายรายการพร้อมกัน (สำหรับ Import)
+        encode ทุก passage ผ่าน Micro-Batcher พร้อมกัน แล้ว upsert ลง Qdrant ในคำสั่งเดียว
+        Args:
+            items: list ของ dict {"mongo_id": str, "description": str, "metadata": dict (optional)}
+        Returns:
+            จำนวนรายการที่ upsert สำเร็จ
+        """
+        if not items:
+            return 0
+
+        vectors = await self.embedding_batcher.encode_many(
+            [f"passage: {item['description']}" for item in items]
+        )
+
+        allowed_keys = ["district", "sub_district", "category", "title", "slug"]
+        points = []
+        for item, vector in zip(items, vectors):
+            payload = {"mongo_id": item["mongo_id"], "text_content": item["description"]}
+            for k in allowed_keys:
+                if (item.get("metadata") or {}).get(k):
+                    payload[k] = item["metadata"][k]
+            points.append(models.PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_DNS, item["mongo_id"])),
+                vector=vector.tolist(),
+                payload=payload
+            ))
+
+        await self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
+        logging.info(f"✅ อัปเดต Vector (e5-prefixed) {len(points)} รายการลงใน Qdrant เรียบร้อยแล้ว (Batch)")
+        return len(points)
     
     async def search_similar(self, query_text: str, top_k: int = settings.QDRANT_TOP_K, metadata_filter: dict = None): 
         """
@@ -118,7 +290,7 @@ class QdrantManager:
             top_k: จำนวนผลลัพธ์
             metadata_filter: Dict ระบุเงื่อนไขกรอง เช่น {"district": "ปัว", "sub_district": "ศิลาแลง"}
         """
-        logging.info(f"กำลังใช้ prefix 'query:' สำหรับการค้นหาด้วย e5-large...")
+        logging.debug("กำลังใช้ prefix 'query:' สำหรับการค้นหาด้วย e5-large...")
         
         # เติม prefix 'query: ' (ข้อกำหนดของโมเดล E5 เวลาค้นหา)
         query_with_prefix = f"query: {query_text}"
@@ -174,23 +346,18 @@ class QdrantManager:
                 query_vector=query_vector.tolist(),
                 query_filter=qdrant_filter, # Apply Filter here
                 limit=top_k,       # จำนวนผลลัพธ์สูงสุดที่ต้องการ
-                with_payload=True  # ขอข้อมูล payload (เนื้อหา) กลับมาด้วย
+                search_params=self.search_params,  # hnsw_ef + rescore (int8) ตาม config
+                with_payload=models.PayloadSelectorInclude(include=SEARCH_PAYLOAD_FIELDS)  # ขอเฉพาะ mongo_id
             )
             
-            logging.info(f"✅ [Qdrant Raw Results] คำค้น '{query_text}' พบ {len(search_results)} ผลลัพธ์ (ก่อน Reranking):")
+            logging.info(f"✅ [Qdrant Raw Results] คำค้น '{query_text}' พบ {len(search_results)} ผลลัพธ์ (ก่อน Reranking)")
             if not search_results and metadata_filter:
                  logging.warning(f"⚠️ [Qdrant] ไม่พบผลลัพธ์ภายใต้ Filter: {metadata_filter}")
             
-            # วนลูปแสดงผลลัพธ์ใน Log เพื่อตรวจสอบความถูกต้อง
-            for i, result in enumerate(search_results):
-                text_preview = result.payload.get('text_content', 'N/A')[:100].strip() + "..."
-                
-                logging.info(
-                    f"  ผลลัพธ์ #{i+1} | "
-                    f"คะแนน: {result.score:.4f} | " 
-                    f"Mongo_ID: {result.payload.get('mongo_id')} | "
-                    f"เนื้อหา: '{text_preview}'"
-                )
+            # รายละเอียดทีละผลลัพธ์: สร้างข้อความเฉพาะเมื่อเปิด DEBUG (ไม่เสียเวลา format ทุก query)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for i, result in enumerate(search_results):
+                    logging.debug("  ผลลัพธ์ #%d | คะแนน: %.4f | Mongo_ID: %s", i + 1, result.score, (result.payload or {}).get("mongo_id"))
             return search_results
         except Exception as e:
             logging.error(f"❌ [Qdrant] การค้นหาล้มเหลว (DB อาจจะล่ม): {e}")
@@ -1,15 +1,32 @@
 import os
-import redis
 import json
+import time
+import socket
+import logging
+import redis
+import redis.asyncio as aioredis
 from dotenv import load_dotenv
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
-QUEUE_NAME = "line_msg_queue"
+QUEUE_NAME = "line_msg_queue"        # Legacy list queue (LPUSH/BRPOP) - ใช้แค่ตอนย้ายข้อมูลค้าง
+STREAM_NAME = "line_msg_stream"      # Redis Stream (Reliable Queue + Consumer Group + ACK)
+DEAD_LETTER_STREAM = "line_msg_dead"  # ข้อความที่ประมวลผลไม่สำเร็จ (เก็บไว้ตรวจสอบ / ส่งซ้ำภายหลัง)
+CONSUMER_GROUP = "line_workers"
+STREAM_MAXLEN = 10000                # ตัด Stream เก่าทิ้งอัตโนมัติ (approximate)
+
+
+def _stream_fields(message_data: dict) -> dict:
+    return {
+        "data": json.dumps(message_data, ensure_ascii=False),
+        "enqueued_at": f"{time.time():.3f}",
+    }
+
 
 class RedisClient:
     def __init__(self):
@@ -21,27 +38,109 @@ class RedisClient:
         )
 
     def push_message(self, message_data: dict):
-        """Push a message to the queue (Producer)"""
+        """Push a message to the stream (Producer - sync)"""
         try:
-            self.client.lpush(QUEUE_NAME, json.dumps(message_data))
-            print(f"[Redis] Pushed message to {QUEUE_NAME}")
+            self.client.xadd(STREAM_NAME, _stream_fields(message_data), maxlen=STREAM_MAXLEN, approximate=True)
+            logger.debug(f"[Redis] Pushed message to {STREAM_NAME}")
         except Exception as e:
-            print(f"[Redis] Error pushing message: {e}")
+            logger.error(f"[Redis] Error pushing message: {e}")
             raise e
 
-    def pop_message(self):
-        """Blocking pop a message from the queue (Consumer)"""
-        # brpop returns a tuple (queue_name, data)
-        # timeout=0 means block indefinitely
+
+class AsyncRedisQueue:
+    """
+    Reliable Queue บน Redis Streams (async)
+    - Producer: XADD
+    - Consumer: XREADGROUP (Consumer Group) -> ประมวลผล -> XACK
+    - ข้อความที่ค้างใน Pending นานเกินไป (worker ตาย) จะถูก XAUTOCLAIM กลับมาทำใหม่
+    """
+
+    def __init__(self, consumer_name: str = None):
+        self.client = aioredis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            decode_responses=True
+        )
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+
+    async def push_message(self, message_data: dict):
+        """Push a message to the stream (Producer - async)"""
+        await self.client.xadd(STREAM_NAME, _stream_fields(message_data), maxlen=STREAM_MAXLEN, approximate=True)
+
+    async def ensure_group(self):
+        """สร้าง Consumer Group (ถ้ายังไม่มี) พร้อมสร้าง Stream ไปด้วย"""
         try:
-            result = self.client.brpop(QUEUE_NAME, timeout=0)
-            if result:
-                _, data = result
-                return json.loads(data)
-        except Exception as e:
-            print(f"[Redis] Error popping message: {e}")
-            return None
-        return None
+            await self.client.xgroup_create(STREAM_NAME, CONSUMER_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def migrate_legacy_queue(self) -> int:
+        """ย้ายข้อความที่ค้างอยู่ใน List queue แบบเก่า (line_msg_queue) เข้า Stream"""
+        moved = 0
+        while True:
+            raw = await self.client.rpop(QUEUE_NAME)
+            if raw is None:
+                return moved
+            try:
+                await self.push_message(json.loads(raw))
+                moved += 1
+            except json.JSONDecodeError:
+                continue
+
+    @staticmethod
+    def _decode(entries) -> list:
+        """แปลงผลลัพธ์ของ Stream เป็น list ของ (message_id, data, enqueued_at)"""
+        messages = []
+        for message_id, fields in entries or []:
+            if not fields:
+                continue  # ข้อความถูกลบ (trim) ไปแล้ว
+            try:
+                data = json.loads(fields.get("data", "{}"))
+            except json.JSONDecodeError:
+                data = {}
+            messages.append((message_id, data, float(fields.get("enqueued_at") or 0)))
+        return messages
+
+    async def read_batch(self, count: int = 10, block_ms: int = 5000) -> list:
+        """ดึงข้อความใหม่ทีละหลายรายการ (Batch Dequeue)"""
+        result = await self.client.xreadgroup(
+            CONSUMER_GROUP, self.consumer_name, {STREAM_NAME: ">"}, count=count, block=block_ms
+        )
+        if not result:
+            return []
+        _, entries = result[0]
+        return self._decode(entries)
+
+    async def claim_stale(self, min_idle_ms: int = 60000, count: int = 10) -> list:
+        """รับช่วงข้อความที่ consumer อื่นดึงไปแล้วแต่ไม่ ACK นานเกิน min_idle_ms"""
+        result = await self.client.xautoclaim(
+            STREAM_NAME, CONSUMER_GROUP, self.consumer_name, min_idle_time=min_idle_ms, start_id="0-0", count=count
+        )
+        return self._decode(result[1] if result else [])
+
+    async def ack(self, message_id: str):
+        await self.client.xack(STREAM_NAME, CONSUMER_GROUP, message_id)
+
+    async def dead_letter(self, message_id: str, data: dict, error: str):
+        """ย้ายข้อความที่ประมวลผลไม่สำเร็จไป DEAD_LETTER_STREAM แล้วค่อย ACK (ไม่วนทำซ้ำข้อความที่พังถาวร)"""
+        fields = _stream_fields(data)
+        fields.update({"message_id": message_id, "error": error[:500], "failed_at": f"{time.time():.3f}"})
+        await self.client.xadd(DEAD_LETTER_STREAM, fields, maxlen=STREAM_MAXLEN, approximate=True)
+        await self.ack(message_id)
+
+    async def group_stats(self) -> dict:
+        """สถานะคิวจาก Redis: จำนวน pending (ดึงแล้วยังไม่ ACK) และ lag (ยังไม่ถูกดึง)"""
+        for group in await self.client.xinfo_groups(STREAM_NAME):
+            if group.get("name") == CONSUMER_GROUP:
+                return {"pending": group.get("pending", 0), "lag": group.get("lag"), "consumers": group.get("consumers", 0)}
+        return {"pending": 0, "lag": None, "consumers": 0}
+
+    async def close(self):
+        await self.client.aclose()
+
 
-# Singleton instance
+# Singleton instances
 redis_client = RedisClient()
+async_redis_queue = AsyncRedisQueue()
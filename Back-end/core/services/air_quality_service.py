@@ -10,6 +10,7 @@ from typing import Dict, Optional
 import aiohttp
 
 from core.config import settings
+from utils.ttl_cache import SWRCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +21,15 @@ class AirQualityService:
     # WAQI API (World Air Quality Index) - ฟรี 1000 calls/day
     WAQI_URL = "https://api.waqi.info/feed"
     
-    # สถานีวัดใน/ใกล้น่าน
+    # สถานีวัดในน่าน (เรียงตามลำดับความสำคัญ)
     STATIONS = [
         "nan",           # น่าน
+        "@8455",         # สถานีน่าน (ID เฉพาะ)
+    ]
+    # จังหวัดใกล้เคียง - ใช้เฉพาะเมื่อไม่มีสถานีในน่านตอบเลย (ไม่ให้ค่าของจังหวัดอื่นกลายเป็น PM2.5 ของน่าน)
+    FALLBACK_STATIONS = [
         "chiangrai",     # เชียงราย (ใกล้สุด)
         "chiangmai",     # เชียงใหม่
-        "@8455",         # สถานีน่าน (ID เฉพาะ)
     ]
     
     # AQI Level mapping
@@ -44,10 +48,11 @@ class AirQualityService:
         if not self.api_key:
             # fallback ใช้ demo token (จำกัด)
             self.api_key = "demo"
+        self._cache = SWRCache(settings.AIR_QUALITY_CACHE_TTL_SECONDS, settings.CONDITIONS_STALE_SECONDS)
     
     async def get_pm25(self, city: str = "nan") -> Optional[Dict]:
         """
-        ดึงค่า PM2.5 ล่าสุด
+        ดึงค่า PM2.5 ล่าสุด (ผ่าน cache แบบ Stale-While-Revalidate)
         
         Args:
             city: ชื่อเมือง หรือ station ID (เช่น "@8455")
@@ -55,12 +60,32 @@ class AirQualityService:
         Returns:
             Dict with pm25, aqi, level, severity
         """
-        # ลองหลายสถานี
-        stations_to_try = [city] + self.STATIONS
-        
-        for station in stations_to_try:
-            result = await self._fetch_station(station)
+        return await self._cache.get(city, lambda: self._probe_stations(city))
+    
+    def get_cached_pm25(self, city: str = "nan") -> Optional[Dict]:
+        """
+        อ่านค่า PM2.5 จาก cache อย่างเดียว (ไม่รอ network) สำหรับตอบแชท
+        ถ้าข้อมูลเก่า/ยังไม่มี จะสั่งโหลดใหม่ใน background ให้รอบถัดไป
+        """
+        return self._cache.peek(city, lambda: self._probe_stations(city))
+    
+    def get_cache_stats(self) -> Dict:
+        return self._cache.get_stats()
+    
+    async def _probe_stations(self, city: str) -> Optional[Dict]:
+        """
+        ถามสถานีในน่านพร้อมกัน แล้วใช้ผลของสถานีที่ลำดับสูงสุดที่ได้ข้อมูลสมบูรณ์ (ไม่ใช่สถานีที่ตอบเร็วสุด)
+        ถ้าไม่มีสถานีในน่านตอบเลย ค่อยถามจังหวัดใกล้เคียง (FALLBACK_STATIONS) ด้วยวิธีเดียวกัน
+        (เดิมถามทีละสถานี รอ timeout สูงสุด 10 วินาทีต่อสถานี)
+        """
+        primary = list(dict.fromkeys([city] + self.STATIONS))
+        fallback = [station for station in self.FALLBACK_STATIONS if station not in primary]
+        for stations in (primary, fallback):
+            results = await asyncio.gather(*(self._fetch_station(station) for station in stations))
+            result = next((r for r in results if r), None)
             if result:
+                if stations is fallback:
+                    logger.warning(f"⚠️ [AirQuality] ไม่มีสถานีในน่านตอบ ใช้ค่าจาก {result['station_name']} แทน")
                 return result
         
         logger.warning(f"⚠️ [AirQuality] ไม่พบข้อมูลจากทุกสถานี")
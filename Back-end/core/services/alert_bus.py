@@ -0,0 +1,253 @@
+# /core/services/alert_bus.py
+"""
+Alert Bus: กระจาย alert ข้ามหลาย process (uvicorn หลาย worker) ผ่าน Redis
+
+- Pub/Sub      : ทุก process subscribe ช่อง ALERT_CHANNEL แล้วส่งต่อให้ WebSocket ของตัวเอง
+- Ring Buffer  : alerts ล่าสุดเก็บใน Redis List (LPUSH + LTRIM) ให้ process ที่เพิ่งเริ่มโหลดประวัติได้
+- Leader Lock  : มีเพียง process เดียวที่รัน NewsScheduler (SET NX PX + ต่ออายุเป็นระยะ)
+                 ถ้า leader ตาย lock จะหมดอายุ แล้ว process อื่นรับช่วงต่อ
+- Scheduler    : เปิด/ปิดจาก API ผ่าน set_scheduler_enabled() (flag กลางใน Redis) -> leader เป็นผู้เริ่ม/หยุดจริง
+                 worker อื่นที่รับ request ไม่เริ่ม poller ของตัวเอง
+
+ถ้าเชื่อมต่อ Redis ไม่ได้ จะทำงานแบบ process เดียวเหมือนเดิม (broadcast ในเครื่อง + รัน scheduler เอง)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from core.database.redis_client import REDIS_HOST, REDIS_PORT, REDIS_DB
+
+logger = logging.getLogger(__name__)
+
+ALERT_CHANNEL = "nan_alerts:broadcast"
+RECENT_ALERTS_KEY = "nan_alerts:recent"
+LEADER_KEY = "nan_alerts:scheduler_leader"
+SCHEDULER_PAUSED_KEY = "nan_alerts:scheduler_paused"
+RECENT_ALERTS_MAX = 100
+LEADER_TTL_MS = 30000          # lock หมดอายุถ้า leader ไม่ต่ออายุภายใน 30 วินาที
+LEADER_RENEW_SECONDS = 10      # ต่ออายุ/ลองชิง lock ทุก 10 วินาที
+
+# ต่ออายุ lock เฉพาะเมื่อยังเป็นเจ้าของอยู่ (กันไปต่ออายุ lock ของ process อื่น)
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class AlertBus:
+
+    def __init__(self):
+        self.client = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.connected = False
+        self.is_leader = False
+        self._alert_manager = None
+        self._scheduler = None
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._leader_task: Optional[asyncio.Task] = None
+        self._last_renewed = 0.0
+
+    async def start(self, alert_manager, scheduler):
+        """
+        เริ่มทำงาน: เชื่อม Redis, โหลดประวัติ, subscribe และเริ่มชิง leader
+        ถ้า Redis ไม่พร้อม -> เริ่ม scheduler ใน process นี้ทันที (โหมด process เดียว)
+        """
+        self._alert_manager = alert_manager
+        self._scheduler = scheduler
+
+        try:
+            await self.client.ping()
+            self.connected = True
+        except Exception as e:
+            logger.warning(f"⚠️ [AlertBus] เชื่อมต่อ Redis ไม่ได้ ({e}) - ทำงานแบบ process เดียว")
+            scheduler.start()
+            return
+
+        alert_manager.attach_bus(self)
+        alert_manager.load_history(await self.get_recent_alerts(RECENT_ALERTS_MAX))
+        self._subscriber_task = asyncio.create_task(self._subscribe_loop())
+        self._leader_task = asyncio.create_task(self._leader_loop())
+        logger.info(f"✅ [AlertBus] เชื่อมต่อ Redis สำเร็จ ({self.instance_id})")
+
+    async def stop(self):
+        for task in (self._leader_task, self._subscriber_task):
+            if task:
+                task.cancel()
+        if self.is_leader:
+            self._scheduler.stop()
+            try:
+                await self.client.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.instance_id)
+            except Exception:
+                pass
+            self.is_leader = False
+        if self.connected:
+            await self.client.aclose()
+            self.connected = False
+
+    # ====== Pub/Sub ======
+
+    async def publish(self, alert: Dict) -> bool:
+        """เก็บลง ring buffer แล้ว publish ให้ทุก process คืน False ถ้า Redis ใช้ไม่ได้ (ให้ส่งในเครื่องแทน)"""
+        payload = json.dumps(alert, ensure_ascii=False, default=str)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.lpush(RECENT_ALERTS_KEY, payload)
+                pipe.ltrim(RECENT_ALERTS_KEY, 0, RECENT_ALERTS_MAX - 1)
+                pipe.publish(ALERT_CHANNEL, payload)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"❌ [AlertBus] publish ล้มเหลว: {e}")
+            return False
+
+    async def _subscribe_loop(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(ALERT_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+                    if data.get("type") == "clear_history":
+                        self._alert_manager.load_history([])
+                    elif data.get("type") == "scheduler_control":
+                        await self._sync_scheduler()
+                    else:
+                        await self._alert_manager.deliver_local(data)
+            except asyncio.CancelledError:
+                await pubsub.aclose()
+                raise
+            except Exception as e:
+                logger.error(f"❌ [AlertBus] subscriber หลุด: {e} - เชื่อมต่อใหม่ใน 5 วินาที")
+                await pubsub.aclose()
+                await asyncio.sleep(5)
+
+    # ====== Ring Buffer ======
+
+    async def get_recent_alerts(self, limit: int = 20) -> List[Dict]:
+        """alerts ล่าสุดจาก ring buffer กลาง (เก่า -> ใหม่ เหมือน AlertManager)"""
+        try:
+            raw = await self.client.lrange(RECENT_ALERTS_KEY, 0, limit - 1)
+        except Exception as e:
+            logger.error(f"❌ [AlertBus] อ่าน ring buffer ล้มเหลว: {e}")
+            return []
+        alerts = []
+        for item in reversed(raw):
+            try:
+                alerts.append(json.loads(item))
+            except json.JSONDecodeError:
+                continue
+        return alerts
+
+    async def clear_history(self):
+        try:
+            await self.client.delete(RECENT_ALERTS_KEY)
+            await self.client.publish(ALERT_CHANNEL, json.dumps({"type": "clear_history"}))
+        except Exception as e:
+            logger.error(f"❌ [AlertBus] ล้าง ring buffer ล้มเหลว: {e}")
+
+    # ====== Leader Election ======
+
+    async def _leader_loop(self):
+        """ชิง/ต่ออายุ leader lock - เฉพาะ leader เท่านั้นที่รัน NewsScheduler"""
+        while True:
+            try:
+                if self.is_leader:
+                    renewed = await self.client.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.instance_id, LEADER_TTL_MS)
+                    if renewed:
+                        self._last_renewed = time.monotonic()
+                    else:
+                        self._step_down("lock ถูก process อื่นถือแล้ว")
+                else:
+                    acquired = await self.client.set(LEADER_KEY, self.instance_id, nx=True, px=LEADER_TTL_MS)
+                    if acquired:
+                        self.is_leader = True
+                        self._last_renewed = time.monotonic()
+                        logger.info(f"👑 [AlertBus] {self.instance_id} เป็น leader")
+                # ตรวจ flag ทุกรอบด้วย (เผื่อพลาดข้อความ scheduler_control ตอน subscriber หลุด)
+                await self._sync_scheduler()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ [AlertBus] leader election error: {e}")
+                # ติดต่อ Redis ไม่ได้นานจน lock น่าจะหมดอายุแล้ว -> หยุดก่อน กัน scheduler รันซ้อนสอง process
+                if self.is_leader and time.monotonic() - self._last_renewed > LEADER_TTL_MS / 1000 - LEADER_RENEW_SECONDS:
+                    self._step_down("ต่ออายุ lock ไม่ได้")
+            await asyncio.sleep(LEADER_RENEW_SECONDS)
+
+    # ====== Scheduler Control ======
+
+    async def _scheduler_paused(self) -> bool:
+        return bool(await self.client.exists(SCHEDULER_PAUSED_KEY))
+
+    async def _sync_scheduler(self):
+        """leader: ให้สถานะ NewsScheduler ตรงกับ flag กลาง (process อื่นไม่ทำอะไร)"""
+        if not self.is_leader:
+            return
+        paused = await self._scheduler_paused()
+        if paused and self._scheduler.running:
+            self._scheduler.stop()
+            logger.info("⏸️ [AlertBus] หยุด NewsScheduler ตามคำสั่งจาก API")
+        elif not paused and not self._scheduler.running:
+            self._scheduler.start()
+            logger.info("▶️ [AlertBus] เริ่ม NewsScheduler บน leader")
+
+    async def set_scheduler_enabled(self, enabled: bool) -> bool:
+        """
+        เปิด/ปิด NewsScheduler จาก worker ไหนก็ได้ คืน False ถ้าอยู่ในสถานะนั้นอยู่แล้ว
+        - มี Redis: เก็บ flag กลางแล้วแจ้งทุก process -> เฉพาะ leader ที่เริ่ม/หยุดจริง
+        - ไม่มี Redis: process เดียว -> เริ่ม/หยุดในเครื่อง
+        """
+        if not self.connected:
+            if self._scheduler.running == enabled:
+                return False
+            if enabled:
+                self._scheduler.start()
+            else:
+                self._scheduler.stop()
+            return True
+
+        if enabled:
+            changed = bool(await self.client.delete(SCHEDULER_PAUSED_KEY))
+        else:
+            changed = bool(await self.client.set(SCHEDULER_PAUSED_KEY, self.instance_id, nx=True))
+        await self.client.publish(ALERT_CHANNEL, json.dumps({"type": "scheduler_control"}))
+        await self._sync_scheduler()
+        return changed
+
+    def _step_down(self, reason: str):
+        self.is_leader = False
+        self._scheduler.stop()
+        logger.warning(f"⚠️ [AlertBus] เสียสถานะ leader ({reason}) - หยุด NewsScheduler")
+
+    def get_status(self) -> Dict:
+        return {
+            "connected": self.connected,
+            "instance_id": self.instance_id,
+            "is_leader": self.is_leader,
+            "scheduler_running": bool(self._scheduler and self._scheduler.running),
+        }
+
+
+# Singleton instance
+alert_bus = AlertBus()
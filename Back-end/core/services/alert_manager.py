@@ -1,10 +1,17 @@
 # /core/services/alert_manager.py
 """
 Alert Manager: จัดการ WebSocket connections และ broadcast alerts
+
+Broadcast Hub:
+- serialize alert เป็น JSON ครั้งเดียว แล้วส่ง payload เดียวกันให้ทุก client
+- แต่ละ client มีคิวส่งของตัวเอง (bounded) และ task ส่งของตัวเอง
+  -> client ที่ช้า/ค้างไม่ทำให้ client อื่นได้รับ alert ช้าตาม
+- client ที่คิวเต็ม (slow consumer) หรือเงียบเกิน HEARTBEAT_TIMEOUT จะถูกตัดออก
 """
 
 import asyncio
 import logging
+import time
 from typing import Set, Dict, Optional, List
 from datetime import datetime, timezone
 from fastapi import WebSocket
@@ -12,102 +19,248 @@ import json
 
 logger = logging.getLogger(__name__)
 
+SEND_QUEUE_SIZE = 32          # จำนวนข้อความค้างส่งสูงสุดต่อ client
+SEND_TIMEOUT_SECONDS = 10     # ส่งข้อความเดียวนานเกินนี้ถือว่า client ค้าง
+HEARTBEAT_INTERVAL = 30       # ส่ง heartbeat ทุก 30 วินาที (ตรวจ connection ที่ตายไปแล้ว)
+HEARTBEAT_TIMEOUT = 90        # Frontend ส่ง "ping" ทุก 30 วินาที เงียบเกิน 90 วินาทีถือว่าหลุด
+
+
+def serialize_message(data: Dict) -> str:
+    """แปลงข้อความเป็น JSON ครั้งเดียว (ใช้ส่งซ้ำได้ทุก client)"""
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ClientConnection:
+    """WebSocket หนึ่งตัว + คิวส่งและ task ส่งของตัวเอง"""
+
+    def __init__(self, websocket: WebSocket, manager: "AlertManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.last_seen = time.monotonic()
+        self.connected_at = time.monotonic()
+        self.sent = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._sender())
+
+    def enqueue(self, payload: str) -> bool:
+        """ใส่ข้อความเข้าคิว คืน False ถ้าคิวเต็ม (client ตามไม่ทัน)"""
+        try:
+            self.queue.put_nowait((payload, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _sender(self):
+        while True:
+            payload, enqueued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(payload), timeout=SEND_TIMEOUT_SECONDS)
+                self.sent += 1
+                self.manager._record_delivery(time.perf_counter() - enqueued_at)
+            except Exception as e:
+                logger.warning(f"⚠️ [AlertManager] ส่งข้อความไม่สำเร็จ ตัด client ออก: {e}")
+                self.manager.metrics["send_errors"] += 1
+                self.manager._drop(self, reason="send_error")
+                return
+
+    async def close(self, code: int = 1000):
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
 
 class AlertManager:
     """
     Manager สำหรับจัดการ WebSocket connections และ broadcast alerts
     รองรับหลาย connection พร้อมกัน
     """
-    
+
     def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+        self._clients: Dict[WebSocket, ClientConnection] = {}
         self._alert_history: List[Dict] = []
         self._max_history = 100  # เก็บประวัติ alert สูงสุด 100 รายการ
-        
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._bus = None
+        self.metrics = {
+            "broadcasts": 0,
+            "messages_enqueued": 0,
+            "messages_sent": 0,
+            "send_errors": 0,
+            "evicted_slow": 0,
+            "evicted_idle": 0,
+            "last_fanout_ms": 0.0,
+            "max_delivery_ms": 0.0,
+            "_delivery_total": 0.0,
+        }
+
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self._clients)
+
     async def connect(self, websocket: WebSocket):
         """รับ connection ใหม่"""
         await websocket.accept()
-        self.active_connections.add(websocket)
-        logger.info(f"🔗 [AlertManager] Client connected. Total: {len(self.active_connections)}")
-        
+        client = ClientConnection(websocket, self)
+        self._clients[websocket] = client
+        client.start()
+        self._ensure_heartbeat()
+        logger.info(f"🔗 [AlertManager] Client connected. Total: {len(self._clients)}")
+
         # ส่ง alerts ล่าสุดให้ client ใหม่
-        try:
-            await websocket.send_json({
-                "type": "connection_established",
-                "message": "เชื่อมต่อระบบแจ้งเตือนสำเร็จ",
-                "recent_alerts": self._alert_history[-10:]  # ส่ง 10 alerts ล่าสุด
-            })
-        except Exception as e:
-            logger.error(f"❌ [AlertManager] Send welcome error: {e}")
-    
+        client.enqueue(serialize_message({
+            "type": "connection_established",
+            "message": "เชื่อมต่อระบบแจ้งเตือนสำเร็จ",
+            "recent_alerts": self.get_recent_alerts(10)  # ส่ง 10 alerts ล่าสุด
+        }))
+
     async def disconnect(self, websocket: WebSocket):
         """ปิด connection"""
-        self.active_connections.discard(websocket)
-        logger.info(f"🔌 [AlertManager] Client disconnected. Total: {len(self.active_connections)}")
-    
+        client = self._clients.pop(websocket, None)
+        if client and client._task:
+            client._task.cancel()
+        logger.info(f"🔌 [AlertManager] Client disconnected. Total: {len(self._clients)}")
+
+    def touch(self, websocket: WebSocket):
+        """บันทึกว่า client ยังมีชีวิต (เรียกทุกครั้งที่ได้รับข้อความจาก client)"""
+        client = self._clients.get(websocket)
+        if client:
+            client.last_seen = time.monotonic()
+
+    def _drop(self, client: ClientConnection, reason: str):
+        if self._clients.pop(client.websocket, None) is None:
+            return
+        asyncio.create_task(client.close(code=1013 if reason == "slow" else 1000))
+        logger.info(f"🔌 [AlertManager] ตัด client ({reason}). Total: {len(self._clients)}")
+
+    def _record_delivery(self, seconds: float):
+        ms = seconds * 1000
+        self.metrics["messages_sent"] += 1
+        self.metrics["_delivery_total"] += ms
+        self.metrics["max_delivery_ms"] = max(self.metrics["max_delivery_ms"], ms)
+
+    def _fanout(self, payload: str) -> int:
+        """ใส่ payload (serialize แล้ว) เข้าคิวทุก client - ไม่ await การส่งจริง"""
+        started = time.perf_counter()
+        delivered = 0
+        for client in list(self._clients.values()):
+            if client.enqueue(payload):
+                delivered += 1
+            else:
+                self.metrics["evicted_slow"] += 1
+                self._drop(client, reason="slow")
+        self.metrics["messages_enqueued"] += delivered
+        self.metrics["last_fanout_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return delivered
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        """ส่ง heartbeat และตัด client ที่เงียบเกิน HEARTBEAT_TIMEOUT"""
+        heartbeat = serialize_message({"type": "heartbeat"})
+        while self._clients:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            for client in list(self._clients.values()):
+                if now - client.last_seen > HEARTBEAT_TIMEOUT:
+                    self.metrics["evicted_idle"] += 1
+                    self._drop(client, reason="idle")
+            self._fanout(heartbeat)
+
+    def attach_bus(self, bus):
+        """เชื่อม AlertBus (Redis pub/sub) เพื่อกระจาย alert ข้ามทุก process"""
+        self._bus = bus
+
     async def broadcast_alert(self, alert: Dict):
         """
-        ส่ง alert ไปยังทุก connection
-        
+        ส่ง alert ไปยังทุก connection (ทุก process ถ้าเชื่อม AlertBus ไว้)
+
         Args:
             alert: Alert data dict
         """
-        if not self.active_connections:
-            logger.debug("⏭️ [AlertManager] ไม่มี client เชื่อมต่อ ข้าม broadcast")
-            return
-            
         # เพิ่มข้อมูล timestamp และ id
         alert["alert_id"] = f"alert_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
         alert["broadcasted_at"] = datetime.now(timezone.utc).isoformat()
         alert["type"] = "alert"
-        
+
+        # มี Redis: publish แล้วทุก process (รวมตัวเอง) จะได้รับผ่าน deliver_local
+        if self._bus is not None and self._bus.connected:
+            if await self._bus.publish(alert):
+                return
+
+        await self.deliver_local(alert)
+
+    async def deliver_local(self, alert: Dict):
+        """เก็บประวัติและกระจาย alert ให้ client ที่ต่อกับ process นี้"""
         # เก็บประวัติ
+        self._remember(alert)
+
+        if not self._clients:
+            logger.debug("⏭️ [AlertManager] ไม่มี client เชื่อมต่อ ข้าม broadcast")
+            return
+
+        # Broadcast: serialize ครั้งเดียว แล้วกระจายเข้าคิวของทุก connection
+        self.metrics["broadcasts"] += 1
+        delivered = self._fanout(serialize_message(alert))
+        await asyncio.sleep(0)  # ให้ task ส่งของแต่ละ client ได้เริ่มทำงาน (กรณี broadcast ติดกันหลายรายการ)
+
+        logger.info(f"📢 [AlertManager] Broadcasted alert to {delivered} clients ({self.metrics['last_fanout_ms']} ms)")
+
+    def _remember(self, alert: Dict):
         self._alert_history.append(alert)
         if len(self._alert_history) > self._max_history:
             self._alert_history = self._alert_history[-self._max_history:]
-        
-        # Broadcast ไปทุก connection
-        disconnected = set()
-        
-        for websocket in self.active_connections:
-            try:
-                await websocket.send_json(alert)
-            except Exception as e:
-                logger.error(f"❌ [AlertManager] Send error: {e}")
-                disconnected.add(websocket)
-        
-        # ลบ connection ที่ disconnect ออก
-        for ws in disconnected:
-            self.active_connections.discard(ws)
-        
-        logger.info(f"📢 [AlertManager] Broadcasted alert to {len(self.active_connections)} clients")
-    
+
+    def load_history(self, alerts: List[Dict]):
+        """โหลดประวัติจาก ring buffer กลาง (เรียกตอน process เริ่มทำงาน)"""
+        self._alert_history = list(alerts)[-self._max_history:]
+
     async def send_to_one(self, websocket: WebSocket, data: Dict):
-        """ส่งข้อความไปยัง client เดียว"""
-        try:
-            await websocket.send_json(data)
-        except Exception as e:
-            logger.error(f"❌ [AlertManager] Send to one error: {e}")
-            self.active_connections.discard(websocket)
-    
+        """ส่งข้อความไปยัง client เดียว (ผ่านคิวของ client นั้น)"""
+        client = self._clients.get(websocket)
+        if client is None:
+            return
+        if not client.enqueue(serialize_message(data)):
+            self.metrics["evicted_slow"] += 1
+            self._drop(client, reason="slow")
+
     def get_recent_alerts(self, limit: int = 20) -> List[Dict]:
         """ดึง alerts ล่าสุด"""
         return self._alert_history[-limit:]
-    
+
     def get_alerts_by_severity(self, min_severity: int = 1) -> List[Dict]:
         """ดึง alerts ตาม severity ขั้นต่ำ"""
         return [a for a in self._alert_history if a.get("severity_score", 0) >= min_severity]
-    
+
     def clear_history(self):
-        """ล้างประวัติ alerts"""
+        """ล้างประวัติ alerts (รวม ring buffer กลางใน Redis ถ้ามี)"""
         self._alert_history = []
+        if self._bus is not None and self._bus.connected:
+            asyncio.create_task(self._bus.clear_history())
         logger.info("🗑️ [AlertManager] Cleared alert history")
-    
+
+    def get_metrics(self) -> Dict:
+        """สถิติ fan-out (สำหรับ API)"""
+        metrics = {k: v for k, v in self.metrics.items() if not k.startswith("_")}
+        sent = self.metrics["messages_sent"]
+        metrics["avg_delivery_ms"] = round(self.metrics["_delivery_total"] / sent, 3) if sent else 0.0
+        metrics["max_delivery_ms"] = round(metrics["max_delivery_ms"], 3)
+        metrics["connections"] = len(self._clients)
+        metrics["queued"] = sum(c.queue.qsize() for c in self._clients.values())
+        return metrics
+
     @property
     def connection_count(self) -> int:
         """จำนวน connections ปัจจุบัน"""
-        return len(self.active_connections)
-    
+        return len(self._clients)
+
     @property
     def alert_count(self) -> int:
         """จำนวน alerts ในประวัติ"""
@@ -1,31 +1,43 @@
 # /core/services/alert_storage_service.py
 """
 Alert Storage Service: บันทึก alerts ลง MongoDB
+ใช้ shared AsyncMongoClient (core/database/async_mongo.py) ไม่บล็อก event loop และไม่เปิด connection pool ซ้ำ
 """
 
+import hashlib
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne, DESCENDING, ReturnDocument
+
+from core.database.async_mongo import get_async_db
 
 logger = logging.getLogger(__name__)
 
+# field ที่ส่งให้ UI (ไม่ส่ง field ภายใน เช่น dedup_key / expires_at)
+ALERT_PROJECTION = {"dedup_key": 0, "expires_at": 0}
+
 
 class AlertStorageService:
     """Service สำหรับเก็บ alerts ใน MongoDB"""
     
     COLLECTION_NAME = "smart_news_alerts"
+    RUNS_COLLECTION_NAME = "news_pipeline_runs"
+    RUNS_TTL_DAYS = 30
+    ALERT_TTL_DAYS = 30
     
     def __init__(self):
-        self._db = None
         self._collection = None
+        self._runs_collection = None
         
     async def _get_collection(self):
         """Lazy load MongoDB collection"""
         if self._collection is None:
-            from core.database.mongodb_manager import MongoDBManager
-            self._db = MongoDBManager()
-            self._collection = self._db.db[self.COLLECTION_NAME]
+            db = get_async_db()
+            self._collection = db[self.COLLECTION_NAME]
+            self._runs_collection = db[self.RUNS_COLLECTION_NAME]
             
             # สร้าง indexes
             await self._ensure_indexes()
@@ -35,24 +47,67 @@ class AlertStorageService:
     async def _ensure_indexes(self):
         """สร้าง indexes สำหรับ performance"""
         try:
-            collection = self._db.db[self.COLLECTION_NAME]
+            collection = self._collection
             
             # Index สำหรับ query ตาม severity และ created_at
-            collection.create_index([("severity_score", -1), ("created_at", -1)])
+            await collection.create_index([("severity_score", -1), ("created_at", -1)])
             
             # Index สำหรับ TTL (ลบ alerts เก่าอัตโนมัติหลัง 30 วัน)
-            collection.create_index(
+            await collection.create_index(
                 "expires_at", 
                 expireAfterSeconds=0  # ลบเมื่อ expires_at ถึง
             )
             
+            # กัน alert ซ้ำ (ข่าวเดียวกัน/alert สภาพอากาศเดิมในวันเดียวกัน)
+            await collection.create_index("dedup_key", unique=True, sparse=True)
+            await collection.create_index([("location_name", 1), ("lat", 1)])
+            
+            await self._runs_collection.create_index([("started_at", -1)])
+            await self._runs_collection.create_index("expires_at", expireAfterSeconds=0)
+            
             logger.info("✅ [AlertStorage] สร้าง indexes เรียบร้อย")
         except Exception as e:
             logger.error(f"❌ [AlertStorage] สร้าง indexes ล้มเหลว: {e}")
     
+    def _dedup_key(self, alert: Dict, now: datetime) -> str:
+        """
+        key สำหรับกัน alert ซ้ำ
+        - ข่าว: URL ต้นฉบับ
+        - อากาศ/PM2.5: หมวด + สรุป + สถานที่ + วันที่ (ไทย) -> วันละ 1 รายการต่อข้อความ
+        """
+        if alert.get("original_url"):
+            raw = f"url|{alert['original_url']}"
+        else:
+            day = now.astimezone(timezone(timedelta(hours=7))).strftime("%Y-%m-%d")
+            raw = f"{alert.get('category')}|{alert.get('summary')}|{alert.get('location_name')}|{day}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    
+    def _upsert_spec(self, alert: Dict, now: datetime) -> tuple:
+        """คืน (filter, update) สำหรับ upsert alert ตาม dedup key"""
+        alert_doc = dict(alert)
+        
+        # ลบ fields ที่ไม่ต้องการ
+        alert_doc.pop("_id", None)
+        alert_doc.pop("alert_id", None)
+        alert_doc.pop("broadcasted_at", None)
+        alert_doc.pop("type", None)
+        
+        return (
+            {"dedup_key": self._dedup_key(alert, now)},
+            {
+                "$set": {**alert_doc, "updated_at": now},
+                "$setOnInsert": {
+                    "created_at": now,
+                    "created_at_th": self._format_thai_datetime(now),
+                    "expires_at": now + timedelta(days=self.ALERT_TTL_DAYS),  # หมดอายุใน 30 วัน
+                    "is_read": False
+                }
+            }
+        )
+    
     async def save_alert(self, alert: Dict) -> Optional[str]:
         """
-        บันทึก alert ลง MongoDB
+        บันทึก alert ลง MongoDB (upsert ตาม dedup key)
         
         Args:
             alert: Alert data dict
@@ -63,24 +118,12 @@ class AlertStorageService:
         try:
             collection = await self._get_collection()
             
-            # เพิ่ม timestamps
             now = datetime.now(timezone.utc)
-            
-            alert_doc = {
-                **alert,
-                "created_at": now,
-                "created_at_th": self._format_thai_datetime(now),
-                "expires_at": now + timedelta(days=30),  # หมดอายุใน 30 วัน
-                "is_read": False
-            }
-            
-            # ลบ fields ที่ไม่ต้องการ
-            alert_doc.pop("alert_id", None)
-            alert_doc.pop("broadcasted_at", None)
-            alert_doc.pop("type", None)
-            
-            result = collection.insert_one(alert_doc)
-            alert_id = str(result.inserted_id)
+            query, update = self._upsert_spec(alert, now)
+            result = await collection.find_one_and_update(
+                query, update, upsert=True, projection={"_id": 1}, return_document=ReturnDocument.AFTER
+            )
+            alert_id = str(result["_id"])
             
             logger.info(f"💾 [AlertStorage] บันทึก alert: {alert_id}")
             return alert_id
@@ -91,22 +134,34 @@ class AlertStorageService:
     
     async def save_alerts_batch(self, alerts: List[Dict]) -> int:
         """
-        บันทึก alerts หลายรายการพร้อมกัน
+        บันทึก alerts หลายรายการด้วย bulk_write ครั้งเดียว (upsert ตาม dedup key)
         
         Returns:
-            จำนวน alerts ที่บันทึกสำเร็จ
+            จำนวน alerts ที่บันทึกสำเร็จ (ใหม่ + อัปเดตของเดิม)
         """
-        saved = 0
-        for alert in alerts:
-            if await self.save_alert(alert):
-                saved += 1
-        return saved
+        if not alerts:
+            return 0
+        try:
+            collection = await self._get_collection()
+            
+            now = datetime.now(timezone.utc)
+            operations = [UpdateOne(*self._upsert_spec(alert, now), upsert=True) for alert in alerts]
+            result = await collection.bulk_write(operations, ordered=False)
+            
+            saved = result.upserted_count + result.matched_count
+            logger.info(f"💾 [AlertStorage] bulk บันทึก {result.upserted_count} ใหม่, {result.matched_count} ซ้ำ (อัปเดต)")
+            return saved
+        
+        except Exception as e:
+            logger.error(f"❌ [AlertStorage] bulk บันทึก alerts ล้มเหลว: {e}")
+            return 0
     
     async def get_recent_alerts(
         self, 
         limit: int = 50, 
         min_severity: int = 1,
-        skip: int = 0
+        skip: int = 0,
+        before: Optional[str] = None
     ) -> List[Dict]:
         """
         ดึง alerts ล่าสุด
@@ -114,17 +169,27 @@ class AlertStorageService:
         Args:
             limit: จำนวนสูงสุด
             min_severity: ระดับความสำคัญขั้นต่ำ
-            skip: จำนวนที่ข้าม (สำหรับ pagination)
+            skip: จำนวนที่ข้าม (แบบเดิม - ช้าลงเมื่อข้อมูลเยอะ ใช้ before แทนถ้าทำได้)
+            before: _id ของ alert สุดท้ายในหน้าก่อน (Keyset Pagination - เร็วคงที่ทุกหน้า)
         """
         try:
             collection = await self._get_collection()
             
-            cursor = collection.find(
-                {"severity_score": {"$gte": min_severity}}
-            ).sort("created_at", -1).skip(skip).limit(limit)
+            query = {"severity_score": {"$gte": min_severity}}
+            if before:
+                try:
+                    query["_id"] = {"$lt": ObjectId(before)}
+                except InvalidId:
+                    return []
+            
+            # _id (ObjectId) เรียงตามเวลาที่สร้าง -> sort ตาม _id แทน created_at
+            cursor = collection.find(query, ALERT_PROJECTION).sort("_id", DESCENDING)
+            if skip and not before:
+                cursor = cursor.skip(skip)
+            cursor = cursor.limit(limit)
             
             alerts = []
-            for doc in cursor:
+            async for doc in cursor:
                 doc["_id"] = str(doc["_id"])
                 alerts.append(doc)
             
@@ -147,12 +212,13 @@ class AlertStorageService:
             start = date.replace(hour=0, minute=0, second=0, microsecond=0)
             end = start + timedelta(days=1)
             
-            cursor = collection.find({
-                "created_at": {"$gte": start, "$lt": end}
-            }).sort("created_at", -1).limit(limit)
+            cursor = collection.find(
+                {"created_at": {"$gte": start, "$lt": end}},
+                ALERT_PROJECTION
+            ).sort("created_at", -1).limit(limit)
             
             alerts = []
-            for doc in cursor:
+            async for doc in cursor:
                 doc["_id"] = str(doc["_id"])
                 alerts.append(doc)
             
@@ -167,10 +233,10 @@ class AlertStorageService:
         try:
             collection = await self._get_collection()
             
-            total = collection.count_documents({})
+            total = await collection.estimated_document_count()
             today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-            today_count = collection.count_documents({"created_at": {"$gte": today}})
-            critical = collection.count_documents({"severity_score": {"$gte": 4}})
+            today_count = await collection.count_documents({"created_at": {"$gte": today}})
+            critical = await collection.count_documents({"severity_score": {"$gte": 4}})
             
             return {
                 "total_alerts": total,
@@ -187,7 +253,7 @@ class AlertStorageService:
         try:
             collection = await self._get_collection()
             
-            result = collection.update_one(
+            result = await collection.update_one(
                 {"_id": ObjectId(alert_id)},
                 {"$set": {"is_read": True, "read_at": datetime.now(timezone.utc)}}
             )
@@ -198,6 +264,56 @@ class AlertStorageService:
             logger.error(f"❌ [AlertStorage] mark_as_read ล้มเหลว: {e}")
             return False
     
+    async def save_pipeline_run(self, run: Dict) -> bool:
+        """บันทึกสถิติของแต่ละรอบ NewsScheduler (เวลาแต่ละ stage) ลง collection แยก"""
+        try:
+            await self._get_collection()
+            
+            await self._runs_collection.insert_one({
+                **run,
+                "expires_at": datetime.now(timezone.utc) + timedelta(days=self.RUNS_TTL_DAYS)
+            })
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ [AlertStorage] บันทึก pipeline run ล้มเหลว: {e}")
+            return False
+    
+    async def get_pipeline_runs(self, limit: int = 50) -> List[Dict]:
+        """ดึงสถิติรอบล่าสุดของ NewsScheduler (สำหรับดูแนวโน้มเวลาแต่ละ stage)"""
+        try:
+            await self._get_collection()
+            
+            cursor = self._runs_collection.find(
+                {}, {"expires_at": 0}
+            ).sort("started_at", -1).limit(limit)
+            
+            runs = []
+            async for doc in cursor:
+                doc["_id"] = str(doc["_id"])
+                runs.append(doc)
+            
+            return runs
+            
+        except Exception as e:
+            logger.error(f"❌ [AlertStorage] ดึง pipeline runs ล้มเหลว: {e}")
+            return []
+    
+    async def attach_coordinates(self, location_name: str, lat: float, lon: float) -> int:
+        """เติมพิกัดให้ alerts ที่บันทึกไปก่อน geocode เสร็จ (จากคิว background ของ GeocodingService)"""
+        try:
+            collection = await self._get_collection()
+            
+            result = await collection.update_many(
+                {"location_name": location_name, "lat": None},
+                {"$set": {"lat": lat, "lon": lon}}
+            )
+            return result.modified_count
+            
+        except Exception as e:
+            logger.error(f"❌ [AlertStorage] attach_coordinates ล้มเหลว: {e}")
+            return 0
+    
     def _format_thai_datetime(self, dt: datetime) -> str:
         """แปลง datetime เป็นรูปแบบไทย"""
         # เปลี่ยน timezone เป็น Bangkok
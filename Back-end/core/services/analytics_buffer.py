@@ -0,0 +1,201 @@
+# /core/services/analytics_buffer.py
+"""
+Analytics Buffer: รวม analytics events ไว้ในหน่วยความจำแล้วเขียนลง MongoDB เป็นชุด
+
+- Ring Buffer  : deque ขนาดจำกัด ANALYTICS_BUFFER_SIZE (เต็มแล้วทับ event เก่าสุด + นับ dropped)
+- Flusher      : task เบื้องหลังเขียน insert_many ทุก ANALYTICS_FLUSH_BATCH_SIZE events
+                 หรือทุก ANALYTICS_FLUSH_INTERVAL_MS (แล้วแต่อย่างไหนถึงก่อน)
+- Backpressure : buffer ถึงขนาด batch -> ปลุก flusher ทันที, MongoDB ล่ม -> คืน events เข้าคิวเท่าที่มีที่ว่าง
+- Idempotent   : insert_many ใส่ _id ให้ทุก event ก่อนส่ง -> retry ใช้ _id เดิม, E11000 (duplicate key) = เขียนไปแล้ว
+                 BulkWriteError คืนเข้าคิวเฉพาะ event ที่ผิดพลาดจริง (ไม่เกิน MAX_WRITE_ATTEMPTS ครั้ง)
+- Shutdown     : lifespan เรียก stop() เพื่อ flush events ที่ค้างทั้งหมดก่อนปิด
+
+submit() ไม่ await I/O ใดๆ -> เวลาตอบแชทไม่รวมเวลาเขียน analytics อีกต่อไป
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from core.config import settings
+from core.database.async_mongo import get_async_db
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsBuffer:
+
+    COLLECTION_NAME = "analytics_logs"
+    RETRY_BACKOFF_SECONDS = 5
+    MAX_WRITE_ATTEMPTS = 3
+    DUPLICATE_KEY_ERROR = 11000
+
+    def __init__(self,
+                 max_size: int = settings.ANALYTICS_BUFFER_SIZE,
+                 batch_size: int = settings.ANALYTICS_FLUSH_BATCH_SIZE,
+                 flush_interval_ms: int = settings.ANALYTICS_FLUSH_INTERVAL_MS):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._buffer: deque = deque(maxlen=max_size)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_attempts: Dict = {}  # _id -> จำนวนครั้งที่ event นั้นเจอ write error (เฉพาะที่ยังค้างอยู่)
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "last_flush_ms": 0.0,
+            "last_batch_size": 0,
+        }
+
+    def start(self):
+        """เริ่ม flusher (เรียกซ้ำได้ - จะเริ่มเฉพาะถ้ายังไม่ทำงาน)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._flush_loop())
+            logger.info(f"✅ [AnalyticsBuffer] เริ่ม flusher (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    def submit(self, event: Dict) -> bool:
+        """
+        ใส่ event เข้า buffer (ไม่บล็อก) คืน False ถ้า buffer เต็มจนต้องทับ event เก่าสุด
+        """
+        self.start()
+        self.stats["submitted"] += 1
+        accepted = True
+        if len(self._buffer) >= self.max_size:
+            self.stats["dropped"] += 1
+            accepted = False
+        self._buffer.append(event)
+
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return accepted
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._buffer:
+                if not await self._flush_batch():
+                    await asyncio.sleep(self.RETRY_BACKOFF_SECONDS)
+                    break
+                if len(self._buffer) < self.batch_size:
+                    break
+
+    def _take_batch(self) -> List[Dict]:
+        count = min(self.batch_size, len(self._buffer))
+        return [self._buffer.popleft() for _ in range(count)]
+
+    def _requeue(self, batch: List[Dict]):
+        """คืน batch ที่เขียนไม่สำเร็จไว้หน้าคิว เท่าที่ buffer ยังมีที่ว่าง (ส่วนที่เหลือนับเป็น dropped)"""
+        room = self.max_size - len(self._buffer)
+        keep = batch[:room]
+        self.stats["dropped"] += len(batch) - len(keep)
+        self._buffer.extendleft(reversed(keep))
+
+    def _failed_documents(self, batch: List[Dict], error: BulkWriteError) -> tuple:
+        """
+        event ใน batch ที่ต้องเขียนใหม่หลัง BulkWriteError (ordered=False: ตัวอื่นเขียนสำเร็จแล้ว)
+        - E11000: _id นี้อยู่ใน MongoDB แล้ว (รอบก่อน server commit แต่ client ไม่ได้รับคำตอบ) -> นับว่าเขียนแล้ว
+        - error อื่น: คืนเข้าคิว จนครบ MAX_WRITE_ATTEMPTS แล้วทิ้ง (เช่น document ผิด schema จะไม่มีวันเขียนได้)
+        คืน (events ที่ต้อง retry, จำนวนที่ทิ้ง)
+        """
+        failed, dropped = [], 0
+        for write_error in error.details.get("writeErrors", []):
+            if write_error.get("code") == self.DUPLICATE_KEY_ERROR:
+                continue
+            doc = batch[write_error["index"]]
+            attempts = self._write_attempts.get(doc.get("_id"), 0) + 1
+            if attempts >= self.MAX_WRITE_ATTEMPTS:
+                self._write_attempts.pop(doc.get("_id"), None)
+                dropped += 1
+                logger.error(f"❌ [AnalyticsBuffer] ทิ้ง event หลังเขียนไม่สำเร็จ {attempts} ครั้ง: {write_error.get('errmsg')}")
+                continue
+            self._write_attempts[doc.get("_id")] = attempts
+            failed.append(doc)
+        return failed, dropped
+
+    async def _flush_batch(self) -> bool:
+        async with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return True
+
+            started = time.perf_counter()
+            failed: List[Dict] = []
+            dropped = 0
+            try:
+                # ordered=False: insert_many ใส่ _id ให้ทุก dict ก่อนส่ง -> ถ้าต้อง retry จะใช้ _id เดิม (ไม่เขียนซ้ำ)
+                await get_async_db()[self.COLLECTION_NAME].insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                failed, dropped = self._failed_documents(batch, e)
+            except Exception as e:
+                # network / timeout: ไม่รู้ว่า server เขียนไปแล้วแค่ไหน -> คืนทั้ง batch (retry เจอ E11000 = เขียนแล้ว)
+                self.stats["flush_failures"] += 1
+                self._requeue(batch)
+                logger.error(f"❌ [AnalyticsBuffer] insert_many {len(batch)} events ล้มเหลว: {e}")
+                return False
+
+            if self._write_attempts:
+                failed_ids = {id(doc) for doc in failed}
+                for doc in batch:
+                    if id(doc) not in failed_ids:
+                        self._write_attempts.pop(doc.get("_id"), None)
+
+            written = len(batch) - len(failed) - dropped
+            self.stats["dropped"] += dropped
+            self.stats["flushes"] += 1
+            self.stats["written"] += written
+            self.stats["last_batch_size"] = written
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            if failed:
+                self.stats["flush_failures"] += 1
+                self._requeue(failed)
+                logger.error(f"❌ [AnalyticsBuffer] เขียนได้ {written}/{len(batch)} events, คืน {len(failed)} events เข้าคิว")
+                return False
+            logger.debug(f"📊 [AnalyticsBuffer] เขียน {written} events ({self.stats['last_flush_ms']} ms)")
+            return True
+
+    async def flush(self) -> int:
+        """เขียน events ที่ค้างทั้งหมดทันที คืนจำนวนที่เขียนสำเร็จ"""
+        if self._flush_lock is None:
+            return 0
+        written_before = self.stats["written"]
+        while self._buffer:
+            if not await self._flush_batch():
+                break
+        return self.stats["written"] - written_before
+
+    async def stop(self):
+        """หยุด flusher แล้ว flush ที่ค้างอยู่ (เรียกจาก lifespan ตอนปิดแอป)"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        if self._buffer:
+            logger.warning(f"⚠️ [AnalyticsBuffer] ปิดแอปโดยยังมี {len(self._buffer)} events เขียนไม่สำเร็จ")
+        logger.info(f"✅ [AnalyticsBuffer] flush ก่อนปิด {written} events")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "buffered": len(self._buffer), "capacity": self.max_size}
+
+
+# Singleton instance
+analytics_buffer = AnalyticsBuffer()
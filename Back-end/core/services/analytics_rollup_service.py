@@ -0,0 +1,238 @@
+# /core/services/analytics_rollup_service.py
+"""
+Analytics Rollup Service: สรุปยอด analytics ล่วงหน้าเป็นรายชั่วโมง/รายวัน
+
+- analytics_rollup_hourly : นับ event ต่อชั่วโมง แยกตามมิติ (origin / province / interest / location / feedback / total)
+- analytics_rollup_daily  : รวมจาก hourly เป็นรายวัน (ตามเวลาไทย)
+- Background job คำนวณเฉพาะชั่วโมงล่าสุดตั้งแต่ watermark (ผ่าน $merge ฝั่ง MongoDB) ทุก ANALYTICS_ROLLUP_INTERVAL_SECONDS
+- Dashboard / trending อ่านจาก rollup รายวันอย่างเดียว + cache ใน process
+  -> เวลาโหลด Dashboard ไม่ขึ้นกับจำนวน log ดิบ
+"""
+
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.database.async_mongo import get_async_db
+from utils.ttl_cache import SWRCache
+
+logger = logging.getLogger(__name__)
+
+BANGKOK_TZ = timezone(timedelta(hours=7))
+
+# มิติ -> field ใน analytics_logs
+LOG_DIMENSIONS = {
+    "origin": "user_origin",
+    "province": "user_province",
+    "interest": "interest_topic",
+    "location": "location_title",
+}
+
+# จำนวนอันดับที่ส่งให้ Dashboard ต่อมิติ (เหมือน pipeline เดิม)
+SUMMARY_LIMITS = {"origin": 10, "province": 15, "interest": 10, "location": 10, "feedback": None}
+
+
+class AnalyticsRollupService:
+
+    LOGS_COLLECTION = "analytics_logs"
+    FEEDBACK_COLLECTION = "feedback_logs"
+    HOURLY_COLLECTION = "analytics_rollup_hourly"
+    DAILY_COLLECTION = "analytics_rollup_daily"
+    STATE_COLLECTION = "analytics_rollup_state"
+    LATE_EVENTS_GRACE = timedelta(hours=1)  # คำนวณย้อนเผื่อ event ที่ถูกเขียนช้า (เช่น AnalyticsBuffer retry)
+
+    def __init__(self):
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self.cache = SWRCache(ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS, stale_seconds=settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS)
+        self.last_refresh: Optional[Dict] = None
+
+    async def _get_db(self):
+        """Lazy load database + สร้าง indexes"""
+        if self._db is None:
+            self._db = get_async_db()
+            try:
+                await self._db[self.DAILY_COLLECTION].create_index([("dim", 1), ("bucket", -1)])
+                await self._db[self.HOURLY_COLLECTION].create_index([("bucket", -1)])
+            except Exception as e:
+                logger.error(f"❌ [AnalyticsRollup] สร้าง indexes ล้มเหลว: {e}")
+        return self._db
+
+    # ====== Background Job ======
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+            logger.info(f"✅ [AnalyticsRollup] เริ่ม rollup job ทุก {settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS} วินาที")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ [AnalyticsRollup] rollup ล้มเหลว: {e}")
+            await asyncio.sleep(settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS)
+
+    # ====== Rollup ======
+
+    def _hourly_pipeline(self, since: Optional[datetime], pairs: List[Dict]) -> List[Dict]:
+        """นับ event ต่อ (ชั่วโมง, มิติ, ค่า) แล้ว $merge ลง hourly (แทนที่ค่าเดิมของชั่วโมงนั้น)"""
+        pipeline = []
+        if since is not None:
+            pipeline.append({"$match": {"timestamp": {"$gte": since}}})
+        pipeline += [
+            {"$project": {"hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}, "pairs": pairs}},
+            {"$unwind": "$pairs"},
+            {"$match": {"hour": {"$ne": None}, "pairs.key": {"$ne": None}}},
+            {"$group": {
+                "_id": {"bucket": "$hour", "dim": "$pairs.dim", "key": "$pairs.key"},
+                "count": {"$sum": 1}
+            }},
+            {"$project": {"bucket": "$_id.bucket", "dim": "$_id.dim", "key": "$_id.key", "count": 1}},
+            {"$merge": {"into": self.HOURLY_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+        return pipeline
+
+    def _daily_pipeline(self, since: Optional[datetime]) -> List[Dict]:
+        """รวม hourly เป็นรายวัน (เวลาไทย) แล้ว $merge ลง daily"""
+        pipeline = []
+        if since is not None:
+            pipeline.append({"$match": {"bucket": {"$gte": since}}})
+        pipeline += [
+            {"$group": {
+                "_id": {
+                    "bucket": {"$dateTrunc": {"date": "$bucket", "unit": "day", "timezone": "Asia/Bangkok"}},
+                    "dim": "$dim",
+                    "key": "$key"
+                },
+                "count": {"$sum": "$count"}
+            }},
+            {"$project": {"bucket": "$_id.bucket", "dim": "$_id.dim", "key": "$_id.key", "count": 1}},
+            {"$merge": {"into": self.DAILY_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+        return pipeline
+
+    async def refresh(self) -> Dict:
+        """
+        คำนวณ rollup ตั้งแต่ watermark ล่าสุด (ครั้งแรก = ทั้งหมด)
+        ทุกขั้นตอนเป็น replace ตาม _id จึงรันซ้ำได้ปลอดภัย (หลาย worker รันพร้อมกันก็ได้ผลเหมือนกัน)
+        """
+        async with self._refresh_lock:
+            db = await self._get_db()
+            started = datetime.now(timezone.utc)
+            state = await db[self.STATE_COLLECTION].find_one({"_id": "watermark"})
+
+            since = None
+            if state and state.get("hour"):
+                since = state["hour"] - self.LATE_EVENTS_GRACE
+
+            log_pairs = [{"dim": "total", "key": "all"}] + [
+                {"dim": dim, "key": f"${field}"} for dim, field in LOG_DIMENSIONS.items()
+            ]
+            feedback_pairs = [{"dim": "feedback", "key": "$feedback_type"}]
+
+            await db[self.LOGS_COLLECTION].aggregate(self._hourly_pipeline(since, log_pairs))
+            await db[self.FEEDBACK_COLLECTION].aggregate(self._hourly_pipeline(since, feedback_pairs))
+
+            # วันที่ต้องคำนวณใหม่ = ตั้งแต่เที่ยงคืน (เวลาไทย) ของวันที่ since อยู่
+            day_start = None
+            if since is not None:
+                day_start = since.astimezone(BANGKOK_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+            await db[self.HOURLY_COLLECTION].aggregate(self._daily_pipeline(day_start))
+
+            current_hour = started.replace(minute=0, second=0, microsecond=0)
+            await db[self.STATE_COLLECTION].update_one(
+                {"_id": "watermark"}, {"$set": {"hour": current_hour, "refreshed_at": started}}, upsert=True
+            )
+
+            elapsed_ms = round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1)
+            self.last_refresh = {"at": started.isoformat(), "since": since.isoformat() if since else None, "elapsed_ms": elapsed_ms}
+            logger.info(f"📊 [AnalyticsRollup] อัปเดต rollup ตั้งแต่ {since or 'เริ่มต้น'} ({elapsed_ms} ms)")
+            return self.last_refresh
+
+    # ====== Reads (rollup only) ======
+
+    async def _load_daily(self, days: int, dims: Optional[List[str]] = None) -> Dict[str, Counter]:
+        db = await self._get_db()
+        today = datetime.now(BANGKOK_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoff = today - timedelta(days=max(days, 1) - 1)
+
+        query = {"bucket": {"$gte": cutoff}}
+        if dims:
+            query["dim"] = {"$in": dims}
+
+        totals: Dict[str, Counter] = defaultdict(Counter)
+        async for doc in db[self.DAILY_COLLECTION].find(query, {"_id": 0, "dim": 1, "key": 1, "count": 1}):
+            totals[doc["dim"]][doc["key"]] += doc["count"]
+        return totals
+
+    @staticmethod
+    def _ranked(counter: Counter, limit: Optional[int]) -> List[Dict]:
+        return [{"_id": key, "count": count} for key, count in counter.most_common(limit)]
+
+    async def _build_summary(self, days: int) -> Dict:
+        totals = await self._load_daily(days)
+
+        summary = {
+            f"{dim}_stats": self._ranked(totals.get(dim, Counter()), limit)
+            for dim, limit in SUMMARY_LIMITS.items()
+        }
+        summary["total_conversations"] = totals.get("total", Counter()).get("all", 0)
+
+        # Default sample data for province if empty (ยังไม่มีการเก็บข้อมูล)
+        if not summary["province_stats"]:
+            summary["province_stats"] = [
+                {"_id": "กรุงเทพมหานคร", "count": 0},
+                {"_id": "เชียงใหม่", "count": 0},
+                {"_id": "น่าน", "count": 0},
+                {"_id": "ลำปาง", "count": 0},
+                {"_id": "แพร่", "count": 0},
+            ]
+        return summary
+
+    @staticmethod
+    def _empty_summary() -> Dict:
+        return {"origin_stats": [], "province_stats": [], "interest_stats": [], "location_stats": [], "total_conversations": 0, "feedback_stats": []}
+
+    async def get_summary(self, days: int = 30) -> Dict:
+        """สรุปสำหรับ Dashboard (รูปแบบเดียวกับ MongoDBManager.get_analytics_summary เดิม)"""
+        try:
+            # cache คืน None ถ้าโหลดครั้งแรกล้มเหลว (ยังไม่มีค่าเก่า) -> คืนโครงสร้างว่างให้ Dashboard เหมือนเดิม
+            return await self.cache.get(f"summary:{days}", lambda: self._build_summary(days)) or self._empty_summary()
+        except Exception as e:
+            logger.error(f"❌ [AnalyticsRollup] ดึงสรุป Dashboard ล้มเหลว: {e}")
+            return self._empty_summary()
+
+    async def _build_top_locations(self, limit: int, days: int) -> List[Dict]:
+        totals = await self._load_daily(days, dims=["location"])
+        return self._ranked(totals.get("location", Counter()), limit)
+
+    async def get_top_locations(self, limit: int = 5, days: int = 30) -> List[Dict]:
+        """สถานที่ยอดฮิต: [{"_id": "วัดภูมินทร์", "count": 10}, ...]"""
+        try:
+            return await self.cache.get(f"top_locations:{limit}:{days}", lambda: self._build_top_locations(limit, days)) or []
+        except Exception as e:
+            logger.error(f"❌ [AnalyticsRollup] ดึง top locations ล้มเหลว: {e}")
+            return []
+
+    def get_stats(self) -> Dict:
+        return {"last_refresh": self.last_refresh, "cache": self.cache.get_stats()}
+
+
+# Singleton instance
+analytics_rollup_service = AnalyticsRollupService()
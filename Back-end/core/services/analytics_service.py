@@ -2,6 +2,8 @@
 import logging
 from datetime import datetime, timezone
 from core.database.mongodb_manager import MongoDBManager
+from core.services.analytics_buffer import analytics_buffer
+from core.services.analytics_rollup_service import analytics_rollup_service
 
 class AnalyticsService:
     def __init__(self, mongo_manager: MongoDBManager):
@@ -19,12 +21,8 @@ class AnalyticsService:
                               sentiment: str = None):
         """
         Logs a single interaction to the analytics_logs collection.
-        This is fire-and-forget (should be awaited but not block critical path if possible).
+        Queued into AnalyticsBuffer (no I/O here) - written by the background flusher via insert_many.
         """
-        if self.collection is None:
-            logging.warning("ไม่พบคอลเลกชัน Analytics ข้ามการบันทึก log")
-            return
-
         try:
             log_entry = {
                 "session_id": session_id,
@@ -42,42 +40,31 @@ class AnalyticsService:
                 }
             }
             
-            # Using insert_one directly (could be batched in high-load systems)
-            # Use asyncio.to_thread to avoid blocking the main event loop
-            import asyncio
-            await asyncio.to_thread(self.collection.insert_one, log_entry)
-            
-            logging.info(f"📊 [Analytics] บันทึกสำเร็จ: '{user_query[:30]}...' -> Topic: {topic}")
+            # เข้าคิว buffer แล้ว flusher เขียนเป็นชุด (ไม่รอ MongoDB ใน request)
+            if analytics_buffer.submit(log_entry):
+                logging.info(f"📊 [Analytics] เข้าคิวบันทึก: '{user_query[:30]}...' -> Topic: {topic}")
+            else:
+                logging.warning("⚠️ [Analytics] buffer เต็ม ทับ event เก่าสุด")
 
         except Exception as e:
             logging.error(f"❌ [Analytics] บันทึก analytics ล้มเหลว: {e}", exc_info=True)
 
     async def get_dashboard_summary(self, days: int = 30):
         """
-        Wrapper to get aggregated stats.
-        Note: The heavy lifting is currently in MongoDBManager.get_analytics_summary.
-        We can move it here later for better separation of concerns.
+        Aggregated stats for the dashboard, read from the pre-computed daily rollups
+        (AnalyticsRollupService) instead of aggregating raw analytics_logs per request.
         """
         # User requested ONLY aggregated stats (charts/totals)
         # Detailed logs are NOT required.
-        summary = self.mongo_manager.get_analytics_summary(days)
-        return summary
+        return await analytics_rollup_service.get_summary(days)
     
     async def get_trending_locations(self, limit: int = 5) -> list:
         """
-        Retrieves top trending locations from analytics logs.
+        Retrieves top trending locations from the daily rollups.
         Used by RAG to enhance broad queries.
         """
-        try:
-            # Use asyncio.to_thread for database I/O
-            import asyncio
-            trending = await asyncio.to_thread(self.mongo_manager.get_top_locations, limit=limit, days=30)
-            return [t["_id"] for t in trending] # Return list of names only e.g. ["วัดภูมินทร์", "วัดพระธาตุแช่แห้ง"]
-        except Exception as e:
-            logging.error(f"❌ [Analytics] Failed to get trending locations: {e}")
-            return []
-    
-
+        trending = await analytics_rollup_service.get_top_locations(limit=limit, days=30)
+        return [t["_id"] for t in trending] # Return list of names only e.g. ["วัดภูมินทร์", "วัดพระธาตุแช่แห้ง"]
 
     async def log_feedback(self, session_id: str, query: str, response: str, feedback_type: str, reason: str = None):
         """
@@ -1,15 +1,42 @@
 # /core/services/geocoding_service.py
 """
 Geocoding Service: แปลงชื่อสถานที่เป็นพิกัด (Nominatim - ฟรี)
+
+ลำดับการค้นหา (เร็ว -> ช้า):
+1. Gazetteer ออฟไลน์: สร้างจาก location_data (lat/lon) และอำเภอของสถานที่ใน nan_locations
+2. Cache ถาวร (MongoDB: geocode_cache) รวม Negative Cache สำหรับชื่อที่หาไม่เจอ
+3. Nominatim: เฉพาะชื่อที่ไม่เคยเจอจริงๆ ผ่านคิว background (1 request/วินาที)
+อ่าน/เขียน MongoDB ผ่าน shared AsyncMongoClient (core/database/async_mongo.py) ไม่บล็อก event loop
 """
 
 import asyncio
 import logging
-from typing import Dict, Optional, List
+import re
+import time
+from typing import Dict, Optional, List, Tuple
+from datetime import datetime, timezone, timedelta
 import aiohttp
 
+from core.database.async_mongo import get_async_db
+from utils.rate_limiter import TokenBucket
+
 logger = logging.getLogger(__name__)
 
+# คำนำหน้า/คำบอกเขตที่ตัดออกก่อนเทียบชื่อ (เช่น "อ.ปัว" == "อำเภอปัว" == "ปัว")
+_ADMIN_PREFIXES = re.compile(r"^(อำเภอ|อ\.|ตำบล|ต\.|จังหวัด|จ\.)")
+# ตัดเฉพาะ "จังหวัดน่าน" / "จ.น่าน" หรือ "น่าน" ที่คั่นด้วยจุลภาค/ช่องว่าง ("ปัว, น่าน")
+# ไม่ตัด "น่าน" ที่เป็นส่วนของชื่อจริง เช่น "เมืองน่าน", "แม่น้ำน่าน"
+_PROVINCE_SUFFIX = re.compile(r"(?:,?\s*(?:จังหวัดน่าน|จ\.\s*น่าน)|(?:,|\s)\s*น่าน)$")
+
+
+def normalize_place_name(name: str) -> str:
+    """ทำชื่อสถานที่ให้อยู่ในรูปเดียวกันสำหรับใช้เป็น key ของ gazetteer / cache"""
+    text = (name or "").strip().lower()
+    text = re.sub(r"\(.*?\)", "", text)  # ตัดชื่อภาษาอังกฤษในวงเล็บ
+    text = _PROVINCE_SUFFIX.sub("", text.strip()).strip() or text
+    text = _ADMIN_PREFIXES.sub("", text.replace(" ", ""))
+    return re.sub(r"[\s\-_,.]+", "", text)
+
 
 class GeocodingService:
     """Service สำหรับแปลงชื่อสถานที่เป็นพิกัด"""
@@ -20,12 +47,234 @@ class GeocodingService:
     # Rate limit: 1 request/second
     RATE_LIMIT_DELAY = 1.1
     
+    # Persistent cache (MongoDB + TTL)
+    CACHE_COLLECTION = "geocode_cache"
+    CACHE_TTL_DAYS = 90
+    NEGATIVE_CACHE_TTL_DAYS = 7   # ชื่อที่หาไม่เจอ: ไม่ถาม Nominatim ซ้ำภายใน 7 วัน
+    GAZETTEER_RETRY_SECONDS = 60  # โหลด Gazetteer ไม่สำเร็จ: ลองใหม่ได้หลังจากนี้ (ไม่ให้ทุก lookup รอ MongoDB ที่ล่ม)
+    
     def __init__(self):
-        self._last_request_time = 0
+        self._rate_limiter = TokenBucket(rate=1 / self.RATE_LIMIT_DELAY, capacity=1)
+        
+        # Gazetteer ออฟไลน์ (normalized name -> result)
+        self._gazetteer: Dict[str, Dict] = {}
+        self._gazetteer_loaded = False
+        self._gazetteer_failed_at: Optional[float] = None
+        self._gazetteer_lock = asyncio.Lock()
+        
+        # Cache ในหน่วยความจำ (normalized name -> result หรือ None = negative)
+        self._memory_cache: Dict[str, Optional[Dict]] = {}
+        self._cache_collection = None
+        
+        # Background queue สำหรับชื่อที่ต้องถาม Nominatim
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._queued: set = set()
+        
+        self.stats = {"gazetteer_hits": 0, "cache_hits": 0, "negative_hits": 0, "nominatim_calls": 0, "queued": 0}
+    
+    # ====== Gazetteer ======
+    
+    async def _load_gazetteer(self) -> Dict[str, Dict]:
+        docs = await get_async_db()["nan_locations"].find(
+            {"location_data.latitude": {"$ne": None}, "location_data.longitude": {"$ne": None}},
+            {"title": 1, "slug": 1, "location_data": 1, "metadata": 1, "related_info": 1}
+        ).to_list(length=None)
+        return self._build_gazetteer(docs)
+    
+    @staticmethod
+    def _build_gazetteer(docs: List[Dict]) -> Dict[str, Dict]:
+        """สร้าง gazetteer จาก nan_locations: ชื่อสถานที่ -> พิกัด และอำเภอ -> จุดกึ่งกลางของสถานที่ในอำเภอนั้น"""
+        gazetteer = {}
+        districts: Dict[str, List[tuple]] = {}
+        for doc in docs:
+            loc = doc.get("location_data") or {}
+            try:
+                lat, lon = float(loc["latitude"]), float(loc["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            
+            title = doc.get("title", "")
+            entry = {"lat": lat, "lon": lon, "display_name": title, "place_name": title, "source": "gazetteer"}
+            for name in (title, doc.get("slug", "")):
+                key = normalize_place_name(name)
+                if key:
+                    gazetteer.setdefault(key, entry)
+            
+            district = (
+                (doc.get("metadata") or {}).get("district")
+                or loc.get("district")
+                or (doc.get("related_info") or {}).get("district")
+            )
+            if district:
+                districts.setdefault(district, []).append((lat, lon))
+        
+        for district, points in districts.items():
+            key = normalize_place_name(district)
+            if not key or key in gazetteer:
+                continue
+            gazetteer[key] = {
+                "lat": sum(p[0] for p in points) / len(points),
+                "lon": sum(p[1] for p in points) / len(points),
+                "display_name": f"อำเภอ{district} จังหวัดน่าน",
+                "place_name": district,
+                "source": "gazetteer_district"
+            }
+        
+        # ตัวจังหวัดเอง (ใช้พิกัดเดียวกับ WeatherService)
+        from core.services.weather_service import WeatherService
+        gazetteer.setdefault("น่าน", {
+            "lat": WeatherService.NAN_LAT,
+            "lon": WeatherService.NAN_LON,
+            "display_name": "จังหวัดน่าน",
+            "place_name": "จังหวัดน่าน",
+            "source": "gazetteer_province"
+        })
+        return gazetteer
+    
+    def _gazetteer_ready(self) -> bool:
+        """โหลดแล้ว หรือเพิ่งโหลดล้มเหลว (รอ GAZETTEER_RETRY_SECONDS ก่อนลองใหม่)"""
+        if self._gazetteer_loaded:
+            return True
+        return self._gazetteer_failed_at is not None and time.monotonic() - self._gazetteer_failed_at < self.GAZETTEER_RETRY_SECONDS
+    
+    async def _ensure_gazetteer(self):
+        if self._gazetteer_ready():
+            return
+        async with self._gazetteer_lock:
+            if self._gazetteer_ready():
+                return
+            try:
+                self._gazetteer = await self._load_gazetteer()
+                self._gazetteer_loaded = True
+                logger.info(f"🗺️ [Geocoding] โหลด Gazetteer {len(self._gazetteer)} รายการ")
+            except Exception as e:
+                # ไม่ตั้ง _gazetteer_loaded -> ลองโหลดใหม่รอบหลัง (ใช้ gazetteer เดิมไปก่อนถ้ามี)
+                self._gazetteer_failed_at = time.monotonic()
+                logger.error(f"❌ [Geocoding] สร้าง Gazetteer ล้มเหลว (ลองใหม่ใน {self.GAZETTEER_RETRY_SECONDS}s): {e}")
+    
+    async def reload_gazetteer(self):
+        """โหลด gazetteer ใหม่ (เรียกหลังเพิ่ม/แก้ไขสถานที่)"""
+        self._gazetteer_loaded = False
+        self._gazetteer_failed_at = None
+        await self._ensure_gazetteer()
+    
+    # ====== Persistent Cache ======
+    
+    async def _get_cache_collection(self):
+        if self._cache_collection is None:
+            self._cache_collection = get_async_db()[self.CACHE_COLLECTION]
+            try:
+                await self._cache_collection.create_index("expires_at", expireAfterSeconds=0)
+            except Exception as e:
+                logger.error(f"❌ [Geocoding] สร้าง cache index ล้มเหลว: {e}")
+        return self._cache_collection
+    
+    async def _write_cache(self, key: str, result: Optional[Dict]):
+        collection = await self._get_cache_collection()
+        days = self.CACHE_TTL_DAYS if result else self.NEGATIVE_CACHE_TTL_DAYS
+        now = datetime.now(timezone.utc)
+        await collection.update_one(
+            {"_id": key},
+            {"$set": {"result": result, "found": result is not None, "updated_at": now, "expires_at": now + timedelta(days=days)}},
+            upsert=True
+        )
+    
+    async def _lookup_cache(self, key: str):
+        """คืน (found_in_cache, result)"""
+        if key in self._memory_cache:
+            return True, self._memory_cache[key]
+        try:
+            collection = await self._get_cache_collection()
+            doc = await collection.find_one({"_id": key})
+        except Exception as e:
+            logger.error(f"❌ [Geocoding] อ่าน cache ล้มเหลว: {e}")
+            return False, None
+        if doc is None:
+            return False, None
+        self._memory_cache[key] = doc.get("result")
+        return True, doc.get("result")
+    
+    async def _store_cache(self, key: str, result: Optional[Dict]):
+        self._memory_cache[key] = result
+        try:
+            await self._write_cache(key, result)
+        except Exception as e:
+            logger.error(f"❌ [Geocoding] เขียน cache ล้มเหลว: {e}")
+    
+    # ====== Public API ======
+    
+    async def lookup(self, place_name: str, enqueue_miss: bool = True) -> Optional[Dict]:
+        """
+        ค้นหาพิกัดแบบไม่รอ network (Gazetteer + Cache เท่านั้น)
+        ถ้าไม่เจอ จะส่งชื่อเข้าคิว background ไปถาม Nominatim แล้วคืน None ทันที
+        """
+        key = normalize_place_name(place_name)
+        if not key:
+            return None
+        
+        await self._ensure_gazetteer()
+        if key in self._gazetteer:
+            self.stats["gazetteer_hits"] += 1
+            return {**self._gazetteer[key], "place_name": place_name}
+        
+        found, result = await self._lookup_cache(key)
+        if found:
+            if result is None:
+                self.stats["negative_hits"] += 1
+                return None
+            self.stats["cache_hits"] += 1
+            return result
         
+        if enqueue_miss:
+            self._enqueue(place_name, key)
+        return None
+    
+    def _enqueue(self, place_name: str, key: str):
+        if key in self._queued:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._background_worker())
+        self._queued.add(key)
+        self.stats["queued"] += 1
+        self._queue.put_nowait((place_name, key))
+    
+    async def _background_worker(self):
+        """ถาม Nominatim ทีละชื่อตาม rate limit แล้วเติมพิกัดให้ alert ที่บันทึกไปแล้ว"""
+        while True:
+            place_name, key = await self._queue.get()
+            try:
+                ok, result = await self._fetch_nominatim(place_name)
+                if ok:
+                    await self._store_cache(key, result)
+                if result:
+                    await self._attach_to_alerts(place_name, result)
+            except Exception as e:
+                logger.error(f"❌ [Geocoding] Background geocode ล้มเหลว: {e}")
+            finally:
+                self._queued.discard(key)
+                self._queue.task_done()
+    
+    async def _attach_to_alerts(self, place_name: str, result: Dict):
+        try:
+            from core.services.alert_storage_service import alert_storage_service
+            await alert_storage_service.attach_coordinates(place_name, result["lat"], result["lon"])
+        except Exception as e:
+            logger.error(f"❌ [Geocoding] อัปเดตพิกัด alert ล้มเหลว: {e}")
+    
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "gazetteer_size": len(self._gazetteer),
+            "memory_cache_size": len(self._memory_cache),
+            "pending": self._queue.qsize() if self._queue else 0
+        }
+    
     async def geocode(self, place_name: str, country: str = "Thailand") -> Optional[Dict]:
         """
-        แปลงชื่อสถานที่เป็นพิกัด
+        แปลงชื่อสถานที่เป็นพิกัด (Gazetteer -> Cache -> Nominatim แบบรอผล)
         
         Args:
             place_name: ชื่อสถานที่
@@ -34,6 +283,27 @@ class GeocodingService:
         Returns:
             Dict with lat, lon, display_name or None
         """
+        key = normalize_place_name(place_name)
+        cached = await self.lookup(place_name, enqueue_miss=False)
+        if cached is not None or not key:
+            return cached
+        found, _ = await self._lookup_cache(key)
+        if found:
+            return None  # Negative cache
+        
+        ok, result = await self._fetch_nominatim(place_name, country)
+        if ok:
+            await self._store_cache(key, result)
+        return result
+    
+    async def _fetch_nominatim(self, place_name: str, country: str = "Thailand") -> Tuple[bool, Optional[Dict]]:
+        """
+        เรียก Nominatim จริง (ใช้ rate limit 1 request/วินาที)
+        
+        Returns:
+            (ok, result) - ok=False เมื่อเกิด error (ไม่ควรเก็บเป็น negative cache)
+        """
+        self.stats["nominatim_calls"] += 1
         try:
             # Rate limiting
             await self._respect_rate_limit()
@@ -62,13 +332,13 @@ class GeocodingService:
                 async with session.get(self.NOMINATIM_URL, params=params, headers=headers) as response:
                     if response.status != 200:
                         logger.error(f"❌ [Geocoding] API error: {response.status}")
-                        return None
+                        return False, None
                         
                     data = await response.json()
                     
                     if not data:
                         logger.warning(f"⚠️ [Geocoding] ไม่พบพิกัดสำหรับ: {place_name}")
-                        return None
+                        return True, None
                         
                     result = data[0]
                     
@@ -80,15 +350,16 @@ class GeocodingService:
                         "address": result.get("address", {}),
                         "osm_type": result.get("osm_type", ""),
                         "osm_id": result.get("osm_id", ""),
-                        "importance": result.get("importance", 0)
+                        "importance": result.get("importance", 0),
+                        "source": "nominatim"
                     }
                     
                     logger.info(f"📍 [Geocoding] {place_name} -> ({geocode_result['lat']}, {geocode_result['lon']})")
-                    return geocode_result
+                    return True, geocode_result
                     
         except Exception as e:
             logger.error(f"❌ [Geocoding] ข้อผิดพลาด: {e}")
-            return None
+            return False, None
     
     async def reverse_geocode(self, lat: float, lon: float) -> Optional[Dict]:
         """
@@ -137,6 +408,7 @@ class GeocodingService:
     async def geocode_batch(self, place_names: List[str]) -> List[Dict]:
         """
         แปลงหลายสถานที่พร้อมกัน (มี rate limit)
+        ชื่อที่อยู่ใน Gazetteer/Cache ได้ผลทันที เฉพาะชื่อที่ไม่เคยเจอเท่านั้นที่ต้องรอ Nominatim
         
         Args:
             place_names: รายการชื่อสถานที่
@@ -144,27 +416,12 @@ class GeocodingService:
         Returns:
             List of geocode results
         """
-        results = []
-        
-        for place in place_names:
-            result = await self.geocode(place)
-            if result:
-                results.append(result)
-            # Rate limit is handled automatically
-            
-        return results
+        results = await asyncio.gather(*(self.geocode(place) for place in place_names))
+        return [result for result in results if result]
     
     async def _respect_rate_limit(self):
-        """รอให้ครบ rate limit ก่อนส่ง request ถัดไป"""
-        import time
-        
-        current_time = time.time()
-        time_since_last = current_time - self._last_request_time
-        
-        if time_since_last < self.RATE_LIMIT_DELAY:
-            await asyncio.sleep(self.RATE_LIMIT_DELAY - time_since_last)
-            
-        self._last_request_time = time.time()
+        """รอให้ครบ rate limit ก่อนส่ง request ถัดไป (Token Bucket ใช้ร่วมกันทุก coroutine)"""
+        await self._rate_limiter.acquire()
 
 
 # Singleton instance
@@ -0,0 +1,178 @@
+# /core/services/image_derivative_service.py
+"""
+Image Derivative Service: สร้างรูปย่อ/รูปพรีวิว/WebP จากรูปต้นฉบับใน static/images/
+
+- Variant     : thumb (การ์ด/รูปย่อ), preview (JPEG สำหรับ LINE), webp (แกลเลอรี/รูปในคำตอบ)
+- Disk cache  : ไฟล์ derivative ตั้งชื่อตาม hash ของเนื้อไฟล์ต้นฉบับ (รูปเดียวกันคนละชื่อใช้ไฟล์เดียวกัน
+                 แก้ไฟล์ต้นฉบับแล้ว hash เปลี่ยน -> สร้างใหม่อัตโนมัติ)
+- Pre-generate: ImageSyncService สร้าง derivative ของไฟล์ใหม่/ที่เปลี่ยนไว้ก่อนตอน sync
+- URL         : /api/images/{variant}/{filename} (endpoint ส่ง ETag + Cache-Control อายุยาว)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageOps
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+SOURCE_DIR = BACKEND_ROOT / "static" / "images"
+CACHE_DIR = BACKEND_ROOT / "static" / "cache" / "image_variants"
+
+VARIANT_URL_PREFIX = "/api/images"
+SOURCE_URL_PREFIX = "/static/images/"
+
+# ขนาดสูงสุด (กว้าง, สูง) + รูปแบบไฟล์ + คุณภาพ
+VARIANTS: Dict[str, Dict] = {
+    "thumb":   {"size": (480, 480),   "format": "JPEG", "ext": "jpg",  "media_type": "image/jpeg", "quality": 78},
+    "preview": {"size": (1024, 1024), "format": "JPEG", "ext": "jpg",  "media_type": "image/jpeg", "quality": 82},
+    "webp":    {"size": (1280, 1280), "format": "WEBP", "ext": "webp", "media_type": "image/webp", "quality": 80},
+}
+
+# แต่ละจุดที่แสดงรูปใช้ variant ไหน
+IMAGE_SURFACES: Dict[str, str] = {
+    "gallery": "webp",        # แกลเลอรีในหน้าแชท
+    "inline": "webp",         # รูปที่แทรกในคำตอบ ({{IMAGE:...}})
+    "source_card": "thumb",   # การ์ดแหล่งข้อมูล
+    "nav_card": "thumb",      # รายการสถานที่สำหรับนำทาง
+    "line_original": "preview",  # LINE: รูปเต็ม (LINE รองรับ JPEG/PNG เท่านั้น)
+    "line_preview": "thumb",     # LINE: รูปพรีวิว / carousel
+}
+
+_SAFE_FILENAME = re.compile(r"^[\w\-.]+\.(jpg|jpeg|png|webp)$", re.IGNORECASE)
+_VARIANT_PATH = re.compile(r"^/api/images/(\w+)/([^/]+)$")
+
+
+class ImageDerivativeService:
+
+    def __init__(self, source_dir: Path = SOURCE_DIR, cache_dir: Path = CACHE_DIR):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}   # filename -> (mtime, size, content hash)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"generated": 0, "cache_hits": 0, "errors": 0}
+
+    # ====== URLs ======
+
+    @staticmethod
+    def _split_url(url: str) -> Tuple[str, str]:
+        """แยก URL เป็น (origin, path) - path ในเครื่องคืน origin ว่าง"""
+        if url.startswith(("http://", "https://")):
+            parts = urlsplit(url)
+            return f"{parts.scheme}://{parts.netloc}", parts.path
+        return "", url
+
+    @staticmethod
+    def _source_filename(path: str) -> Optional[str]:
+        """ชื่อไฟล์ต้นฉบับจาก path ของรูปในเครื่อง (/static/images/x.jpg หรือ /api/images/{variant}/x.jpg)"""
+        if path.startswith(SOURCE_URL_PREFIX):
+            filename = path[len(SOURCE_URL_PREFIX):]
+        else:
+            match = _VARIANT_PATH.match(path)
+            filename = match.group(2) if match else None
+        return filename if filename and _SAFE_FILENAME.match(filename) else None
+
+    def variant_url(self, url: Optional[str], variant: str) -> Optional[str]:
+        """แปลง URL รูปในเครื่องเป็น URL ของ variant (URL ภายนอก เช่น Google คืนค่าเดิม)"""
+        if not url or not settings.IMAGE_VARIANTS_ENABLED or variant not in VARIANTS:
+            return url
+        origin, path = self._split_url(url)
+        filename = self._source_filename(path)
+        if not filename:
+            return url
+        return f"{origin}{VARIANT_URL_PREFIX}/{variant}/{filename}"
+
+    def surface_url(self, url: Optional[str], surface: str) -> Optional[str]:
+        return self.variant_url(url, IMAGE_SURFACES.get(surface, ""))
+
+    # ====== Generation ======
+
+    def _content_hash(self, filename: str) -> Optional[str]:
+        """hash ของเนื้อไฟล์ต้นฉบับ (คำนวณใหม่เฉพาะเมื่อ mtime/size เปลี่ยน)"""
+        path = self.source_dir / filename
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        known = self._hashes.get(filename)
+        if known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+            return known[2]
+        digest = hashlib.sha1()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()[:20]
+        self._hashes[filename] = (stat.st_mtime, stat.st_size, content_hash)
+        return content_hash
+
+    def _render(self, source: Path, target: Path, spec: Dict):
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            if spec["format"] == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.thumbnail(spec["size"], Image.LANCZOS)
+            tmp = target.with_suffix(target.suffix + f".{os.getpid()}-{threading.get_ident()}.tmp")
+            img.save(tmp, spec["format"], quality=spec["quality"], optimize=True)
+            os.replace(tmp, target)  # เขียนไฟล์ชั่วคราวก่อน กันอ่านไฟล์ที่ยังเขียนไม่เสร็จ
+
+    def ensure_variant(self, filename: str, variant: str) -> Optional[Tuple[Path, str, str]]:
+        """
+        คืน (path ของไฟล์ derivative, etag, media_type) สร้างใหม่ถ้ายังไม่มีใน cache
+        (sync - เรียกผ่าน thread)
+        """
+        spec = VARIANTS.get(variant)
+        if spec is None or not _SAFE_FILENAME.match(filename or ""):
+            return None
+        content_hash = self._content_hash(filename)
+        if content_hash is None:
+            return None
+
+        etag = f"{content_hash}-{variant}"
+        target = self.cache_dir / f"{etag}.{spec['ext']}"
+        if target.exists():
+            self.stats["cache_hits"] += 1
+        else:
+            try:
+                self._render(self.source_dir / filename, target, spec)
+                self.stats["generated"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ [ImageVariants] สร้าง {variant} ของ {filename} ล้มเหลว: {e}")
+                return None
+        return target, etag, spec["media_type"]
+
+    async def get_variant(self, filename: str, variant: str) -> Optional[Tuple[Path, str, str]]:
+        """เหมือน ensure_variant แต่รันใน thread และคำขอพร้อมกันของไฟล์เดียวกันสร้างครั้งเดียว"""
+        key = f"{filename}:{variant}"
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(self.ensure_variant, filename, variant))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def pregenerate(self, filenames: Iterable[str]) -> int:
+        """สร้างทุก variant ของไฟล์ที่ระบุไว้ล่วงหน้า (เรียกจาก ImageSyncService ใน thread) คืนจำนวนไฟล์ที่สร้าง"""
+        generated_before = self.stats["generated"]
+        for filename in filenames:
+            for variant in VARIANTS:
+                self.ensure_variant(filename, variant)
+        return self.stats["generated"] - generated_before
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "enabled": settings.IMAGE_VARIANTS_ENABLED, "tracked_sources": len(self._hashes)}
+
+
+# Singleton instance
+image_derivative_service = ImageDerivativeService()
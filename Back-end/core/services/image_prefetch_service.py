@@ -0,0 +1,113 @@
+# /core/services/image_prefetch_service.py
+"""
+Image Prefetch Service: ดึงรูปจาก Google ไว้ล่วงหน้าให้สถานที่ที่ไม่มีรูปในเครื่อง
+
+- ทำงานเฉพาะช่วงคนใช้น้อย (IMAGE_PREFETCH_START_HOUR - IMAGE_PREFETCH_END_HOUR เวลาไทย)
+- ใช้คำค้นเดียวกับ RAGOrchestrator ("{title} จังหวัดน่าน", GOOGLE_IMAGE_MAX_RESULTS) ผลจึงลง cache ถาวรชุดเดียวกัน
+  -> ตอนผู้ใช้ถามจริงอ่านจาก cache แทนการรอ Google
+- หยุดเมื่อโควต้าวันนี้เหลือไม่ถึง IMAGE_PREFETCH_QUOTA_RESERVE (เก็บไว้ให้คำค้นของผู้ใช้)
+- ถ้ามี Redis: รันเฉพาะ leader ของ AlertBus (worker เดียว)
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from core.config import settings
+from core.tools.image_search_tool import image_search_tool_instance
+
+logger = logging.getLogger(__name__)
+
+BANGKOK_TZ = timezone(timedelta(hours=7))
+CHECK_INTERVAL_SECONDS = 900
+REQUEST_SPACING_SECONDS = 2
+
+
+class ImagePrefetchService:
+
+    def __init__(self, image_service):
+        self.image_service = image_service
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict] = None
+
+    def start(self):
+        if not settings.IMAGE_PREFETCH_ENABLED or not settings.GOOGLE_API_KEY:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._prefetch_loop())
+            logger.info(f"✅ [ImagePrefetch] เริ่มทำงานช่วง {settings.IMAGE_PREFETCH_START_HOUR}:00-{settings.IMAGE_PREFETCH_END_HOUR}:00")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def is_off_peak(now: Optional[datetime] = None) -> bool:
+        hour = (now or datetime.now(BANGKOK_TZ)).hour
+        start, end = settings.IMAGE_PREFETCH_START_HOUR, settings.IMAGE_PREFETCH_END_HOUR
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # ช่วงข้ามเที่ยงคืน เช่น 23-5
+
+    @staticmethod
+    def _is_leader() -> bool:
+        from core.services.alert_bus import alert_bus
+        return alert_bus.is_leader or not alert_bus.connected
+
+    async def _prefetch_loop(self):
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+            if not self.is_off_peak() or not self._is_leader():
+                continue
+            try:
+                await self.prefetch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ [ImagePrefetch] prefetch ล้มเหลว: {e}")
+
+    async def prefetch(self, respect_hours: bool = True) -> Dict:
+        """
+        ค้นรูปของสถานที่ที่ยังไม่มีรูปและยังไม่อยู่ใน cache จนกว่าจะหมดรายการ/หมดช่วง off-peak/เหลือโควต้าเท่า reserve
+        respect_hours=False: สั่งรันทันที (admin) แต่ยังเคารพ quota reserve
+        """
+        titles = self.image_service.locations_needing_google_images()
+        fetched = skipped = 0
+        stopped_by = None
+
+        for title in titles:
+            query = f"{title} จังหวัดน่าน"
+            if await image_search_tool_instance.is_cached(query, settings.GOOGLE_IMAGE_MAX_RESULTS):
+                skipped += 1
+                continue
+            if respect_hours and not self.is_off_peak():
+                stopped_by = "peak_hours"
+                break
+            quota = await image_search_tool_instance.get_quota_usage()
+            if quota["remaining"] <= settings.IMAGE_PREFETCH_QUOTA_RESERVE:
+                stopped_by = "quota_reserve"
+                break
+
+            await image_search_tool_instance.get_image_urls(query, max_results=settings.GOOGLE_IMAGE_MAX_RESULTS)
+            fetched += 1
+            await asyncio.sleep(REQUEST_SPACING_SECONDS)
+
+        self.last_run = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "candidates": len(titles),
+            "fetched": fetched,
+            "already_cached": skipped,
+            "stopped_by": stopped_by
+        }
+        if fetched or stopped_by:
+            logger.info(f"🖼️ [ImagePrefetch] ดึงรูปล่วงหน้า {fetched} สถานที่ (cache แล้ว {skipped}/{len(titles)}, หยุดเพราะ: {stopped_by or '-'})")
+        return self.last_run
+
+    def get_stats(self) -> Dict:
+        return {"enabled": settings.IMAGE_PREFETCH_ENABLED, "running": bool(self._task and not self._task.done()), "last_run": self.last_run}
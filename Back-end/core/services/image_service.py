@@ -6,11 +6,33 @@ import logging
 import random
 import re
 import asyncio
+import difflib
 from typing import List, Dict, Optional
 from core.database.mongodb_manager import MongoDBManager
 from core.config import settings
 from core.tools.image_search_tool import image_search_tool_instance
-from core.services.image_sync_service import ImageSyncService
+from core.services.image_sync_service import ImageSyncService, ImageDirectoryWatcher
+from core.services.image_derivative_service import image_derivative_service
+from utils.keyword_index import KeywordIndex
+
+IMAGE_TAG_PATTERN = re.compile(r"\{\{IMAGE:\s*(.*?)\}\}")
+
+# ลำดับความสำคัญของ key ใน index (ชื่อตรงกว่า = สูงกว่า)
+PRIORITY_IMAGE_PREFIX = 3   # prefix ของไฟล์รูป เช่น "wat-phumin-"
+PRIORITY_NAME = 2           # title / ชื่อในวงเล็บ / slug / image_prefix ของสถานที่
+PRIORITY_ALIAS = 1          # keywords ของสถานที่ (ถ้าซ้ำกันหลายที่จะถูกตัดทิ้งเพราะกำกวม)
+PRIORITY_TOKEN = 0          # token ท้ายของ slug เช่น "phumin" จาก "wat-phumin"
+
+
+def normalize_image_keyword(text: str) -> str:
+    """ทำ keyword / ชื่อสถานที่ / prefix ให้อยู่ในรูปเดียวกัน (ตัวเล็ก ไม่มีช่องว่าง/ขีด)"""
+    return re.sub(r"[\s\-_.,]+", "", (text or "").lower())
+
+
+def _slug_tokens(slug: str) -> List[str]:
+    """token ท้ายของ slug: "wat-phra-that" -> ["phrathat", "that"] (ใช้เป็น prefix token)"""
+    parts = [p for p in (slug or "").lower().strip("-").split("-") if p]
+    return ["".join(parts[i:]) for i in range(1, len(parts))]
 
 class ImageService:
     def __init__(self, mongo_manager: MongoDBManager):
@@ -18,21 +40,97 @@ class ImageService:
         self.collection = self.mongo_manager.get_collection("image_metadata")
         self.prefixed_image_map: Dict[str, List[str]] = {}
         self.all_image_files: List[str] = []
+        self.keyword_index = KeywordIndex()
+        self._location_docs: List[Dict] = []
+        self.revision = 0  # เพิ่มทุกครั้งที่ชุดรูปเปลี่ยน (ให้ cache ที่อ้างรูป เช่น LocationGeoIndex รู้ว่าต้องสร้างใหม่)
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._pending_sync: Optional[asyncio.TimerHandle] = None
+        self._watcher: Optional[ImageDirectoryWatcher] = None
         
-        # Initialize sync service and run sync at startup
+        # Load cache จาก MongoDB ทันที (ไม่รอสแกนโฟลเดอร์)
         self.sync_service = ImageSyncService(mongo_manager)
-        self._run_initial_sync()
-        
-        # Load cache after sync
         self.refresh_cache()
+        
+        # Incremental sync + watcher ทำใน background (startup ไม่ขึ้นกับจำนวนรูปในโฟลเดอร์)
+        self._run_initial_sync()
 
     def _run_initial_sync(self):
-        """สแกนและซิงค์รูปภาพตอน startup"""
+        """สแกนและซิงค์รูปภาพตอน startup (background task ถ้ามี event loop, ไม่งั้นรันเลย)"""
         try:
-            result = self.sync_service.sync_images()
-            logging.info(f"✅ [ImageService] Startup sync สำเร็จ: {result['total_images']} รูป")
-        except Exception as e:
-            logging.warning(f"⚠️ [ImageService] Startup sync ล้มเหลว: {e}")
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                result = self.sync_service.sync_images()
+                self.apply_image_changes(result.get("changes", {}))
+                logging.info(f"✅ [ImageService] Startup sync สำเร็จ: {result['total_images']} รูป")
+            except Exception as e:
+                logging.warning(f"⚠️ [ImageService] Startup sync ล้มเหลว: {e}")
+            return
+
+        loop.create_task(self.sync_now())
+        if settings.IMAGE_WATCH_ENABLED:
+            self._watcher = ImageDirectoryWatcher(
+                self.sync_service.static_images_path,
+                on_change=lambda: loop.call_soon_threadsafe(self._schedule_sync)
+            )
+            self._watcher.start()
+
+    def _schedule_sync(self):
+        """รวม event ของไฟล์ที่ติดกัน (debounce) แล้ว sync ครั้งเดียว"""
+        if self._pending_sync is not None:
+            self._pending_sync.cancel()
+        loop = asyncio.get_running_loop()
+        self._pending_sync = loop.call_later(
+            settings.IMAGE_WATCH_DEBOUNCE_SECONDS,
+            lambda: loop.create_task(self.sync_now())
+        )
+
+    async def sync_now(self) -> Dict:
+        """Incremental sync (สแกนใน thread) แล้วอัปเดต cache ในหน่วยความจำเฉพาะส่วนที่เปลี่ยน"""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            try:
+                result = await asyncio.to_thread(self.sync_service.sync_images)
+            except Exception as e:
+                logging.warning(f"⚠️ [ImageService] Image sync ล้มเหลว: {e}")
+                return {"success": False, "error": str(e)}
+            self.apply_image_changes(result.pop("changes", {}))
+            return result
+
+    def apply_image_changes(self, changes: Dict[str, List[Dict]]):
+        """อัปเดต prefixed_image_map / all_image_files / keyword index ตามผล sync (ไม่โหลดใหม่ทั้งหมด)"""
+        added = changes.get("added", [])
+        removed = changes.get("removed", [])
+        if not added and not removed:
+            return
+
+        for entry in removed:
+            url, prefix = entry.get("url"), entry.get("prefix")
+            if url in self.all_image_files:
+                self.all_image_files.remove(url)
+            paths = self.prefixed_image_map.get(prefix)
+            if paths and url in paths:
+                paths.remove(url)
+                if not paths:
+                    del self.prefixed_image_map[prefix]
+
+        for entry in added:
+            url, prefix = entry["url"], entry["prefix"]
+            if url not in self.all_image_files:
+                self.all_image_files.append(url)
+            paths = self.prefixed_image_map.setdefault(prefix, [])
+            if url not in paths:
+                paths.append(url)
+                paths.sort()
+
+        self.rebuild_keyword_index(reload_locations=False)
+        logging.info(f"🔄 [ImageService] อัปเดต cache: +{len(added)} / -{len(removed)} รูป")
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
 
     def refresh_cache(self):
         """Loads all image metadata from MongoDB into memory."""
@@ -41,7 +139,7 @@ class ImageService:
             return
 
         try:
-            all_docs = list(self.collection.find({}))
+            all_docs = list(self.collection.find({}, {"url": 1, "prefix": 1}))
             self.prefixed_image_map = {}
             self.all_image_files = []
 
@@ -59,6 +157,85 @@ class ImageService:
         except Exception as e:
             logging.error(f"❌ ImageService: เกิดข้อผิดพลาดในการรีเฟรช cache: {e}")
 
+        self.rebuild_keyword_index()
+
+    def _resolve_prefix_images(self, target_prefix: Optional[str]) -> List[str]:
+        """หา URLs ของ prefix (ตรงตัวก่อน แล้วค่อยยอมให้ prefix หนึ่งขึ้นต้นด้วยอีกตัว)"""
+        if not target_prefix:
+            return []
+        if self.prefixed_image_map.get(target_prefix):
+            return self.prefixed_image_map[target_prefix]
+        for prefix, paths in self.prefixed_image_map.items():
+            if paths and (prefix.startswith(target_prefix) or target_prefix.startswith(prefix)):
+                return paths
+        return []
+
+    def _doc_images(self, doc: Dict) -> tuple:
+        """รูปของสถานที่หนึ่งแห่ง (ไม่รวม Google)"""
+        # 🆕 PRIORITY: explicit 'image_urls' ใน DB (Admin overrides) มาก่อนรูปในเครื่อง
+        db_image_urls = doc.get("image_urls")
+        if isinstance(db_image_urls, list) and db_image_urls:
+            return tuple(str(url) for url in db_image_urls if url)
+        slug = doc.get("slug")
+        image_prefix = (doc.get("metadata") or {}).get("image_prefix")
+        return tuple(self._resolve_prefix_images(image_prefix or (f"{slug}-" if slug else None)))
+
+    def locations_needing_google_images(self) -> List[str]:
+        """
+        ชื่อสถานที่ที่รูปในเครื่อง/DB ไม่ถึง IMAGE_FALLBACK_THRESHOLD (RAGOrchestrator จะไปค้น Google)
+        ใช้โดย ImagePrefetchService
+        """
+        return [
+            doc["title"] for doc in self._location_docs
+            if doc.get("title") and len(self._doc_images(doc)) < settings.IMAGE_FALLBACK_THRESHOLD
+        ]
+
+    def rebuild_keyword_index(self, reload_locations: bool = True):
+        """
+        สร้าง keyword -> รูปภาพ ล่วงหน้า (ครั้งเดียวตอนโหลด cache)
+        จาก prefix ของไฟล์รูป + title / ชื่อในวงเล็บ / slug / keywords / image_prefix ของ nan_locations
+        reload_locations=False: ใช้ข้อมูลสถานที่ชุดเดิม (กรณีรูปเปลี่ยนอย่างเดียว)
+        """
+        index = KeywordIndex()
+
+        for prefix, paths in self.prefixed_image_map.items():
+            if not paths:
+                continue
+            images = tuple(paths)
+            index.add(normalize_image_keyword(prefix), images, PRIORITY_IMAGE_PREFIX)
+            for token in _slug_tokens(prefix):
+                index.add(token, images, PRIORITY_TOKEN)
+
+        if reload_locations:
+            locations = self.mongo_manager.get_collection("nan_locations")
+            if locations is not None:
+                try:
+                    self._location_docs = list(locations.find({}, {"title": 1, "slug": 1, "keywords": 1, "image_urls": 1, "metadata.image_prefix": 1}))
+                except Exception as e:
+                    logging.warning(f"⚠️ [ImageService] โหลดชื่อสถานที่สำหรับ keyword index ไม่สำเร็จ: {e}")
+        docs = self._location_docs
+
+        for doc in docs:
+            images = self._doc_images(doc)
+            if not images:
+                continue
+
+            title = doc.get("title") or ""
+            names = [title, re.sub(r"\(.*?\)", "", title)] + re.findall(r"\((.*?)\)", title)
+            names += [doc.get("slug"), (doc.get("metadata") or {}).get("image_prefix")]
+            for name in names:
+                index.add(normalize_image_keyword(name), images, PRIORITY_NAME)
+            for alias in doc.get("keywords") or []:
+                if isinstance(alias, str):
+                    index.add(normalize_image_keyword(alias), images, PRIORITY_ALIAS)
+            for token in _slug_tokens(doc.get("slug")):
+                index.add(token, images, PRIORITY_TOKEN)
+
+        index.build()
+        self.keyword_index = index
+        self.revision += 1
+        logging.info(f"✅ [ImageService] สร้าง keyword index {len(index)} keys จาก {len(docs)} สถานที่")
+
     def find_all_images_by_prefix(self, prefix: str) -> List[str]:
         """ค้นหารูปภาพตาม prefix (Exact Match เท่านั้น)"""
         if not prefix: 
@@ -104,6 +281,10 @@ class ImageService:
             return None
         return random.choice(self.all_image_files)
 
+    def surface_url(self, image_path: str | None, surface: str) -> str | None:
+        """URL ของรูปสำหรับจุดแสดงผลนั้นๆ (เช่น "gallery" -> WebP, "source_card" -> thumbnail)"""
+        return image_derivative_service.surface_url(image_path, surface)
+
     def construct_full_image_url(self, image_path: str | None) -> str | None:
         if not image_path: 
             return None
@@ -117,72 +298,49 @@ class ImageService:
         return image_path
 
 
+    def match_local_images(self, keyword: str) -> List[str]:
+        """หารูปในเครื่อง/DB จาก keyword index (ไม่มี I/O): exact -> contains -> prefix token -> fuzzy"""
+        key = normalize_image_keyword(keyword)
+        if not key:
+            return []
+        match = self.keyword_index.match(key)
+        if match:
+            return list(match[1])
+
+        # สะกดผิดเล็กน้อย: เทียบกับ key ทั้งหมดในหน่วยความจำ (แทน fuzzy full scan ใน MongoDB)
+        close = difflib.get_close_matches(key, self.keyword_index.keys(), n=1, cutoff=0.8)
+        if close:
+            logging.info(f"🎯 [ImageService] Fuzzy '{keyword}' -> '{close[0]}'")
+            return list(self.keyword_index.exact(close[0]))
+        return []
+
+    async def _resolve_image_tag(self, keyword: str) -> List[str]:
+        """หารูปสำหรับ {{IMAGE:keyword}} หนึ่งตัว: keyword index ก่อน แล้วค่อย Google (มี cache ถาวร)"""
+        images = self.match_local_images(keyword)
+        if images:
+            return images
+        try:
+            return await image_search_tool_instance.get_image_urls(f"{keyword} จังหวัดน่าน", max_results=1)
+        except Exception as e:
+            logging.warning(f"การค้นหารูปภาพเพื่อแทรกเนื้อหาล้มเหลวสำหรับ {keyword}: {e}")
+            return []
+
     async def inject_images_into_text(self, text: str) -> str:
         if not text: return ""
-        pattern = r"\{\{IMAGE:\s*(.*?)\}\}"
-        matches = re.findall(pattern, text)
-        
-        for keyword in matches:
-            image_url = None
-            safe_keyword = keyword.replace(" ", "-").lower()
-            
-            # 1. Search in cache (Exact or Partial match on keys)
-            image_found = False
-            for prefix, paths in self.prefixed_image_map.items():
-                if (safe_keyword in prefix.lower() or prefix.lower().replace("-", " ") in keyword.lower()) and paths:
-                    image_url = random.choice(paths)
-                    image_found = True
-                    break
-            
-            # 2. If not found, try to look up in MongoDB (Title -> DB Image URLs -> Slug -> Local Image)
-            if not image_found:
-                try:
-                    # Try to find location by title (Thai name)
-                    doc = await asyncio.to_thread(self.mongo_manager.get_location_by_title, keyword)
-                    if doc:
-                        # 🆕 PRIORITY: Check if DB document has explicit 'image_urls' (Admin overrides)
-                        db_image_urls = doc.get("image_urls", [])
-                        if db_image_urls and isinstance(db_image_urls, list) and len(db_image_urls) > 0:
-                             raw_url = random.choice(db_image_urls)
-                             image_url = self.construct_full_image_url(str(raw_url))
-                             image_found = True
-                             logging.info(f"✅ [ImageService] Found explicit DB URL for '{keyword}': {image_url}")
-
-                        if not image_found:
-                            # If no explicit URLs, try to find images using its slug
-                            slug = doc.get("slug")
-                            image_prefix = doc.get("metadata", {}).get("image_prefix")
-                            
-                            target_prefix = image_prefix or (f"{slug}-" if slug else None)
-                            
-                            if target_prefix:
-                                # Try to find in cache using the looked-up prefix
-                                for prefix, paths in self.prefixed_image_map.items():
-                                    if prefix.startswith(target_prefix) or target_prefix.startswith(prefix):
-                                         if paths:
-                                             image_url = random.choice(paths)
-                                             image_found = True
-                                             logging.info(f"✅ [ImageService] Mapped '{keyword}' -> Slug/Prefix '{target_prefix}' -> Found Local Image")
-                                             break
-                except Exception as e:
-                    logging.warning(f"⚠️ [ImageService] DB Lookup failed for '{keyword}': {e}")
+        keywords = list(dict.fromkeys(IMAGE_TAG_PATTERN.findall(text)))
+        if not keywords:
+            return text
 
-            # 3. Fallback to Google Search
-            if not image_url and not image_found:
-                try:
-                    search_q = f"{keyword} จังหวัดน่าน"
-                    google_urls = await image_search_tool_instance.get_image_urls(search_q, max_results=1)
-                    if google_urls:
-                        image_url = google_urls[0]
-                except Exception as e:
-                    logging.warning(f"การค้นหารูปภาพเพื่อแทรกเนื้อหาล้มเหลวสำหรับ {keyword}: {e}")
-            
-            if image_url:
-                full_url = self.construct_full_image_url(image_url)
-                replacement = f"\n\n![{keyword}]({full_url})\n\n"
-            else:
-                replacement = ""
-            
-            text = re.sub(r"\{\{IMAGE:\s*" + re.escape(keyword) + r"\}\}", replacement, text, count=1)
-        
-        return text
+        # หารูปของทุก tag พร้อมกัน แล้วแทนที่ในรอบเดียว
+        results = await asyncio.gather(*(self._resolve_image_tag(keyword) for keyword in keywords))
+        resolved: Dict[str, List[str]] = dict(zip(keywords, results))
+
+        def replace(match: re.Match) -> str:
+            keyword = match.group(1)
+            images = resolved.get(keyword)
+            if not images:
+                return ""
+            full_url = self.construct_full_image_url(self.surface_url(random.choice(images), "inline"))
+            return f"\n\n![{keyword}]({full_url})\n\n"
+
+        return IMAGE_TAG_PATTERN.sub(replace, text)
@@ -1,13 +1,29 @@
 """
 Image Sync Service - สแกนไฟล์รูปภาพจาก static/images/ และบันทึกลง MongoDB
 ใช้ Exact Match เท่านั้น เพื่อป้องกันการแสดงภาพผิด
+
+Incremental Sync:
+- เอกสารใน image_metadata เก็บ mtime/size ของไฟล์ไว้ด้วย (ใช้เป็น manifest ของโฟลเดอร์)
+- ทุกครั้งที่ sync จะเทียบ snapshot ของโฟลเดอร์ (os.scandir) กับ manifest
+  แล้วเขียนเฉพาะไฟล์ใหม่/เปลี่ยน/ถูกลบ ด้วย bulk_write ครั้งเดียว
+- ImageDirectoryWatcher (watchdog - optional) แจ้งเมื่อไฟล์ในโฟลเดอร์เปลี่ยน เพื่อ sync ทันที
 """
 import os
 import re
+import time
 import logging
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
+from pymongo import UpdateOne, DeleteOne
 from core.database.mongodb_manager import MongoDBManager
+from core.config import settings
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog เป็น optional dependency
+    Observer = None
+    FileSystemEventHandler = object
 
 # Pattern: filename-01.jpg, filename-02.jpg, etc.
 IMAGE_PATTERN = re.compile(r'^(.+)-(\d{2})\.(jpg|jpeg|png|webp)$', re.IGNORECASE)
@@ -17,88 +33,128 @@ class ImageSyncService:
         self.mongo_manager = mongo_manager
         self.collection = mongo_manager.get_collection("image_metadata")
         self.static_images_path = Path(__file__).resolve().parent.parent.parent / "static" / "images"
-    
+
+    def scan_directory(self) -> Dict[str, Dict]:
+        """
+        Snapshot ของไฟล์รูปใน static/images/ (ไม่อ่านเนื้อไฟล์ ใช้ stat จาก scandir)
+        คืนค่า dict ของ url -> {"url", "prefix", "mtime", "size"}
+        """
+        snapshot: Dict[str, Dict] = {}
+
+        if not self.static_images_path.exists():
+            logging.warning(f"⚠️ [ImageSync] ไม่พบโฟลเดอร์ {self.static_images_path}")
+            return snapshot
+
+        with os.scandir(self.static_images_path) as entries:
+            for entry in entries:
+                match = IMAGE_PATTERN.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                url = f"/static/images/{entry.name}"
+                snapshot[url] = {
+                    "url": url,
+                    "prefix": match.group(1) + "-",  # e.g., "krua-huen-horm-"
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size
+                }
+        return snapshot
+
     def scan_images(self) -> Dict[str, List[str]]:
         """
         สแกนไฟล์รูปทั้งหมดใน static/images/
         คืนค่า dict ของ prefix -> list of URLs
         """
         prefix_map: Dict[str, List[str]] = {}
-        
-        if not self.static_images_path.exists():
-            logging.warning(f"⚠️ [ImageSync] ไม่พบโฟลเดอร์ {self.static_images_path}")
-            return prefix_map
-        
-        for filename in os.listdir(self.static_images_path):
-            match = IMAGE_PATTERN.match(filename)
-            if match:
-                prefix = match.group(1) + "-"  # e.g., "krua-huen-horm-"
-                url = f"/static/images/{filename}"
-                
-                if prefix not in prefix_map:
-                    prefix_map[prefix] = []
-                prefix_map[prefix].append(url)
-        
+        for url, entry in self.scan_directory().items():
+            prefix_map.setdefault(entry["prefix"], []).append(url)
+
         # Sort URLs within each prefix (01, 02, 03...)
         for prefix in prefix_map:
             prefix_map[prefix].sort()
-        
+
         logging.info(f"✅ [ImageSync] สแกนพบรูปภาพ {sum(len(v) for v in prefix_map.values())} รูป จาก {len(prefix_map)} prefixes")
         return prefix_map
-    
-    def sync_to_database(self, prefix_map: Dict[str, List[str]]) -> Tuple[int, int]:
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """manifest ที่บันทึกไว้ใน image_metadata: url -> {"url", "prefix", "mtime", "size"}"""
+        docs = self.collection.find({}, {"_id": 0, "url": 1, "prefix": 1, "mtime": 1, "size": 1})
+        return {doc["url"]: doc for doc in docs if doc.get("url")}
+
+    @staticmethod
+    def diff(snapshot: Dict[str, Dict], manifest: Dict[str, Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """เทียบ snapshot กับ manifest คืน (added, changed, removed)"""
+        added, changed = [], []
+        for url, entry in snapshot.items():
+            known = manifest.get(url)
+            if known is None:
+                added.append(entry)
+            elif (known.get("mtime"), known.get("size"), known.get("prefix")) != (entry["mtime"], entry["size"], entry["prefix"]):
+                changed.append(entry)
+        removed = [entry for url, entry in manifest.items() if url not in snapshot]
+        return added, changed, removed
+
+    def sync_to_database(self, added: List[Dict], changed: List[Dict], removed: List[Dict]) -> Tuple[int, int, int]:
         """
-        บันทึกข้อมูลรูปภาพลง MongoDB collection 'image_metadata'
-        คืนค่า (inserted_count, updated_count)
+        เขียนเฉพาะส่วนที่เปลี่ยนลง MongoDB collection 'image_metadata' ด้วย bulk_write ครั้งเดียว
+        คืนค่า (inserted_count, updated_count, deleted_count)
         """
-        if self.collection is None:
-            logging.error("❌ [ImageSync] ไม่สามารถเชื่อมต่อ MongoDB ได้")
-            return (0, 0)
-        
-        inserted = 0
-        updated = 0
-        
-        for prefix, urls in prefix_map.items():
-            for url in urls:
-                # Upsert: update if exists, insert if not
-                result = self.collection.update_one(
-                    {"url": url},
-                    {"$set": {"url": url, "prefix": prefix}},
-                    upsert=True
-                )
-                if result.upserted_id:
-                    inserted += 1
-                elif result.modified_count > 0:
-                    updated += 1
-        
-        logging.info(f"✅ [ImageSync] บันทึกสำเร็จ - ใหม่: {inserted}, อัพเดท: {updated}")
-        return (inserted, updated)
-    
+        operations = [
+            UpdateOne({"url": entry["url"]}, {"$set": entry}, upsert=True)
+            for entry in added + changed
+        ] + [DeleteOne({"url": entry["url"]}) for entry in removed]
+        if not operations:
+            return (0, 0, 0)
+
+        result = self.collection.bulk_write(operations, ordered=False)
+        logging.info(f"✅ [ImageSync] บันทึกสำเร็จ - ใหม่: {result.upserted_count}, อัพเดท: {result.modified_count}, ลบ: {result.deleted_count}")
+        return (result.upserted_count, result.modified_count, result.deleted_count)
+
     def sync_images(self) -> Dict[str, any]:
         """
-        สแกนและบันทึกรูปภาพทั้งหมด
-        คืนค่าสรุปผลการ sync
+        สแกนโฟลเดอร์แล้วบันทึกเฉพาะไฟล์ที่เปลี่ยน (incremental)
+        คืนค่าสรุปผลการ sync + "changes" (added/changed/removed) สำหรับอัปเดต cache ในหน่วยความจำ
         """
-        logging.info("🔄 [ImageSync] เริ่มสแกนและซิงค์รูปภาพ...")
-        
-        prefix_map = self.scan_images()
-        inserted, updated = self.sync_to_database(prefix_map)
-        
+        if self.collection is None:
+            logging.error("❌ [ImageSync] ไม่สามารถเชื่อมต่อ MongoDB ได้")
+            return {"success": False, "total_prefixes": 0, "total_images": 0, "inserted": 0, "updated": 0, "deleted": 0}
+
+        started = time.perf_counter()
+        snapshot = self.scan_directory()
+        added, changed, removed = self.diff(snapshot, self.load_manifest())
+        inserted, updated, deleted = self.sync_to_database(added, changed, removed)
+
+        # สร้างรูปย่อ/WebP ของไฟล์ใหม่และไฟล์ที่เปลี่ยนไว้ล่วงหน้า (ผู้ใช้คนแรกไม่ต้องรอ)
+        variants_generated = 0
+        if settings.IMAGE_VARIANTS_ENABLED and settings.IMAGE_VARIANTS_PREGENERATE and (added or changed):
+            from core.services.image_derivative_service import image_derivative_service
+            variants_generated = image_derivative_service.pregenerate(
+                entry["url"].rsplit("/", 1)[-1] for entry in added + changed
+            )
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logging.info(f"🔄 [ImageSync] {len(snapshot)} รูป: ใหม่ {len(added)}, เปลี่ยน {len(changed)}, ลบ {len(removed)} ({elapsed_ms} ms)")
+
         return {
             "success": True,
-            "total_prefixes": len(prefix_map),
-            "total_images": sum(len(v) for v in prefix_map.values()),
+            "total_prefixes": len({entry["prefix"] for entry in snapshot.values()}),
+            "total_images": len(snapshot),
             "inserted": inserted,
-            "updated": updated
+            "updated": updated,
+            "deleted": deleted,
+            "unchanged": len(snapshot) - len(added) - len(changed),
+            "variants_generated": variants_generated,
+            "elapsed_ms": elapsed_ms,
+            "changes": {"added": added, "changed": changed, "removed": removed}
         }
-    
+
     def get_images_by_prefix(self, prefix: str) -> List[str]:
         """
         ดึง URLs ทั้งหมดที่มี prefix ตรงกัน (Exact Match)
         """
         if not prefix or self.collection is None:
             return []
-        
+
         try:
             docs = list(self.collection.find({"prefix": prefix}))
             urls = [doc["url"] for doc in docs if "url" in doc]
@@ -107,3 +163,50 @@ class ImageSyncService:
         except Exception as e:
             logging.error(f"❌ [ImageSync] เกิดข้อผิดพลาดในการดึงรูป prefix={prefix}: {e}")
             return []
+
+
+class _ImageDirEventHandler(FileSystemEventHandler):
+    def __init__(self, on_change: Callable[[], None]):
+        super().__init__()
+        self.on_change = on_change
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = [getattr(event, "src_path", ""), getattr(event, "dest_path", "")]
+        if any(IMAGE_PATTERN.match(os.path.basename(p)) for p in paths if p):
+            self.on_change()
+
+
+class ImageDirectoryWatcher:
+    """
+    เฝ้าโฟลเดอร์ static/images/ (ต้องติดตั้ง watchdog) แล้วเรียก on_change เมื่อไฟล์รูปถูกเพิ่ม/แก้/ลบ
+    on_change ถูกเรียกจาก thread ของ watchdog -> ผู้เรียกต้องส่งต่อเข้า event loop เอง
+    """
+
+    def __init__(self, path: Path, on_change: Callable[[], None]):
+        self.path = path
+        self.on_change = on_change
+        self._observer = None
+
+    @staticmethod
+    def available() -> bool:
+        return Observer is not None
+
+    def start(self) -> bool:
+        if Observer is None:
+            logging.warning("⚠️ [ImageSync] ไม่ได้ติดตั้ง watchdog - ปิดการติดตามโฟลเดอร์รูปแบบ live")
+            return False
+        if not self.path.exists():
+            return False
+        self._observer = Observer()
+        self._observer.schedule(_ImageDirEventHandler(self.on_change), str(self.path), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        logging.info(f"👀 [ImageSync] ติดตามการเปลี่ยนแปลงใน {self.path}")
+        return True
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
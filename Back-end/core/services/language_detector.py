@@ -14,8 +14,11 @@
 """
 
 import logging
+import re
+from functools import lru_cache
 from typing import Optional, Tuple
-from pathlib import Path
+
+from core.services.prompt_registry import prompt_registry
 
 # Try to import langdetect
 try:
@@ -61,12 +64,37 @@ class LanguageDetector:
         "id": "ms",  # Indonesian is similar to Malay
     }
     
+    # ⚡ ช่วง Unicode ของอักษรแต่ละภาษา (นับตัวอักษรก่อน ไม่ต้องรัน langdetect)
+    SCRIPT_RANGES = (
+        ("th", re.compile(r"[\u0E00-\u0E7F]")),
+        ("hi", re.compile(r"[\u0900-\u097F]")),
+        ("ru", re.compile(r"[\u0400-\u04FF]")),
+        ("ja", re.compile(r"[\u3040-\u30FF]")),   # Hiragana / Katakana
+        ("zh", re.compile(r"[\u4E00-\u9FFF]")),   # CJK Unified Ideographs (ญี่ปุ่นก็ใช้ -> ดู kana ก่อน)
+    )
+    RE_LATIN = re.compile(r"[A-Za-z]")
+    SCRIPT_DOMINANCE = 0.8  # สัดส่วนตัวอักษรขั้นต่ำที่ถือว่าเป็นภาษานั้นแน่นอน
+
     def __init__(self):
-        self.prompts_dir = Path(__file__).parent.parent.parent / "prompts"
-    
+        self.prompts_dir = prompt_registry.prompts_dir
+
+    def detect_by_script(self, text: str) -> Optional[str]:
+        """
+        เดาภาษาจากชนิดตัวอักษร (Thai/CJK/Devanagari/Cyrillic)
+        คืน None ถ้าเป็นอักษรละติน (en/ms แยกด้วยตัวอักษรไม่ได้) หรือผสมหลายชนิดจนไม่ชัด -> ให้ langdetect ตัดสิน
+        """
+        counts = {lang: len(pattern.findall(text)) for lang, pattern in self.SCRIPT_RANGES}
+        if counts["ja"]:
+            counts["ja"] += counts.pop("zh")  # มี kana = ญี่ปุ่น (คันจิเป็นส่วนหนึ่งของภาษาญี่ปุ่น)
+        total = sum(counts.values()) + len(self.RE_LATIN.findall(text))
+        if total == 0:
+            return None
+        lang, count = max(counts.items(), key=lambda item: item[1])
+        return lang if count / total >= self.SCRIPT_DOMINANCE else None
+
     def detect(self, text: str) -> str:
         """
-        ตรวจจับภาษาจาก text
+        ตรวจจับภาษาจาก text (จำผลของข้อความเดิมไว้ - ถูกเรียกซ้ำจาก Prompt, TTS, Analytics)
         ถ้าเจอหลายภาษาผสม (mixed language) → fallback to English
         
         Args:
@@ -77,7 +105,15 @@ class LanguageDetector:
         """
         if not text or len(text.strip()) < 3:
             return self.DEFAULT_LANG
-        
+        return self._detect_cached(" ".join(text.split()))
+
+    @lru_cache(maxsize=2048)
+    def _detect_cached(self, text: str) -> str:
+        script_lang = self.detect_by_script(text)
+        if script_lang:
+            logging.info(f"🌐 [Language] ตรวจพบภาษาจากตัวอักษร: {script_lang}")
+            return script_lang
+
         if not LANGDETECT_AVAILABLE:
             logging.warning("⚠️ langdetect ไม่พร้อมใช้งาน ใช้ภาษาเริ่มต้น")
             return self.DEFAULT_LANG
@@ -182,23 +218,8 @@ class LanguageDetector:
         Returns:
             เนื้อหา prompt
         """
-        # Try requested language first
-        prompt_path = self.prompts_dir / lang_code / f"{prompt_name}.txt"
-        
-        if prompt_path.exists():
-            content = prompt_path.read_text(encoding="utf-8")
-            logging.info(f"📝 [Prompt] โหลดแล้ว: {prompt_path}")
-            return content
-        
-        # Fallback to Thai
-        fallback_path = self.prompts_dir / "th" / f"{prompt_name}.txt"
-        if fallback_path.exists():
-            logging.warning(f"⚠️ [Prompt] ไม่พบ {prompt_path} ใช้ภาษาไทยเป็น fallback")
-            return fallback_path.read_text(encoding="utf-8")
-        
-        # Final fallback - return empty
-        logging.error(f"❌ [Prompt] ไม่พบ prompt สำหรับ: {prompt_name}")
-        return ""
+        # 📝 อ่านจาก Prompt Registry ในหน่วยความจำ (ไม่มีภาษาที่ขอ -> ภาษาไทย)
+        return prompt_registry.get(prompt_name, lang_code)
     
     def is_supported(self, lang_code: str) -> bool:
         """ตรวจสอบว่าภาษาได้รับการสนับสนุน"""
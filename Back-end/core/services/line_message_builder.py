@@ -24,6 +24,8 @@ from linebot.models import (
     PostbackAction,
 )
 
+from core.services.image_derivative_service import image_derivative_service
+
 
 class LineMessageBuilder:
     """Utility class to build LINE messages from RAG Orchestrator responses."""
@@ -34,6 +36,19 @@ class LineMessageBuilder:
     # Base URL for static images (will be set from env or config)
     BASE_URL = os.getenv("LINE_STATIC_BASE_URL", "")
 
+    @staticmethod
+    def _public_url(url: Optional[str], base_url: str) -> Optional[str]:
+        """Make an image URL public HTTPS: keep external URLs, prefix local paths with base_url."""
+        if not url:
+            return None
+        if url.startswith("http://") or url.startswith("https://"):
+            # Already public URL
+            return url.replace("http://", "https://")
+        if url.startswith("/"):
+            # Local path, prepend base_url
+            return f"{base_url}{url}"
+        return None
+
     @staticmethod
     def text_message(text: str, max_length: int = 5000) -> TextSendMessage:
         """
@@ -69,26 +84,33 @@ class LineMessageBuilder:
         )
 
     @staticmethod
-    def image_carousel(image_urls: List[str], max_images: int = 10) -> Optional[TemplateSendMessage]:
+    def image_carousel(
+        image_urls: List[str], max_images: int = 10, thumbnail_urls: Optional[List[Optional[str]]] = None
+    ) -> Optional[TemplateSendMessage]:
         """
         Create an image carousel from a list of image URLs.
         LINE supports up to 10 images in a carousel.
+        thumbnail_urls (same order) are shown in the bubbles; tapping opens the full image.
         """
         if not image_urls:
             return None
 
+        thumbnail_urls = thumbnail_urls or []
         columns = []
-        for url in image_urls[:max_images]:
+        for i, url in enumerate(image_urls[:max_images]):
             if not url:
                 continue
 
             # Ensure HTTPS
             if url.startswith("http://"):
                 url = url.replace("http://", "https://")
+            thumb = (thumbnail_urls[i] if i < len(thumbnail_urls) else None) or url
+            if thumb.startswith("http://"):
+                thumb = thumb.replace("http://", "https://")
 
             columns.append(
                 ImageCarouselColumn(
-                    image_url=url,
+                    image_url=thumb,
                     action=URIAction(label="ดูรูปขยาย", uri=url)
                 )
             )
@@ -338,23 +360,25 @@ class LineMessageBuilder:
         image_gallery = response.get("image_gallery", [])
         if image_gallery and base_url:
             # Convert local URLs to public URLs using base_url (ngrok)
+            # Local images are sent as resized JPEG variants (LINE does not accept WebP,
+            # and previews should not download multi-MB originals)
+            # (thumb variant = preview of a single image and the carousel bubbles)
             public_images = []
+            thumbnails = []
             for url in image_gallery[:10]:
                 if not url:
                     continue
-                if url.startswith("http://") or url.startswith("https://"):
-                    # Already public URL
-                    public_images.append(url.replace("http://", "https://"))
-                elif url.startswith("/"):
-                    # Local path, prepend base_url
-                    public_images.append(f"{base_url}{url}")
+                original = cls._public_url(image_derivative_service.surface_url(url, "line_original"), base_url)
+                if original:
+                    public_images.append(original)
+                    thumbnails.append(cls._public_url(image_derivative_service.surface_url(url, "line_preview"), base_url))
             
             if len(public_images) == 1:
-                img_msg = cls.image_message(public_images[0])
+                img_msg = cls.image_message(public_images[0], thumbnails[0])
                 if img_msg:
                     messages.append(img_msg)
             elif len(public_images) > 1:
-                carousel_msg = cls.image_carousel(public_images)
+                carousel_msg = cls.image_carousel(public_images, thumbnail_urls=thumbnails)
                 if carousel_msg:
                     messages.append(carousel_msg)
 
@@ -4,13 +4,77 @@ News Monitor Service: ดึงข่าวจาก GNews และ DuckDuckGo
 """
 
 import asyncio
+import hashlib
 import logging
+import re
 from typing import List, Dict, Optional
 from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 import aiohttp
 
+from utils.rate_limiter import TokenBucket
+
 logger = logging.getLogger(__name__)
 
+# Rate limit ต่อแหล่งข่าว: (token ต่อวินาที, burst) -> ยิงทุกคีย์เวิร์ดพร้อมกันได้ในรอบเดียว
+# แต่ถ้าเรียกถี่ๆ ติดกันจะถูกจำกัดอัตราโดยอัตโนมัติ
+SOURCE_RATE_LIMITS = {
+    "duckduckgo": (0.5, 8),
+    "gnews": (1.0, 8),
+}
+FETCH_TIMEOUT_SECONDS = 15
+
+# Near-duplicate: SimHash ของหัวข้อข่าว (character 3-gram เพราะภาษาไทยไม่มีช่องว่างคั่นคำ)
+TITLE_SHINGLE_SIZE = 3
+SIMHASH_MAX_DISTANCE = 6   # Hamming distance (จาก 64 bits) ที่ถือว่าเป็นข่าวเดียวกัน
+SIMHASH_MIN_TITLE_CHARS = 20  # หัวข้อสั้นกว่านี้ (ไม่นับช่องว่าง/เครื่องหมาย) ไม่ใช้ SimHash - ข่าวต่างเรื่องชนกันง่าย
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "oc", "ved")
+
+
+def normalize_url(url: str) -> str:
+    """ตัด tracking parameters / fragment / trailing slash ออก เพื่อให้ URL เดียวกันเทียบกันได้ (URL ว่างคืน "")"""
+    if not (url or "").strip():
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith(_TRACKING_PARAMS)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def title_simhash(title: str) -> int:
+    """SimHash 64-bit ของหัวข้อข่าว (character shingles) - หัวข้อสั้นกว่า SIMHASH_MIN_TITLE_CHARS คืน 0 (ไม่เทียบ)"""
+    text = re.sub(r"[\W_]+", "", (title or "").lower())
+    if len(text) < SIMHASH_MIN_TITLE_CHARS:
+        return 0
+    shingles = [text[i:i + TITLE_SHINGLE_SIZE] for i in range(len(text) - TITLE_SHINGLE_SIZE + 1)]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _strip_publisher(title: str, publisher: str) -> str:
+    """
+    GNews ต่อท้ายหัวข้อด้วย ' - ชื่อสำนักข่าว' ทำให้ข่าวเดียวกันจากคนละที่ดูต่างกัน
+    ตัดเฉพาะชื่อสำนักข่าวที่ item ระบุมา (หัวข้อข่าวไทยใช้ " - " คั่นข้อความเองบ่อย เช่น "น่าน - น้ำป่าไหลหลาก...")
+    """
+    title = (title or "").strip()
+    publisher = (publisher or "").strip()
+    if publisher:
+        title = re.sub(rf"\s*[-|–]\s*{re.escape(publisher)}$", "", title).strip()
+    return title
+
 
 class NewsMonitorService:
     """Service สำหรับดึงข่าวเกี่ยวกับจังหวัดน่าน"""
@@ -29,6 +93,9 @@ class NewsMonitorService:
     def __init__(self):
         self.gnews_enabled = True
         self.ddg_enabled = True
+        self._limiters = {
+            source: TokenBucket(rate, capacity) for source, (rate, capacity) in SOURCE_RATE_LIMITS.items()
+        }
         
     async def fetch_duckduckgo(self, keyword: str, max_results: int = 5) -> List[Dict]:
         """
@@ -43,27 +110,30 @@ class NewsMonitorService:
         """
         try:
             from ddgs import DDGS
-            
+
+            def _search() -> List[Dict]:
+                with DDGS() as ddgs:
+                    # ค้นหาข่าว (news)
+                    return list(ddgs.news(
+                        keyword,
+                        region="th-th",
+                        max_results=max_results
+                    ))
+
+            # DDGS เป็น sync I/O -> รันใน thread เพื่อไม่ให้บล็อก event loop
+            news_results = await asyncio.to_thread(_search)
             results = []
-            with DDGS() as ddgs:
-                # ค้นหาข่าว (news)
-                news_results = list(ddgs.news(
-                    keyword,
-                    region="th-th",
-                    max_results=max_results
-                ))
-                
-                for item in news_results:
-                    results.append({
-                        "source": "duckduckgo",
-                        "title": item.get("title", ""),
-                        "body": item.get("body", ""),
-                        "url": item.get("url", ""),
-                        "date": item.get("date", ""),
-                        "image": item.get("image", ""),
-                        "keyword": keyword,
-                        "fetched_at": datetime.now(timezone.utc).isoformat()
-                    })
+            for item in news_results:
+                results.append({
+                    "source": "duckduckgo",
+                    "title": item.get("title", ""),
+                    "body": item.get("body", ""),
+                    "url": item.get("url", ""),
+                    "date": item.get("date", ""),
+                    "image": item.get("image", ""),
+                    "keyword": keyword,
+                    "fetched_at": datetime.now(timezone.utc).isoformat()
+                })
                     
             logger.info(f"✅ [DDG] พบ {len(results)} ข่าวสำหรับ: {keyword}")
             return results
@@ -95,7 +165,8 @@ class NewsMonitorService:
                 max_results=max_results
             )
             
-            news_results = google_news.get_news(keyword)
+            # GNews เป็น sync I/O -> รันใน thread เพื่อไม่ให้บล็อก event loop
+            news_results = await asyncio.to_thread(google_news.get_news, keyword)
             results = []
             
             for item in news_results or []:
@@ -120,43 +191,86 @@ class NewsMonitorService:
             logger.error(f"❌ [GNews] ข้อผิดพลาด: {e}")
             return []
     
+    async def _fetch_limited(self, source: str, keyword: str, max_results: int) -> List[Dict]:
+        """ดึงข่าว 1 คีย์เวิร์ดจาก 1 แหล่ง ผ่าน Token Bucket ของแหล่งนั้น และมี timeout ต่อ request"""
+        fetch = self.fetch_duckduckgo if source == "duckduckgo" else self.fetch_gnews
+        await self._limiters[source].acquire()
+        try:
+            return await asyncio.wait_for(fetch(keyword, max_results=max_results), timeout=FETCH_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ [NewsMonitor] {source} timeout ({FETCH_TIMEOUT_SECONDS}s) สำหรับ: {keyword}")
+            return []
+
+    @staticmethod
+    def deduplicate(news_items: List[Dict]) -> List[Dict]:
+        """
+        ตัดข่าวซ้ำ 2 ชั้น:
+        1. URL เดียวกัน (หลัง normalize ตัด tracking parameters)
+        2. หัวข้อข่าวใกล้เคียงกัน (SimHash Hamming distance <= SIMHASH_MAX_DISTANCE)
+           เช่นข่าวเดียวกันที่ DDG และ GNews ให้ URL ต่างกัน หรือหลายสำนักข่าวลงหัวข้อเดียวกัน
+        """
+        unique = []
+        seen_urls = set()
+        fingerprints = []
+
+        for item in news_items:
+            url_key = normalize_url(item.get("url", ""))
+            if url_key and url_key in seen_urls:
+                continue
+
+            fingerprint = title_simhash(_strip_publisher(item.get("title", ""), item.get("publisher", "")))
+            if fingerprint and any(bin(fingerprint ^ fp).count("1") <= SIMHASH_MAX_DISTANCE for fp in fingerprints):
+                continue
+
+            if url_key:
+                seen_urls.add(url_key)
+            if fingerprint:
+                fingerprints.append(fingerprint)
+            unique.append(item)
+
+        return unique
+
     async def aggregate_news(self, keywords: List[str] = None) -> List[Dict]:
         """
         รวมข่าวจากทุกแหล่ง
+        ยิงทุกคู่ (คีย์เวิร์ด x แหล่งข่าว) พร้อมกันด้วย asyncio.gather
+        เวลาที่ใช้ต่อรอบจึงเท่ากับ request ที่ช้าที่สุดเพียงตัวเดียว (ไม่ใช่ผลรวมของทุกตัว)
         
         Args:
             keywords: รายการคีย์เวิร์ด (ถ้าไม่ระบุใช้ค่าเริ่มต้น)
             
         Returns:
-            List of all news items (deduplicated by URL)
+            List of all news items (deduplicated by URL + near-duplicate title)
         """
         if keywords is None:
             keywords = self.KEYWORDS
-            
-        all_news = []
-        seen_urls = set()
-        
-        for keyword in keywords:
-            # ดึงจาก DuckDuckGo
-            if self.ddg_enabled:
-                ddg_results = await self.fetch_duckduckgo(keyword, max_results=3)
-                for item in ddg_results:
-                    if item["url"] not in seen_urls:
-                        all_news.append(item)
-                        seen_urls.add(item["url"])
-            
-            # ดึงจาก GNews
-            if self.gnews_enabled:
-                gnews_results = await self.fetch_gnews(keyword, max_results=3)
-                for item in gnews_results:
-                    if item["url"] not in seen_urls:
-                        all_news.append(item)
-                        seen_urls.add(item["url"])
-            
-            # หน่วงเวลาเล็กน้อยเพื่อไม่ให้โดน rate limit
-            await asyncio.sleep(0.5)
-        
-        logger.info(f"📰 [NewsMonitor] รวมข่าวทั้งหมด: {len(all_news)} รายการ")
+
+        sources = []
+        if self.ddg_enabled:
+            sources.append("duckduckgo")
+        if self.gnews_enabled:
+            sources.append("gnews")
+
+        started = asyncio.get_running_loop().time()
+        # ลำดับผลลัพธ์คงที่ (คีย์เวิร์ด -> แหล่งข่าว) เหมือนแบบเดิม
+        results = await asyncio.gather(
+            *(self._fetch_limited(source, keyword, 3) for keyword in keywords for source in sources),
+            return_exceptions=True
+        )
+
+        raw_news = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"❌ [NewsMonitor] ดึงข่าวล้มเหลว: {result}")
+                continue
+            raw_news.extend(result)
+
+        all_news = self.deduplicate(raw_news)
+        elapsed = asyncio.get_running_loop().time() - started
+        logger.info(
+            f"📰 [NewsMonitor] รวมข่าวทั้งหมด: {len(all_news)} รายการ "
+            f"(ดิบ {len(raw_news)}, ตัดซ้ำ {len(raw_news) - len(all_news)}) ใช้เวลา {elapsed:.1f}s"
+        )
         return all_news
 
 
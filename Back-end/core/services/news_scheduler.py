@@ -5,6 +5,8 @@ News Scheduler: Background job ที่รันทุก 10 นาที
 
 import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 from typing import Optional, Callable, List, Dict
 from datetime import datetime, timezone
 
@@ -17,6 +19,11 @@ class NewsScheduler:
     ใช้ asyncio task แทน APScheduler เพื่อความเบาและเข้ากับ FastAPI
     """
     
+    # Timeout ของแต่ละสายใน DAG (วินาที)
+    NEWS_BRANCH_TIMEOUT = 180
+    WEATHER_BRANCH_TIMEOUT = 45
+    AIR_QUALITY_BRANCH_TIMEOUT = 45
+    
     def __init__(self, interval_minutes: int = 10):
         self.interval_minutes = interval_minutes
         self.running = False
@@ -29,6 +36,18 @@ class NewsScheduler:
         self._air_quality_service = None
         self._news_analyzer = None
         self._geocoding_service = None
+        self._seen_store = None
+        
+        # สถิติ Incremental Pipeline (LLM calls ที่ประหยัดได้)
+        self.pipeline_stats = {
+            "cycles": 0,
+            "llm_calls": 0,
+            "llm_calls_avoided": 0,
+            "items_fetched": 0,
+            "items_analyzed": 0,
+            "items_skipped": 0,
+            "last_cycle": None,
+        }
         
     async def _load_services(self):
         """Lazy load services"""
@@ -38,12 +57,14 @@ class NewsScheduler:
             from core.services.air_quality_service import air_quality_service
             from core.services.geocoding_service import geocoding_service
             from core.ai_models.news_analyzer_agent import news_analyzer_agent
+            from core.services.news_seen_store import news_seen_store
             
             self._news_service = news_monitor_service
             self._weather_service = weather_service
             self._air_quality_service = air_quality_service
             self._news_analyzer = news_analyzer_agent
             self._geocoding_service = geocoding_service
+            self._seen_store = news_seen_store
     
     def set_alert_callback(self, callback: Callable):
         """ตั้ง callback สำหรับส่ง alert ไป WebSocket"""
@@ -84,66 +105,207 @@ class NewsScheduler:
     async def poll_and_analyze(self) -> List[Dict]:
         """
         ดึงข่าว วิเคราะห์ และส่ง alert
+        
+        แต่ละรอบรันเป็น DAG 3 สายพร้อมกัน (ไม่ขึ้นต่อกัน):
+            news    : ดึงข่าว -> วิเคราะห์ (LLM) -> geocode -> broadcast
+            weather : ดึงสภาพอากาศ -> วิเคราะห์ -> broadcast
+            pm25    : ดึง PM2.5 -> วิเคราะห์ -> broadcast
+        แต่ละสายมี timeout ของตัวเอง และ broadcast alert ทันทีที่สายนั้นเสร็จ
+        (สาย weather ที่ค้างจะไม่ทำให้ alert ข่าวระดับ 5 ช้าไปด้วย) สายที่ล้มเหลว/timeout จะถูกข้าม
+        
         Returns: List of alerts generated
         """
         await self._load_services()
         
-        all_alerts = []
+        run = {
+            "started_at": datetime.now(timezone.utc),
+            "stages": {},     # ชื่อ stage -> วินาที
+            "branches": {},   # ชื่อสาย -> ok | timeout | error
+            "alerts": 0,
+            "high_priority": 0,
+        }
+        cycle_start = time.perf_counter()
         
         logger.info("📰 [NewsScheduler] เริ่มดึงข้อมูล...")
         
         try:
-            # 1. ดึงข่าว
-            news_items = await self._news_service.aggregate_news()
-            logger.info(f"📰 พบข่าว {len(news_items)} รายการ")
-            
-            # 2. วิเคราะห์ข่าว
-            if news_items:
-                analyzed = await self._news_analyzer.analyze_batch(news_items[:10])  # จำกัด 10 ข่าว/รอบ
-                for item in analyzed:
-                    # Geocode สถานที่
-                    if item.get("location_name"):
-                        geo = await self._geocoding_service.geocode(item["location_name"])
-                        if geo:
-                            item["lat"] = geo["lat"]
-                            item["lon"] = geo["lon"]
-                    
-                    all_alerts.append(item)
-            
-            # 3. ดึงและวิเคราะห์สภาพอากาศ
-            weather = await self._weather_service.get_current_weather()
-            if weather:
-                weather_alert = await self._news_analyzer.analyze_weather(weather)
-                if weather_alert:
-                    all_alerts.append(weather_alert)
-            
-            # 4. ดึงและวิเคราะห์ PM2.5 (WAQI API)
-            pm25 = await self._air_quality_service.get_pm25()
-            if pm25:
-                pm25_alert = await self._news_analyzer.analyze_air_quality(pm25)
-                if pm25_alert:
-                    all_alerts.append(pm25_alert)
-            
-            # 5. ส่ง alerts ที่ severity >= 4 ไป WebSocket
-            high_priority_alerts = [a for a in all_alerts if a.get("severity_score", 0) >= 4]
-            
-            if high_priority_alerts and self._alert_callback:
-                for alert in high_priority_alerts:
-                    try:
-                        await self._alert_callback(alert)
-                        logger.info(f"🚨 [NewsScheduler] ส่ง alert: {alert.get('summary', '')[:50]}...")
-                    except Exception as e:
-                        logger.error(f"❌ [NewsScheduler] ส่ง alert ล้มเหลว: {e}")
+            branches = {
+                "news": (self._news_branch(run), self.NEWS_BRANCH_TIMEOUT),
+                "weather": (self._weather_branch(run), self.WEATHER_BRANCH_TIMEOUT),
+                "pm25": (self._air_quality_branch(run), self.AIR_QUALITY_BRANCH_TIMEOUT),
+            }
+            results = await asyncio.gather(
+                *(self._run_branch(run, name, coro, timeout) for name, (coro, timeout) in branches.items())
+            )
+            all_alerts = [alert for branch_alerts in results for alert in branch_alerts]
             
-            # 6. บันทึก alerts ทั้งหมดลง storage (สำหรับ UI)
-            await self._store_alerts(all_alerts)
+            # บันทึก alerts ทั้งหมดลง storage (สำหรับ UI)
+            async with self._stage(run, "store"):
+                await self._store_alerts(all_alerts)
             
-            logger.info(f"✅ [NewsScheduler] เสร็จสิ้น: {len(all_alerts)} alerts, {len(high_priority_alerts)} high priority")
+            run["alerts"] = len(all_alerts)
+            logger.info(
+                f"✅ [NewsScheduler] เสร็จสิ้น: {len(all_alerts)} alerts, {run['high_priority']} high priority "
+                f"({time.perf_counter() - cycle_start:.1f}s, สาย: {run['branches']})"
+            )
             return all_alerts
             
         except Exception as e:
             logger.error(f"❌ [NewsScheduler] poll_and_analyze error: {e}")
             return []
+        finally:
+            run["total_seconds"] = round(time.perf_counter() - cycle_start, 3)
+            await self._record_run(run)
+    
+    @asynccontextmanager
+    async def _stage(self, run: Dict, name: str):
+        """จับเวลาแต่ละ stage ลง run["stages"]"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            run["stages"][name] = round(time.perf_counter() - started, 3)
+    
+    async def _run_branch(self, run: Dict, name: str, coro, timeout: float) -> List[Dict]:
+        """รันหนึ่งสายพร้อม timeout - ล้มเหลวแล้วคืน [] (ผลบางส่วนของสายอื่นยังใช้ได้)"""
+        try:
+            alerts = await asyncio.wait_for(coro, timeout=timeout)
+            run["branches"][name] = "ok"
+            return alerts
+        except asyncio.TimeoutError:
+            run["branches"][name] = "timeout"
+            logger.warning(f"⏱️ [NewsScheduler] สาย '{name}' เกินเวลา {timeout}s - ข้ามไปก่อน")
+        except Exception as e:
+            run["branches"][name] = "error"
+            logger.error(f"❌ [NewsScheduler] สาย '{name}' ล้มเหลว: {e}")
+        return []
+    
+    async def _news_branch(self, run: Dict) -> List[Dict]:
+        # 1. ดึงข่าว
+        async with self._stage(run, "news.fetch"):
+            news_items = await self._news_service.aggregate_news()
+        logger.info(f"📰 พบข่าว {len(news_items)} รายการ")
+        
+        # 2. วิเคราะห์เฉพาะข่าวใหม่/ข่าวที่เนื้อหาเปลี่ยน (ข่าวเดิมถูกบันทึกเป็น alert ไปแล้วในรอบก่อน จึงไม่ส่งซ้ำ)
+        async with self._stage(run, "news.analyze"):
+            analyzed = await self._analyze_incremental(news_items)
+        
+        # 3. Geocode สถานที่ (Gazetteer/Cache เท่านั้น ไม่รอ Nominatim - ชื่อใหม่จะถูก geocode ใน background)
+        async with self._stage(run, "news.geocode"):
+            geos = await asyncio.gather(*(
+                self._geocoding_service.lookup(item["location_name"]) if item.get("location_name") else asyncio.sleep(0)
+                for item in analyzed
+            ))
+            for item, geo in zip(analyzed, geos):
+                if geo:
+                    item["lat"] = geo["lat"]
+                    item["lon"] = geo["lon"]
+        
+        async with self._stage(run, "news.broadcast"):
+            await self._broadcast(run, analyzed)
+        return analyzed
+    
+    async def _weather_branch(self, run: Dict) -> List[Dict]:
+        async with self._stage(run, "weather.fetch"):
+            weather = await self._weather_service.get_current_weather()
+        if not weather:
+            return []
+        async with self._stage(run, "weather.analyze"):
+            weather_alert = await self._news_analyzer.analyze_weather(weather)
+        alerts = [weather_alert] if weather_alert else []
+        await self._broadcast(run, alerts)
+        return alerts
+    
+    async def _air_quality_branch(self, run: Dict) -> List[Dict]:
+        # PM2.5 (WAQI API)
+        async with self._stage(run, "pm25.fetch"):
+            pm25 = await self._air_quality_service.get_pm25()
+        if not pm25:
+            return []
+        async with self._stage(run, "pm25.analyze"):
+            pm25_alert = await self._news_analyzer.analyze_air_quality(pm25)
+        alerts = [pm25_alert] if pm25_alert else []
+        await self._broadcast(run, alerts)
+        return alerts
+    
+    async def _broadcast(self, run: Dict, alerts: List[Dict]):
+        """ส่ง alerts ที่ severity >= 4 ไป WebSocket"""
+        high_priority_alerts = [a for a in alerts if a.get("severity_score", 0) >= 4]
+        run["high_priority"] += len(high_priority_alerts)
+        
+        if not (high_priority_alerts and self._alert_callback):
+            return
+        for alert in high_priority_alerts:
+            try:
+                await self._alert_callback(alert)
+                logger.info(f"🚨 [NewsScheduler] ส่ง alert: {alert.get('summary', '')[:50]}...")
+            except Exception as e:
+                logger.error(f"❌ [NewsScheduler] ส่ง alert ล้มเหลว: {e}")
+    
+    async def _record_run(self, run: Dict):
+        """บันทึกเวลาแต่ละ stage ของรอบนี้ลง MongoDB (ดูแนวโน้มย้อนหลัง)"""
+        try:
+            from core.services.alert_storage_service import alert_storage_service
+            await alert_storage_service.save_pipeline_run(run)
+        except Exception as e:
+            logger.error(f"❌ [NewsScheduler] บันทึกสถิติรอบล้มเหลว: {e}")
+    
+    async def _analyze_incremental(self, news_items: List[Dict]) -> List[Dict]:
+        """
+        ส่งให้ LLM เฉพาะข่าวที่ยังไม่เคยเห็น หรือเนื้อหาเปลี่ยน (1 Gemini call/รอบ เท่าเดิม)
+        ข่าวที่ค้างเกิน BATCH_SIZE จะถูกวิเคราะห์ในรอบถัดไป เพราะยังไม่ถูกบันทึกว่าเห็นแล้ว
+        """
+        cycle = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "fetched": len(news_items),
+            "new": 0,
+            "changed": 0,
+            "unchanged": 0,
+            "analyzed": 0,
+            "llm_calls": 0,
+            "llm_calls_avoided": 0,
+        }
+
+        if news_items:
+            split = await self._seen_store.partition(news_items)
+            cycle.update(new=split["new"], changed=split["changed"], unchanged=split["unchanged"])
+            batch = split["pending"][:self._news_analyzer.BATCH_SIZE]
+        else:
+            batch = []
+
+        analyzed = []
+        if batch:
+            cycle["llm_calls"] = 1
+            cycle["analyzed"] = len(batch)
+            try:
+                analyzed = await self._news_analyzer.analyze_batch(batch, raise_on_error=True)
+                await self._seen_store.record(batch, analyzed)
+            except Exception as e:
+                # ไม่บันทึกว่าเห็นแล้ว -> รอบหน้าจะวิเคราะห์ใหม่
+                logger.error(f"❌ [NewsScheduler] วิเคราะห์ข่าวล้มเหลว: {e}")
+                analyzed = []
+        elif news_items:
+            # แบบเดิมจะเรียก Gemini ทุกรอบที่มีข่าว แม้ข่าวจะซ้ำทั้งหมด
+            cycle["llm_calls_avoided"] = 1
+
+        stats = self.pipeline_stats
+        stats["cycles"] += 1
+        stats["llm_calls"] += cycle["llm_calls"]
+        stats["llm_calls_avoided"] += cycle["llm_calls_avoided"]
+        stats["items_fetched"] += cycle["fetched"]
+        stats["items_analyzed"] += cycle["analyzed"]
+        stats["items_skipped"] += cycle["unchanged"]
+        stats["last_cycle"] = cycle
+
+        logger.info(
+            f"🧮 [NewsScheduler] ข่าว {cycle['fetched']} รายการ: ใหม่ {cycle['new']}, เปลี่ยน {cycle['changed']}, "
+            f"ซ้ำ {cycle['unchanged']} -> LLM calls {cycle['llm_calls']} (ประหยัด {cycle['llm_calls_avoided']})"
+        )
+        return analyzed
+    
+    def get_pipeline_stats(self) -> Dict:
+        """สถิติ Incremental Pipeline สำหรับ API"""
+        return dict(self.pipeline_stats)
     
     async def _store_alerts(self, alerts: List[Dict]):
         """บันทึก alerts ลง MongoDB"""
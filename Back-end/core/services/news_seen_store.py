@@ -0,0 +1,170 @@
+# /core/services/news_seen_store.py
+"""
+News Seen Store: จำข่าวที่เคยวิเคราะห์แล้ว (MongoDB + TTL)
+- key = URL (normalize แล้ว), เทียบ content hash เพื่อตรวจว่าเนื้อหาข่าวเปลี่ยนหรือไม่
+- ข่าวที่เคยเห็นและเนื้อหาไม่เปลี่ยน -> ไม่ต้องส่งให้ LLM วิเคราะห์ซ้ำ
+- เก็บผลวิเคราะห์ไว้ด้วย เพื่อดึงกลับมาแสดงได้โดยไม่ต้องเรียก Gemini ใหม่
+ใช้ shared AsyncMongoClient (core/database/async_mongo.py) ไม่บล็อก event loop และไม่เปิด connection pool ซ้ำ
+"""
+
+import hashlib
+import logging
+import re
+from typing import Dict, List
+from datetime import datetime, timezone, timedelta
+
+from pymongo import UpdateOne
+
+from core.database.async_mongo import get_async_db
+from core.services.news_monitor_service import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class NewsSeenStore:
+    """Service สำหรับเก็บข่าวที่เห็นแล้ว + ผลวิเคราะห์ใน MongoDB"""
+
+    COLLECTION_NAME = "news_seen_items"
+    TTL_DAYS = 7  # ข่าวที่ไม่ถูกดึงมาอีกเลยเกิน 7 วันจะถูกลบอัตโนมัติ
+
+    def __init__(self):
+        self._collection = None
+
+    async def _get_collection(self):
+        """Lazy load MongoDB collection"""
+        if self._collection is None:
+            self._collection = get_async_db()[self.COLLECTION_NAME]
+            await self._ensure_indexes()
+        return self._collection
+
+    async def _ensure_indexes(self):
+        try:
+            # TTL: ลบเมื่อ expires_at ถึง (ต่ออายุทุกครั้งที่เห็นข่าวนี้อีก)
+            await self._collection.create_index("expires_at", expireAfterSeconds=0)
+            await self._collection.create_index([("is_relevant", 1), ("analyzed_at", -1)])
+            logger.info("✅ [NewsSeenStore] สร้าง indexes เรียบร้อย")
+        except Exception as e:
+            logger.error(f"❌ [NewsSeenStore] สร้าง indexes ล้มเหลว: {e}")
+
+    @staticmethod
+    def item_key(item: Dict) -> str:
+        return normalize_url(item.get("url", "")) or item.get("title", "")
+
+    @staticmethod
+    def content_hash(item: Dict) -> str:
+        """hash ของหัวข้อ + เนื้อหา (ตัดช่องว่างออก) ใช้ตรวจว่าข่าวเดิมถูกแก้ไขหรือไม่"""
+        text = f"{item.get('title', '')}\n{item.get('body', '')}"
+        text = re.sub(r"\s+", " ", text).strip().lower()
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    async def partition(self, news_items: List[Dict]) -> Dict:
+        """
+        แยกข่าวเป็น ข่าวใหม่/ข่าวที่เนื้อหาเปลี่ยน (ต้องวิเคราะห์) กับ ข่าวที่เคยวิเคราะห์แล้ว
+
+        Returns:
+            {"pending": [...], "new": n, "changed": n, "unchanged": n}
+        """
+        result = {"pending": list(news_items), "new": len(news_items), "changed": 0, "unchanged": 0}
+        collection = await self._get_collection()
+        if collection is None or not news_items:
+            return result
+
+        keys = [self.item_key(item) for item in news_items]
+        try:
+            docs = {doc["_id"]: doc async for doc in collection.find({"_id": {"$in": keys}})}
+        except Exception as e:
+            logger.error(f"❌ [NewsSeenStore] อ่านข้อมูลล้มเหลว: {e}")
+            return result
+
+        pending = []
+        new_count = changed_count = 0
+        for key, item in zip(keys, news_items):
+            doc = docs.get(key)
+            if doc is None:
+                new_count += 1
+                pending.append(item)
+            elif doc.get("content_hash") != self.content_hash(item):
+                changed_count += 1
+                pending.append(item)
+
+        await self._touch([k for k in keys if k in docs])
+        return {
+            "pending": pending,
+            "new": new_count,
+            "changed": changed_count,
+            "unchanged": len(news_items) - new_count - changed_count,
+        }
+
+    async def _touch(self, keys: List[str]):
+        """ต่ออายุ TTL ของข่าวที่ยังถูกดึงมาเจออยู่"""
+        if not keys:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            await self._collection.update_many(
+                {"_id": {"$in": keys}},
+                {"$set": {"last_seen_at": now, "expires_at": now + timedelta(days=self.TTL_DAYS)}}
+            )
+        except Exception as e:
+            logger.error(f"❌ [NewsSeenStore] ต่ออายุข่าวล้มเหลว: {e}")
+
+    async def record(self, analyzed_items: List[Dict], results: List[Dict]):
+        """
+        บันทึกข่าวที่ส่งให้ LLM วิเคราะห์แล้ว พร้อมผลลัพธ์
+        (ข่าวที่ LLM บอกว่าไม่เกี่ยวข้องจะถูกบันทึกด้วย analysis=None เพื่อไม่ต้องวิเคราะห์ซ้ำ)
+        """
+        collection = await self._get_collection()
+        if collection is None or not analyzed_items:
+            return
+
+        by_url = {normalize_url(r.get("original_url", "")): r for r in results}
+        now = datetime.now(timezone.utc)
+        operations = []
+        for item in analyzed_items:
+            key = self.item_key(item)
+            analysis = by_url.get(normalize_url(item.get("url", "")))
+            operations.append(UpdateOne(
+                {"_id": key},
+                {
+                    "$set": {
+                        "title": item.get("title", ""),
+                        "source": item.get("source", ""),
+                        "content_hash": self.content_hash(item),
+                        "analysis": analysis,
+                        "is_relevant": analysis is not None,
+                        "analyzed_at": now,
+                        "last_seen_at": now,
+                        "expires_at": now + timedelta(days=self.TTL_DAYS),
+                    },
+                    "$setOnInsert": {"first_seen_at": now},
+                },
+                upsert=True
+            ))
+
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"❌ [NewsSeenStore] บันทึกข่าวล้มเหลว: {e}")
+
+    async def get_cached_analyses(self, limit: int = 20, min_severity: int = 1) -> List[Dict]:
+        """ดึงผลวิเคราะห์ข่าวที่ยังไม่หมดอายุ (valid_until) กลับมาแสดงโดยไม่ต้องเรียก LLM"""
+        collection = await self._get_collection()
+        if collection is None:
+            return []
+
+        now_iso = datetime.now(timezone.utc).isoformat()
+        query = {
+            "is_relevant": True,
+            "analysis.severity_score": {"$gte": min_severity},
+            "analysis.valid_until": {"$gte": now_iso},
+        }
+        try:
+            docs = await collection.find(query, {"analysis": 1}).sort("analyzed_at", -1).limit(limit).to_list(length=None)
+            return [doc["analysis"] for doc in docs]
+        except Exception as e:
+            logger.error(f"❌ [NewsSeenStore] ดึงผลวิเคราะห์ล้มเหลว: {e}")
+            return []
+
+
+# Singleton instance
+news_seen_store = NewsSeenStore()
@@ -0,0 +1,116 @@
+# Back-end/core/services/prompt_registry.py
+"""
+📝 Prompt Registry
+โหลด prompt ทุกไฟล์ใน prompts/<lang>/<name>.txt เข้าหน่วยความจำครั้งเดียว (แทนการอ่านดิสก์ทุก request)
+
+- มี watchdog: แก้ไฟล์ prompt แล้วโหลดใหม่อัตโนมัติ (ไม่ต้อง restart)
+- ไม่มี watchdog: เช็ค mtime ของโฟลเดอร์ทุก PROMPT_RELOAD_CHECK_SECONDS แทน
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog เป็น optional dependency
+    Observer = None
+    FileSystemEventHandler = object
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent.parent / "prompts"
+FALLBACK_LANG = "th"
+
+
+class _PromptDirEventHandler(FileSystemEventHandler):
+    def __init__(self, registry: "PromptRegistry"):
+        self.registry = registry
+
+    def on_any_event(self, event):
+        if not event.is_directory and str(getattr(event, "src_path", "")).endswith(".txt"):
+            self.registry.invalidate()
+
+
+class PromptRegistry:
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._templates: Dict[Tuple[str, str], str] = {}
+        self._loaded = False
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._observer = None
+        self.reloads = 0
+
+    def _snapshot(self) -> Tuple:
+        """(path, mtime) ของไฟล์ prompt ทั้งหมด - ใช้ตรวจว่ามีไฟล์เปลี่ยนเมื่อไม่มี watchdog"""
+        if not self.prompts_dir.exists():
+            return ()
+        return tuple(sorted((str(p), p.stat().st_mtime_ns) for p in self.prompts_dir.glob("*/*.txt")))
+
+    def reload(self):
+        templates = {}
+        for path in self.prompts_dir.glob("*/*.txt"):
+            templates[(path.stem, path.parent.name)] = path.read_text(encoding="utf-8")
+        with self._lock:
+            self._templates = templates
+            self._signature = self._snapshot()
+            self._checked_at = time.monotonic()
+            self._loaded = True
+            self.reloads += 1
+        logging.info(f"📝 [Prompt] โหลด prompt {len(templates)} ไฟล์จาก {self.prompts_dir}")
+
+    def invalidate(self):
+        """ให้ get() ครั้งถัดไปโหลดใหม่ (เรียกจาก thread ของ watchdog ได้)"""
+        self._loaded = False
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            self.reload()
+            return
+        if self._observer is not None:
+            return
+        if time.monotonic() - self._checked_at < settings.PROMPT_RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+        if self._snapshot() != self._signature:
+            logging.info("🔄 [Prompt] ไฟล์ prompt เปลี่ยน กำลังโหลดใหม่...")
+            self.reload()
+
+    def get(self, prompt_name: str, lang_code: str) -> str:
+        """prompt ตามภาษา (ไม่มี -> ภาษาไทย, ไม่มีเลย -> "")"""
+        self._ensure_fresh()
+        templates = self._templates
+        content = templates.get((prompt_name, lang_code))
+        if content is not None:
+            return content
+
+        content = templates.get((prompt_name, FALLBACK_LANG))
+        if content is not None:
+            logging.warning(f"⚠️ [Prompt] ไม่พบ {lang_code}/{prompt_name}.txt ใช้ภาษาไทยเป็น fallback")
+            return content
+
+        logging.error(f"❌ [Prompt] ไม่พบ prompt สำหรับ: {prompt_name}")
+        return ""
+
+    def start_watching(self) -> bool:
+        if Observer is None or not self.prompts_dir.exists() or self._observer is not None:
+            return False
+        self._observer = Observer()
+        self._observer.schedule(_PromptDirEventHandler(self), str(self.prompts_dir), recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        logging.info(f"👀 [Prompt] ติดตามการเปลี่ยนแปลงใน {self.prompts_dir}")
+        return True
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+
+prompt_registry = PromptRegistry()
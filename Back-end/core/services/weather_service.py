@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 import aiohttp
 
 from core.config import settings
+from utils.ttl_cache import SWRCache
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +33,15 @@ class WeatherService:
         # ใช้ค่าจาก settings หรือ environment variables
         self.openweather_api_key = getattr(settings, 'OPENWEATHER_API_KEY', None)
         self.tmd_api_key = getattr(settings, 'TMD_API_KEY', None)
+        self._cache = SWRCache(settings.WEATHER_CACHE_TTL_SECONDS, settings.CONDITIONS_STALE_SECONDS)
+        
+    @staticmethod
+    def _cache_key(lat: float, lon: float) -> str:
+        return f"{round(lat, 2)},{round(lon, 2)}"
         
     async def get_current_weather(self, lat: float = None, lon: float = None) -> Optional[Dict]:
         """
-        ดึงสภาพอากาศปัจจุบัน
+        ดึงสภาพอากาศปัจจุบัน (ผ่าน cache แบบ Stale-While-Revalidate)
         
         Args:
             lat: ละติจูด (default: น่าน)
@@ -46,7 +52,22 @@ class WeatherService:
         """
         lat = lat or self.NAN_LAT
         lon = lon or self.NAN_LON
-        
+        return await self._cache.get(self._cache_key(lat, lon), lambda: self._fetch_current_weather(lat, lon))
+    
+    def get_cached_weather(self, lat: float = None, lon: float = None) -> Optional[Dict]:
+        """
+        อ่านสภาพอากาศจาก cache อย่างเดียว (ไม่รอ network) สำหรับตอบแชท
+        ถ้าข้อมูลเก่า/ยังไม่มี จะสั่งโหลดใหม่ใน background ให้รอบถัดไป
+        """
+        lat = lat or self.NAN_LAT
+        lon = lon or self.NAN_LON
+        return self._cache.peek(self._cache_key(lat, lon), lambda: self._fetch_current_weather(lat, lon))
+    
+    def get_cache_stats(self) -> Dict:
+        return self._cache.get_stats()
+    
+    async def _fetch_current_weather(self, lat: float, lon: float) -> Optional[Dict]:
+        """ดึงจาก API จริง: TMD ก่อน แล้ว fallback ไป OpenWeatherMap"""
         # ลอง TMD ก่อน
         if self.tmd_api_key:
             result = await self._fetch_tmd(lat, lon)
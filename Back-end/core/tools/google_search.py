@@ -73,14 +73,20 @@ class GoogleSearchTool:
         logging.info(f"✅ [GoogleSearch] Found {len(search_results)} web results.")
         return search_results
 
-    def search_images(self, query: str, max_results: int = 5) -> List[GoogleSearchResult]:
-        """Performs an image search."""
+    def search_images(self, query: str, max_results: int = 5, raise_on_error: bool = False) -> List[GoogleSearchResult]:
+        """
+        Performs an image search.
+        raise_on_error=True raises RuntimeError when the API call itself fails, so callers
+        can tell "no results" (empty list, safe to cache) apart from an outage/quota error.
+        """
         logging.info(f"🖼️ [GoogleSearch] Searching images for: '{query}'")
         # Google Image Search API returns max 10 results per request
         num_to_request = min(max_results, 10) 
         
         raw_results = self._execute_search(query, search_type='image', num_results=num_to_request)
 
+        if raw_results is None and raise_on_error:
+            raise RuntimeError("Google image search request failed.")
         if not raw_results or 'items' not in raw_results:
             logging.warning("[GoogleSearch] No image results found or API error.")
             return []
@@ -2,33 +2,187 @@
 
 import asyncio
 import logging
-from typing import List
-from core.tools.google_search import google_search_instance 
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from core.config import settings
+from core.tools.google_search import google_search_instance
+from core.database.async_mongo import get_async_db
+
+try:
+    # โควต้า Google CSE รีเซ็ตตอนเที่ยงคืนเวลาแปซิฟิก
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except ZoneInfoNotFoundError:  # เครื่องที่ไม่มี tzdata
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
 
 class ImageSearchTool:
+    # Persistent cache (MongoDB + TTL): คำค้นเดิมไม่ต้องเรียก Google CSE ซ้ำ (โควต้าจำกัดต่อวัน)
+    CACHE_COLLECTION = "image_search_cache"
+    QUOTA_COLLECTION = "image_search_quota"
+    CACHE_TTL_DAYS = 30
+    NEGATIVE_CACHE_TTL_DAYS = 3  # คำค้นที่ Google ไม่มีผล -> จำไว้สั้นกว่า แล้วค่อยลองใหม่
+
     def __init__(self):
         logging.info("🛠️ Image Search Tool initialized.")
         self.search_tool = google_search_instance
+        self._cache_collection = None
+        self._quota_collection = None
+        self.stats = {"cache_hits": 0, "negative_hits": 0, "google_calls": 0, "google_errors": 0, "quota_skips": 0}
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+    @staticmethod
+    def _quota_day() -> str:
+        return datetime.now(QUOTA_TZ).strftime("%Y-%m-%d")
+
+    async def _get_cache_collection(self):
+        """Lazy load cache collection + TTL index"""
+        if self._cache_collection is None:
+            collection = get_async_db()[self.CACHE_COLLECTION]
+            try:
+                await collection.create_index("expires_at", expireAfterSeconds=0)
+            except Exception as e:
+                logging.warning(f"⚠️ [ImageTool] สร้าง TTL index ล้มเหลว: {e}")
+            self._cache_collection = collection
+        return self._cache_collection
+
+    async def _get_quota_collection(self):
+        """Lazy load quota collection (1 เอกสารต่อวัน ลบเองหลัง 7 วัน)"""
+        if self._quota_collection is None:
+            collection = get_async_db()[self.QUOTA_COLLECTION]
+            try:
+                await collection.create_index("created_at", expireAfterSeconds=7 * 24 * 3600)
+            except Exception as e:
+                logging.warning(f"⚠️ [ImageTool] สร้าง TTL index ของ quota ล้มเหลว: {e}")
+            self._quota_collection = collection
+        return self._quota_collection
+
+    # ====== Cache ======
+
+    async def _get_cached_doc(self, key: str) -> Optional[Dict]:
+        try:
+            collection = await self._get_cache_collection()
+            doc = await collection.find_one({"_id": key})
+        except Exception as e:
+            logging.warning(f"⚠️ [ImageTool] อ่าน cache ล้มเหลว: {e}")
+            return None
+        # TTL monitor ของ MongoDB ลบทุก ~60 วินาที -> เช็คเวลาหมดอายุเองด้วย
+        expires_at = doc.get("expires_at") if doc else None
+        if expires_at is not None and expires_at.replace(tzinfo=expires_at.tzinfo or timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return doc
+
+    async def _get_cached(self, key: str, max_results: int) -> Optional[List[str]]:
+        doc = await self._get_cached_doc(key)
+        # ใช้ได้ถ้าเคยค้นด้วยจำนวนที่มากพอ (หรือ Google มีผลแค่นั้นจริง / ไม่มีผลเลย)
+        if doc and (doc.get("requested", 0) >= max_results or len(doc.get("urls", [])) >= max_results):
+            return doc["urls"][:max_results]
+        return None
+
+    async def is_cached(self, query: str, max_results: int) -> bool:
+        return await self._get_cached(self._cache_key(query), max_results) is not None
+
+    async def _store_cached(self, key: str, urls: List[str], max_results: int):
+        now = datetime.now(timezone.utc)
+        ttl_days = self.CACHE_TTL_DAYS if urls else self.NEGATIVE_CACHE_TTL_DAYS
+        try:
+            collection = await self._get_cache_collection()
+            await collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "urls": urls,
+                    "requested": max_results,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(days=ttl_days)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logging.warning(f"⚠️ [ImageTool] บันทึก cache ล้มเหลว: {e}")
+
+    # ====== Daily Quota ======
+
+    async def _reserve_quota(self) -> bool:
+        """
+        จองโควต้า 1 call ของวันนี้แบบ atomic (ใช้ร่วมกันทุก worker)
+        คืน False ถ้าครบ GOOGLE_CSE_DAILY_QUOTA แล้ว (ถ้า MongoDB ใช้ไม่ได้ -> ยอมให้เรียก)
+        """
+        day = self._quota_day()
+        try:
+            collection = await self._get_quota_collection()
+            await collection.find_one_and_update(
+                {"_id": day, "calls": {"$lt": settings.GOOGLE_CSE_DAILY_QUOTA}},
+                {"$inc": {"calls": 1}, "$setOnInsert": {"created_at": datetime.now(timezone.utc)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            # เอกสารของวันนี้มีอยู่แล้วแต่ calls >= quota -> upsert ชน _id
+            return False
+        except Exception as e:
+            logging.warning(f"⚠️ [ImageTool] ตรวจโควต้าล้มเหลว: {e}")
+            return True
+
+    async def get_quota_usage(self) -> Dict:
+        day = self._quota_day()
+        used = 0
+        try:
+            collection = await self._get_quota_collection()
+            doc = await collection.find_one({"_id": day})
+            used = (doc or {}).get("calls", 0)
+        except Exception as e:
+            logging.warning(f"⚠️ [ImageTool] อ่านโควต้าล้มเหลว: {e}")
+        limit = settings.GOOGLE_CSE_DAILY_QUOTA
+        return {"day": day, "used": used, "limit": limit, "remaining": max(limit - used, 0)}
+
+    # ====== Search ======
 
     async def get_image_urls(self, query: str, max_results: int = 3) -> List[str]:
         """
         ค้นหารูปภาพจาก Google แบบ Async (ผ่าน to_thread)
-        และคืนค่าเป็น List ของ URL เท่านั้น
+        และคืนค่าเป็น List ของ URL เท่านั้น (อ่านจาก cache ก่อนถ้าเคยค้นคำนี้แล้ว รวมถึงคำที่เคยค้นแล้วไม่เจอ)
         """
+        key = self._cache_key(query)
+        cached = await self._get_cached(key, max_results)
+        if cached is not None:
+            self.stats["cache_hits" if cached else "negative_hits"] += 1
+            logging.info(f"⚡ [ImageTool] Cache hit for: '{query}' ({len(cached)} images)")
+            return cached
+
+        if not await self._reserve_quota():
+            self.stats["quota_skips"] += 1
+            logging.warning(f"⚠️ [ImageTool] โควต้า Google CSE วันนี้หมดแล้ว - ข้าม '{query}'")
+            return []
+
         logging.info(f"🖼️ [ImageTool] Searching Google Images for: '{query}'")
         try:
+            self.stats["google_calls"] += 1
             google_results = await asyncio.to_thread(
                 self.search_tool.search_images,
                 query=query,
-                max_results=max_results
+                max_results=max_results,
+                raise_on_error=True
             )
-            
+
             image_urls = [img.image_url for img in google_results if img.image_url]
             logging.info(f"✅ [ImageTool] Found {len(image_urls)} images.")
+            # เก็บทั้งผลที่เจอและไม่เจอ (negative cache) - แต่ไม่เก็บกรณี API error
+            await self._store_cached(key, image_urls, max_results)
             return image_urls
 
         except Exception as e:
+            self.stats["google_errors"] += 1
             logging.error(f"❌ [ImageTool] Error during Google Image Search: {e}", exc_info=True)
             return []
 
-image_search_tool_instance = ImageSearchTool()
\ No newline at end of file
+    async def get_stats(self) -> Dict:
+        return {**self.stats, "quota": await self.get_quota_usage()}
+
+image_search_tool_instance = ImageSearchTool()
@@ -0,0 +1,173 @@
+"""
+Benchmark Inference Backend: torch (fp32) vs onnx vs onnx-int8
+
+วัดผลบนข้อมูลสถานที่จริงของเรา (core/database/data/_processed/*.jsonl):
+- Latency: encode คำค้นทีละข้อความ (เหมือน traffic จริง) p50/p95, encode corpus ทั้งหมด, rerank
+- Memory: Peak RSS ของ process ที่โหลดโมเดล (แต่ละ backend รันใน subprocess แยก)
+- Recall: Recall@K ของการค้นหาด้วยชื่อสถานที่ และ Overlap@K เทียบกับ fp32 baseline
+- Re-ranker: อัตราที่อันดับ 1 ตรงกับ fp32 baseline
+
+วิธีใช้:
+    python scripts/benchmark_inference_backends.py
+    python scripts/benchmark_inference_backends.py --backends torch onnx-int8 --top-k 5
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import resource
+import multiprocessing as mp
+
+import numpy as np
+
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+DEFAULT_DATA_DIR = os.path.join(backend_dir, 'core', 'database', 'data', '_processed')
+
+
+def load_corpus(data_dir: str) -> list:
+    items = []
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".jsonl"):
+            continue
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(item, dict) and item.get("title"):
+                    items.append(item)
+    return items
+
+
+def _run_backend(backend: str, passages: list, queries: list, rerank_pairs: list, result_queue):
+    """รันใน subprocess เพื่อให้วัด Peak RSS ของแต่ละ backend ได้แยกกัน"""
+    from core.ai_models.model_loader import load_embedding_model, load_reranker_model
+
+    result = {"backend": backend}
+
+    t0 = time.perf_counter()
+    embedder = load_embedding_model(backend, allow_remote=False)
+    reranker = load_reranker_model(backend, allow_remote=False)
+    result["load_seconds"] = time.perf_counter() - t0
+
+    # encode corpus (batch) - ใช้ตอน import
+    t0 = time.perf_counter()
+    doc_vectors = embedder.encode(passages, batch_size=32, normalize_embeddings=True, show_progress_bar=False)
+    result["corpus_encode_seconds"] = time.perf_counter() - t0
+
+    # encode คำค้นทีละข้อความ - ใช้ตอนตอบคำถาม
+    embedder.encode(queries[0], normalize_embeddings=True)  # warm-up
+    latencies = []
+    query_vectors = []
+    for q in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(embedder.encode(q, normalize_embeddings=True))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    result["query_p50_ms"] = float(np.percentile(latencies, 50))
+    result["query_p95_ms"] = float(np.percentile(latencies, 95))
+
+    # rerank (ชุดละ QDRANT_TOP_K คู่ เหมือน pipeline จริง)
+    rerank_latencies = []
+    rerank_scores = []
+    for pairs in rerank_pairs:
+        t0 = time.perf_counter()
+        rerank_scores.append(np.asarray(reranker.predict(pairs, show_progress_bar=False)).tolist())
+        rerank_latencies.append((time.perf_counter() - t0) * 1000)
+    result["rerank_p50_ms"] = float(np.percentile(rerank_latencies, 50)) if rerank_latencies else 0.0
+
+    # ru_maxrss บน Linux มีหน่วยเป็น KB
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result["doc_vectors"] = np.asarray(doc_vectors)
+    result["query_vectors"] = np.asarray(query_vectors)
+    result["rerank_scores"] = rerank_scores
+    result_queue.put(result)
+
+
+def top_k_indices(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    from core.config import settings
+    from utils.helper_functions import create_synthetic_document
+
+    parser = argparse.ArgumentParser(description="Benchmark torch / onnx / onnx-int8 inference backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--top-k", type=int, default=settings.QDRANT_TOP_K)
+    parser.add_argument("--max-queries", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.data_dir)
+    if not corpus:
+        print(f"❌ ไม่พบข้อมูลใน {args.data_dir}")
+        return
+
+    passages = [f"passage: {create_synthetic_document(item)}" for item in corpus]
+    titles = [item["title"] for item in corpus][: args.max_queries]
+    queries = [f"query: {t}" for t in titles]
+    # rerank: ให้แต่ละคำค้นจับคู่กับเอกสารของตัวเอง + เอกสารข้างเคียง (รวม top_k คู่)
+    rerank_pairs = [
+        [[titles[i], create_synthetic_document(corpus[(i + j) % len(corpus)])] for j in range(args.top_k)]
+        for i in range(min(len(titles), 50))
+    ]
+
+    print("\n" + "="*60)
+    print(f"--- ⚡ Inference Backend Benchmark ({len(corpus)} docs, {len(queries)} queries, device={settings.DEVICE}) ---")
+    print("="*60)
+
+    ctx = mp.get_context("spawn")
+    results = {}
+    for backend in args.backends:
+        print(f"\n🔄 Running backend '{backend}'...")
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_backend, args=(backend, passages, queries, rerank_pairs, queue))
+        proc.start()
+        try:
+            results[backend] = queue.get(timeout=3600)
+        except Exception as e:
+            print(f"❌ Backend '{backend}' ล้มเหลว: {e}")
+        proc.join()
+
+    if not results:
+        return
+
+    baseline = results.get("torch")
+    expected = np.arange(len(queries))[:, None]
+
+    header = f"{'backend':<10} {'load s':>7} {'corpus s':>9} {'q p50':>7} {'q p95':>7} {'rr p50':>7} {'RSS MB':>8} {'R@K':>6} {'Ovl@K':>6} {'RR top1':>8}"
+    print("\n" + header)
+    print("-" * len(header))
+    for backend, r in results.items():
+        top = top_k_indices(r["query_vectors"], r["doc_vectors"], args.top_k)
+        recall = float(np.mean(np.any(top == expected, axis=1)))
+
+        overlap = rr_agree = float("nan")
+        if baseline is not None:
+            base_top = top_k_indices(baseline["query_vectors"], baseline["doc_vectors"], args.top_k)
+            overlap = float(np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(top, base_top)]))
+            rr_agree = float(np.mean([
+                int(np.argmax(s) == np.argmax(b)) for s, b in zip(r["rerank_scores"], baseline["rerank_scores"])
+            ])) if r["rerank_scores"] else float("nan")
+
+        print(
+            f"{backend:<10} {r['load_seconds']:>7.1f} {r['corpus_encode_seconds']:>9.2f} "
+            f"{r['query_p50_ms']:>7.1f} {r['query_p95_ms']:>7.1f} {r['rerank_p50_ms']:>7.1f} "
+            f"{r['peak_rss_mb']:>8.0f} {recall:>6.3f} {overlap:>6.3f} {rr_agree:>8.3f}"
+        )
+
+    print("\n(q = query encode ms, rr = rerank ms ต่อ top_k คู่, R@K = recall ด้วยชื่อสถานที่, Ovl@K/RR top1 = เทียบกับ torch fp32)")
+
+
+if __name__ == "__main__":
+    main()
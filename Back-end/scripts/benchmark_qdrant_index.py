@@ -0,0 +1,194 @@
+"""
+Benchmark Qdrant Index: payload index / HNSW (m, ef_construct, hnsw_ef) / scalar int8 quantization
+
+คัดลอกเวกเตอร์ + payload จาก Collection จริง (QDRANT_COLLECTION_NAME) ไปยัง Collection ชั่วคราวตามแต่ละ setting แล้ววัด:
+- Latency: p50/p95 ต่อคำค้น (ใช้เวกเตอร์ของสถานที่สุ่มเป็นคำค้น)
+- Recall@K: เทียบกับการค้นหาแบบ exact (brute force) ภายใต้ filter เดียวกัน
+ทั้งแบบไม่มี filter และแบบกรอง category (must) + ไม่เอา "ข้อมูลอำเภอ" (must_not) เหมือน search_similar
+
+วิธีใช้:
+    python scripts/benchmark_qdrant_index.py
+    python scripts/benchmark_qdrant_index.py --ef 0 32 64 128 --top-k 5 --force-hnsw
+    python scripts/benchmark_qdrant_index.py --m 16 32 --ef-construct 100 200
+
+หมายเหตุ: Collection เล็ก (< indexing_threshold) Qdrant จะค้นหาแบบ full scan เสมอ
+ใช้ --force-hnsw เพื่อบังคับสร้าง HNSW (จำลองตอนข้อมูลโตขึ้น)
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+
+import numpy as np
+
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from qdrant_client import QdrantClient, models
+from core.config import settings
+from core.database.qdrant_manager import PAYLOAD_INDEX_FIELDS, build_hnsw_config, build_quantization_config, build_search_params
+
+BENCH_PREFIX = "__bench_"
+EXCLUDED_CATEGORY = "ข้อมูลอำเภอ"
+
+
+def load_points(client: QdrantClient, collection: str) -> list:
+    points, offset = [], None
+    while True:
+        batch, offset = client.scroll(collection, limit=256, offset=offset, with_payload=True, with_vectors=True)
+        points.extend(batch)
+        if offset is None:
+            return points
+
+
+def wait_until_indexed(client: QdrantClient, collection: str, timeout: float = 600):
+    started = time.time()
+    while time.time() - started < timeout:
+        if client.get_collection(collection).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"⚠️  '{collection}' ยังสร้าง index ไม่เสร็จภายใน {timeout:.0f}s (วัดผลต่อไปตามสถานะปัจจุบัน)")
+
+
+def create_variant(client: QdrantClient, name: str, points: list, m: int, ef_construct: int,
+                   payload_index: bool, quantized: bool, force_hnsw: bool) -> float:
+    """สร้าง Collection ชั่วคราวตาม setting แล้วคืนเวลาที่ใช้ upload + สร้าง index (วินาที)"""
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    hnsw = build_hnsw_config(m, ef_construct)
+    if force_hnsw:
+        hnsw.full_scan_threshold = 1
+    client.create_collection(
+        name,
+        vectors_config=models.VectorParams(
+            size=len(points[0].vector), distance=models.Distance.COSINE, on_disk=quantized and settings.QDRANT_ON_DISK_ORIGINALS
+        ),
+        hnsw_config=hnsw,
+        quantization_config=build_quantization_config(quantized),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1) if force_hnsw else None
+    )
+    if payload_index:
+        for field in PAYLOAD_INDEX_FIELDS:
+            client.create_payload_index(name, field, field_schema=models.PayloadSchemaType.KEYWORD, wait=True)
+
+    started = time.perf_counter()
+    for i in range(0, len(points), 256):
+        client.upsert(name, points=[
+            models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points[i:i + 256]
+        ], wait=True)
+    wait_until_indexed(client, name)
+    return time.perf_counter() - started
+
+
+def category_filter(payload: dict):
+    must = [models.FieldCondition(key="category", match=models.MatchValue(value=payload["category"]))] if payload.get("category") else None
+    must_not = [models.FieldCondition(key="category", match=models.MatchValue(value=EXCLUDED_CATEGORY))]
+    return models.Filter(must=must, must_not=must_not)
+
+
+def run_queries(client: QdrantClient, collection: str, queries: list, filters: list, top_k: int, search_params) -> tuple:
+    client.search(collection, query_vector=queries[0], limit=top_k, search_params=search_params)  # warm-up
+    latencies, results = [], []
+    for vector, query_filter in zip(queries, filters):
+        t0 = time.perf_counter()
+        hits = client.search(
+            collection, query_vector=vector, query_filter=query_filter, limit=top_k,
+            search_params=search_params, with_payload=False
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append([hit.id for hit in hits])
+    return latencies, results
+
+
+def recall_at_k(results: list, truth: list) -> float:
+    scores = [len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t]
+    return float(np.mean(scores)) if scores else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant payload index / HNSW / int8 quantization")
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION_NAME)
+    parser.add_argument("--top-k", type=int, default=settings.QDRANT_TOP_K)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--m", type=int, nargs="+", default=[settings.QDRANT_HNSW_M])
+    parser.add_argument("--ef-construct", type=int, nargs="+", default=[settings.QDRANT_HNSW_EF_CONSTRUCT])
+    parser.add_argument("--ef", type=int, nargs="+", default=[0, 32, 64, 128], help="hnsw_ef ตอนค้นหา (0 = ค่าเริ่มต้น)")
+    parser.add_argument("--force-hnsw", action="store_true", help="บังคับใช้ HNSW แม้ Collection เล็ก")
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบ Collection ชั่วคราวหลังวัดผล")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    client = QdrantClient(
+        host=settings.QDRANT_HOST, port=settings.QDRANT_PORT,
+        grpc_port=settings.QDRANT_GRPC_PORT, prefer_grpc=settings.QDRANT_PREFER_GRPC
+    )
+    points = load_points(client, args.collection)
+    if not points:
+        print(f"❌ ไม่พบข้อมูลใน Collection '{args.collection}'")
+        return
+
+    rng = random.Random(args.seed)
+    sample = rng.sample(points, min(args.queries, len(points)))
+    queries = [p.vector for p in sample]
+    filter_sets = {
+        "none": [None] * len(sample),
+        "category": [category_filter(p.payload or {}) for p in sample],
+    }
+
+    print("\n" + "="*60)
+    print(f"--- 🧭 Qdrant Index Benchmark ({len(points)} points, {len(queries)} queries, top_k={args.top_k}) ---")
+    print("="*60)
+
+    # Ground truth: exact search บน Collection baseline (ไม่มี index / quantization)
+    variants = [("baseline", 16, 100, False, False)]
+    for m in args.m:
+        for ef_construct in args.ef_construct:
+            variants.append((f"m{m}-efc{ef_construct}", m, ef_construct, True, False))
+            variants.append((f"m{m}-efc{ef_construct}-int8", m, ef_construct, True, True))
+
+    created = []
+    try:
+        rows = []
+        truth = {}
+        for label, m, ef_construct, payload_index, quantized in variants:
+            name = f"{args.collection}{BENCH_PREFIX}{label}"
+            print(f"\n🔄 Building '{label}' (payload index={payload_index}, int8={quantized})...")
+            build_seconds = create_variant(client, name, points, m, ef_construct, payload_index, quantized, args.force_hnsw)
+            created.append(name)
+
+            if label == "baseline":
+                exact = models.SearchParams(exact=True)
+                for filter_name, filters in filter_sets.items():
+                    truth[filter_name] = run_queries(client, name, queries, filters, args.top_k, exact)[1]
+
+            for ef in args.ef:
+                params = build_search_params(ef, quantized)
+                for filter_name, filters in filter_sets.items():
+                    latencies, results = run_queries(client, name, queries, filters, args.top_k, params)
+                    rows.append((
+                        label, ef, filter_name, build_seconds,
+                        float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95)),
+                        recall_at_k(results, truth[filter_name])
+                    ))
+    finally:
+        if not args.keep:
+            for name in created:
+                client.delete_collection(name)
+
+    header = f"{'setting':<22} {'hnsw_ef':>7} {'filter':>9} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} {'R@K':>6}"
+    print("\n" + header)
+    print("-" * len(header))
+    for label, ef, filter_name, build_seconds, p50, p95, recall in rows:
+        print(f"{label:<22} {ef or 'default':>7} {filter_name:>9} {build_seconds:>8.2f} {p50:>7.2f} {p95:>7.2f} {recall:>6.3f}")
+
+    print(
+        f"\n(R@K = recall เทียบกับ exact search, int8 = rescore={settings.QDRANT_QUANTIZATION_RESCORE} "
+        f"oversampling={settings.QDRANT_QUANTIZATION_OVERSAMPLING}, baseline = ไม่มี payload index / quantization)"
+    )
+
+
+if __name__ == "__main__":
+    main()
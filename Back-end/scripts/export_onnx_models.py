@@ -0,0 +1,74 @@
+"""
+Export โมเดล Embedding + Re-ranker เป็น ONNX และ ONNX int8 (Dynamic Quantization)
+
+ผลลัพธ์จะถูกเก็บใน settings.ONNX_MODEL_DIR/<model_name> ซึ่ง core/ai_models/model_loader.py
+จะหยิบไปใช้เมื่อตั้ง INFERENCE_BACKEND=onnx หรือ INFERENCE_BACKEND=onnx-int8
+
+ต้องติดตั้ง: pip install "optimum[onnxruntime]"
+
+วิธีใช้:
+    python scripts/export_onnx_models.py                    # export ทั้งสองโมเดล
+    python scripts/export_onnx_models.py --only embedding   # เฉพาะ Embedding
+    python scripts/export_onnx_models.py --quantization avx512_vnni
+"""
+
+import sys
+import os
+import shutil
+import argparse
+
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from sentence_transformers import SentenceTransformer, CrossEncoder, export_dynamic_quantized_onnx_model
+from core.config import settings
+from core.ai_models.model_loader import get_onnx_model_dir
+
+
+def export_model(model_name: str, model_cls, quantization_config: str):
+    save_dir = get_onnx_model_dir(model_name)
+    print(f"\n--- 🏭 Exporting '{model_name}' -> {save_dir} ---")
+
+    if save_dir.exists():
+        print(f"🗑️ Removing old export: {save_dir}")
+        shutil.rmtree(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+
+    # 1. fp32 ONNX (sentence-transformers จะแปลงผ่าน optimum ให้อัตโนมัติ)
+    model = model_cls(model_name, device="cpu", backend="onnx")
+    model.save_pretrained(str(save_dir))
+    print("✅ Saved fp32 ONNX (onnx/model.onnx)")
+
+    # 2. int8 Dynamic Quantization
+    export_dynamic_quantized_onnx_model(
+        model,
+        quantization_config=quantization_config,
+        model_name_or_path=str(save_dir)
+    )
+    print(f"✅ Saved int8 ONNX (onnx/model_qint8_{quantization_config}.onnx)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export embedding/reranker models to ONNX (+int8)")
+    parser.add_argument("--only", choices=["embedding", "reranker"], default=None)
+    parser.add_argument("--quantization", default=settings.ONNX_QUANTIZATION_CONFIG,
+                        help="arm64 | avx2 | avx512 | avx512_vnni (ต้องตรงกับ ONNX_QUANTIZATION_CONFIG)")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("--- ⚡ ONNX Export (Embedding + Re-ranker) ---")
+    print("="*60)
+
+    if args.only in (None, "embedding"):
+        export_model(settings.EMBEDDING_MODEL_NAME, SentenceTransformer, args.quantization)
+    if args.only in (None, "reranker"):
+        export_model(settings.RERANKER_MODEL_NAME, CrossEncoder, args.quantization)
+
+    print("\n" + "="*60)
+    print("✅ Export finished. ตั้งค่า INFERENCE_BACKEND=onnx หรือ onnx-int8 ใน .env เพื่อใช้งาน")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
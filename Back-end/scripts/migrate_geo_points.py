@@ -0,0 +1,50 @@
+import os
+import sys
+import logging
+
+# Add backend to sys.path
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(current_script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from pymongo import UpdateOne
+from core.database.mongodb_manager import MongoDBManager, location_geo_point
+
+logging.basicConfig(level=logging.INFO)
+
+def migrate_geo_points():
+    """
+    เติม field "geo" (GeoJSON Point) ให้ทุกเอกสารใน nan_locations จาก location_data.latitude/longitude
+    แล้วสร้าง 2dsphere index (รันซ้ำได้ - เขียนเฉพาะเอกสารที่ค่า geo เปลี่ยน)
+    """
+    print("🚀 Starting Geo Point Migration...")
+
+    mongo_manager = MongoDBManager()
+    collection = mongo_manager.get_collection("nan_locations")
+
+    if collection is None:
+        print("❌ Failed to get collection.")
+        return
+
+    operations = []
+    missing = 0
+    for doc in collection.find({}, {"location_data": 1, "geo": 1}):
+        geo = location_geo_point(doc.get("location_data"))
+        if geo is None:
+            missing += 1
+        if doc.get("geo") != geo:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"geo": geo}}))
+
+    if operations:
+        result = collection.bulk_write(operations, ordered=False)
+        print(f"✅ Updated geo for {result.modified_count} locations.")
+    else:
+        print("✅ All geo points are up to date.")
+    if missing:
+        print(f"⚠️  {missing} locations have no valid coordinates (excluded from near-me search).")
+
+    if mongo_manager.ensure_geo_index():
+        print("✅ 2dsphere index 'geo_2dsphere' is ready.")
+
+if __name__ == "__main__":
+    migrate_geo_points()
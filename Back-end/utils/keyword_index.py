@@ -0,0 +1,141 @@
+# /utils/keyword_index.py
+"""
+Keyword Index: จับคู่ keyword -> ค่า (เช่น รูปภาพ) โดยไม่ต้องวนเทียบทีละรายการ
+
+- exact    : dict lookup
+- contains : Aho-Corasick หา key ทุกตัวที่อยู่ "ใน" ข้อความในรอบเดียว (O(len(text) + จำนวนที่เจอ))
+- prefix   : Trie หา key ที่ "ขึ้นต้น" ด้วยข้อความ (เช่น "phumin" -> "phumin..." ของ token ใน slug)
+
+key แต่ละตัวมี priority: ถ้า key เดียวกันชี้ไปหลายค่าที่ priority เท่ากัน (กำกวม) จะไม่ใช้ key นั้น
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("children", "fail", "output", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.fail: Optional["_Node"] = None
+        self.output: List[str] = []      # key ที่จบที่ node นี้ (รวมที่ได้จาก fail link)
+        self.terminal: Optional[str] = None
+
+
+class KeywordIndex:
+
+    def __init__(self, min_length: int = 3):
+        self.min_length = min_length
+        self._entries: Dict[str, Tuple[int, Any]] = {}   # key -> (priority, value)
+        self._ambiguous: Dict[str, int] = {}              # key -> priority ที่กำกวม
+        self._root = _Node()
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, value: Any, priority: int = 0):
+        """เพิ่ม key (ต้อง normalize มาแล้ว) ถ้าซ้ำ: priority สูงกว่าชนะ, เท่ากันแต่ค่าต่างกัน = กำกวม"""
+        if not key or len(key) < self.min_length:
+            return
+        if self._ambiguous.get(key, -1) >= priority:
+            return
+        current = self._entries.get(key)
+        if current is None or priority > current[0]:
+            self._entries[key] = (priority, value)
+            self._ambiguous.pop(key, None)
+        elif priority == current[0] and value != current[1]:
+            del self._entries[key]
+            self._ambiguous[key] = priority
+        self._built = False
+
+    def build(self):
+        """สร้าง Trie + fail links (Aho-Corasick) จาก key ทั้งหมด"""
+        root = _Node()
+        for key in self._entries:
+            node = root
+            for ch in key:
+                node = node.children.setdefault(ch, _Node())
+            node.terminal = key
+            node.output.append(key)
+
+        queue = deque()
+        for child in root.children.values():
+            child.fail = root
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in node.children.items():
+                fail = node.fail
+                while fail is not None and ch not in fail.children:
+                    fail = fail.fail
+                child.fail = fail.children[ch] if fail is not None else root
+                child.output = child.output + child.fail.output
+                queue.append(child)
+
+        self._root = root
+        self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def exact(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def find_contained(self, text: str) -> List[str]:
+        """key ทั้งหมดที่ปรากฏอยู่ใน text (Aho-Corasick)"""
+        self._ensure_built()
+        found = []
+        node = self._root
+        for ch in text:
+            while node is not self._root and ch not in node.children:
+                node = node.fail
+            node = node.children.get(ch, self._root)
+            found.extend(node.output)
+        return found
+
+    def find_prefixed(self, text: str, limit: int = 20) -> List[str]:
+        """key ที่ขึ้นต้นด้วย text (เดิน Trie ไปถึง node ของ text แล้วเก็บ key ใต้ node นั้น)"""
+        self._ensure_built()
+        node = self._root
+        for ch in text:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        # BFS: key ที่สั้นกว่า (ใกล้ text กว่า) มาก่อน
+        keys = []
+        queue = deque([node])
+        while queue and len(keys) < limit:
+            current = queue.popleft()
+            if current.terminal:
+                keys.append(current.terminal)
+            queue.extend(current.children.values())
+        return keys
+
+    def match(self, text: str) -> Optional[Tuple[str, Any]]:
+        """
+        หา (key, value) ที่ตรงที่สุด: exact -> key ยาวที่สุดที่อยู่ใน text -> key สั้นที่สุดที่ขึ้นต้นด้วย text
+        """
+        if not text:
+            return None
+        value = self.exact(text)
+        if value is not None:
+            return text, value
+
+        contained = self.find_contained(text)
+        if contained:
+            key = max(contained, key=lambda k: (len(k), self._entries[k][0]))
+            return key, self._entries[key][1]
+
+        if len(text) >= self.min_length:
+            prefixed = self.find_prefixed(text)
+            if prefixed:
+                key = min(prefixed, key=lambda k: (len(k), -self._entries[k][0], k))
+                return key, self._entries[key][1]
+        return None
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
@@ -0,0 +1,43 @@
+# /utils/rate_limiter.py
+"""
+Token Bucket Rate Limiter (async)
+ใช้แทนการ asyncio.sleep แบบตายตัว: ยิง request ได้ทันทีตราบที่ยังมี token เหลือ
+และจะรอเฉพาะตอนที่ token หมดเท่านั้น (token เติมกลับด้วยอัตรา rate ต่อวินาที)
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Args:
+        rate: จำนวน token ที่เติมกลับต่อวินาที (= request ต่อวินาทีในระยะยาว)
+        capacity: จำนวน token สูงสุด (= burst ที่ยิงติดกันได้ทันที)
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """รอจนกว่าจะมี token พอ แล้วหัก token ออก"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
@@ -0,0 +1,83 @@
+# /utils/ttl_cache.py
+"""
+TTL Cache แบบ Stale-While-Revalidate (async, in-process)
+- ข้อมูลยังสด (อายุ < ttl)            -> คืนค่าทันที
+- ข้อมูลเก่าแต่ยังใช้ได้ (< ttl + stale_ttl) -> คืนค่าเก่าทันที แล้วโหลดใหม่ใน background
+- ไม่มีข้อมูล/หมดอายุ                  -> รอโหลดใหม่ (คำขอพร้อมกันใช้การโหลดครั้งเดียวกัน)
+ถ้าโหลดใหม่ล้มเหลว (loader คืน None) จะเก็บค่าเดิมไว้ ไม่ทับด้วย None
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class SWRCache:
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float):
+        self.ttl = ttl_seconds
+        self.stale = stale_seconds
+        self._entries: Dict[str, tuple] = {}           # key -> (value, stored_at)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_failures": 0}
+
+    def _age(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    async def _load(self, key: str, loader: Loader):
+        self.stats["refreshes"] += 1
+        try:
+            value = await loader()
+        except Exception as e:
+            logger.error(f"❌ [SWRCache] โหลด '{key}' ล้มเหลว: {e}")
+            value = None
+        if value is None:
+            self.stats["refresh_failures"] += 1
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+        self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _refresh(self, key: str, loader: Loader) -> asyncio.Task:
+        """เริ่มโหลดใหม่ (ถ้ายังไม่มีใครโหลดอยู่) - single flight ต่อ key"""
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        return task
+
+    async def get(self, key: str, loader: Loader):
+        age = self._age(key)
+        if age is not None and age < self.ttl:
+            self.stats["hits"] += 1
+            return self._entries[key][0]
+        if age is not None and age < self.ttl + self.stale:
+            self.stats["stale_hits"] += 1
+            self._refresh(key, loader)
+            return self._entries[key][0]
+
+        self.stats["misses"] += 1
+        # shield: ถ้าผู้เรียกถูก cancel (เช่น timeout) การโหลดยังทำต่อให้คนอื่นใช้
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def peek(self, key: str, loader: Optional[Loader] = None):
+        """
+        อ่านค่าจาก cache อย่างเดียว (ไม่รอ network)
+        ถ้าให้ loader มาด้วย และข้อมูลเก่า/ไม่มี จะสั่งโหลดใหม่ใน background
+        """
+        age = self._age(key)
+        if loader is not None and (age is None or age >= self.ttl):
+            self._refresh(key, loader)
+        if age is None or age >= self.ttl + self.stale:
+            return None
+        return self._entries[key][0]
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "entries": len(self._entries), "inflight": len(self._inflight)}
@@ -0,0 +1,154 @@
+"""
+Model Host - Shared Model-Serving Process
+
+โหลดโมเดล Embedding (e5-large), Re-ranker (CrossEncoder) และ Local Whisper (ถ้าเปิดใช้)
+เพียงครั้งเดียว แล้วให้ FastAPI (ทุก uvicorn worker) และ LINE Worker เรียกใช้ร่วมกันผ่าน
+Unix socket (MODEL_HOST_SOCKET) หรือ Local HTTP (MODEL_HOST_URL)
+
+- /embed      : encode ข้อความ (รวม batch ข้ามทุก client ด้วย EmbeddingBatcher)
+- /rerank     : ให้คะแนนคู่ (query, document) ด้วย CrossEncoder
+- /transcribe : แปลงเสียงเป็นข้อความด้วย Local Whisper (MODEL_HOST_WHISPER=true)
+- /health     : พร้อมใช้งาน (โหลดโมเดลเสร็จแล้ว) - start_*.sh รอ endpoint นี้ก่อนเริ่ม Backend
+- /info, /stats
+
+วิธีใช้:
+    python workers/model_host.py
+    แล้วตั้ง USE_MODEL_HOST=true ใน .env ของ process อื่นๆ
+"""
+
+import sys
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+# Ensure we can import from core
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from typing import List
+
+from core.config import settings
+from core.ai_models.model_loader import load_embedding_model, load_reranker_model
+from core.ai_models.remote_models import encode_array
+from core.database.embedding_batcher import EmbeddingBatcher
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("ModelHost")
+logging.getLogger("sentence_transformers").setLevel(logging.WARNING)
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+class RerankRequest(BaseModel):
+    pairs: List[List[str]]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"🚀 Starting Model Host (backend: {settings.INFERENCE_BACKEND}, device: {settings.DEVICE})...")
+
+    # allow_remote=False: ตัว Host เองต้องโหลดโมเดลจริงเสมอ
+    app.state.embedder = load_embedding_model(allow_remote=False)
+    app.state.reranker = load_reranker_model(allow_remote=False)
+    app.state.batcher = EmbeddingBatcher(
+        lambda texts: app.state.embedder.encode(
+            texts, batch_size=settings.EMBEDDING_BATCH_MAX_SIZE, convert_to_tensor=False, show_progress_bar=False
+        ),
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+    )
+    # CrossEncoder ไม่ thread-safe ร้อยเปอร์เซ็นต์ และ CPU ก็มีจำกัด ให้ทำทีละงาน
+    app.state.rerank_lock = asyncio.Lock()
+
+    app.state.speech_handler = None
+    if settings.MODEL_HOST_WHISPER:
+        from core.ai_models.speech_handler import speech_handler_instance
+        app.state.speech_handler = speech_handler_instance
+        await speech_handler_instance.local_engine.preload()
+        logger.info(f"✅ Local Whisper loaded ({speech_handler_instance.local_engine.backend})")
+
+    logger.info("✅ Model Host ready")
+    yield
+    await app.state.batcher.close()
+    if app.state.speech_handler is not None:
+        app.state.speech_handler.local_engine.shutdown()
+    logger.info("✅ Model Host stopped")
+
+
+app = FastAPI(title="Nan AI Guide - Model Host", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    # lifespan โหลดโมเดลเสร็จก่อนเริ่มรับ request -> ตอบได้ = พร้อมใช้งาน
+    return {"status": "ok"}
+
+
+@app.get("/info")
+async def info(request: Request):
+    return {
+        "embedding_model": settings.EMBEDDING_MODEL_NAME,
+        "reranker_model": settings.RERANKER_MODEL_NAME,
+        "dimension": request.app.state.embedder.get_sentence_embedding_dimension(),
+        "backend": settings.INFERENCE_BACKEND,
+        "device": settings.DEVICE,
+        "whisper": request.app.state.speech_handler is not None,
+    }
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    handler = request.app.state.speech_handler
+    return {
+        "embedding": request.app.state.batcher.get_stats(),
+        "whisper": handler.local_engine.get_stats() if handler is not None else None,
+    }
+
+
+@app.post("/embed")
+async def embed(body: EmbedRequest, request: Request):
+    if not body.texts:
+        return {"shape": [0, 0], "data": ""}
+    vectors = await request.app.state.batcher.encode_many(body.texts)
+    return encode_array(vectors)
+
+
+@app.post("/rerank")
+async def rerank(body: RerankRequest, request: Request):
+    if not body.pairs:
+        return {"scores": []}
+    async with request.app.state.rerank_lock:
+        scores = await asyncio.to_thread(request.app.state.reranker.predict, body.pairs, show_progress_bar=False)
+    return {"scores": [float(s) for s in scores]}
+
+
+@app.post("/transcribe")
+async def transcribe(request: Request):
+    handler = request.app.state.speech_handler
+    if handler is None:
+        raise HTTPException(status_code=503, detail="Local Whisper is disabled (MODEL_HOST_WHISPER=false)")
+
+    audio_bytes = await request.body()
+    if not audio_bytes:
+        return {"text": ""}
+
+    text = await handler.local_engine.transcribe(audio_bytes)
+    return {"text": text}
+
+if __name__ == "__main__":
+    # workers=1 เสมอ: จุดประสงค์คือโหลดโมเดลชุดเดียวให้ทุก process ใช้ร่วมกัน
+    if settings.MODEL_HOST_SOCKET:
+        if os.path.exists(settings.MODEL_HOST_SOCKET):
+            os.remove(settings.MODEL_HOST_SOCKET)
+        logger.info(f"🔌 Listening on unix://{settings.MODEL_HOST_SOCKET}")
+        uvicorn.run(app, uds=settings.MODEL_HOST_SOCKET, workers=1)
+    else:
+        parsed = urlparse(settings.MODEL_HOST_URL)
+        logger.info(f"🔌 Listening on {settings.MODEL_HOST_URL}")
+        uvicorn.run(app, host=parsed.hostname or "127.0.0.1", port=parsed.port or 9191, workers=1)
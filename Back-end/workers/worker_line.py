@@ -1,31 +1,45 @@
 """
 LINE Worker - Consumer for LINE Message Queue
 
-This worker pulls messages from Redis queue, processes them with RAG Orchestrator,
-and sends rich responses back to LINE users with support for:
+This worker pulls messages from a Redis Stream (consumer group + ack), processes them
+with RAG Orchestrator, and sends rich responses back to LINE users with support for:
 - Text messages
 - Image carousels
 - Location messages with Google Maps links
 - YouTube song cards
 - Source reference cards
+
+Concurrency model:
+- One reader does batch dequeue (XREADGROUP count=N) and dispatches by user_id
+- LINE_WORKER_CONCURRENCY consumers run in parallel; messages of the same user always
+  go to the same consumer, so one user's messages stay sequential
+- A message is XACKed only after it was handled; a message that fails is moved to the
+  dead-letter stream (line_msg_dead) first, and messages left pending by a dead worker
+  (or whose dead-lettering failed) are reclaimed with XAUTOCLAIM
+- LINE API calls are async (AsyncLineBotApi + aiohttp)
 """
 
 import sys
 import os
+import time
+import zlib
 import asyncio
 import logging
+from collections import deque
 from dotenv import load_dotenv
 
 # Ensure we can import from core
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.database.redis_client import redis_client
+import aiohttp
+from core.database.redis_client import AsyncRedisQueue
 from core.database.mongodb_manager import MongoDBManager
 from core.database.qdrant_manager import QdrantManager
 from core.ai_models.query_interpreter import QueryInterpreter
 from core.ai_models.rag_orchestrator import RAGOrchestrator
 from core.services.line_message_builder import LineMessageBuilder
-from linebot import LineBotApi
+from linebot import AsyncLineBotApi
+from linebot.aiohttp_async_http_client import AiohttpAsyncHttpClient
 from linebot.models import TextSendMessage
 from linebot.exceptions import LineBotApiError
 
@@ -38,96 +52,246 @@ LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 if not LINE_CHANNEL_ACCESS_TOKEN:
     logger.warning("⚠️ LINE_CHANNEL_ACCESS_TOKEN not set! Worker will fail to reply.")
 
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN) if LINE_CHANNEL_ACCESS_TOKEN else None
-
 # Base URL for static files (for image URLs)
 STATIC_BASE_URL = os.getenv("LINE_STATIC_BASE_URL", "")
 
+# Concurrency / Queue settings
+WORKER_CONCURRENCY = int(os.getenv("LINE_WORKER_CONCURRENCY", 4))   # จำนวน consumer ที่ทำงานพร้อมกัน
+DEQUEUE_BATCH_SIZE = int(os.getenv("LINE_WORKER_BATCH_SIZE", 10))   # ดึงจาก Stream ครั้งละกี่ข้อความ
+SHARD_QUEUE_SIZE = 20                                               # Backpressure ต่อ consumer
+STALE_MESSAGE_MS = 60000                                            # Pending นานเกินนี้ถือว่า worker ตาย
+METRICS_INTERVAL_SECONDS = 60
+METRICS_KEY = "line_worker:metrics"
+
+line_bot_api = None  # AsyncLineBotApi (สร้างใน main() เพราะต้องใช้ aiohttp session ใน event loop)
+local_message_ids = set()  # ข้อความที่อยู่ใน process นี้แล้ว (กันไม่ให้ reclaim ซ้ำตอน backlog ยาว)
+
+
+class QueueMetrics:
+    """เก็บสถิติ Queue Lag (เวลาตั้งแต่ Webhook ใส่คิว จนถึงเริ่มประมวลผล) และเวลาประมวลผล"""
+
+    def __init__(self, window: int = 500):
+        self.lags = deque(maxlen=window)
+        self.durations = deque(maxlen=window)
+        self.processed = 0
+        self.failed = 0
+        self.reclaimed = 0
+        self.push_fallbacks = 0
+        self.in_flight = 0
+
+    def observe_lag(self, enqueued_at: float):
+        if enqueued_at:
+            self.lags.append(max(0.0, time.time() - enqueued_at))
+
+    @staticmethod
+    def _percentile(values, pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def snapshot(self) -> dict:
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+            "push_fallbacks": self.push_fallbacks,
+            "in_flight": self.in_flight,
+            "lag_p50_s": round(self._percentile(self.lags, 0.5), 3),
+            "lag_p95_s": round(self._percentile(self.lags, 0.95), 3),
+            "lag_max_s": round(max(self.lags), 3) if self.lags else 0.0,
+            "process_p50_s": round(self._percentile(self.durations, 0.5), 3),
+            "process_p95_s": round(self._percentile(self.durations, 0.95), 3),
+        }
+
+
+metrics = QueueMetrics()
+
+
+async def send_reply(reply_token: str, user_id: str, messages) -> None:
+    """ตอบกลับผ่าน reply token ถ้า token หมดอายุ (> 30 วินาที) ใช้ push message แทน"""
+    try:
+        await line_bot_api.reply_message(reply_token, messages)
+        logger.info("✅ Reply sent to LINE successfully!")
+    except LineBotApiError as e:
+        logger.error(f"❌ LINE API Error: {e.status_code} - {e.error.message}")
+        if e.status_code == 400 and "Invalid reply token" in str(e.error.message):
+            logger.info("⏱️ Reply token expired, attempting push message...")
+            metrics.push_fallbacks += 1
+            try:
+                await line_bot_api.push_message(user_id, messages)
+                logger.info("✅ Push message sent successfully!")
+            except LineBotApiError as push_err:
+                logger.error(f"❌ Push message also failed: {push_err.error.message}")
+
 
 async def process_message(orchestrator: RAGOrchestrator, data: dict) -> None:
     """
     Process a single message from the queue and reply via LINE.
+    Re-raises processing errors (after telling the user) so the consumer can dead-letter the message.
     """
     user_id = data.get("user_id")
     text = data.get("text")
     reply_token = data.get("reply_token")
-    
+
     logger.info(f"📩 Received message from {user_id}: {text}")
-    
+
     try:
         # Call AI with LINE-specific intent routing
         response = await orchestrator.answer_query(
-            query=text, 
+            query=text,
             session_id=user_id,
             frontend_intent="LINE"  # Let orchestrator know this is from LINE
         )
-        
+
         # Log the response structure for debugging
         logger.info(f"🔍 Response keys: {response.keys() if isinstance(response, dict) else 'N/A'}")
-        
+
         # Build LINE messages from the response
         messages = LineMessageBuilder.build_response_messages(
             response=response,
             base_url=STATIC_BASE_URL
         )
-        
+
         if not messages:
             # Fallback: If no messages were built, create a simple text reply
             answer = "ขออภัยครับ ไม่สามารถประมวลผลคำตอบได้"
             if isinstance(response, dict):
                 answer = response.get("answer", answer)
             messages = [TextSendMessage(text=answer)]
-        
+
         # Log what we're sending
         logger.info(f"📤 Sending {len(messages)} message(s) to LINE:")
         for i, msg in enumerate(messages):
             msg_type = type(msg).__name__
             logger.info(f"   [{i+1}] {msg_type}")
-        
+
         # Send reply via LINE API
         if line_bot_api:
-            try:
-                line_bot_api.reply_message(reply_token, messages)
-                logger.info("✅ Reply sent to LINE successfully!")
-            except LineBotApiError as e:
-                logger.error(f"❌ LINE API Error: {e.status_code} - {e.error.message}")
-                # If reply token expired (> 30 seconds), try push message instead
-                if e.status_code == 400 and "Invalid reply token" in str(e.error.message):
-                    logger.info("⏱️ Reply token expired, attempting push message...")
-                    try:
-                        line_bot_api.push_message(user_id, messages)
-                        logger.info("✅ Push message sent successfully!")
-                    except LineBotApiError as push_err:
-                        logger.error(f"❌ Push message also failed: {push_err.error.message}")
+            await send_reply(reply_token, user_id, messages)
         else:
             logger.error("❌ Cannot reply: LINE_CHANNEL_ACCESS_TOKEN missing.")
-            
+
     except Exception as ai_err:
+        metrics.failed += 1
         logger.error(f"❌ AI Processing Error: {ai_err}", exc_info=True)
         # Send error message to user
         if line_bot_api:
             try:
                 error_msg = TextSendMessage(text="ขออภัยครับ เกิดข้อผิดพลาดในการประมวลผล กรุณาลองใหม่อีกครั้งนะครับ 🙏")
-                line_bot_api.reply_message(reply_token, error_msg)
-            except:
+                await line_bot_api.reply_message(reply_token, error_msg)
+            except Exception:
                 pass  # Best effort
+        raise
+
+
+def shard_for(user_id: str) -> int:
+    """เลือก consumer จาก user_id (stable hash) เพื่อรักษาลำดับข้อความของผู้ใช้คนเดียวกัน"""
+    return zlib.crc32((user_id or "").encode("utf-8")) % WORKER_CONCURRENCY
+
+
+async def consumer(index: int, shard_queue: asyncio.Queue, queue: AsyncRedisQueue, orchestrator: RAGOrchestrator):
+    while True:
+        message_id, data, enqueued_at = await shard_queue.get()
+        metrics.observe_lag(enqueued_at)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        error = None
+        try:
+            await process_message(orchestrator, data)
+            metrics.processed += 1
+        except Exception as e:
+            error = e
+        finally:
+            metrics.in_flight -= 1
+            metrics.durations.append(time.perf_counter() - started)
+
+        # ACK เฉพาะข้อความที่สำเร็จ / ข้อความที่ล้มเหลวย้ายไป dead-letter ก่อน ACK
+        # (ถ้าย้ายไม่สำเร็จจะค้าง Pending แล้วถูก reclaim มาทำใหม่)
+        try:
+            if error is None:
+                await queue.ack(message_id)
+            else:
+                await queue.dead_letter(message_id, data, repr(error))
+                logger.warning(f"☠️ [Consumer {index}] Moved {message_id} to dead-letter stream: {error}")
+        except Exception as ack_err:
+            logger.error(f"❌ [Consumer {index}] ACK failed for {message_id}: {ack_err}")
+        finally:
+            local_message_ids.discard(message_id)
+            shard_queue.task_done()
+
+
+async def dispatch(messages: list, shard_queues: list):
+    for message_id, data, enqueued_at in messages:
+        if message_id in local_message_ids:
+            continue
+        local_message_ids.add(message_id)
+        await shard_queues[shard_for(data.get("user_id"))].put((message_id, data, enqueued_at))
+
+
+async def reader(queue: AsyncRedisQueue, shard_queues: list):
+    """Batch dequeue จาก Stream แล้วกระจายให้ consumer ตาม user_id"""
+    while True:
+        try:
+            messages = await queue.read_batch(count=DEQUEUE_BATCH_SIZE, block_ms=5000)
+            if messages:
+                logger.info(f"📥 Dequeued {len(messages)} message(s)")
+                await dispatch(messages, shard_queues)
+        except Exception as e:
+            logger.error(f"❌ Worker Loop Error: {e}", exc_info=True)
+            await asyncio.sleep(5)
+
+
+async def reclaimer(queue: AsyncRedisQueue, shard_queues: list):
+    """รับช่วงข้อความที่ค้าง Pending (worker อื่นตายกลางทาง)"""
+    while True:
+        try:
+            stale = await queue.claim_stale(min_idle_ms=STALE_MESSAGE_MS, count=DEQUEUE_BATCH_SIZE)
+            stale = [m for m in stale if m[0] not in local_message_ids]
+            if stale:
+                logger.warning(f"♻️ Reclaimed {len(stale)} stale message(s)")
+                metrics.reclaimed += len(stale)
+                await dispatch(stale, shard_queues)
+        except Exception as e:
+            logger.error(f"❌ Reclaim Error: {e}")
+        await asyncio.sleep(STALE_MESSAGE_MS / 2000)
+
+
+async def metrics_reporter(queue: AsyncRedisQueue, shard_queues: list):
+    """Log + บันทึกสถิติ Queue Lag ลง Redis hash (line_worker:metrics) เป็นระยะ"""
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL_SECONDS)
+        try:
+            snapshot = metrics.snapshot()
+            snapshot.update(await queue.group_stats())
+            snapshot["local_backlog"] = sum(q.qsize() for q in shard_queues)
+            snapshot["updated_at"] = round(time.time(), 3)
+            logger.info(f"📊 [Queue Metrics] {snapshot}")
+            await queue.client.hset(
+                f"{METRICS_KEY}:{queue.consumer_name}",
+                mapping={k: str(v) for k, v in snapshot.items()}
+            )
+            await queue.client.expire(f"{METRICS_KEY}:{queue.consumer_name}", METRICS_INTERVAL_SECONDS * 5)
+        except Exception as e:
+            logger.error(f"❌ Metrics Error: {e}")
 
 
 async def main():
+    global line_bot_api
     logger.info("🚀 Starting LINE Worker (Full Feature Mode)...")
-    
+
     logger.info("📦 Initializing Managers...")
     mongo_manager = MongoDBManager()
     qdrant_manager = QdrantManager()
     query_interpreter = QueryInterpreter()
-    
+
     logger.info("⚙️ Initializing RAG Orchestrator...")
     orchestrator = RAGOrchestrator(
         mongo_manager=mongo_manager,
         qdrant_manager=qdrant_manager,
         query_interpreter=query_interpreter
     )
-    
+
     # Init DB connections (Async)
     try:
         logger.info("🔌 Connecting to Qdrant...")
@@ -136,24 +300,39 @@ async def main():
     except Exception as e:
         logger.error(f"❌ Failed to init Qdrant: {e}")
 
+    session = aiohttp.ClientSession()
+    if LINE_CHANNEL_ACCESS_TOKEN:
+        line_bot_api = AsyncLineBotApi(LINE_CHANNEL_ACCESS_TOKEN, AiohttpAsyncHttpClient(session))
+
+    queue = AsyncRedisQueue()
+    await queue.ensure_group()
+    moved = await queue.migrate_legacy_queue()
+    if moved:
+        logger.info(f"📦 Moved {moved} message(s) from legacy list queue to stream")
+
+    shard_queues = [asyncio.Queue(maxsize=SHARD_QUEUE_SIZE) for _ in range(WORKER_CONCURRENCY)]
+
     print("\n" + "="*60)
     print("✅ LINE Worker (Full Feature Mode) is ready!")
     print("   รองรับ: ข้อความ | รูปภาพ | แผนที่ | เพลง | การ์ดอ้างอิง")
     print("   (ส่งข้อความในไลน์ได้เลยครับ)")
     print("="*60 + "\n")
-    logger.info("⌛ Waiting for messages from Redis queue...")
+    logger.debug(f"Consumers: {WORKER_CONCURRENCY} | Batch: {DEQUEUE_BATCH_SIZE} | Consumer: {queue.consumer_name}")
+    logger.info("⌛ Waiting for messages from Redis stream...")
 
-    while True:
-        try:
-            # Use asyncio.to_thread to run the blocking Redis pop
-            data = await asyncio.to_thread(redis_client.pop_message)
-            
-            if data:
-                await process_message(orchestrator, data)
-                
-        except Exception as e:
-            logger.error(f"❌ Worker Loop Error: {e}", exc_info=True)
-            await asyncio.sleep(5)
+    tasks = [asyncio.create_task(consumer(i, q, queue, orchestrator)) for i, q in enumerate(shard_queues)]
+    tasks.append(asyncio.create_task(reader(queue, shard_queues)))
+    tasks.append(asyncio.create_task(reclaimer(queue, shard_queues)))
+    tasks.append(asyncio.create_task(metrics_reporter(queue, shard_queues)))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await session.close()
+        await queue.close()
+        await qdrant_manager.close()
 
 
 if __name__ == "__main__":
@@ -117,6 +117,7 @@ class AlertHandler {
                 break;
 
             case 'pong':
+            case 'heartbeat':
                 // Connection alive
                 break;
 
@@ -0,0 +1,65 @@
+#!/bin/bash
+# ============================================
+# 🧩 scripts/start_model_host.sh - Shared Model Host helper
+# ============================================
+# ใช้ด้วย `source` จาก start_*.sh: ถ้า USE_MODEL_HOST=true ใน Back-end/.env
+# จะเริ่ม workers/model_host.py แล้วรอจน /health ตอบ (โหลดโมเดลเสร็จ) ก่อนเริ่ม Backend / Worker
+# ไม่พร้อมภายใน MODEL_HOST_START_TIMEOUT วินาที -> คืนค่า error (client จะไม่แอบโหลดโมเดลเองทีละ process)
+# ============================================
+
+# ค่าจาก environment ก่อน แล้วค่อยดูใน .env (เหมือน load_dotenv ที่ไม่ทับตัวแปรที่ตั้งไว้แล้ว)
+_model_host_setting() {
+    local key="$1" default="$2" line
+    if [ -n "${!key+x}" ]; then
+        echo "${!key}"
+        return
+    fi
+    line=$(grep -E "^${key}=" "$MODEL_HOST_ENV_FILE" 2>/dev/null | tail -1)
+    if [ -z "$line" ]; then
+        echo "$default"
+        return
+    fi
+    line="${line#*=}"
+    line="${line%\"}"; line="${line#\"}"
+    line="${line%\'}"; line="${line#\'}"
+    echo "$line"
+}
+
+_model_host_ready() {
+    if [ -n "$1" ]; then
+        curl -sf --max-time 2 --unix-socket "$1" http://model-host/health > /dev/null 2>&1
+    else
+        curl -sf --max-time 2 "$2/health" > /dev/null 2>&1
+    fi
+}
+
+# start_model_host [ENV_FILE] - ตั้ง MODEL_HOST_PID เมื่อเริ่ม process
+start_model_host() {
+    MODEL_HOST_ENV_FILE="${1:-Back-end/.env}"
+    local enabled socket url timeout waited=0
+    enabled=$(_model_host_setting USE_MODEL_HOST false)
+    if [ "${enabled,,}" != "true" ]; then
+        return 0
+    fi
+    socket=$(_model_host_setting MODEL_HOST_SOCKET /tmp/nan_model_host.sock)
+    url=$(_model_host_setting MODEL_HOST_URL http://127.0.0.1:9191)
+    timeout=$(_model_host_setting MODEL_HOST_START_TIMEOUT 300)
+
+    echo -e "\n${GREEN}🧩 Starting Model Host (shared Embedding/Re-ranker)...${NC}"
+    (cd Back-end && PYTHONPATH=$(pwd) exec python3 workers/model_host.py) &
+    MODEL_HOST_PID=$!
+
+    until _model_host_ready "$socket" "$url"; do
+        if ! kill -0 "$MODEL_HOST_PID" 2>/dev/null; then
+            echo -e "${RED}❌ Model Host exited during startup (see log above).${NC}"
+            return 1
+        fi
+        if [ "$waited" -ge "$timeout" ]; then
+            echo -e "${RED}❌ Model Host not ready after ${timeout}s (MODEL_HOST_START_TIMEOUT).${NC}"
+            return 1
+        fi
+        sleep 2
+        waited=$((waited + 2))
+    done
+    echo -e "${GREEN}✅ Model Host ready (${waited}s)${NC}"
+}
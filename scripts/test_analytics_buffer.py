@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test Script: AnalyticsBuffer retry
+ทดสอบว่า batch ที่เขียนได้บางส่วน (BulkWriteError) หรือ timeout หลัง server commit แล้ว
+ไม่วนค้างหน้าคิวด้วย E11000 duplicate key
+"""
+
+import asyncio
+import sys
+import os
+import uuid
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Back-end'))
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import core.services.analytics_buffer as analytics_buffer_module
+from core.services.analytics_buffer import AnalyticsBuffer
+
+
+class FakeCollection:
+    """จำลอง insert_many(ordered=False) ของ MongoDB: _id ซ้ำ = E11000, index ใน fail_first = error ครั้งแรก"""
+
+    def __init__(self, fail_first=(), fail_always=(), timeout_after_commit=False):
+        self.docs = {}
+        self.calls = 0
+        self.fail_first = set(fail_first)
+        self.fail_always = set(fail_always)
+        self.timeout_after_commit = timeout_after_commit
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        errors = []
+        for index, doc in enumerate(documents):
+            doc.setdefault("_id", uuid.uuid4().hex)  # เหมือน pymongo: ใส่ _id ลงใน dict ของผู้เรียก
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+            elif doc["event"] in self.fail_always or (self.calls == 1 and doc["event"] in self.fail_first):
+                errors.append({"index": index, "code": 121, "errmsg": "Document failed validation"})
+            else:
+                self.docs[doc["_id"]] = doc
+        if self.timeout_after_commit and self.calls == 1:
+            raise AutoReconnect("connection closed after write")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+
+
+def _buffer_with(collection: FakeCollection) -> AnalyticsBuffer:
+    analytics_buffer_module.get_async_db = lambda: {AnalyticsBuffer.COLLECTION_NAME: collection}
+    buffer = AnalyticsBuffer(max_size=100, batch_size=10, flush_interval_ms=60000)
+    for event in ("a", "b", "c"):
+        buffer.submit({"event": event})
+    return buffer
+
+
+def test_partial_bulk_write_requeues_only_failed_docs():
+    async def run():
+        collection = FakeCollection(fail_first={"b"})
+        buffer = _buffer_with(collection)
+
+        assert await buffer._flush_batch() is False
+        assert [doc["event"] for doc in buffer._buffer] == ["b"]
+        assert buffer.stats["written"] == 2
+
+        assert await buffer._flush_batch() is True
+        assert len(buffer._buffer) == 0
+        assert buffer.stats["written"] == 3
+        assert sorted(doc["event"] for doc in collection.docs.values()) == ["a", "b", "c"]
+        await buffer.stop()
+
+    asyncio.run(run())
+
+
+def test_retry_after_ambiguous_write_treats_duplicates_as_written():
+    async def run():
+        collection = FakeCollection(timeout_after_commit=True)
+        buffer = _buffer_with(collection)
+
+        assert await buffer._flush_batch() is False
+        assert len(buffer._buffer) == 3  # ไม่รู้ว่าเขียนไปแล้วหรือยัง -> คืนทั้ง batch (_id เดิม)
+
+        assert await buffer._flush_batch() is True  # ทุกตัว E11000 = เขียนไปแล้ว
+        assert len(buffer._buffer) == 0
+        assert buffer.stats["written"] == 3
+        assert len(collection.docs) == 3
+        await buffer.stop()
+
+    asyncio.run(run())
+
+
+def test_permanent_write_error_is_dropped_after_max_attempts():
+    async def run():
+        collection = FakeCollection(fail_always={"b"})
+        buffer = _buffer_with(collection)
+
+        for _ in range(AnalyticsBuffer.MAX_WRITE_ATTEMPTS):
+            await buffer._flush_batch()
+        assert len(buffer._buffer) == 0
+        assert buffer.stats["written"] == 2
+        assert buffer.stats["dropped"] == 1
+        assert buffer._write_attempts == {}
+        await buffer.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for test in (
+        test_partial_bulk_write_requeues_only_failed_docs,
+        test_retry_after_ambiguous_write_treats_duplicates_as_written,
+        test_permanent_write_error_is_dropped_after_max_attempts,
+    ):
+        test()
+        print(f"✅ {test.__name__}: PASSED")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test Script: News deduplicate
+ทดสอบการตัดข่าวซ้ำ (URL + SimHash หัวข้อ) ว่าไม่ทิ้งข่าวต่างเรื่องที่หัวข้อขึ้นต้นเหมือนกัน
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Back-end'))
+
+from core.services.news_monitor_service import NewsMonitorService, normalize_url
+
+
+def test_stories_sharing_a_prefix_are_kept():
+    items = [
+        {"source": "duckduckgo", "title": "น่าน - น้ำป่าไหลหลากท่วมบ้านเรือนริมน้ำ อำเภอบ่อเกลือ", "url": "https://a.example/1"},
+        {"source": "duckduckgo", "title": "น่าน - ไฟป่าลุกลามบนดอยภูคา เจ้าหน้าที่เร่งดับไฟ", "url": "https://b.example/2"},
+    ]
+    assert len(NewsMonitorService.deduplicate(items)) == 2
+
+
+def test_same_story_from_two_publishers_is_merged():
+    items = [
+        {"source": "gnews", "title": "น้ำป่าไหลหลากท่วมบ้านเรือนริมน้ำ อำเภอบ่อเกลือ - Thai PBS", "publisher": "Thai PBS", "url": "https://a.example/1"},
+        {"source": "gnews", "title": "น้ำป่าไหลหลากท่วมบ้านเรือนริมน้ำ อำเภอบ่อเกลือ - ไทยรัฐ", "publisher": "ไทยรัฐ", "url": "https://b.example/2"},
+    ]
+    assert len(NewsMonitorService.deduplicate(items)) == 1
+
+
+def test_short_titles_are_not_simhashed():
+    items = [
+        {"source": "duckduckgo", "title": "ข่าวน่าน", "url": "https://a.example/1"},
+        {"source": "duckduckgo", "title": "ข่าวน่าน!", "url": "https://b.example/2"},
+    ]
+    assert len(NewsMonitorService.deduplicate(items)) == 2
+
+
+def test_items_without_url_do_not_collide():
+    assert normalize_url("") == ""
+    items = [
+        {"source": "duckduckgo", "title": "น้ำป่าไหลหลากท่วมบ้านเรือนริมน้ำ อำเภอบ่อเกลือ", "url": ""},
+        {"source": "duckduckgo", "title": "ไฟป่าลุกลามบนดอยภูคา เจ้าหน้าที่เร่งดับไฟ", "url": ""},
+    ]
+    assert len(NewsMonitorService.deduplicate(items)) == 2
+
+
+if __name__ == "__main__":
+    for test in (
+        test_stories_sharing_a_prefix_are_kept,
+        test_same_story_from_two_publishers_is_merged,
+        test_short_titles_are_not_simhashed,
+        test_items_without_url_do_not_collide,
+    ):
+        test()
+        print(f"✅ {test.__name__}: PASSED")
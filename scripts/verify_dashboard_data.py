@@ -2,19 +2,21 @@
 import sys
 import os
 import json
+import asyncio
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Back-end")))
 
-from core.database.mongodb_manager import MongoDBManager
+from core.database.async_mongo import close_async_client, get_async_db
+from core.services.analytics_rollup_service import analytics_rollup_service
 
-def verify_dashboard_data():
+async def verify_dashboard_data():
     try:
-        mongo = MongoDBManager()
-        print(f"✅ Connected to Database: {mongo.db.name}")
+        print(f"✅ Connected to Database: {get_async_db().name}")
         
-        # Test get_analytics_summary
-        summary = mongo.get_analytics_summary(days=30)
+        # สรุป Dashboard มาจาก rollup (อัปเดต rollup ก่อน เผื่อ API server ไม่ได้รันอยู่)
+        await analytics_rollup_service.refresh()
+        summary = await analytics_rollup_service.get_summary(days=30)
         
         print("\n📊 Dashboard Data Summary:")
         print(f"   - Total Conversations: {summary.get('total_conversations')}")
@@ -30,6 +32,8 @@ def verify_dashboard_data():
 
     except Exception as e:
         print(f"❌ Error: {e}")
+    finally:
+        await close_async_client()
 
 if __name__ == "__main__":
-    verify_dashboard_data()
+    asyncio.run(verify_dashboard_data())
@@ -15,6 +15,9 @@ cleanup() {
     if [ -n "$BACKEND_PID" ]; then
         kill $BACKEND_PID 2>/dev/null
     fi
+    if [ -n "$MODEL_HOST_PID" ]; then
+        kill $MODEL_HOST_PID 2>/dev/null
+    fi
     exit
 }
 trap cleanup SIGINT SIGTERM
@@ -37,19 +40,21 @@ if [ -n "$PID" ]; then
     sleep 1
 fi
 
-# 2. Start Python Backend
+# 3. Activate venv if exists, otherwise assume system python
+if [ -d "Back-end/venv" ]; then
+    source Back-end/venv/bin/activate
+elif [ -d ".venv-robot" ]; then
+    source .venv-robot/bin/activate
+fi
+
+# 4. Start shared Model Host (optional: USE_MODEL_HOST=true in Back-end/.env) and wait until /health responds
+source scripts/start_model_host.sh
+start_model_host "Back-end/.env" || cleanup
+
+# 5. Start Python Backend
 echo -e "\n${GREEN}🐍 Starting Python Backend (Port 9090)...${NC}"
 cd Back-end
-# Activate venv if exists, otherwise assume system python
-if [ -d "venv" ]; then
-    source venv/bin/activate
-    ./venv/bin/python3 -m uvicorn api.main:app --host 0.0.0.0 --port 9090 --reload &
-elif [ -d "../.venv-robot" ]; then
-    source ../.venv-robot/bin/activate
-    ../.venv-robot/bin/python3 -m uvicorn api.main:app --host 0.0.0.0 --port 9090 --reload &
-else
-    python3 -m uvicorn api.main:app --host 0.0.0.0 --port 9090 --reload &
-fi
+python3 -m uvicorn api.main:app --host 0.0.0.0 --port 9090 --reload &
 BACKEND_PID=$!
 cd ..
 echo -e "${GREEN}✅ Python Backend started (PID: $BACKEND_PID)${NC}"
@@ -91,6 +91,10 @@ else
     echo -e "${YELLOW}⚠️ .env file not found at $ENV_FILE${NC}"
 fi
 
+# 6.5 Start shared Model Host (optional: USE_MODEL_HOST=true in .env) and wait until /health responds
+source scripts/start_model_host.sh
+start_model_host "$ENV_FILE" || cleanup
+
 # 7. Start Python Backend
 echo -e "\n${GREEN}🐍 Starting Python Backend (port $BACKEND_PORT)...${NC}"
 cd Back-end
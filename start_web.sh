@@ -41,7 +41,11 @@ elif [ -d "Back-end/venv" ]; then
     echo -e "${GREEN}✅ Virtual environment activated (Back-end/venv)${NC}"
 fi
 
-# 3. Start Python Backend
+# 3. Start shared Model Host (optional: USE_MODEL_HOST=true in Back-end/.env) and wait until /health responds
+source scripts/start_model_host.sh
+start_model_host "Back-end/.env" || cleanup
+
+# 4. Start Python Backend
 echo -e "\n${GREEN}🐍 Starting Python Backend (port 9090)...${NC}"
 cd Back-end
 python3 -m uvicorn api.main:app --host 0.0.0.0 --port 9090 --reload &